@@ -0,0 +1,136 @@
+"""
+Import Time Benchmark - Cold-start cost per entry point
+
+Imports each entry point in a fresh interpreter (python -X importtime) and
+reports the median import time, the slowest third-party packages and which
+heavy dependencies (torch, faiss, sentence_transformers, langgraph, ...) got
+loaded. Results can be saved as JSON and compared against a baseline.
+
+Usage:
+    python -m benchmarks.bench_import_time --runs 5
+    python -m benchmarks.bench_import_time --entry dataset_cli --entry rag_cli
+    python -m benchmarks.bench_import_time --output imports.json --compare imports_before.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+
+ENTRY_POINTS = {
+    "api": "design_system_agent.api.main",
+    "api_router": "design_system_agent.api.router",
+    "dataset_cli": "design_system_agent.core.dataset_genertor.dataset_generator_controller",
+    "rag_cli": "design_system_agent.agent.core.vector_layout_rag",
+    "graph": "design_system_agent.agent.layout_graph_agent",
+}
+
+HEAVY_PACKAGES = (
+    "torch", "faiss", "sentence_transformers", "transformers",
+    "langgraph", "langchain_openai", "openai", "tiktoken",
+)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PROJECT_PACKAGE = "design_system_agent"
+
+
+def import_once(module: str):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        (wall ms, {third-party package: cumulative us}, heavy packages loaded)
+    """
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    packages = {}
+    heavy = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        root = raw_name.strip().split(".")[0]
+        if root in HEAVY_PACKAGES:
+            heavy.add(root)
+        # Largest cumulative entry of a package = its first (paying) import, wherever it happened
+        if root != PROJECT_PACKAGE:
+            packages[root] = max(packages.get(root, 0), int(cumulative))
+    return wall_ms, packages, heavy
+
+
+def bench_entry(module: str, runs: int):
+    walls = []
+    heavy_loaded = set()
+    package_samples = defaultdict(list)
+    for _ in range(runs):
+        wall_ms, packages, heavy = import_once(module)
+        walls.append(wall_ms)
+        heavy_loaded |= heavy
+        for package, cumulative_us in packages.items():
+            package_samples[package].append(cumulative_us / 1000)
+
+    slowest = sorted(
+        ((package, statistics.median(values)) for package, values in package_samples.items()),
+        key=lambda item: item[1], reverse=True
+    )[:8]
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": round(statistics.median(walls), 1),
+        "min_ms": round(min(walls), 1),
+        "heavy_loaded": sorted(heavy_loaded),
+        "slowest_packages_ms": {package: round(ms, 1) for package, ms in slowest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time per entry point")
+    parser.add_argument("--entry", action="append", choices=sorted(ENTRY_POINTS), help="Entry point(s) to measure (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per entry point")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"\n{'ENTRY':<14}{'MEDIAN ms':>11}{'MIN ms':>10}  HEAVY DEPENDENCIES LOADED")
+    print("-" * 90)
+    for name in args.entry or ENTRY_POINTS:
+        results[name] = bench_entry(ENTRY_POINTS[name], args.runs)
+        row = results[name]
+        print(f"{name:<14}{row['median_ms']:>11}{row['min_ms']:>10}  {', '.join(row['heavy_loaded']) or '-'}")
+
+    print("\nSlowest third-party packages (cumulative ms):")
+    for name, row in results.items():
+        top = ", ".join(f"{package} {ms:.0f}" for package, ms in list(row["slowest_packages_ms"].items())[:5])
+        print(f"  {name:<12} {top}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n{'ENTRY':<14}{'BASE ms':>10}{'NOW ms':>10}{'CHANGE':>9}")
+        print("-" * 43)
+        for name, row in results.items():
+            if name in baseline:
+                base = baseline[name]["median_ms"]
+                change = (row["median_ms"] - base) / base * 100
+                print(f"{name:<14}{base:>10}{row['median_ms']:>10}{change:>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
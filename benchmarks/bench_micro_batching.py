@@ -0,0 +1,95 @@
+"""
+Micro-Batching Benchmark - Encoder / cross-encoder throughput under concurrency
+
+Each simulated search embeds 3 query variations and reranks 20 candidate
+pairs, like VectorLayoutRAGEngine.search. Searches run from N threads with
+batching off (each thread calls the models itself) and on (MicroBatcher),
+and the script reports searches per second and latency percentiles.
+
+Loads the real models (all-MiniLM-L6-v2, ms-marco-MiniLM-L-6-v2).
+
+Usage:
+    python -m benchmarks.bench_micro_batching
+    python -m benchmarks.bench_micro_batching --concurrency 1,8,32 --searches 400 --wait-ms 3
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from benchmarks.load_test import latency_summary
+from design_system_agent.agent.core.micro_batcher import MicroBatcher
+
+
+QUERIES = [
+    "show all leads", "open cases by priority", "account dashboard with revenue metrics",
+    "contacts created this week", "opportunity pipeline by stage", "list of overdue tasks",
+]
+CANDIDATES = [f"{obj} {view}" for obj in ("lead", "account", "case", "contact", "opportunity")
+              for view in ("list", "table", "summary card", "dashboard")]
+
+
+def search_once(i: int, encode, rerank):
+    query = QUERIES[i % len(QUERIES)]
+    encode([query, f"{query} view", f"display {query}"])
+    rerank([[query, candidate] for candidate in CANDIDATES])
+
+
+def run_level(concurrency: int, searches: int, encode, rerank) -> Dict:
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def one(i):
+        started = time.perf_counter()
+        search_once(i, encode, rerank)
+        with lock:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(searches)))
+    elapsed = time.perf_counter() - started
+    return {"throughput_rps": round(searches / elapsed, 1), **latency_summary(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encoder / cross-encoder throughput with and without micro-batching")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="Comma-separated thread counts")
+    parser.add_argument("--searches", type=int, default=200, help="Searches per run")
+    parser.add_argument("--max-batch", type=int, default=64, help="Items per batch")
+    parser.add_argument("--wait-ms", type=float, default=2, help="Batch collection window")
+    args = parser.parse_args()
+
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+    reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+    def encode_batch(texts):
+        return embedding_model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+    def rerank_batch(pairs):
+        return reranker.predict(pairs, batch_size=len(pairs))
+
+    encode_batcher = MicroBatcher("embedding", encode_batch, args.max_batch, args.wait_ms, enabled=True)
+    rerank_batcher = MicroBatcher("reranker", rerank_batch, args.max_batch, args.wait_ms, enabled=True)
+    modes = {
+        "direct": (encode_batch, rerank_batch),
+        "batched": (encode_batcher.run, rerank_batcher.run),
+    }
+
+    search_once(0, encode_batch, rerank_batch)  # first-inference overhead
+    print(f"\n{'THREADS':>8}{'MODE':>9}{'SEARCH/s':>10}{'P50 ms':>9}{'P95 ms':>9}{'SPEEDUP':>9}")
+    print("-" * 54)
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        rows = {mode: run_level(concurrency, args.searches, *fns) for mode, fns in modes.items()}
+        for mode, row in rows.items():
+            speedup = row["throughput_rps"] / rows["direct"]["throughput_rps"]
+            print(f"{concurrency:>8}{mode:>9}{row['throughput_rps']:>10}{row['p50_ms']:>9}{row['p95_ms']:>9}{speedup:>8.2f}x")
+
+    print(f"\nBatches: embedding {encode_batcher.stats()}, reranker {rerank_batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Model Routing Benchmark - Latency and cost per LLM route
+
+Runs generated CRM queries through the graph and groups node timings, LLM
+calls and estimated cost by the route each node took (see model_router.py).
+
+Usage:
+    python -m benchmarks.bench_model_routing --queries 50
+    LLM_ROUTING_CONFIG=routing.json python -m benchmarks.bench_model_routing --output routing.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from design_system_agent.agent.layout_graph_agent import GraphAgent
+from design_system_agent.agent.core.llm_usage import start_usage_tracking
+from design_system_agent.agent.core.model_router import get_model_router
+from design_system_agent.core.dataset_genertor.crm_dataset.crm_queries import generate_full_dataset
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_query(agent, query):
+    """Run one query node by node; returns (node durations in ms, routes, usage)"""
+    usage = start_usage_tracking()
+    durations = {}
+    final_state = {}
+
+    start = last = time.perf_counter()
+    for chunk in agent.graph.stream(agent._create_initial_state(query), stream_mode="updates"):
+        now = time.perf_counter()
+        for node, update in chunk.items():
+            durations[node] = (now - last) * 1000
+            final_state = update or final_state
+        last = now
+    durations["total"] = (time.perf_counter() - start) * 1000
+
+    return durations, final_state.get("routes", {}), usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and cost per model route")
+    parser.add_argument("--queries", type=int, default=30, help="Number of generated queries")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for query generation")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    queries = generate_full_dataset(total=args.queries)
+    agent = GraphAgent(verbose=False)
+    router = get_model_router()
+
+    # (node, route name, model) -> samples
+    stats = defaultdict(lambda: {"latency_ms": [], "calls": 0, "cost_usd": 0.0, "requests": 0})
+    totals = []
+
+    for query in queries:
+        durations, routes, usage = run_query(agent, query)
+        totals.append(durations["total"])
+        for node, route in routes.items():
+            node_usage = usage["by_node"].get(node, {})
+            entry = stats[(node, route["name"], route["model"] or "no LLM")]
+            entry["requests"] += 1
+            entry["latency_ms"].append(durations.get(node, 0.0))
+            entry["calls"] += node_usage.get("calls", 0)
+            entry["cost_usd"] += router.estimate_cost(route["model"], node_usage) if node_usage else 0.0
+
+    results = []
+    print(f"\n{'NODE':<26}{'ROUTE':<24}{'MODEL':<14}{'N':>5}{'P50 ms':>10}{'P95 ms':>10}{'CALLS':>7}{'$/REQ':>11}")
+    print("-" * 107)
+    for (node, name, model), entry in sorted(stats.items()):
+        latencies = entry["latency_ms"]
+        row = {
+            "node": node,
+            "route": name,
+            "model": model,
+            "requests": entry["requests"],
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "llm_calls": entry["calls"],
+            "cost_per_request_usd": round(entry["cost_usd"] / entry["requests"], 6),
+        }
+        results.append(row)
+        print(f"{node:<26}{name:<24}{model:<14}{row['requests']:>5}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['llm_calls']:>7}{row['cost_per_request_usd']:>11.6f}")
+
+    print(f"\nRequests: {len(totals)} | total p50 {statistics.median(totals):.1f} ms | p95 {percentile(totals, 95):.1f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"queries": args.queries, "seed": args.seed, "routes": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
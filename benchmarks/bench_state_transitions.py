@@ -0,0 +1,141 @@
+"""
+State Transition Benchmark - Per-node-transition overhead of AgentState
+
+Runs a LangGraph StateGraph(AgentState) with the seven workflow nodes as
+passthroughs (each returns the whole state, like WorkflowExecutor's nodes),
+so the measured time is LangGraph's copy / merge of the state between nodes.
+Compares two state shapes, both built from the real layout catalog:
+- full : layout dicts in retrieved_layouts, selected_layout, adapted_layout
+         and outcome["layout"], analysis with generated_queries
+         (the state before reference-based passing)
+- slim : score records and layout IDs, bodies in the layout store
+         (see layout_store.py)
+
+Each shape runs without and with a checkpointer (MemorySaver), which
+serializes the state at every transition like a persistent checkpointer.
+
+Usage:
+    python -m benchmarks.bench_state_transitions
+    python -m benchmarks.bench_state_transitions --runs 500 --candidates 3
+"""
+import argparse
+import copy
+import pickle
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.load_test import percentile
+from design_system_agent.agent.core.layout_store import LayoutStore
+from design_system_agent.agent.models import AgentState
+
+
+NODES = ["plan_tasks", "normalize_query", "analyze_and_reformulate", "retrieve_layouts",
+         "fetch_data", "llm_select_and_fill", "score_output"]
+
+METADATA_PATH = Path(__file__).parent.parent / "design_system_agent" / "vector_index" / "crm_layouts_metadata.pkl"
+
+
+def load_catalog() -> List[Dict]:
+    with open(METADATA_PATH, "rb") as f:
+        metadata = pickle.load(f)
+    return [{
+        "id": f"crm_{idx}",
+        "query": entry["query"],
+        "object_type": entry["object_type"],
+        "layout_type": entry["layout_type"],
+        "patterns_used": entry["patterns_used"],
+        "layout": entry["layout"],
+        "metadata_info": entry["metadata"],
+    } for idx, entry in enumerate(metadata)]
+
+
+def build_states(catalog: List[Dict], candidates: int) -> Dict[str, AgentState]:
+    """Final state of one request in both shapes"""
+    scored = [{**entry, "vector_score": 0.8, "rerank_score": 4.2, "final_score": 2.5, "matched_query": entry["query"],
+               "has_required_components": True, "missing_components": [], "component_match_boost": 0.3,
+               "required_view_type": "list"} for entry in catalog[:candidates]]
+    filled = {"id": scored[0]["id"], "layout": copy.deepcopy(scored[0]["layout"]), "score": 2.5,
+              "query": scored[0]["query"], "metadata": {"filled_with_data": True}}
+    queries = [f"{scored[0]['query']} variation {i}" for i in range(3)]
+    analysis = {"normalized_query": scored[0]["query"], "intent": "list", "object_type": "lead",
+                "layout_type": "list", "pattern_type": "LIST_SIMPLE", "confidence": 0.9}
+    base = {
+        "query": scored[0]["query"], "normalized_query": scored[0]["query"],
+        "rag_query": {"search_query": queries[0], "search_queries": queries, "confidence": 0.9, "object_type": "lead"},
+        "layout_ranking": {"confidence": 0.9, "reasoning": "Top candidate", "is_adapted": False, "adaptations": []},
+        "output_score": {"overall_score": 0.9}, "messages": [], "task_plan": None, "current_task_index": 0,
+        "fetched_data": {}, "routes": {}, "deadline": None, "degraded": [], "tier": "full", "events": [],
+        "progress": 1.0, "error": None,
+    }
+
+    store = LayoutStore(catalog={entry["id"]: entry for entry in catalog}.get)
+    layout_id = store.put(filled)
+    return {
+        "full": {
+            **base, "layout_store": None, "analysis": {**analysis, "generated_queries": queries},
+            "retrieved_layouts": scored, "selected_layout": filled, "adapted_layout": filled,
+            "outcome": {"success": True, "layout": filled, "data": {}, "score": 0.9},
+        },
+        "slim": {
+            **base, "layout_store": "store_1", "analysis": analysis,
+            "retrieved_layouts": [store.record(candidate) for candidate in scored],
+            "selected_layout": layout_id, "adapted_layout": layout_id,
+            "outcome": {"success": True, "layout": layout_id, "score": 0.9},
+        },
+    }
+
+
+def build_graph(checkpointer=None):
+    from langgraph.graph import END, StateGraph
+
+    workflow = StateGraph(AgentState)
+    for node in NODES:
+        workflow.add_node(node, lambda state: state)
+    workflow.set_entry_point(NODES[0])
+    for current, following in zip(NODES, NODES[1:]):
+        workflow.add_edge(current, following)
+    workflow.add_edge(NODES[-1], END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def serialized_bytes(state: AgentState) -> int:
+    """Size of the state as a checkpointer stores it (no sharing between equal dicts)"""
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    return len(JsonPlusSerializer().dumps_typed(state)[1])
+
+
+def measure(state: AgentState, runs: int, checkpointed: bool) -> Dict[str, float]:
+    """p50 / p95 of the graph time per transition (us)"""
+    from langgraph.checkpoint.memory import MemorySaver
+
+    graph = build_graph(MemorySaver() if checkpointed else None)
+    transitions = len(NODES)
+    latencies = []
+    for run in range(runs + 10):
+        config = {"configurable": {"thread_id": f"run-{run}"}} if checkpointed else None
+        started = time.perf_counter()
+        graph.invoke(state, config)
+        if run >= 10:  # warm-up
+            latencies.append((time.perf_counter() - started) * 1e6 / transitions)
+    return {"p50_us": percentile(latencies, 50), "p95_us": percentile(latencies, 95)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="Graph executions per configuration")
+    parser.add_argument("--candidates", type=int, default=3, help="Retrieved layouts in the state (full tier: 3)")
+    args = parser.parse_args()
+
+    states = build_states(load_catalog(), args.candidates)
+    print(f"{'state':6} {'checkpointer':13} {'state bytes':>12} {'p50 us/transition':>18} {'p95 us/transition':>18}")
+    for checkpointed in (False, True):
+        for shape, state in states.items():
+            summary = measure(state, args.runs, checkpointed)
+            print(f"{shape:6} {'MemorySaver' if checkpointed else '-':13} {serialized_bytes(state):>12} "
+                  f"{summary['p50_us']:>18.1f} {summary['p95_us']:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
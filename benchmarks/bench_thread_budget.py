@@ -0,0 +1,104 @@
+"""
+Thread Budget Benchmark - Search latency of several workers sharing the CPUs
+
+Starts W worker processes (like gunicorn workers) that each run searches
+from T threads (embed 3 query variations + rerank 20 pairs, see
+bench_micro_batching.py). Runs once with the library defaults (every pool
+sized to all cores) and once with the per-worker thread budget
+(thread_budget.py), and reports latency percentiles and total throughput.
+
+Loads the real models (all-MiniLM-L6-v2, ms-marco-MiniLM-L-6-v2) in every worker.
+
+Usage:
+    python -m benchmarks.bench_thread_budget
+    python -m benchmarks.bench_thread_budget --workers 4 --threads 8 --searches 100
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from benchmarks.bench_micro_batching import search_once
+from benchmarks.load_test import latency_summary
+
+
+def worker(mode: str, workers: int, threads: int, searches: int, start, results):
+    if mode == "budget":
+        from design_system_agent.agent.core.thread_budget import apply_thread_budget
+
+        apply_thread_budget(workers)  # env before torch is imported
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    if mode == "budget":
+        apply_thread_budget(workers)  # torch pools
+    import torch
+
+    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+    reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+    def encode(texts):
+        return embedding_model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+    def rerank(pairs):
+        return reranker.predict(pairs, batch_size=len(pairs))
+
+    search_once(0, encode, rerank)  # first-inference overhead
+    start.wait()
+
+    latencies: List[float] = []
+
+    def one(i):
+        started = time.perf_counter()
+        search_once(i, encode, rerank)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(searches)))
+    results.put({"latencies": latencies, "torch_threads": torch.get_num_threads()})
+
+
+def run_mode(mode: str, workers: int, threads: int, searches: int) -> Dict:
+    context = multiprocessing.get_context("spawn")  # fresh interpreter, env applies before torch import
+    start = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, workers, threads, searches, start, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    start.wait()
+    started = time.perf_counter()
+    reports = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = [ms for report in reports for ms in report["latencies"]]
+    return {
+        "torch_threads": reports[0]["torch_threads"],
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        **latency_summary(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency with default thread pools vs the per-worker budget")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent searches per worker")
+    parser.add_argument("--searches", type=int, default=50, help="Searches per worker")
+    args = parser.parse_args()
+
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "TOKENIZERS_PARALLELISM", "WORKER_THREADS"):
+        os.environ.pop(name, None)  # defaults run must see the library defaults
+
+    print(f"\n{args.workers} workers x {args.threads} concurrent searches, {os.cpu_count()} CPUs")
+    print(f"{'MODE':>9}{'TORCH THR':>11}{'SEARCH/s':>10}{'P50 ms':>9}{'P95 ms':>9}{'P99 ms':>9}")
+    print("-" * 57)
+    for mode in ("default", "budget"):
+        row = run_mode(mode, args.workers, args.threads, args.searches)
+        print(f"{mode:>9}{row['torch_threads']:>11}{row['throughput_rps']:>10}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Worker Memory Benchmark - Per-worker memory with and without model preload
+
+Starts gunicorn (design_system_agent/api/gunicorn_conf.py) once per mode,
+waits until the workers are ready, sends some queries so copy-on-write pages
+that get touched by real requests are accounted for, and reads
+/proc/<pid>/smaps_rollup of the master and every worker:
+- RSS      : resident pages, shared ones counted in every process
+- PSS      : shared pages split between the processes sharing them
+             (the sum over all processes is the real footprint)
+- private  : pages only this process holds (what each extra worker costs)
+
+Modes:
+- preload    : PRELOAD_MODELS=true, agent built in the master, workers forked after
+- per-worker : PRELOAD_MODELS=false, every worker builds its own agent
+
+Linux only (reads /proc).
+
+Usage:
+    python -m benchmarks.bench_worker_memory --workers 4
+    python -m benchmarks.bench_worker_memory --workers 4 --mode preload --output memory.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+
+MODES = {
+    "preload": {"PRELOAD_MODELS": "true"},
+    "per-worker": {"PRELOAD_MODELS": "false"},
+}
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+GUNICORN_CONF = PROJECT_ROOT / "design_system_agent" / "api" / "gunicorn_conf.py"
+
+
+def read_memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS, shared and private memory of a process in MB (from /proc/<pid>/smaps_rollup)"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(values.get("Rss", 0), 1),
+        "pss_mb": round(values.get("Pss", 0), 1),
+        "shared_mb": round(values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0), 1),
+        "private_mb": round(values.get("Private_Clean", 0) + values.get("Private_Dirty", 0), 1),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children", "r", encoding="utf-8") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_ready(base_url: str, workers: int, timeout_s: float):
+    """Poll /ready until enough consecutive 200s that every worker has likely answered"""
+    deadline = time.monotonic() + timeout_s
+    streak = 0
+    while streak < workers * 3:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Workers not ready after {timeout_s:.0f} s")
+        try:
+            streak = streak + 1 if httpx.get(f"{base_url}/ready", timeout=5).status_code == 200 else 0
+        except httpx.HTTPError:
+            streak = 0
+        if streak == 0:
+            time.sleep(1)
+
+
+def run_mode(mode: str, args) -> Dict:
+    env = {**os.environ, **MODES[mode], "WEB_CONCURRENCY": str(args.workers), "API_PORT": str(args.port)}
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(GUNICORN_CONF), "design_system_agent.api.main:app"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        started = time.perf_counter()
+        wait_ready(base_url, args.workers, args.timeout)
+        ready_s = time.perf_counter() - started
+        for _ in range(args.requests):
+            httpx.post(f"{base_url}/api/v1/query", json={"query": args.query, "deadline_ms": 0}, timeout=60)
+
+        master = read_memory(server.pid)
+        workers = [read_memory(pid) for pid in child_pids(server.pid)]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    def mean(key):
+        return round(sum(w[key] for w in workers) / max(1, len(workers)), 1)
+
+    return {
+        "workers": len(workers),
+        "ready_s": round(ready_s, 1),
+        "master": master,
+        "worker_avg": {key: mean(key) for key in ("rss_mb", "pss_mb", "shared_mb", "private_mb")},
+        "total_pss_mb": round(master["pss_mb"] + sum(w["pss_mb"] for w in workers), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory with and without model preload")
+    parser.add_argument("--workers", type=int, default=4, help="Gunicorn workers")
+    parser.add_argument("--mode", action="append", choices=sorted(MODES), help="Mode(s) to measure (default: both)")
+    parser.add_argument("--port", type=int, default=8011, help="Port for the benchmarked server")
+    parser.add_argument("--requests", type=int, default=20, help="Queries sent before measuring")
+    parser.add_argument("--query", default="show all leads", help="Query sent before measuring")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for readiness")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.mode or MODES:
+        print(f"Measuring {mode} with {args.workers} workers...")
+        results[mode] = run_mode(mode, args)
+
+    print(f"\n{'MODE':<12}{'READY s':>9}{'WORKER RSS':>12}{'WORKER PSS':>12}{'PRIVATE':>10}{'SHARED':>10}{'TOTAL PSS':>11}")
+    print("-" * 76)
+    for mode, row in results.items():
+        avg = row["worker_avg"]
+        print(f"{mode:<12}{row['ready_s']:>9}{avg['rss_mb']:>12}{avg['pss_mb']:>12}"
+              f"{avg['private_mb']:>10}{avg['shared_mb']:>10}{row['total_pss_mb']:>11}")
+
+    if "preload" in results and "per-worker" in results:
+        saved = results["per-worker"]["total_pss_mb"] - results["preload"]["total_pss_mb"]
+        per_worker = results["per-worker"]["worker_avg"]["private_mb"] - results["preload"]["worker_avg"]["private_mb"]
+        print(f"\nPreload saves {saved:.0f} MB in total, {per_worker:.0f} MB private memory per worker")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Load Test - Throughput and tail latency of the FastAPI service
+
+Replays generated CRM queries (generate_full_dataset) against /api/v1/query
+and /api/v1/rag/search with an asyncio load generator and reports
+p50/p95/p99 per endpoint and per graph node (from metrics.nodes_ms of
+/query responses). Results are saved as JSON baselines and can be compared
+against an earlier run.
+
+Arrival modes:
+- closed loop (default): --concurrency workers send requests back to back
+- open loop (--rate N):  Poisson arrivals at N requests/s, at most
+                         --concurrency requests in flight
+
+Run against the local LLM stub so results do not depend on a provider:
+    python -m design_system_agent.api.llm_stub --port 8900
+    LLM_BASE_URL=http://127.0.0.1:8900/v1 uvicorn design_system_agent.api.main:app --port 8000
+
+Usage:
+    python -m benchmarks.load_test --requests 200 --concurrency 8 --output baseline.json
+    python -m benchmarks.load_test --rate 5 --duration 60 --mix query=1,rag=3
+    python -m benchmarks.load_test --requests 200 --compare baseline.json --max-regression 20
+
+Overload with mixed priorities (two runs side by side):
+    python -m benchmarks.load_test --rate 20 --duration 60 --mix query=1 --priority batch
+    python -m benchmarks.load_test --rate 2 --duration 60 --mix query=1 --deadline-ms 8000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from design_system_agent.core.dataset_genertor.crm_dataset.crm_queries import generate_full_dataset
+
+
+ENDPOINTS = {
+    "query": "/api/v1/query",
+    "rag": "/api/v1/rag/search",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """count and p50/p95/p99 (ms) of a list of latencies"""
+    if not values:
+        return {"count": 0}
+    summary = {"count": len(values)}
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(values, pct), 1)
+    return summary
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse an endpoint mix like "query=1,rag=3" into weights"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def build_body(endpoint: str, query: str, args) -> Dict[str, Any]:
+    if endpoint == "query":
+        body = {"query": query}
+        if args.deadline_ms:
+            body["deadline_ms"] = args.deadline_ms
+        if args.priority:
+            body["priority"] = args.priority
+        return body
+    return {"query": query, "top_k": 10, "rerank": True, "final_k": 3}
+
+
+class LoadRecorder:
+    """Collects per-request outcomes during a run"""
+
+    def __init__(self):
+        self.latency_ms = defaultdict(list)        # endpoint -> latencies of successful requests
+        self.node_ms = defaultdict(list)           # graph node -> latencies
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint: str, status: Any, elapsed_ms: float, payload: Optional[Dict] = None):
+        self.statuses[endpoint][str(status)] += 1
+        if status != 200:
+            self.errors[endpoint] += 1
+            return
+        self.latency_ms[endpoint].append(elapsed_ms)
+        nodes = ((payload or {}).get("metrics") or {}).get("nodes_ms") or {}
+        for node, duration in nodes.items():
+            self.node_ms[node].append(duration)
+
+    def summary(self, wall_s: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint in sorted(self.statuses):
+            total = sum(self.statuses[endpoint].values())
+            endpoints[endpoint] = {
+                **latency_summary(self.latency_ms[endpoint]),
+                "requests": total,
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / total, 4) if total else 0.0,
+                "throughput_rps": round(total / wall_s, 2) if wall_s else 0.0,
+                "statuses": dict(self.statuses[endpoint]),
+            }
+        nodes = {node: latency_summary(values) for node, values in self.node_ms.items()}
+        return {"endpoints": endpoints, "nodes": nodes}
+
+
+async def send(client: httpx.AsyncClient, recorder: LoadRecorder, endpoint: str, query: str, args):
+    started = time.perf_counter()
+    try:
+        response = await client.post(ENDPOINTS[endpoint], json=build_body(endpoint, query, args))
+        status, payload = response.status_code, None
+        if status == 200 and endpoint == "query":
+            payload = response.json()
+    except httpx.HTTPError as e:
+        status, payload = type(e).__name__, None
+    recorder.record(endpoint, status, (time.perf_counter() - started) * 1000, payload)
+
+
+async def run_load(args, transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict[str, Any]:
+    """
+    Run one load test and return the results dict (config, endpoints, nodes).
+
+    Args:
+        args: Parsed command line arguments
+        transport: Optional httpx transport (e.g. httpx.ASGITransport for in-process runs)
+    """
+    random.seed(args.seed)
+    queries = generate_full_dataset(total=max(args.requests or 0, 200))
+    weights = parse_mix(args.mix)
+    names, probs = list(weights), list(weights.values())
+    rng = random.Random(args.seed)
+
+    def next_request(i: int):
+        return rng.choices(names, probs)[0], queries[i % len(queries)]
+
+    recorder = LoadRecorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    stop_at = time.perf_counter() + args.duration if args.duration else None
+
+    def more(i: int) -> bool:
+        if args.requests and i >= args.requests:
+            return False
+        return stop_at is None or time.perf_counter() < stop_at
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits, transport=transport) as client:
+        if args.rate:
+            # Open loop: Poisson arrivals, in-flight requests capped by the semaphore
+            slots = asyncio.Semaphore(args.concurrency)
+            tasks, i = [], 0
+
+            async def bounded(endpoint, query):
+                async with slots:
+                    await send(client, recorder, endpoint, query, args)
+
+            while more(i):
+                tasks.append(asyncio.create_task(bounded(*next_request(i))))
+                i += 1
+                await asyncio.sleep(rng.expovariate(args.rate))
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: each worker sends its next request when the previous one returns
+            counter = iter(range(sys.maxsize))
+
+            async def worker():
+                while True:
+                    i = next(counter)
+                    if not more(i):
+                        return
+                    await send(client, recorder, *next_request(i), args)
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    wall_s = time.perf_counter() - started
+    return {
+        "config": {
+            "base_url": args.base_url,
+            "mix": weights,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "requests": args.requests,
+            "duration": args.duration,
+            "seed": args.seed,
+            "deadline_ms": args.deadline_ms,
+            "priority": args.priority,
+        },
+        "wall_s": round(wall_s, 2),
+        **recorder.summary(wall_s),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Percent change of every percentile shared by two runs (endpoints and nodes)"""
+    rows = []
+    for section in ("endpoints", "nodes"):
+        for name, stats in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name, {})
+            for pct in PERCENTILES:
+                key = f"p{pct}_ms"
+                if key in stats and base.get(key):
+                    rows.append({
+                        "section": section,
+                        "name": name,
+                        "metric": key,
+                        "baseline": base[key],
+                        "current": stats[key],
+                        "change_pct": round((stats[key] - base[key]) / base[key] * 100, 1),
+                    })
+    return rows
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"\n{'ENDPOINT':<12}{'REQS':>7}{'ERRORS':>8}{'RPS':>8}{'P50 ms':>10}{'P95 ms':>10}{'P99 ms':>10}")
+    print("-" * 65)
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<12}{stats['requests']:>7}{stats['errors']:>8}{stats['throughput_rps']:>8}"
+              f"{stats.get('p50_ms', '-'):>10}{stats.get('p95_ms', '-'):>10}{stats.get('p99_ms', '-'):>10}")
+
+    if results["nodes"]:
+        print(f"\n{'NODE':<26}{'N':>6}{'P50 ms':>10}{'P95 ms':>10}{'P99 ms':>10}")
+        print("-" * 62)
+        for name, stats in results["nodes"].items():
+            print(f"{name:<26}{stats['count']:>6}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+    print(f"\nWall time: {results['wall_s']} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the design system agent API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Service base URL")
+    parser.add_argument("--mix", default="query=1,rag=1", help="Endpoint weights, e.g. query=1,rag=3")
+    parser.add_argument("--concurrency", type=int, default=4, help="Workers (closed loop) or max in flight (open loop)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Open-loop arrival rate in requests/s (0 = closed loop)")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests (0 = until --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Stop after this many seconds (0 = no limit)")
+    parser.add_argument("--deadline-ms", type=int, help="deadline_ms sent with /query requests")
+    parser.add_argument("--priority", choices=("interactive", "batch", "regeneration"),
+                        help="Admission priority sent with /query requests (429s show up in statuses)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request in seconds")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for queries and the endpoint mix")
+    parser.add_argument("--output", help="Write results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 if any percentile regresses by more than this percent")
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        parser.error("set --requests or --duration")
+
+    results = asyncio.run(run_load(args))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline)
+        print(f"\n{'SECTION':<11}{'NAME':<26}{'METRIC':<8}{'BASE':>10}{'NOW':>10}{'CHANGE':>9}")
+        print("-" * 74)
+        for row in rows:
+            print(f"{row['section']:<11}{row['name']:<26}{row['metric']:<8}{row['baseline']:>10}"
+                  f"{row['current']:>10}{row['change_pct']:>8}%")
+
+        if args.max_regression is not None:
+            regressions = [row for row in rows if row["change_pct"] > args.max_regression]
+            if regressions:
+                print(f"\n{len(regressions)} percentile(s) regressed by more than {args.max_regression}%")
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
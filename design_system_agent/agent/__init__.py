@@ -1,6 +1,21 @@
 """Agent module."""
-from .layout_graph_agent import GraphAgent
+import importlib
+
 from .models import AgentEvent, EventType, AgentState
-from .agent_controller import AgentController
+
+# Loaded on first access: GraphAgent pulls in the whole graph (RAG engine, LLM clients)
+_LAZY_EXPORTS = {
+    "GraphAgent": "layout_graph_agent",
+    "AgentController": "agent_controller",
+}
 
 __all__ = ["GraphAgent", "AgentController", "AgentEvent", "EventType", "AgentState"]
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -1,6 +1,8 @@
 ﻿"""
 Main agent controller using Streaming Agent.
 """
+from typing import Optional
+
 from .layout_graph_agent import GraphAgent
 
 
@@ -11,13 +13,27 @@ class AgentController:
         self.agent = GraphAgent(verbose=False)
         print("AgentController initialized with Streaming Agent")
     
-    def process_query(self, query: str):
+    def process_query(
+        self,
+        query: str,
+        deadline_ms: Optional[int] = None,
+        profile: bool = False,
+        idempotency_key: Optional[str] = None,
+        tier: Optional[str] = None,
+        session_id: Optional[str] = None
+    ):
         """Process query through streaming agent.
         
         Args:
             query: User's natural language query
+            deadline_ms: Optional request latency budget (default: REQUEST_DEADLINE_MS)
+            profile: Request a sampling profile of this query (X-Profile header)
+            idempotency_key: Retries with the same key share one execution (Idempotency-Key header)
+            tier: Force a pipeline tier for testing (X-Tier header, see degradation_tiers.py)
+            session_id: Refinement session the query follows up on (see refinement_sessions.py)
         
         Returns:
             Dict with generated layout and metadata
         """
-        return self.agent.invoke(query)
+        return self.agent.invoke(query, deadline_ms=deadline_ms, profile=profile, idempotency_key=idempotency_key,
+                                 tier=tier, session_id=session_id)
@@ -1,8 +1,73 @@
 ﻿"""
 Core package - Essential utilities for LangGraph agents.
+
+Exports are resolved on first access (PEP 562 module __getattr__), so importing
+one core module (e.g. logging_config) does not load the other core modules
+and their dependencies (langchain_openai via LLMFactory).
 """
-from .llm_factory import LLMFactory
+import importlib
+
+# Exported name -> core module defining it
+_EXPORTS = {
+    "LLMFactory": "llm_factory",
+    "QueryExpander": "query_expander",
+    "get_query_expander": "query_expander",
+    "PromptBudget": "prompt_budget",
+    "count_tokens": "prompt_budget",
+    "compact_json": "prompt_budget",
+    "LLMUsageTracker": "llm_usage",
+    "start_usage_tracking": "llm_usage",
+    "get_current_usage": "llm_usage",
+    "ModelRouter": "model_router",
+    "get_model_router": "model_router",
+    "new_deadline": "deadline",
+    "remaining_ms": "deadline",
+    "has_budget": "deadline",
+    "llm_timeout_s": "deadline",
+    "ResilientLLMCaller": "llm_resilience",
+    "CircuitBreaker": "llm_resilience",
+    "CircuitOpenError": "llm_resilience",
+    "get_resilient_caller": "llm_resilience",
+    "MetricsRegistry": "instrumentation",
+    "get_metrics_registry": "instrumentation",
+    "timed": "instrumentation",
+    "start_request": "instrumentation",
+    "get_request_id": "instrumentation",
+    "RequestProfiler": "request_profiler",
+    "configure_logging": "logging_config",
+    "set_request_log_level": "logging_config",
+    "debug_enabled": "logging_config",
+    "sampled_logger": "logging_config",
+    "MicroBatcher": "micro_batcher",
+    "apply_thread_budget": "thread_budget",
+    "get_thread_budget": "thread_budget",
+    "AdmissionController": "admission_control",
+    "AdmissionRejected": "admission_control",
+    "get_admission_controller": "admission_control",
+    "SingleFlight": "single_flight",
+    "IdempotencyConflict": "single_flight",
+    "get_single_flight": "single_flight",
+    "TierController": "degradation_tiers",
+    "get_tier_controller": "degradation_tiers",
+    "LayoutStore": "layout_store",
+    "open_layout_store": "layout_store",
+    "get_layout_store": "layout_store",
+    "close_layout_store": "layout_store",
+    "SQLiteCheckpointSaver": "graph_checkpoints",
+    "get_graph_checkpointer": "graph_checkpoints",
+    "SessionStore": "refinement_sessions",
+    "get_session_store": "refinement_sessions",
+    "IntentLookupTable": "intent_lookup",
+    "build_intent_table": "intent_lookup",
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "LLMFactory",
-]
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,274 @@
+"""
+Admission Control - Concurrency limit and priority queue for graph requests
+
+Each /query runs the whole layout graph (LLM calls, reranking). Without a
+limit a burst queues unbounded work behind the LLM and every request slows
+down. The controller keeps at most ADMISSION_MAX_CONCURRENT requests in the
+graph per worker and queues the rest by priority:
+- interactive   : user-facing requests (default), served first
+- batch         : bulk / offline traffic
+- regeneration  : re-running earlier queries, served last
+
+A request is rejected up front (HTTP 429 with Retry-After) when
+- the queue is full and nothing of lower priority can be shed, or
+- the estimated wait exceeds its deadline (deadline_ms / REQUEST_DEADLINE_MS)
+and rejected later when its deadline passes while still queued. When the
+queue is full, an arriving request sheds the newest queued request of a lower
+priority instead. The wait estimate is the number of queued requests ahead
+divided by the slots, times the moving average of the graph duration.
+
+Queue depth, active requests, queue wait and rejections are exported on
+/metrics and by get_stats() (GET /api/v1/admission/stats).
+
+All state belongs to the worker's event loop, so no locks are needed.
+
+Environment Variables:
+- ADMISSION_CONTROL        : "false" disables the limit (default: true)
+- ADMISSION_MAX_CONCURRENT : Requests in the graph at once per worker (default: 8)
+- ADMISSION_MAX_QUEUE      : Requests waiting per worker (default: 32)
+
+Usage:
+    controller = get_admission_controller()
+    async with controller.admit("interactive", deadline_ms=5000) as remaining_ms:
+        result = await asyncio.to_thread(agent.process_query, query, deadline_ms=remaining_ms)
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from design_system_agent.agent.core.deadline import DEFAULT_DEADLINE_MS
+from design_system_agent.agent.core.instrumentation import (
+    ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS, get_metrics_registry
+)
+
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "batch": 1, "regeneration": 2}
+
+# Weight of the newest graph duration in the moving average
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; retry_after_s is the suggested Retry-After"""
+
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(f"Request not admitted ({reason}), retry after {retry_after_s:.1f} s")
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after_s)))
+
+
+class _Waiter:
+    __slots__ = ("priority", "future", "enqueued_at")
+
+    def __init__(self, priority: str, future: asyncio.Future):
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class AdmissionController:
+    """
+    Limits concurrent graph requests and queues the rest by priority.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Initialize admission controller
+
+        Args:
+            max_concurrent: Requests admitted at once (default: ADMISSION_MAX_CONCURRENT env var or 8)
+            max_queue: Requests waiting for a slot (default: ADMISSION_MAX_QUEUE env var or 32)
+            enabled: Apply the limit (default: ADMISSION_CONTROL env var)
+        """
+        self.max_concurrent = max(1, max_concurrent if max_concurrent is not None else int(os.getenv("ADMISSION_MAX_CONCURRENT", 8)))
+        self.max_queue = max(0, max_queue if max_queue is not None else int(os.getenv("ADMISSION_MAX_QUEUE", 32)))
+        self.enabled = enabled if enabled is not None else os.getenv("ADMISSION_CONTROL", "true").lower() != "false"
+
+        self.active = 0
+        # (priority rank, sequence, waiter); cancelled / rejected waiters are skipped on pop
+        self._heap: List[tuple] = []
+        self._queued: Dict[str, int] = {name: 0 for name in PRIORITIES}
+        self._sequence = itertools.count()
+        self.service_time_s: Optional[float] = None
+
+        self.stats = {"admitted": 0, "enqueued": 0, "completed": 0, "rejected": 0, "shed": 0}
+
+    # ====================
+    # ADMISSION
+    # ====================
+
+    def estimated_wait_s(self, priority: str = "interactive") -> float:
+        """Expected queue wait for a request of this priority arriving now"""
+        if self.active < self.max_concurrent:
+            return 0.0
+        rank = PRIORITIES[priority]
+        ahead = sum(count for name, count in self._queued.items() if PRIORITIES[name] <= rank)
+        return (ahead // self.max_concurrent + 1) * (self.service_time_s or 0.0)
+
+    @asynccontextmanager
+    async def admit(self, priority: str = "interactive", deadline_ms: Optional[int] = None):
+        """
+        Hold a graph slot for the duration of the block
+
+        Args:
+            priority: "interactive", "batch" or "regeneration"
+            deadline_ms: Latency budget of the request (default: REQUEST_DEADLINE_MS)
+
+        Yields:
+            Budget left for the graph after queueing (ms)
+
+        Raises:
+            AdmissionRejected: queue full, estimated wait over the deadline, or deadline passed while queued
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {list(PRIORITIES)}")
+        if deadline_ms is None:
+            deadline_ms = int(os.getenv("REQUEST_DEADLINE_MS", DEFAULT_DEADLINE_MS))
+        if not self.enabled:
+            yield deadline_ms
+            return
+
+        wait_s = await self._acquire(priority, deadline_ms / 1000)
+        started = time.perf_counter()
+        try:
+            yield max(0, int(deadline_ms - wait_s * 1000))
+        finally:
+            self._release(time.perf_counter() - started)
+
+    async def _acquire(self, priority: str, deadline_s: float) -> float:
+        """Wait for a slot; returns the time spent queued (s)"""
+        ADMISSION_QUEUE_DEPTH.observe(len(self), priority=priority)
+        if self.active < self.max_concurrent and not len(self):
+            self.active += 1
+            self.stats["admitted"] += 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, priority=priority)
+            return 0.0
+
+        wait_s = self.estimated_wait_s(priority)
+        if wait_s > deadline_s:
+            self._reject(priority, "deadline", wait_s)
+        if len(self) >= self.max_queue and not self._shed_below(priority):
+            self._reject(priority, "queue_full", wait_s)
+
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (PRIORITIES[priority], next(self._sequence), waiter))
+        self._queued[priority] += 1
+        self.stats["enqueued"] += 1
+        try:
+            # The slot is handed over by _release (active is not decremented in between)
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=deadline_s)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                self._release(None)  # slot granted just as the deadline passed
+            self._reject(priority, "deadline", self.estimated_wait_s(priority))
+        except asyncio.CancelledError:
+            if not self._abandon(waiter):
+                self._release(None)  # client went away after the slot was granted
+            raise
+        self.stats["admitted"] += 1
+        waited_s = time.perf_counter() - waiter.enqueued_at
+        ADMISSION_WAIT_SECONDS.observe(waited_s, priority=priority)
+        return waited_s
+
+    def _release(self, duration_s: Optional[float]):
+        """Hand the slot to the next queued request, or free it"""
+        if duration_s is not None:
+            self.stats["completed"] += 1
+            self.service_time_s = duration_s if self.service_time_s is None else (
+                SERVICE_TIME_ALPHA * duration_s + (1 - SERVICE_TIME_ALPHA) * self.service_time_s
+            )
+        while self._heap:
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue  # shed or abandoned
+            self._queued[waiter.priority] -= 1
+            waiter.future.set_result(None)
+            return
+        self.active -= 1
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Take a waiter out of the queue; False if it had already been granted a slot"""
+        if not waiter.future.done():
+            waiter.future.cancel()
+            self._queued[waiter.priority] -= 1
+            return True
+        return waiter.future.exception() is not None  # shed
+
+    def _shed_below(self, priority: str) -> bool:
+        """Reject the newest queued request of a lower priority to make room"""
+        rank = PRIORITIES[priority]
+        candidates = [entry for entry in self._heap if entry[0] > rank and not entry[2].future.done()]
+        if not candidates:
+            return False
+        _, _, victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        self._queued[victim.priority] -= 1
+        self.stats["shed"] += 1
+        wait_s = self.estimated_wait_s(victim.priority)
+        ADMISSION_REJECTED.inc(priority=victim.priority, reason="shed")
+        victim.future.set_exception(AdmissionRejected("shed", wait_s))
+        return True
+
+    def _reject(self, priority: str, reason: str, wait_s: float):
+        self.stats["rejected"] += 1
+        ADMISSION_REJECTED.inc(priority=priority, reason=reason)
+        raise AdmissionRejected(reason, max(wait_s, self.service_time_s or 0.0))
+
+    def __len__(self) -> int:
+        return sum(self._queued.values())
+
+    # ====================
+    # STATS
+    # ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": dict(self._queued),
+            "service_time_ms": round(self.service_time_s * 1000, 1) if self.service_time_s is not None else None,
+            "estimated_wait_ms": {name: round(self.estimated_wait_s(name) * 1000, 1) for name in PRIORITIES},
+            **self.stats,
+        }
+
+
+# Singleton instance
+_admission_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    """Get singleton instance of AdmissionController"""
+    global _admission_controller
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
+
+
+def _collect_admission_gauges():
+    """Scrape-time gauges: slots in use and queued requests per priority"""
+    if _admission_controller is None:
+        return {}
+    return {
+        "dsa_admission_active": ("Requests currently in the graph", {"": _admission_controller.active}),
+        "dsa_admission_queued": ("Requests waiting for a graph slot", {
+            f'{{priority="{name}"}}': count for name, count in _admission_controller._queued.items()
+        }),
+    }
+
+
+get_metrics_registry().add_collector(_collect_admission_gauges)
@@ -0,0 +1,81 @@
+"""
+Request Deadline - Latency budget for one pass through the layout graph
+
+The deadline is an absolute wall-clock time (epoch seconds) carried in
+AgentState. Before doing expensive work a node checks how much time is left:
+- enough budget  -> full mode (LLM call with a timeout derived from the budget)
+- short budget   -> degraded mode (skip reranking, top candidate, fallback
+                    layout, heuristic score)
+
+Environment Variables:
+- REQUEST_DEADLINE_MS : Default request deadline (default: 15000)
+- NODE_BUDGETS_MS     : JSON overrides for DEFAULT_NODE_BUDGETS_MS,
+                        e.g. '{"llm_select_and_fill": 6000}'
+"""
+import json
+import os
+import time
+from typing import Dict, Optional
+
+
+DEFAULT_DEADLINE_MS = 15000
+
+# Minimum remaining time (ms) for a node to run in full mode
+DEFAULT_NODE_BUDGETS_MS = {
+    "analyze_and_reformulate": 3000,  # LLM analysis, else keyword analysis
+    "retrieve_layouts": 1000,         # cross-encoder reranking, else vector order
+    "llm_select_and_fill": 4000,      # LLM selection, else top candidate / fallback layout
+    "score_output": 1500,             # LLM scoring, else heuristic score
+}
+
+# Time held back from LLM timeouts so degraded downstream nodes can still finish
+DOWNSTREAM_RESERVE_MS = 500
+
+# Shortest LLM timeout handed out (seconds)
+MIN_LLM_TIMEOUT_S = 0.2
+
+
+def get_node_budgets() -> Dict[str, int]:
+    """Get minimum full-mode budgets per node (defaults merged with NODE_BUDGETS_MS)"""
+    overrides = os.getenv("NODE_BUDGETS_MS")
+    if not overrides:
+        return DEFAULT_NODE_BUDGETS_MS
+    try:
+        return {**DEFAULT_NODE_BUDGETS_MS, **json.loads(overrides)}
+    except ValueError:
+        print("[Deadline] ⚠️  Invalid NODE_BUDGETS_MS, using defaults")
+        return DEFAULT_NODE_BUDGETS_MS
+
+
+def new_deadline(timeout_ms: Optional[int] = None) -> float:
+    """Create a deadline timeout_ms from now (default: REQUEST_DEADLINE_MS)"""
+    if timeout_ms is None:
+        timeout_ms = int(os.getenv("REQUEST_DEADLINE_MS", DEFAULT_DEADLINE_MS))
+    return time.time() + timeout_ms / 1000
+
+
+def remaining_ms(deadline: Optional[float]) -> Optional[float]:
+    """Milliseconds left until the deadline (None when there is no deadline)"""
+    if deadline is None:
+        return None
+    return (deadline - time.time()) * 1000
+
+
+def budget_class(deadline: Optional[float]) -> str:
+    """Coarse budget of a request: "full" when every node can still run in full mode, else "short" """
+    remaining = remaining_ms(deadline)
+    return "full" if remaining is None or remaining >= sum(get_node_budgets().values()) else "short"
+
+
+def has_budget(deadline: Optional[float], node: str) -> bool:
+    """Whether a node has enough time left to run in full mode"""
+    remaining = remaining_ms(deadline)
+    return remaining is None or remaining >= get_node_budgets().get(node, 0)
+
+
+def llm_timeout_s(deadline: Optional[float]) -> Optional[float]:
+    """LLM call timeout in seconds: remaining budget minus the downstream reserve"""
+    remaining = remaining_ms(deadline)
+    if remaining is None:
+        return None
+    return max((remaining - DOWNSTREAM_RESERVE_MS) / 1000, MIN_LLM_TIMEOUT_S)
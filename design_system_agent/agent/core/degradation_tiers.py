@@ -0,0 +1,195 @@
+"""
+Degradation Tiers - Load-adaptive pipeline depth
+
+Under sustained load a simpler layout served fast beats a timeout. The
+TierController watches the admission queue depth and the recent graph
+latency and moves the service between three tiers:
+- full    : the complete pipeline
+- lean    : heuristic output score (no scoring LLM call), reranks only the
+            top LEAN_RERANK_K vector candidates
+- minimal : no LLM at all: keyword analysis, vector top-1 without reranking,
+            top candidate or DefaultLayoutBuilder / FallbackLayoutBuilder
+
+Nodes read the tier from AgentState and take the same no-LLM routes as the
+deadline / circuit breaker degradation (WorkflowExecutor._route).
+
+Hysteresis keeps the tier from flapping:
+- one step down when queue depth >= TIER_QUEUE_HIGH or p95 latency >= TIER_LATENCY_HIGH_MS
+- one step up only when queue depth <= TIER_QUEUE_LOW and p95 latency <= TIER_LATENCY_LOW_MS
+- at least TIER_DWELL_S between changes
+
+The tier of each request is returned in the response ("tier"). For tests a
+tier can be forced for the process (TIER_FORCE) or per request ("X-Tier"
+header, honoured when TIER_HEADER_ENABLED=true).
+
+Environment Variables:
+- LOAD_ADAPTIVE_TIERS  : "false" always runs the full tier (default: true)
+- TIER_QUEUE_HIGH      : Queued requests that step down (default: 8)
+- TIER_QUEUE_LOW       : Queued requests that allow stepping up (default: 2)
+- TIER_LATENCY_HIGH_MS : p95 graph latency that steps down (default: 8000)
+- TIER_LATENCY_LOW_MS  : p95 graph latency that allows stepping up (default: 4000)
+- TIER_DWELL_S         : Minimum seconds between tier changes (default: 10)
+- TIER_FORCE           : Force "full", "lean" or "minimal" for every request
+- TIER_HEADER_ENABLED  : "true" honours the X-Tier request header (default: false)
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import TIER_CHANGES, get_metrics_registry
+
+
+TIERS = ("full", "lean", "minimal")
+
+# Candidates reranked in the lean tier (full: 20)
+LEAN_RERANK_K = 5
+
+# Graph durations the p95 is computed over
+LATENCY_WINDOW = 50
+
+
+def _admission_queue_depth() -> int:
+    from design_system_agent.agent.core import admission_control
+
+    controller = admission_control._admission_controller
+    return len(controller) if controller is not None else 0
+
+
+class TierController:
+    """
+    Picks the pipeline tier from queue depth and recent latency, with hysteresis.
+    """
+
+    def __init__(
+        self,
+        queue_depth: Optional[Callable[[], int]] = None,
+        enabled: Optional[bool] = None,
+        forced: Optional[str] = None
+    ):
+        """
+        Initialize tier controller
+
+        Args:
+            queue_depth: Returns the number of queued requests (default: admission controller queue)
+            enabled: Adapt the tier to load (default: LOAD_ADAPTIVE_TIERS env var)
+            forced: Tier used for every request (default: TIER_FORCE env var)
+        """
+        self.queue_depth = queue_depth or _admission_queue_depth
+        self.enabled = enabled if enabled is not None else os.getenv("LOAD_ADAPTIVE_TIERS", "true").lower() != "false"
+        self.forced = forced if forced is not None else os.getenv("TIER_FORCE") or None
+        if self.forced is not None and self.forced not in TIERS:
+            raise ValueError(f"Unknown tier {self.forced!r}, expected one of {TIERS}")
+
+        self.queue_high = int(os.getenv("TIER_QUEUE_HIGH", 8))
+        self.queue_low = int(os.getenv("TIER_QUEUE_LOW", 2))
+        self.latency_high_ms = float(os.getenv("TIER_LATENCY_HIGH_MS", 8000))
+        self.latency_low_ms = float(os.getenv("TIER_LATENCY_LOW_MS", 4000))
+        self.dwell_s = float(os.getenv("TIER_DWELL_S", 10))
+
+        self.tier = "full"
+        self.changed_at = 0.0
+        self._latencies_ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record_latency(self, duration_ms: float):
+        """Record the duration of one graph execution"""
+        with self._lock:
+            self._latencies_ms.append(duration_ms)
+
+    def p95_latency_ms(self) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self._latencies_ms)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def select(self, requested: Optional[str] = None) -> str:
+        """
+        Tier for a request arriving now
+
+        Args:
+            requested: Tier asked for by the request (X-Tier header), honoured when TIER_HEADER_ENABLED=true
+        """
+        if requested is not None and os.getenv("TIER_HEADER_ENABLED", "false").lower() == "true":
+            if requested not in TIERS:
+                raise ValueError(f"Unknown tier {requested!r}, expected one of {TIERS}")
+            return requested
+        if self.forced is not None:
+            return self.forced
+        if not self.enabled:
+            return "full"
+        self._evaluate()
+        return self.tier
+
+    def _evaluate(self):
+        """Step the tier down or up when load crosses the high / low marks"""
+        if time.monotonic() - self.changed_at < self.dwell_s:
+            return
+        depth = self.queue_depth()
+        p95 = self.p95_latency_ms()
+        with self._lock:
+            # Again under the lock: concurrent requests passing the check above change the tier once
+            now = time.monotonic()
+            if now - self.changed_at < self.dwell_s:
+                return
+            index = TIERS.index(self.tier)
+            overloaded = depth >= self.queue_high or (p95 is not None and p95 >= self.latency_high_ms)
+            recovered = depth <= self.queue_low and (p95 is None or p95 <= self.latency_low_ms)
+            if overloaded and index < len(TIERS) - 1:
+                target = TIERS[index + 1]
+            elif recovered and index > 0:
+                target = TIERS[index - 1]
+            else:
+                return
+            previous, self.tier, self.changed_at = self.tier, target, now
+            # Latencies of the old tier would keep pushing in the same direction
+            self._latencies_ms.clear()
+        TIER_CHANGES.inc(previous=previous, tier=target)
+        logger.warning(
+            "[TierController] {} -> {} (queue depth {}, p95 {} ms)",
+            previous, target, depth, p95 if p95 is not None else "-"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        p95 = self.p95_latency_ms()
+        return {
+            "enabled": self.enabled,
+            "forced": self.forced,
+            "tier": self.forced or (self.tier if self.enabled else "full"),
+            "queue_depth": self.queue_depth(),
+            "p95_latency_ms": round(p95, 1) if p95 is not None else None,
+            "thresholds": {
+                "queue_high": self.queue_high,
+                "queue_low": self.queue_low,
+                "latency_high_ms": self.latency_high_ms,
+                "latency_low_ms": self.latency_low_ms,
+                "dwell_s": self.dwell_s,
+            },
+        }
+
+
+# Singleton instance
+_tier_controller = None
+
+def get_tier_controller() -> TierController:
+    """Get singleton instance of TierController"""
+    global _tier_controller
+    if _tier_controller is None:
+        _tier_controller = TierController()
+    return _tier_controller
+
+
+def _collect_tier_gauge():
+    """Scrape-time gauge: current tier (0 = full, 1 = lean, 2 = minimal)"""
+    if _tier_controller is None:
+        return {}
+    return {"dsa_degradation_tier": ("Pipeline tier (0 full, 1 lean, 2 minimal)", {
+        "": TIERS.index(_tier_controller.get_stats()["tier"])
+    })}
+
+
+get_metrics_registry().add_collector(_collect_tier_gauge)
@@ -0,0 +1,356 @@
+"""
+Graph Checkpoints - Resume failed graph executions from the last completed node
+
+Without checkpoints a client retry after a failed request reruns query
+analysis (LLM call), retrieval and data fetching from scratch. The graph is
+compiled with a SQLiteCheckpointSaver: after every node the state is stored
+in a local SQLite file under a thread ID, and a retry with the same ID
+resumes at the node that did not complete.
+
+Thread ID of a request (GraphAgent._execute):
+- the Idempotency-Key header when given
+- else the request ID (a valid X-Request-ID header, or generated and
+  returned in the X-Request-ID response header)
+
+A thread runs one execution at a time: the execution holds a lease on it
+(until its deadline plus LEASE_GRACE_S, so a crashed worker's thread frees
+up). Another worker's request with a busy idempotency key is rejected; a
+request ID shared by concurrent requests (e.g. a propagated trace ID) gets a
+thread of its own for the second one.
+
+Only the latest checkpoint of a thread is kept (resume, no history). A
+thread is deleted when its execution completes; threads of failed
+executions expire after GRAPH_CHECKPOINT_TTL_S. Generated layout bodies
+(layout_store.py) are stored with the thread, so layout IDs in a resumed
+state still resolve.
+
+The file is shared by the workers of a host (WAL mode), so a retry that
+lands on another worker resumes too. Each thread opens its own connection
+on first use (safe with the preloaded, forked agent), so a transaction
+waiting for another worker's write lock only blocks its own request.
+
+Environment Variables:
+- GRAPH_CHECKPOINTS      : "false" runs the graph without checkpoints (default: true)
+- GRAPH_CHECKPOINT_DB    : SQLite file (default: design_system_agent/checkpoints/graph_checkpoints.sqlite)
+- GRAPH_CHECKPOINT_TTL_S : Seconds a failed execution can be resumed (default: 900)
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple,
+    get_checkpoint_id, get_checkpoint_metadata
+)
+from langchain_core.runnables import RunnableConfig
+
+
+DEFAULT_DB_PATH = Path(__file__).parent.parent.parent / "checkpoints" / "graph_checkpoints.sqlite"
+
+# Expired threads are purged at most this often (s)
+PURGE_INTERVAL_S = 60
+
+# Leases outlive the execution's deadline by this much (s)
+LEASE_GRACE_S = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS layouts (
+    thread_id TEXT NOT NULL,
+    layout_id TEXT NOT NULL,
+    type TEXT,
+    body BLOB,
+    PRIMARY KEY (thread_id, layout_id)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    thread_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (updated_at);
+"""
+
+
+def checkpoints_enabled() -> bool:
+    return os.getenv("GRAPH_CHECKPOINTS", "true").lower() != "false"
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer on a local SQLite file; latest checkpoint per thread, with TTL.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_s: Optional[float] = None):
+        """
+        Initialize checkpoint saver
+
+        Args:
+            path: SQLite file (default: GRAPH_CHECKPOINT_DB env var or DEFAULT_DB_PATH)
+            ttl_s: Seconds a thread is kept after its last checkpoint (default: GRAPH_CHECKPOINT_TTL_S env var or 900)
+        """
+        super().__init__()
+        self.path = str(path or os.getenv("GRAPH_CHECKPOINT_DB") or DEFAULT_DB_PATH)
+        self.ttl_s = ttl_s if ttl_s is not None else float(os.getenv("GRAPH_CHECKPOINT_TTL_S", 900))
+        self._local = threading.local()  # connection of each thread
+        self._schema_pid: Optional[int] = None
+        self._lock = threading.Lock()  # schema setup only
+        self._purged_at = 0.0
+
+    # ====================
+    # CONNECTION
+    # ====================
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the calling thread (opened on first use, and again in a forked child)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if self._schema_pid != os.getpid():
+                    conn.executescript(_SCHEMA)
+                    self._schema_pid = os.getpid()
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _cursor(self, write: bool = True) -> Iterator[sqlite3.Cursor]:
+        """Cursor on this thread's connection, in one transaction (write: take the write lock up front)"""
+        cursor = self._connection().cursor()
+        cursor.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield cursor
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.close()
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl_s
+
+    def _purge(self, cursor: sqlite3.Cursor):
+        """Delete expired threads (at most every PURGE_INTERVAL_S)"""
+        now = time.time()
+        if now - self._purged_at < PURGE_INTERVAL_S:
+            return
+        self._purged_at = now
+        expired = [row[0] for row in cursor.execute(
+            "SELECT thread_id FROM checkpoints WHERE updated_at < ?", (self._expired_before(),)
+        ).fetchall()]
+        for thread_id in expired:
+            self._delete(cursor, thread_id)
+
+    @staticmethod
+    def _delete(cursor: sqlite3.Cursor, thread_id: str):
+        for table in ("checkpoints", "writes", "layouts"):
+            cursor.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    # ====================
+    # CHECKPOINTER API
+    # ====================
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Latest checkpoint of the thread (None when missing or expired)"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._cursor(write=False) as cursor:
+            row = cursor.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND updated_at >= ?",
+                (thread_id, checkpoint_ns, self._expired_before())
+            ).fetchone()
+            if row is None or get_checkpoint_id(config) not in (None, row[0]):
+                return None
+            checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+            writes = cursor.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchall()
+
+        def thread_config(checkpoint_id: str) -> RunnableConfig:
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+        return CheckpointTuple(
+            config=thread_config(checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=thread_config(parent_checkpoint_id) if parent_checkpoint_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((value_type, value)))
+                            for task_id, channel, value_type, value in writes],
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        """Checkpoints of a thread; only the latest is kept"""
+        if config is None or before is not None or limit == 0:
+            return
+        checkpoint = self.get_tuple(config)
+        if checkpoint is not None and all(checkpoint.metadata.get(key) == value for key, value in (filter or {}).items()):
+            yield checkpoint
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        """Store the checkpoint after a step, replacing the thread's previous one"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._cursor() as cursor:
+            self._purge(cursor)
+            cursor.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, serialized, metadata_type, serialized_metadata, time.time())
+            )
+            # Writes of replaced checkpoints can no longer be resumed from
+            cursor.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                (thread_id, checkpoint_ns, checkpoint["id"])
+            )
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = ""
+    ) -> None:
+        """Store the writes of a task of the current step"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, serialized, task_path))
+        # Special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._cursor() as cursor:
+            cursor.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete the thread's checkpoint, writes and layouts"""
+        with self._cursor() as cursor:
+            self._delete(cursor, str(thread_id))
+
+    # ====================
+    # LEASES
+    # ====================
+
+    def acquire_lease(self, thread_id: str, deadline: float) -> Optional[str]:
+        """
+        Lease a thread for one execution
+
+        Args:
+            thread_id: Checkpoint thread
+            deadline: Execution deadline (epoch seconds); the lease lasts LEASE_GRACE_S longer
+
+        Returns:
+            Lease token for release_lease(), None while another execution holds the thread
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM leases WHERE thread_id = ? AND expires_at < ?", (str(thread_id), now))
+            cursor.execute(
+                "INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                (str(thread_id), token, max(deadline, now) + LEASE_GRACE_S)
+            )
+            return token if cursor.rowcount == 1 else None
+
+    def release_lease(self, thread_id: str, token: str):
+        """Release a lease (no-op when it expired and was taken over)"""
+        with self._cursor() as cursor:
+            cursor.execute("DELETE FROM leases WHERE thread_id = ? AND owner = ?", (str(thread_id), token))
+
+    # ====================
+    # LAYOUTS
+    # ====================
+
+    def layouts(self, thread_id: str) -> "ThreadLayouts":
+        """Generated layouts of a thread (LayoutStore storage that survives a failed execution)"""
+        with self._cursor(write=False) as cursor:
+            rows = cursor.execute(
+                "SELECT layout_id, type, body FROM layouts WHERE thread_id = ?", (str(thread_id),)
+            ).fetchall()
+        layouts = ThreadLayouts(self, str(thread_id))
+        for layout_id, type_, body in rows:
+            dict.__setitem__(layouts, layout_id, self.serde.loads_typed((type_, body)))
+        return layouts
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cursor(write=False) as cursor:
+            threads = cursor.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        return {"path": self.path, "ttl_s": self.ttl_s, "threads": threads}
+
+
+class ThreadLayouts(dict):
+    """Layout bodies of one thread; new entries are written through to SQLite"""
+
+    def __init__(self, saver: SQLiteCheckpointSaver, thread_id: str):
+        super().__init__()
+        self.saver = saver
+        self.thread_id = thread_id
+
+    def __setitem__(self, layout_id: str, layout: Dict):
+        type_, body = self.saver.serde.dumps_typed(layout)
+        with self.saver._cursor() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO layouts VALUES (?, ?, ?, ?)", (self.thread_id, layout_id, type_, body))
+        super().__setitem__(layout_id, layout)
+
+
+# Singleton instance
+_checkpointer = None
+
+def get_graph_checkpointer() -> Optional[SQLiteCheckpointSaver]:
+    """Get singleton instance of SQLiteCheckpointSaver (None when GRAPH_CHECKPOINTS=false)"""
+    global _checkpointer
+    if _checkpointer is None and checkpoints_enabled():
+        _checkpointer = SQLiteCheckpointSaver()
+    return _checkpointer
@@ -0,0 +1,360 @@
+"""
+Inference Sidecar - One model-serving process shared by all API workers
+
+The sidecar owns the SentenceTransformer, the CrossEncoder and the FAISS
+index (a local VectorLayoutRAGEngine) and serves embed, search and rerank
+over a Unix domain socket. API workers run VectorLayoutRAGEngine in client
+mode (INFERENCE_SIDECAR=true): they keep only the layout metadata, so adding
+workers for I/O-bound LLM traffic does not add model memory. Requests from
+all workers go through the sidecar's micro-batchers.
+
+Protocol: every message is one frame
+    header  : op (u8), flags (u8), meta length (u32), payload length (u32), big endian
+    meta    : UTF-8 JSON (texts, pairs, k, array dtypes and shapes, errors)
+    payload : raw array bytes (C order, concatenated)
+Each client connection creates a shared memory segment and announces it in
+its HELLO frame; the sidecar writes result arrays that fit into that segment
+(FLAG_SHM, empty payload) instead of sending them through the socket. When
+the sidecar cannot open the segment (no shared /dev/shm), arrays are sent
+inline.
+
+Environment Variables:
+- INFERENCE_SIDECAR            : "true" puts VectorLayoutRAGEngine in client mode (default: false)
+- INFERENCE_SIDECAR_SOCKET     : Socket path (default: /tmp/dsa-inference.sock)
+- INFERENCE_SIDECAR_SHM_BYTES  : Shared memory per client connection (default: 4 MB)
+- INFERENCE_SIDECAR_TIMEOUT_S  : Client socket timeout per request (default: 10)
+- INFERENCE_SIDECAR_WAIT_S     : How long a client waits for the sidecar to come up (default: 60)
+
+Usage:
+    python -m design_system_agent.agent.core.inference_sidecar --socket /tmp/dsa-inference.sock
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from design_system_agent.agent.core.thread_budget import apply_thread_budget
+
+
+DEFAULT_SOCKET = "/tmp/dsa-inference.sock"
+
+HEADER = struct.Struct("!BBII")  # op, flags, meta length, payload length
+
+OP_HELLO = 1
+OP_EMBED = 2
+OP_SEARCH = 3
+OP_RERANK = 4
+OP_STATS = 5
+OP_ERROR = 255
+
+FLAG_SHM = 1
+
+
+class SidecarError(Exception):
+    """Error reported by the sidecar or a broken connection to it"""
+    pass
+
+
+def socket_path() -> str:
+    return os.getenv("INFERENCE_SIDECAR_SOCKET", DEFAULT_SOCKET)
+
+
+def sidecar_enabled() -> bool:
+    return os.getenv("INFERENCE_SIDECAR", "false").lower() == "true"
+
+
+# ====================
+# FRAMING
+# ====================
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        chunk = sock.recv_into(view[received:], size - received)
+        if chunk == 0:
+            raise ConnectionError("connection closed")
+        received += chunk
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, op: int, meta: Dict[str, Any], payload: bytes = b"", flags: int = 0):
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    sock.sendall(HEADER.pack(op, flags, len(meta_bytes), len(payload)) + meta_bytes + payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, int, Dict[str, Any], bytes]:
+    op, flags, meta_size, payload_size = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    meta = json.loads(_recv_exact(sock, meta_size)) if meta_size else {}
+    payload = _recv_exact(sock, payload_size) if payload_size else b""
+    return op, flags, meta, payload
+
+
+def pack_arrays(arrays: Sequence[np.ndarray]) -> Tuple[List[Dict[str, Any]], bytes]:
+    """Array descriptors for the meta plus the concatenated array bytes"""
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    specs = [{"dtype": array.dtype.str, "shape": list(array.shape)} for array in arrays]
+    return specs, b"".join(array.tobytes() for array in arrays)
+
+
+def unpack_arrays(specs: List[Dict[str, Any]], buffer) -> List[np.ndarray]:
+    """Copy arrays described by specs out of a bytes-like buffer"""
+    arrays = []
+    offset = 0
+    for spec in specs:
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(spec["shape"]).copy()
+        arrays.append(array)
+        offset += count * dtype.itemsize
+    return arrays
+
+
+# ====================
+# SERVER
+# ====================
+
+class _SidecarHandler(socketserver.BaseRequestHandler):
+    """Serves one client connection (one thread per connection)"""
+
+    def handle(self):
+        engine = self.server.engine
+        shm: Optional[shared_memory.SharedMemory] = None
+        try:
+            while True:
+                try:
+                    op, _, meta, _ = recv_frame(self.request)
+                except ConnectionError:
+                    return
+                try:
+                    if op == OP_HELLO:
+                        shm = self._attach(meta)
+                        send_frame(self.request, OP_HELLO, {
+                            "pid": os.getpid(),
+                            "shm": shm is not None,
+                            "embedding_dim": engine.embedding_dim,
+                            "ntotal": engine.index.ntotal,
+                            "metadata_path": str(engine.metadata_path),
+                        })
+                    elif op == OP_EMBED:
+                        self._reply_arrays(op, shm, [np.asarray(engine.encode_batcher.run(meta["texts"]), dtype="float32")])
+                    elif op == OP_SEARCH:
+                        embeddings = np.asarray(engine.encode_batcher.run(meta["texts"]), dtype="float32")
+                        distances, indices = engine.index.search(embeddings, int(meta["k"]))
+                        self._reply_arrays(op, shm, [distances.astype("float32"), indices.astype("int64")])
+                    elif op == OP_RERANK:
+                        self._reply_arrays(op, shm, [np.asarray(engine.rerank_batcher.run(meta["pairs"]), dtype="float32")])
+                    elif op == OP_STATS:
+                        send_frame(self.request, OP_STATS, engine.get_stats())
+                    else:
+                        send_frame(self.request, OP_ERROR, {"error": f"unknown op {op}"})
+                except Exception as e:
+                    logger.warning("[InferenceSidecar] op {} failed: {}: {}", op, type(e).__name__, e)
+                    send_frame(self.request, OP_ERROR, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            if shm is not None:
+                shm.close()
+
+    def _attach(self, meta: Dict[str, Any]) -> Optional[shared_memory.SharedMemory]:
+        if not meta.get("shm"):
+            return None
+        try:
+            shm = shared_memory.SharedMemory(name=meta["shm"])
+        except FileNotFoundError:
+            return None  # no shared /dev/shm (e.g. separate containers): arrays go inline
+        # The client owns (and unlinks) the segment; keep our tracker from unlinking it at exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+    def _reply_arrays(self, op: int, shm: Optional[shared_memory.SharedMemory], arrays: List[np.ndarray]):
+        specs, payload = pack_arrays(arrays)
+        if shm is not None and len(payload) <= shm.size:
+            shm.buf[:len(payload)] = payload
+            send_frame(self.request, op, {"arrays": specs}, flags=FLAG_SHM)
+        else:
+            send_frame(self.request, op, {"arrays": specs}, payload)
+
+
+class InferenceSidecar(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server exposing a local VectorLayoutRAGEngine"""
+
+    daemon_threads = True
+
+    def __init__(self, engine, path: Optional[str] = None):
+        """
+        Initialize sidecar (call serve_forever() to start serving)
+
+        Args:
+            engine: Local VectorLayoutRAGEngine (models and index loaded)
+            path: Socket path (default: INFERENCE_SIDECAR_SOCKET env var or /tmp/dsa-inference.sock)
+        """
+        self.engine = engine
+        self.path = path or socket_path()
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # stale socket of a previous run
+        super().__init__(self.path, _SidecarHandler)
+        os.chmod(self.path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+# ====================
+# CLIENT
+# ====================
+
+class _Connection:
+    def __init__(self, path: str, timeout_s: float, shm_bytes: int):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout_s)
+        self.sock.connect(path)
+        self.shm = shared_memory.SharedMemory(create=True, size=shm_bytes) if shm_bytes > 0 else None
+        self.hello = self.request(OP_HELLO, {"shm": self.shm.name if self.shm else None})[0]
+        if self.shm is not None and not self.hello["shm"]:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def request(self, op: int, meta: Dict[str, Any]) -> Tuple[Dict[str, Any], List[np.ndarray]]:
+        send_frame(self.sock, op, meta)
+        reply_op, flags, reply, payload = recv_frame(self.sock)
+        if reply_op == OP_ERROR:
+            raise SidecarError(reply.get("error", "unknown error"))
+        arrays = []
+        if "arrays" in reply:
+            arrays = unpack_arrays(reply["arrays"], self.shm.buf if flags & FLAG_SHM else payload)
+        return reply, arrays
+
+    def close(self):
+        self.sock.close()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+
+
+class InferenceClient:
+    """
+    Thread-safe client of the inference sidecar.
+
+    Keeps a pool of connections (one per concurrently calling thread), each
+    with its own shared memory segment. A forked child drops the parent's
+    pool and opens its own connections.
+    """
+
+    def __init__(self, path: Optional[str] = None, timeout_s: Optional[float] = None, shm_bytes: Optional[int] = None):
+        """
+        Initialize client and wait for the sidecar
+
+        Args:
+            path: Socket path (default: INFERENCE_SIDECAR_SOCKET env var or /tmp/dsa-inference.sock)
+            timeout_s: Socket timeout per request (default: INFERENCE_SIDECAR_TIMEOUT_S env var or 10)
+            shm_bytes: Shared memory per connection, 0 = inline payloads
+                       (default: INFERENCE_SIDECAR_SHM_BYTES env var or 4 MB)
+        """
+        self.path = path or socket_path()
+        self.timeout_s = timeout_s if timeout_s is not None else float(os.getenv("INFERENCE_SIDECAR_TIMEOUT_S", 10))
+        self.shm_bytes = shm_bytes if shm_bytes is not None else int(os.getenv("INFERENCE_SIDECAR_SHM_BYTES", 4 * 1024 * 1024))
+        self._pool: "queue.LifoQueue[_Connection]" = queue.LifoQueue()
+        self._pid = os.getpid()
+        self.info = self._wait_for_sidecar(float(os.getenv("INFERENCE_SIDECAR_WAIT_S", 60)))
+
+    def _wait_for_sidecar(self, wait_s: float) -> Dict[str, Any]:
+        deadline = time.monotonic() + wait_s
+        while True:
+            try:
+                connection = _Connection(self.path, self.timeout_s, self.shm_bytes)
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.monotonic() > deadline:
+                    raise SidecarError(f"Inference sidecar not reachable at {self.path}: {e}") from e
+                time.sleep(0.5)
+                continue
+            self._pool.put(connection)
+            logger.info("[InferenceClient] Connected to inference sidecar (pid {}) at {}", connection.hello["pid"], self.path)
+            return connection.hello
+
+    @contextmanager
+    def _connection(self):
+        if self._pid != os.getpid():
+            # Forked child: the parent's sockets and segments are not ours to use or unlink
+            self._pool = queue.LifoQueue()
+            self._pid = os.getpid()
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = _Connection(self.path, self.timeout_s, self.shm_bytes)
+        try:
+            yield connection
+        except (OSError, ConnectionError) as e:
+            connection.close()  # broken or out of sync, do not reuse
+            raise SidecarError(f"Inference sidecar request failed: {type(e).__name__}: {e}") from e
+        except Exception:
+            self._pool.put(connection)
+            raise
+        else:
+            self._pool.put(connection)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Normalized embeddings, shape (len(texts), embedding_dim)"""
+        with self._connection() as connection:
+            return connection.request(OP_EMBED, {"texts": list(texts)})[1][0]
+
+    def search(self, texts: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Embed texts and search the FAISS index; (distances, indices), each shape (len(texts), k)"""
+        with self._connection() as connection:
+            distances, indices = connection.request(OP_SEARCH, {"texts": list(texts), "k": int(k)})[1]
+            return distances, indices
+
+    def rerank(self, pairs: List[List[str]]) -> np.ndarray:
+        """Cross-encoder scores of (query, document) pairs"""
+        with self._connection() as connection:
+            return connection.request(OP_RERANK, {"pairs": [list(pair) for pair in pairs]})[1][0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connection() as connection:
+            return connection.request(OP_STATS, {})[0]
+
+    def close(self):
+        if self._pid != os.getpid():
+            return
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve embed / search / rerank over a Unix domain socket")
+    parser.add_argument("--socket", default=socket_path(), help="Socket path")
+    parser.add_argument("--index-name", default="crm_layouts", help="FAISS index name")
+    args = parser.parse_args()
+
+    from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
+
+    apply_thread_budget(workers=1)  # the only process running inference on this host
+    engine = VectorLayoutRAGEngine(index_name=args.index_name, use_sidecar=False)
+    server = InferenceSidecar(engine, args.socket)
+    logger.info("[InferenceSidecar] Serving {} layouts on {}", engine.index.ntotal, server.path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
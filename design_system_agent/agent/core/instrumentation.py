@@ -0,0 +1,334 @@
+"""
+Instrumentation - Hot-path histograms, request IDs and spans
+
+Dependency-free metrics registry rendered in the Prometheus text exposition
+format (served on GET /metrics). Instrumented code paths:
+- every WorkflowExecutor node (via instrument_node() in GraphBuilder)
+- VectorLayoutRAGEngine.search stages (encode, vector_search, rerank)
+  and candidate counts
+- every LLM call (duration and outcome in ResilientLLMCaller, tokens and
+  prompt cache hit ratio in LLMUsageTracker)
+- micro-batched encoder / cross-encoder calls (batch size, queue depth and
+  wait in MicroBatcher)
+- admission of /query requests (queue wait, depth and rejections in
+  AdmissionController)
+- coalescing of identical in-flight requests (SingleFlight roles)
+- load-adaptive pipeline tier changes (TierController)
+
+Each request gets an ID (X-Request-ID header or generated) held in a
+ContextVar. Client IDs are used only when they match REQUEST_ID_PATTERN (they
+name profile files and checkpoint threads), otherwise one is generated; spans recorded while a request runs carry that ID, so node,
+RAG and LLM timings of one request can be linked (result["metrics"]["spans"]).
+
+With METRICS_ENABLED=false nodes are not wrapped at all and timed() returns a
+shared no-op context manager, so the disabled overhead is one flag check.
+
+Environment Variables:
+- METRICS_ENABLED : "false" disables all instrumentation (default: true)
+
+Usage:
+    with timed(RAG_STAGE_SECONDS, stage="rerank"):
+        scores = reranker.predict(pairs)
+    RAG_CANDIDATES.observe(len(candidates), stage="vector")
+"""
+import bisect
+import os
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+RATIO_BUCKETS = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_current_spans: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("spans", default=None)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(series[0]), series[1], series[2]) for key, series in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and renders them in Prometheus text format.
+
+    Collectors are callables returning {metric name: (help, {label string: value})}
+    gauges computed at scrape time (e.g. LLM circuit breaker counters).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Callable[[], Dict[str, Tuple[str, Dict[str, float]]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets, labelnames))
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def add_collector(self, collector: Callable[[], Dict[str, Tuple[str, Dict[str, float]]]]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                gauges = collector()
+            except Exception as e:
+                print(f"[MetricsRegistry] ⚠️  Collector failed: {type(e).__name__}: {e}")
+                continue
+            for name, (help_text, values) in gauges.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in values.items():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+_metrics_registry = None
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Get singleton instance of MetricsRegistry"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        _metrics_registry = MetricsRegistry()
+    return _metrics_registry
+
+
+# ====================
+# METRICS
+# ====================
+
+_registry = get_metrics_registry()
+
+NODE_SECONDS = _registry.histogram(
+    "dsa_node_duration_seconds", "Graph node duration", LATENCY_BUCKETS_S, ("node",))
+RAG_STAGE_SECONDS = _registry.histogram(
+    "dsa_rag_stage_duration_seconds", "RAG search stage duration (encode, vector_search, sidecar_search, rerank, total)",
+    LATENCY_BUCKETS_S, ("stage",))
+RAG_CANDIDATES = _registry.histogram(
+    "dsa_rag_candidates", "Candidates per RAG search stage (vector, returned)", COUNT_BUCKETS, ("stage",))
+LLM_SECONDS = _registry.histogram(
+    "dsa_llm_call_duration_seconds", "LLM call duration including retries", LATENCY_BUCKETS_S, ("name", "outcome"))
+LLM_TOKENS = _registry.histogram(
+    "dsa_llm_tokens", "Tokens per LLM call (input, output, cached)", TOKEN_BUCKETS, ("node", "kind"))
+LLM_CACHE_HIT_RATIO = _registry.histogram(
+    "dsa_llm_prompt_cache_hit_ratio", "Cached / input tokens per LLM call", RATIO_BUCKETS, ("node",))
+HTTP_SECONDS = _registry.histogram(
+    "dsa_http_request_duration_seconds", "HTTP request duration", LATENCY_BUCKETS_S, ("path", "status"))
+BATCH_SIZE = _registry.histogram(
+    "dsa_inference_batch_size", "Items per micro-batched model call", BATCH_BUCKETS, ("batcher",))
+BATCH_QUEUE_DEPTH = _registry.histogram(
+    "dsa_inference_queue_depth", "Requests queued when a micro-batch is formed", BATCH_BUCKETS, ("batcher",))
+BATCH_WAIT_SECONDS = _registry.histogram(
+    "dsa_inference_batch_wait_seconds", "Time a request waited for its micro-batch to start",
+    (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25), ("batcher",))
+ADMISSION_WAIT_SECONDS = _registry.histogram(
+    "dsa_admission_wait_seconds", "Time a request waited for a graph slot", LATENCY_BUCKETS_S, ("priority",))
+ADMISSION_QUEUE_DEPTH = _registry.histogram(
+    "dsa_admission_queue_depth", "Requests already queued when a request arrives", BATCH_BUCKETS, ("priority",))
+ADMISSION_REJECTED = _registry.counter(
+    "dsa_admission_rejected_total", "Requests rejected with 429 (queue_full, deadline, shed)", ("priority", "reason"))
+COALESCED_REQUESTS = _registry.counter(
+    "dsa_coalesced_requests_total", "Graph requests by single-flight role (leader, follower, replay, detached)", ("role",))
+TIER_CHANGES = _registry.counter(
+    "dsa_degradation_tier_changes_total", "Load-adaptive pipeline tier changes", ("previous", "tier"))
+GRAPH_RESUMES = _registry.counter(
+    "dsa_graph_resumes_total", "Graph executions resumed from a checkpoint, by first node run", ("node",))
+INTENT_LOOKUPS = _registry.counter(
+    "dsa_intent_lookups_total", "Intent table lookups of confident analyses (hit skips the vector search)", ("result",))
+
+
+# ====================
+# REQUEST IDS AND SPANS
+# ====================
+
+# Accepted client request IDs (X-Request-ID); anything else gets a generated ID
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def valid_request_id(request_id: Optional[str]) -> bool:
+    """Whether a client-supplied ID is safe to use in file names and storage keys"""
+    return bool(request_id) and REQUEST_ID_PATTERN.fullmatch(request_id) is not None
+
+
+def start_request(request_id: Optional[str] = None) -> str:
+    """Set the request ID of the current context (generated when missing or invalid) and return it"""
+    if not valid_request_id(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+def get_request_id() -> Optional[str]:
+    """Get the request ID of the current context (None outside a request)"""
+    return _request_id.get()
+
+
+def start_span_recording() -> List[Dict[str, Any]]:
+    """Start collecting spans for the current request and return the list they are added to"""
+    spans: List[Dict[str, Any]] = []
+    _current_spans.set(spans)
+    return spans
+
+
+class _Timer:
+    """Context manager observing its duration into a histogram and the current span list"""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def set(self, **labels):
+        """Update labels known only at the end of the block (e.g. outcome)"""
+        self.labels.update(labels)
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        self.histogram.observe(duration, **self.labels)
+        spans = _current_spans.get()
+        if spans is not None:
+            spans.append({
+                "request_id": _request_id.get(),
+                "name": self.histogram.name,
+                **self.labels,
+                "duration_ms": round(duration * 1000, 2),
+                "error": exc_type.__name__ if exc_type else None,
+            })
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def set(self, **labels):
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def timed(histogram: Histogram, **labels):
+    """Time a block into a histogram (and a span); no-op when metrics are disabled"""
+    if not METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _Timer(histogram, labels)
+
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """Wrap a graph node so its duration is recorded (returns the node unchanged when disabled)"""
+    if not METRICS_ENABLED:
+        return node
+
+    def instrumented(state):
+        with _Timer(NODE_SECONDS, {"node": name}):
+            return node(state)
+
+    instrumented.__name__ = getattr(node, "__name__", name)
+    return instrumented
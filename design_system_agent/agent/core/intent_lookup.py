@@ -0,0 +1,165 @@
+"""
+Intent Lookup - Layout IDs by analysis tuple, without vector search
+
+Production queries collapse onto a small set of analysis tuples
+(object_type, pattern_type, view_type, aggregation_type, group_by_field),
+the structure PATTERN_TO_VIEW_TYPE and VIEW_TYPE_COMPONENTS encode for the
+corpus. The intent table is built offline from the layout corpus and maps
+each tuple to its best-ranked layout IDs:
+- each layout is keyed by its object type and the keyword analysis of its
+  query (view type defaulting to the pattern's, see PATTERN_TO_VIEW_TYPE),
+  and additionally under every view type whose primary component it has
+- per tuple, layouts with the view type's primary component come first,
+  then by coverage of its required components (VIEW_TYPE_COMPONENTS), then
+  corpus order
+
+When the analysis is confident (INTENT_LOOKUP_MIN_CONFIDENCE)
+retrieve_layouts answers with a dict lookup and skips embedding, FAISS and
+reranking (VectorLayoutRAGEngine.lookup); a miss runs the vector search.
+
+The table is written next to the FAISS index (<index_name>_intents.json) and
+rebuilt with it; a table built from another corpus is rebuilt on load.
+
+Environment Variables:
+- INTENT_LOOKUP                : "false" always runs the vector search (default: true)
+- INTENT_LOOKUP_MIN_CONFIDENCE : Analysis confidence needed for a lookup (default: 0.85)
+- INTENT_LOOKUP_TOP_K          : Layout IDs kept per tuple (default: 3)
+
+Usage:
+    python -m design_system_agent.agent.core.intent_lookup   # rebuild the table offline
+"""
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import INTENT_LOOKUPS
+from design_system_agent.core.dataset_genertor.crm_dataset.crm_queries import PATTERN_TO_VIEW_TYPE, VIEW_TYPE_COMPONENTS
+
+
+# Analysis fields that key the table, in key order
+INTENT_FIELDS = ("object_type", "pattern_type", "view_type", "aggregation_type", "group_by_field")
+
+# Analysis confidence needed before retrieve_layouts trusts a lookup
+INTENT_LOOKUP_MIN_CONFIDENCE = float(os.getenv("INTENT_LOOKUP_MIN_CONFIDENCE", 0.85))
+
+TABLE_VERSION = 1
+
+
+def intent_key(analysis: Dict[str, Any]) -> str:
+    """Table key of an analysis; a missing view type follows the pattern (PATTERN_TO_VIEW_TYPE)"""
+    fields = {name: analysis.get(name) for name in INTENT_FIELDS}
+    fields["view_type"] = fields["view_type"] or PATTERN_TO_VIEW_TYPE.get(fields["pattern_type"] or "", "table")
+    return "|".join(str(fields[name] or "").lower() for name in INTENT_FIELDS)
+
+
+def corpus_fingerprint(layouts_metadata: List[Dict]) -> str:
+    """Identifies the corpus a table was built from"""
+    return hashlib.sha1("\n".join(entry["query"] for entry in layouts_metadata).encode("utf-8")).hexdigest()
+
+
+def _components(layout: Dict) -> set:
+    return {component.get("type") for row in layout.get("rows", []) for component in row.get("pattern_info", [])}
+
+
+def build_intent_table(layouts_metadata: List[Dict], top_k: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Map analysis tuples to the best-ranked layout IDs of the corpus (offline, no models)
+
+    Args:
+        layouts_metadata: Indexed corpus (VectorLayoutRAGEngine.layouts_metadata), IDs are "crm_<index>"
+        top_k: Layout IDs kept per tuple (default: INTENT_LOOKUP_TOP_K env var or 3)
+
+    Returns:
+        Intent key -> layout IDs, best first
+    """
+    from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
+
+    top_k = top_k or int(os.getenv("INTENT_LOOKUP_TOP_K", 3))
+    ranked: Dict[str, List[tuple]] = {}
+    for idx, entry in enumerate(layouts_metadata):
+        analysis = QueryAnalyzer.keyword_analysis(entry["query"]).model_dump()
+        analysis["object_type"] = entry["object_type"]  # the corpus knows the object
+        components = _components(entry["layout"])
+
+        view_types = {intent_key(analysis).split("|")[2]}
+        view_types.update(view for view, spec in VIEW_TYPE_COMPONENTS.items() if spec["primary"] in components)
+        for view_type in view_types:
+            spec = VIEW_TYPE_COMPONENTS.get(view_type, {"primary": None, "required": []})
+            coverage = len(components.intersection(spec["required"])) / max(len(spec["required"]), 1)
+            rank = (spec["primary"] in components, coverage, -idx)
+            ranked.setdefault(intent_key({**analysis, "view_type": view_type}), []).append((rank, f"crm_{idx}"))
+
+    return {
+        key: [layout_id for _, layout_id in sorted(entries, reverse=True)[:top_k]]
+        for key, entries in ranked.items()
+    }
+
+
+class IntentLookupTable:
+    """
+    Intent table of an index: analysis tuple -> layout IDs.
+    """
+
+    def __init__(self, table: Dict[str, List[str]], enabled: Optional[bool] = None):
+        """
+        Initialize lookup table
+
+        Args:
+            table: Intent key -> layout IDs (see build_intent_table)
+            enabled: Answer lookups (default: INTENT_LOOKUP env var or true)
+        """
+        self.table = table
+        self.enabled = enabled if enabled is not None else os.getenv("INTENT_LOOKUP", "true").lower() != "false"
+        self.stats = {"hit": 0, "miss": 0}
+
+    @classmethod
+    def load_or_build(cls, path: Path, layouts_metadata: List[Dict]) -> "IntentLookupTable":
+        """Load the table written next to the index, rebuilding it when missing or built from another corpus"""
+        fingerprint = corpus_fingerprint(layouts_metadata)
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("version") == TABLE_VERSION and stored.get("corpus") == fingerprint:
+                return cls(stored["table"])
+
+        table = build_intent_table(layouts_metadata)
+        save_intent_table(path, table, fingerprint)
+        logger.info("[IntentLookupTable] Built {} intent keys from {} layouts", len(table), len(layouts_metadata))
+        return cls(table)
+
+    def lookup(self, analysis: Dict[str, Any]) -> List[str]:
+        """Layout IDs for the analysis tuple, best first ([] on a miss or when disabled)"""
+        if not self.enabled:
+            return []
+        layout_ids = self.table.get(intent_key(analysis), [])
+        result = "hit" if layout_ids else "miss"
+        self.stats[result] += 1
+        INTENT_LOOKUPS.inc(result=result)
+        return layout_ids
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "keys": len(self.table), **self.stats}
+
+
+def save_intent_table(path: Path, table: Dict[str, List[str]], fingerprint: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": TABLE_VERSION, "corpus": fingerprint, "table": table}, f, indent=1, sort_keys=True)
+
+
+def main():
+    """Rebuild the intent table of the default index from its layout metadata"""
+    index_dir = Path(__file__).parent.parent.parent / "vector_index"
+    with open(index_dir / "crm_layouts_metadata.pkl", "rb") as f:
+        layouts_metadata = pickle.load(f)
+    table = build_intent_table(layouts_metadata)
+    save_intent_table(index_dir / "crm_layouts_intents.json", table, corpus_fingerprint(layouts_metadata))
+    print(f"Wrote {len(table)} intent keys for {len(layouts_metadata)} layouts to {index_dir / 'crm_layouts_intents.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Layout Store - Layout bodies referenced by ID from the graph state
+
+LangGraph copies and merges AgentState at every node transition. Full layout
+dicts (rows, pattern_info, metadata) used to travel in retrieved_layouts,
+selected_layout, adapted_layout and outcome["layout"], often several times.
+The state now carries:
+- retrieved_layouts : score records (ID, query, scores, component match)
+- selected_layout / adapted_layout / outcome["layout"] : layout IDs
+
+Bodies are resolved from the request's LayoutStore only where a node needs
+them (selection and filling, scoring) and when the result is serialized:
+- catalog layouts ("crm_<n>") come from the RAG engine's metadata
+- generated layouts (filled, fallback, default) are put in the store and
+  get a request-local ID ("local_<n>")
+
+A store lives for one graph execution. The state holds its store ID, so the
+state itself stays plain data. Store IDs are always generated here, never
+taken from the request. With graph checkpoints the generated layouts are
+kept with the thread's checkpoint (graph_checkpoints.py) and a resumed
+execution opens a new store on them, so layout IDs resolve again.
+
+Usage:
+    store_id = open_layout_store(catalog=rag_engine.get_layout)
+    try:
+        store = get_layout_store(store_id)
+        layout_id = store.put(filled_layout)
+        layout = store.get(layout_id)
+    finally:
+        close_layout_store(store_id)
+"""
+import itertools
+import threading
+from typing import Callable, Dict, MutableMapping, Optional
+
+
+# Candidate fields resolved from the store instead of carried in score records
+BODY_KEYS = ("layout", "metadata_info")
+
+
+class LayoutStore:
+    """
+    Layout bodies of one graph execution, addressed by ID.
+    """
+
+    def __init__(
+        self,
+        catalog: Optional[Callable[[str], Optional[Dict]]] = None,
+        layouts: Optional[MutableMapping[str, Dict]] = None
+    ):
+        """
+        Initialize layout store
+
+        Args:
+            catalog: Returns the catalog layout for an ID, None if unknown (e.g. VectorLayoutRAGEngine.get_layout)
+            layouts: Storage of generated layouts (default: in memory), e.g. SQLiteCheckpointSaver.layouts()
+        """
+        self.catalog = catalog
+        self._local: MutableMapping[str, Dict] = layouts if layouts is not None else {}
+
+    def put(self, layout: Dict) -> str:
+        """Keep a generated layout; returns its request-local ID"""
+        layout_id = f"local_{len(self._local) + 1}"
+        self._local[layout_id] = layout
+        return layout_id
+
+    def get(self, layout_id: Optional[str]) -> Optional[Dict]:
+        """Layout body for an ID (generated layouts first, then the catalog)"""
+        if layout_id is None:
+            return None
+        if layout_id in self._local:
+            return self._local[layout_id]
+        return self.catalog(layout_id) if self.catalog is not None else None
+
+    def record(self, candidate: Dict) -> Dict:
+        """Score record of a retrieved candidate; bodies outside the catalog are kept in the store"""
+        if self.get(candidate.get("id")) is None:
+            candidate = {**candidate, "id": self.put(candidate)}
+        return {key: value for key, value in candidate.items() if key not in BODY_KEYS}
+
+    def resolve(self, record: Dict) -> Dict:
+        """Full candidate for a score record (records that still carry their body are returned as-is)"""
+        if "layout" in record:
+            return record
+        return {**(self.get(record.get("id")) or {}), **record}
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+
+# Open stores by store ID (one per graph execution)
+_stores: Dict[str, LayoutStore] = {}
+_store_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+def open_layout_store(
+    catalog: Optional[Callable[[str], Optional[Dict]]] = None,
+    layouts: Optional[MutableMapping[str, Dict]] = None
+) -> str:
+    """
+    Create the store of a graph execution; returns the (generated) store ID kept in AgentState
+
+    Args:
+        catalog: Catalog lookup (see LayoutStore)
+        layouts: Storage of generated layouts (see LayoutStore), e.g. the checkpoint thread's
+    """
+    with _lock:
+        store_id = f"store_{next(_store_ids)}"
+        _stores[store_id] = LayoutStore(catalog, layouts)
+    return store_id
+
+
+def get_layout_store(store_id: Optional[str]) -> Optional[LayoutStore]:
+    """Store for a store ID, None when it is unknown or closed"""
+    return _stores.get(store_id) if store_id is not None else None
+
+
+def close_layout_store(store_id: Optional[str]):
+    """Drop the store (and its generated layouts) once the result is serialized"""
+    with _lock:
+        _stores.pop(store_id, None)
@@ -17,18 +17,33 @@ Alternative Models (set via OPENAI_MODEL env var):
 Environment Variables:
 - OPENAI_API_KEY  : Required for API access
 - OPENAI_MODEL    : Optional model override (default: gpt-4o-mini)
+- LLM_ROUTING_CONFIG : Optional routing rules per node/complexity (see model_router.py)
+- LLM_REQUEST_TIMEOUT_S : HTTP timeout per OpenAI request (default: 30)
+- LLM_BASE_URL    : OpenAI-compatible endpoint, e.g. the local stub
+                    (python -m design_system_agent.api.llm_stub -> http://127.0.0.1:8900/v1)
+- LLM_MAX_RETRIES, LLM_HEDGING, LLM_BREAKER_* : Call resilience (see llm_resilience.py)
 
 Example:
     export OPENAI_MODEL=gpt-3.5-turbo  # Use fastest model
     export OPENAI_MODEL=gpt-4o         # Use most capable model
+
+Routing:
+    route = LLMFactory.route("llm_select_and_fill", analysis)
+    llm = LLMFactory.routed_structured_llm(route, LayoutSelectionResult)  # None = skip LLM
+
+langchain_openai (openai, tiktoken) is imported when the first OpenAI client
+is created; with the mock client it is never loaded.
 """
-from langchain_openai import ChatOpenAI
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.language_models.fake_chat_models import FakeListChatModel
 import os
+from typing import Any, Dict, Optional
 from loguru import logger
 from langchain_core.output_parsers import JsonOutputParser
 
+from design_system_agent.agent.core.llm_usage import get_usage_tracker
+from design_system_agent.agent.core.model_router import get_model_router
+from design_system_agent.agent.core.llm_resilience import get_resilient_caller
+
 
 def get_mock_llm():
     """Get a LangChain-compatible mock LLM for testing."""
@@ -84,10 +99,21 @@ def get_mock_llm():
         }"""
     ] * 10  # Repeat for multiple queries
     
-    return FakeListChatModel(responses=responses)
+    return FakeListChatModel(responses=responses, callbacks=[get_usage_tracker()])
 
 
 class LLMFactory:
+    # Routed clients reused across requests, keyed by (kind, model, output schema, max_tokens)
+    _routed_clients: Dict[tuple, Any] = {}
+
+    @classmethod
+    def _api_key(cls) -> Optional[str]:
+        """OpenAI API key; a local stub (LLM_BASE_URL) needs no real key"""
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key and os.getenv("LLM_BASE_URL"):
+            return "stub"
+        return api_key
+
     @classmethod
     def open_ai(cls, max_tokens: int = 10000, model: str = None):
         """
@@ -99,7 +125,7 @@ class LLMFactory:
                    Options: gpt-4o-mini (recommended), gpt-4o (most capable), 
                            gpt-4-turbo, gpt-3.5-turbo (fastest)
         """
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = cls._api_key()
         
         if not api_key or api_key == "":
             logger.warning("OPENAI_API_KEY not set. Using mock LLM client.")
@@ -110,11 +136,16 @@ class LLMFactory:
         model_name = model or default_model
         
         try:
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model=model_name,
                 temperature=0,
                 max_tokens=max_tokens,
-                openai_api_key=api_key
+                openai_api_key=api_key,
+                base_url=os.getenv("LLM_BASE_URL") or None,
+                timeout=float(os.getenv("LLM_REQUEST_TIMEOUT_S", 30)),
+                max_retries=0,  # retries are handled by LLMFactory.invoke
+                callbacks=[get_usage_tracker()]
             )
         except Exception as e:
             logger.error(f"Error creating OpenAI client with model {model_name}: {e}. Using mock client.")
@@ -132,7 +163,7 @@ class LLMFactory:
                    Options: gpt-4o-mini (recommended), gpt-4o (most capable), 
                            gpt-4-turbo, gpt-3.5-turbo (fastest)
         """
-        api_key = os.getenv("OPENAI_API_KEY")
+        api_key = cls._api_key()
         
         if not api_key or api_key == "":
             logger.warning("OPENAI_API_KEY not set. Using mock LLM client.")
@@ -143,12 +174,18 @@ class LLMFactory:
         model_name = model or default_model
         
         try:
+            from langchain_openai import ChatOpenAI
+
             # Create base LLM
             base_llm = ChatOpenAI(
                 model=model_name,
                 temperature=0,
                 max_tokens=max_tokens,
-                openai_api_key=api_key
+                openai_api_key=api_key,
+                base_url=os.getenv("LLM_BASE_URL") or None,
+                timeout=float(os.getenv("LLM_REQUEST_TIMEOUT_S", 30)),
+                max_retries=0,  # retries are handled by LLMFactory.invoke
+                callbacks=[get_usage_tracker()]
             )
             
             # Add structured output if provided
@@ -163,6 +200,7 @@ class LLMFactory:
 
     @classmethod
     def open_ai_embeddings(cls):
+        from langchain_openai import OpenAIEmbeddings
         return OpenAIEmbeddings(
             model="text-embedding-3-large",
             openai_api_key=os.getenv("OPENAI_API_KEY")
@@ -182,3 +220,55 @@ class LLMFactory:
         parser = JsonOutputParser(pydantic_object=pydantic_model)
         return llm | parser
 
+    @classmethod
+    def route(cls, node: str, analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Pick the model route for a graph node (rules from LLM_ROUTING_CONFIG)
+
+        Args:
+            node: Graph node name
+            analysis: Query analysis dict (pattern_type, complexity_level)
+        Returns:
+            dict with name, node and model (None = node should skip the LLM)
+        """
+        return get_model_router().route(node, analysis)
+
+    @classmethod
+    def routed_llm(cls, route: Dict[str, Any], max_tokens: int = 10000):
+        """Get a cached plain LLM for a route (None when the route skips the LLM)"""
+        if route.get("model") is None:
+            return None
+        key = ("plain", route["model"], None, max_tokens)
+        if key not in cls._routed_clients:
+            cls._routed_clients[key] = cls.open_ai(max_tokens=max_tokens, model=route["model"])
+        return cls._routed_clients[key]
+
+    @classmethod
+    def routed_structured_llm(cls, route: Dict[str, Any], structured_output, max_tokens: int = 10000):
+        """Get a cached structured output LLM for a route (None when the route skips the LLM)"""
+        if route.get("model") is None:
+            return None
+        key = ("structured", route["model"], structured_output, max_tokens)
+        if key not in cls._routed_clients:
+            cls._routed_clients[key] = cls.open_ai_structured_llm(
+                structured_output=structured_output,
+                max_tokens=max_tokens,
+                model=route["model"]
+            )
+        return cls._routed_clients[key]
+
+    @classmethod
+    def invoke(cls, llm, llm_input, timeout_s: Optional[float] = None, name: str = "llm"):
+        """
+        Invoke an LLM (or chain) with retries, hedging and the circuit breaker
+
+        Args:
+            llm: Runnable to invoke (plain, structured or tool-bound LLM, or a chain)
+            llm_input: Input passed to llm.invoke()
+            timeout_s: Time limit including retries (None = no limit)
+            name: Call name for p95 latency tracking / hedging
+        Raises:
+            CircuitOpenError: Provider unhealthy - use the local fallback
+            TimeoutError: When the call does not finish in time
+        """
+        return get_resilient_caller().call(llm, llm_input, timeout_s=timeout_s, name=name)
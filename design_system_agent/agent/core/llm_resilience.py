@@ -0,0 +1,364 @@
+"""
+LLM Resilience - Retries, hedged requests and a circuit breaker for LLM calls
+
+Every graph LLM call goes through ResilientLLMCaller.call() (via LLMFactory.invoke):
+- Retry: retryable errors (429, 5xx, connection errors, timeouts) are retried
+  with full-jitter exponential backoff, within the call's time limit
+- Hedging: when a call runs longer than the p95 latency of its name, a
+  duplicate request is sent and the first success wins (capped to a share
+  of all calls so hedging cannot double the load)
+- Circuit breaker: after consecutive failures the breaker opens and calls fail
+  fast with CircuitOpenError, so callers take their local fallback paths
+  immediately; after a recovery period one trial call is let through
+
+Each request's HTTP timeout is capped at the time left to its call
+(with_request_timeout), so a request the call gave up on frees its pool
+thread then instead of after LLM_REQUEST_TIMEOUT_S.
+
+Environment Variables:
+- LLM_MAX_RETRIES          : Retries per call (default: 2)
+- LLM_HEDGING              : "false" disables hedged requests (default: true)
+- LLM_BREAKER_FAILURES     : Consecutive failures that open the breaker (default: 5)
+- LLM_BREAKER_RECOVERY_S   : Seconds before a trial call is allowed (default: 30)
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import LLM_SECONDS, timed
+
+
+# Shortest HTTP timeout given to a request (s)
+MIN_REQUEST_TIMEOUT_S = 0.1
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when the LLM provider is considered unhealthy and calls are short-circuited"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an LLM error is transient (rate limit, server error, connection problem, timeout)"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError")
+
+
+def with_request_timeout(llm, timeout_s: float):
+    """
+    The runnable with the HTTP timeout of its chat model requests capped at timeout_s
+
+    Chat models take a per-request timeout, also when tool-bound, in chains and in
+    structured output sequences; other runnables are returned unchanged.
+    """
+    if isinstance(llm, BaseChatModel) or (isinstance(llm, RunnableBinding) and isinstance(llm.bound, BaseChatModel)):
+        return llm.bind(timeout=timeout_s)
+    if isinstance(llm, RunnableSequence):
+        return RunnableSequence(*(with_request_timeout(step, timeout_s) for step in llm.steps))
+    return llm
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    States: closed (calls pass) -> open (calls fail fast) -> half_open (one trial call)
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time_s = recovery_time_s
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.recovery_time_s:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether calls are currently short-circuited (does not claim the half-open trial)"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.recovery_time_s
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("[CircuitBreaker] Opening circuit after {} failure(s)", self.consecutive_failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for_s": round(time.monotonic() - self.opened_at, 1) if self.state == "open" else 0.0,
+            }
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per call name"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def names(self):
+        with self._lock:
+            return list(self._samples)
+
+    def p95(self, name: str) -> Optional[float]:
+        """p95 latency in seconds (None until min_samples calls were recorded)"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class ResilientLLMCaller:
+    """
+    Wraps LLM invocations with retries, hedging and a circuit breaker.
+
+    Example:
+        caller = ResilientLLMCaller()
+        result = caller.call(llm, prompt, timeout_s=4.0, name="layout_selector")
+        caller.get_stats()  # counters, breaker state, p95 per name
+    """
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base_backoff_s: float = 0.2,
+        max_backoff_s: float = 2.0,
+        hedging: Optional[bool] = None,
+        max_hedge_ratio: float = 0.1,
+        breaker: Optional[CircuitBreaker] = None,
+        max_workers: int = 32
+    ):
+        """
+        Initialize resilient caller
+
+        Args:
+            max_retries: Retries per call (default: LLM_MAX_RETRIES env var or 2)
+            base_backoff_s: Backoff cap of the first retry (doubles per retry)
+            max_backoff_s: Maximum backoff cap
+            hedging: Send a duplicate request after the p95 delay (default: LLM_HEDGING env var or True)
+            max_hedge_ratio: Maximum share of calls that may be hedged
+            breaker: Circuit breaker (default: from LLM_BREAKER_* env vars)
+            max_workers: Threads running LLM requests
+        """
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", 2))
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.hedging = hedging if hedging is not None else os.getenv("LLM_HEDGING", "true").lower() != "false"
+        self.max_hedge_ratio = max_hedge_ratio
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", 5)),
+            recovery_time_s=float(os.getenv("LLM_BREAKER_RECOVERY_S", 30))
+        )
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+        self._counters = {
+            "calls": 0, "successes": 0, "failures": 0, "retries": 0,
+            "timeouts": 0, "hedges": 0, "hedge_wins": 0, "short_circuits": 0,
+        }
+        self._lock = threading.Lock()
+
+    # ====================
+    # PUBLIC API
+    # ====================
+
+    def call(self, llm, llm_input, timeout_s: Optional[float] = None, name: str = "llm"):
+        """
+        Invoke an LLM with retries, hedging and the circuit breaker.
+
+        Args:
+            llm: Runnable to invoke (plain, structured or tool-bound LLM, or a chain)
+            llm_input: Input passed to llm.invoke()
+            timeout_s: Time limit for the whole call including retries (None = no limit)
+            name: Call name used for p95 latency tracking (e.g. "layout_selector")
+
+        Raises:
+            CircuitOpenError: Provider unhealthy, caller should use its fallback
+            TimeoutError: Time limit reached
+            Exception: Last error after retries, or a non-retryable error
+        """
+        with timed(LLM_SECONDS, name=name, outcome="error") as span:
+            try:
+                result = self._call(llm, llm_input, timeout_s, name)
+            except CircuitOpenError:
+                span.set(outcome="short_circuit")
+                raise
+            except TimeoutError:
+                span.set(outcome="timeout")
+                raise
+            span.set(outcome="success")
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters, circuit breaker state and p95 latency per call name"""
+        with self._lock:
+            counters = dict(self._counters)
+        p95_ms = {}
+        for call_name in self.latency.names():
+            p95 = self.latency.p95(call_name)
+            if p95 is not None:
+                p95_ms[call_name] = round(p95 * 1000, 1)
+        return {**counters, "circuit": self.breaker.get_state(), "p95_ms": p95_ms}
+
+    # ====================
+    # INTERNALS
+    # ====================
+
+    def _call(self, llm, llm_input, timeout_s: Optional[float], name: str):
+        """Retry loop around hedged attempts (see call())"""
+        self._count("calls")
+        deadline = time.monotonic() + timeout_s if timeout_s is not None else None
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count("short_circuits")
+                raise CircuitOpenError("LLM circuit open - provider unhealthy, using fallback")
+
+            try:
+                result = self._hedged_call(llm, llm_input, deadline, name)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # Provider answered (e.g. output failed validation) - it is healthy
+                    self.breaker.record_success()
+                if isinstance(e, TimeoutError):
+                    self._count("timeouts")
+
+                backoff = random.uniform(0, min(self.max_backoff_s, self.base_backoff_s * 2 ** attempt))
+                out_of_time = deadline is not None and time.monotonic() + backoff >= deadline
+                if not retryable or attempt >= self.max_retries or out_of_time:
+                    self._count("failures")
+                    raise
+
+                attempt += 1
+                self._count("retries")
+                logger.debug(
+                    "[ResilientLLMCaller] {}: {}, retry {}/{} in {:.2f}s", name, type(e).__name__, attempt, self.max_retries, backoff
+                )
+                time.sleep(backoff)
+                continue
+
+            self.breaker.record_success()
+            self._count("successes")
+            return result
+
+    def _submit(self, llm, llm_input, deadline: Optional[float]):
+        """Run one request on the pool (own context copy so usage tracking still sees it), bounded by the deadline"""
+        context = contextvars.copy_context()
+        started = time.monotonic()
+        if deadline is not None:
+            llm = with_request_timeout(llm, max(deadline - started, MIN_REQUEST_TIMEOUT_S))
+        future = self._executor.submit(context.run, llm.invoke, llm_input)
+        future.started = started
+        return future
+
+    def _hedged_call(self, llm, llm_input, deadline: Optional[float], name: str):
+        """One attempt: primary request plus an optional hedge after the p95 delay"""
+        pending = {self._submit(llm, llm_input, deadline)}
+        hedge_delay = self._hedge_delay(name)
+        hedge = None
+        first_error = None
+
+        while pending:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("LLM call exceeded its deadline")
+
+            wait_s = remaining
+            if hedge is None and hedge_delay is not None:
+                wait_s = hedge_delay if wait_s is None else min(wait_s, hedge_delay)
+
+            done, pending = wait(pending, timeout=wait_s, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    self.latency.record(name, time.monotonic() - future.started)
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                first_error = first_error or future.exception()
+
+            if not done and hedge is None and hedge_delay is not None and self._may_hedge():
+                # Primary is slower than p95: send a duplicate, first success wins
+                hedge = self._submit(llm, llm_input, deadline)
+                pending.add(hedge)
+                self._count("hedges")
+                hedge_delay = None
+            elif not done and hedge is None:
+                hedge_delay = None
+
+        raise first_error
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        if not self.hedging:
+            return None
+        return self.latency.p95(name)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            return self._counters["hedges"] < self.max_hedge_ratio * self._counters["calls"]
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+
+# Singleton instance
+_resilient_caller = None
+
+def get_resilient_caller() -> ResilientLLMCaller:
+    """Get singleton instance of ResilientLLMCaller"""
+    global _resilient_caller
+    if _resilient_caller is None:
+        _resilient_caller = ResilientLLMCaller()
+    return _resilient_caller
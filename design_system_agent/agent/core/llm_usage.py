@@ -0,0 +1,126 @@
+"""
+LLM Usage Tracking - Per-request token and prompt-cache accounting
+
+A LangChain callback handler (attached to every client created by LLMFactory)
+records input, output and cached input tokens for each LLM call into the
+usage record of the current request. The record lives in a ContextVar, so
+concurrent requests never mix their numbers (LangGraph propagates the
+context into node execution).
+
+Usage:
+    usage = start_usage_tracking()
+    graph.invoke(state)
+    usage  # {"calls": 2, "input_tokens": ..., "cached_tokens": ..., "by_node": {...}}
+"""
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from design_system_agent.agent.core.instrumentation import (
+    LLM_CACHE_HIT_RATIO, LLM_TOKENS, METRICS_ENABLED
+)
+
+
+_current_usage: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_usage", default=None)
+
+
+def _empty_usage() -> Dict[str, Any]:
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+
+
+def start_usage_tracking() -> Dict[str, Any]:
+    """Start a new usage record for the current request and return it"""
+    usage = _empty_usage()
+    usage["by_node"] = {}
+    _current_usage.set(usage)
+    return usage
+
+
+def get_current_usage() -> Optional[Dict[str, Any]]:
+    """Get the usage record of the current request (None outside a tracked request)"""
+    return _current_usage.get()
+
+
+def summarize_usage(usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add the prompt cache hit ratio (cached / input tokens) to a usage record"""
+    if not usage:
+        return {}
+    summary = dict(usage)
+    summary["cache_hit_ratio"] = round(
+        usage["cached_tokens"] / usage["input_tokens"], 3
+    ) if usage["input_tokens"] else 0.0
+    return summary
+
+
+def _extract_token_usage(response) -> Dict[str, int]:
+    """Read input/output/cached tokens from an LLMResult (usage_metadata or OpenAI token_usage)"""
+    tokens = {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0}
+
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage_metadata = getattr(message, "usage_metadata", None) if message else None
+            if usage_metadata:
+                tokens["input_tokens"] += usage_metadata.get("input_tokens", 0) or 0
+                tokens["output_tokens"] += usage_metadata.get("output_tokens", 0) or 0
+                details = usage_metadata.get("input_token_details") or {}
+                tokens["cached_tokens"] += details.get("cache_read", 0) or 0
+
+    if not tokens["input_tokens"] and response.llm_output:
+        token_usage = response.llm_output.get("token_usage") or {}
+        tokens["input_tokens"] = token_usage.get("prompt_tokens", 0) or 0
+        tokens["output_tokens"] = token_usage.get("completion_tokens", 0) or 0
+        details = token_usage.get("prompt_tokens_details") or {}
+        tokens["cached_tokens"] = details.get("cached_tokens", 0) or 0
+
+    return tokens
+
+
+class LLMUsageTracker(BaseCallbackHandler):
+    """Callback handler that adds token usage of every LLM call to the current request's record"""
+
+    def __init__(self):
+        self._run_nodes: Dict[Any, str] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        if METRICS_ENABLED or _current_usage.get() is not None:
+            self._run_nodes[run_id] = (metadata or {}).get("langgraph_node", "unknown")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        if METRICS_ENABLED or _current_usage.get() is not None:
+            self._run_nodes[run_id] = (metadata or {}).get("langgraph_node", "unknown")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        node = self._run_nodes.pop(run_id, "unknown")
+        usage = _current_usage.get()
+        if usage is None and not METRICS_ENABLED:
+            return
+
+        tokens = _extract_token_usage(response)
+        for kind, count in tokens.items():
+            LLM_TOKENS.observe(count, node=node, kind=kind.replace("_tokens", ""))
+        if tokens["input_tokens"]:
+            LLM_CACHE_HIT_RATIO.observe(tokens["cached_tokens"] / tokens["input_tokens"], node=node)
+        if usage is None:
+            return
+
+        node_usage = usage["by_node"].setdefault(node, _empty_usage())
+        for record in (usage, node_usage):
+            record["calls"] += 1
+            for key, value in tokens.items():
+                record[key] += value
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._run_nodes.pop(run_id, None)
+
+
+# Singleton instance
+_usage_tracker = None
+
+def get_usage_tracker() -> LLMUsageTracker:
+    """Get singleton instance of LLMUsageTracker"""
+    global _usage_tracker
+    if _usage_tracker is None:
+        _usage_tracker = LLMUsageTracker()
+    return _usage_tracker
@@ -0,0 +1,185 @@
+"""
+Logging Config - Non-blocking, sampled loguru pipeline for the hot path
+
+One loguru sink replaces the per-node print() output:
+- enqueued: records are handed to a writer thread, request threads never
+  block on stdout/stderr
+- per-module levels: LOG_MODULE_LEVELS raises or lowers single modules
+- per-request verbosity: a request can ask for more detail (X-Log-Level
+  header) without changing the global level
+- sampling: high-volume debug lines (per candidate, per tool call) are
+  logged through sampled_logger and only a share of them is emitted
+- request IDs: every record carries the current request ID
+
+Loguru formats a message before filters run, so hot-path calls use brace
+arguments (logger.debug("found {} candidates", n)) instead of f-strings and
+opt(lazy=True) for expensive values. With LOG_LEVEL=INFO and request
+overrides off, debug calls return at loguru's level check and loops of
+debug lines are skipped entirely via debug_enabled().
+
+Environment Variables:
+- LOG_LEVEL             : Default level (default: INFO)
+- LOG_MODULE_LEVELS     : Per-module levels, e.g. "vector_layout_rag=WARNING,layout_selector_agent=DEBUG"
+                          (last module name component or dotted prefix)
+- LOG_SAMPLE_RATE       : Share of sampled debug lines emitted (default: 0.05)
+- LOG_REQUEST_OVERRIDE  : "true" honours per-request levels (X-Log-Level) (default: false)
+- LOG_ENQUEUE           : "false" writes synchronously (default: true)
+"""
+import os
+import random
+import sys
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import get_request_id
+
+
+LOG_FORMAT = (
+    "<green>{time:HH:mm:ss.SSS}</green> | <level>{level: <7}</level> | "
+    "<cyan>{extra[request_id]}</cyan> | <level>{message}</level>"
+)
+
+DEBUG_LEVEL_NO = 10
+
+# High-volume debug lines go through this logger and are sampled (LOG_SAMPLE_RATE)
+sampled_logger = logger.bind(sampled=True)
+
+_request_level: ContextVar[Optional[int]] = ContextVar("log_level", default=None)
+
+_handler_id: Optional[int] = None
+_state = {
+    "debug_possible": os.getenv("LOG_LEVEL", "INFO").upper() in ("TRACE", "DEBUG"),
+    "debug_configured": os.getenv("LOG_LEVEL", "INFO").upper() in ("TRACE", "DEBUG"),
+}
+
+
+def _level_no(level: str) -> int:
+    return logger.level(level.upper()).no
+
+
+def _parse_module_levels(spec: str) -> Dict[str, int]:
+    """Parse "module=LEVEL,other=LEVEL" into {module: level number}"""
+    levels = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        module, _, level = part.partition("=")
+        try:
+            levels[module.strip()] = _level_no(level.strip() or "INFO")
+        except ValueError:
+            print(f"[LoggingConfig] ⚠️  Unknown level in LOG_MODULE_LEVELS: '{part}'")
+    return levels
+
+
+class LogFilter:
+    """Per-module levels, per-request verbosity and sampling of debug lines"""
+
+    def __init__(self, default_level: int, module_levels: Dict[str, int], sample_rate: float, request_override: bool):
+        self.default_level = default_level
+        self.module_levels = module_levels
+        self.sample_rate = sample_rate
+        self.request_override = request_override
+        self._cache: Dict[str, int] = {}
+
+    def level_for(self, module: str) -> int:
+        """Effective level of a module (most specific LOG_MODULE_LEVELS match, else default)"""
+        level = self._cache.get(module)
+        if level is None:
+            level = self.default_level
+            best = -1
+            for name, name_level in self.module_levels.items():
+                matches = module == name or module.startswith(name + ".") or module.rsplit(".", 1)[-1] == name
+                if matches and len(name) > best:
+                    level, best = name_level, len(name)
+            self._cache[module] = level
+        return level
+
+    def __call__(self, record) -> bool:
+        level_no = record["level"].no
+        if self.request_override:
+            request_level = _request_level.get()
+            if request_level is not None and level_no >= request_level:
+                return True
+        if level_no < self.level_for(record["name"] or ""):
+            return False
+        if record["extra"].get("sampled") and level_no <= DEBUG_LEVEL_NO:
+            return random.random() < self.sample_rate
+        return True
+
+
+def _add_request_id(record):
+    record["extra"].setdefault("request_id", get_request_id() or "-")
+
+
+def configure_logging(
+    sink=sys.stderr,
+    level: Optional[str] = None,
+    module_levels: Optional[str] = None,
+    sample_rate: Optional[float] = None,
+    request_override: Optional[bool] = None,
+    enqueue: Optional[bool] = None
+) -> int:
+    """
+    (Re)configure the loguru pipeline; replaces loguru's default handler
+
+    Args:
+        sink: Where records are written (default: stderr)
+        level: Default level (default: LOG_LEVEL env var or INFO)
+        module_levels: Per-module levels spec (default: LOG_MODULE_LEVELS env var)
+        sample_rate: Share of sampled debug lines emitted (default: LOG_SAMPLE_RATE env var or 0.05)
+        request_override: Honour per-request levels (default: LOG_REQUEST_OVERRIDE env var or False)
+        enqueue: Write from a background thread (default: LOG_ENQUEUE env var or True)
+
+    Returns:
+        loguru handler id
+    """
+    global _handler_id
+    default_level = _level_no(level or os.getenv("LOG_LEVEL", "INFO"))
+    modules = _parse_module_levels(module_levels if module_levels is not None else os.getenv("LOG_MODULE_LEVELS", ""))
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_SAMPLE_RATE", 0.05))
+    if request_override is None:
+        request_override = os.getenv("LOG_REQUEST_OVERRIDE", "false").lower() == "true"
+    if enqueue is None:
+        enqueue = os.getenv("LOG_ENQUEUE", "true").lower() != "false"
+
+    # Lowest level any record could pass at; loguru drops anything below it before building a record
+    min_level = min([default_level, *modules.values()])
+    if request_override:
+        min_level = min(min_level, DEBUG_LEVEL_NO)
+    _state["debug_configured"] = min([default_level, *modules.values()]) <= DEBUG_LEVEL_NO
+    _state["debug_possible"] = min_level <= DEBUG_LEVEL_NO
+
+    if _handler_id is None:
+        logger.remove()  # loguru's default stderr handler
+    else:
+        logger.remove(_handler_id)
+    logger.configure(patcher=_add_request_id)
+    _handler_id = logger.add(
+        sink,
+        level=min_level,
+        format=LOG_FORMAT,
+        filter=LogFilter(default_level, modules, sample_rate, request_override),
+        enqueue=enqueue,
+        backtrace=False,
+        diagnose=False,
+    )
+    return _handler_id
+
+
+def set_request_log_level(level: Optional[str]):
+    """Set the log level of the current request (None = global levels); ignored for unknown levels"""
+    try:
+        _request_level.set(_level_no(level) if level else None)
+    except ValueError:
+        _request_level.set(None)
+
+
+def debug_enabled() -> bool:
+    """Whether debug lines can be emitted now (guard for loops of debug logging)"""
+    if not _state["debug_possible"]:
+        return False
+    if _state["debug_configured"]:
+        return True
+    request_level = _request_level.get()
+    return request_level is not None and request_level <= DEBUG_LEVEL_NO
@@ -0,0 +1,156 @@
+"""
+Micro Batcher - Dynamic batching of model inference across concurrent requests
+
+Concurrent searches each encode a few queries and rerank ~10-30 pairs. Run
+one by one, those tiny batches leave most of the CPU's vector units idle and
+the request threads' torch calls compete for the same intra-op threads.
+A MicroBatcher puts submitted items on a queue; one worker thread takes the
+first waiting request, keeps collecting until max_wait_ms passed or
+max_batch_size items are gathered, runs them as one batch and resolves each
+request's future with its slice of the results.
+
+A single request pays at most max_wait_ms extra; under load many requests
+share one forward pass. Requests larger than max_batch_size run whole.
+
+The worker thread starts on first use and is restarted in a forked child
+(preload-then-fork serving), so no thread is started in the master.
+
+Metrics: dsa_inference_batch_size, dsa_inference_queue_depth and
+dsa_inference_batch_wait_seconds, labelled by batcher name.
+
+Environment Variables:
+- INFERENCE_BATCHING       : "false" runs every request inline (default: true)
+- INFERENCE_BATCH_MAX_SIZE : Items per batch (default: 64)
+- INFERENCE_BATCH_WAIT_MS  : Collection window after the first request (default: 2)
+
+Usage:
+    batcher = MicroBatcher("embedding", lambda texts: model.encode(texts))
+    vectors = batcher.run(["show all leads"])
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence
+
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import BATCH_QUEUE_DEPTH, BATCH_SIZE, BATCH_WAIT_SECONDS
+
+
+class _Request:
+    __slots__ = ("items", "future", "enqueued")
+
+    def __init__(self, items: Sequence[Any]):
+        self.items = items
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """Runs items submitted by concurrent threads through batch_fn in shared batches"""
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Initialize batcher
+
+        Args:
+            name: Label of the batch metrics (e.g. "embedding", "reranker")
+            batch_fn: Runs a list of items, returns one result per item (list or array)
+            max_batch_size: Items per batch (default: INFERENCE_BATCH_MAX_SIZE env var or 64)
+            max_wait_ms: Collection window (default: INFERENCE_BATCH_WAIT_MS env var or 2)
+            enabled: Batch across requests (default: INFERENCE_BATCHING env var or True)
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or int(os.getenv("INFERENCE_BATCH_MAX_SIZE", 64))
+        self.max_wait_s = (max_wait_ms if max_wait_ms is not None else float(os.getenv("INFERENCE_BATCH_WAIT_MS", 2))) / 1000
+        self.enabled = enabled if enabled is not None else os.getenv("INFERENCE_BATCHING", "true").lower() != "false"
+        self._queue: "queue.SimpleQueue[_Request]" = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = {"requests": 0, "batches": 0, "items": 0}
+
+    def run(self, items: Sequence[Any], timeout: Optional[float] = None) -> Sequence[Any]:
+        """Run items (in a shared batch when batching is enabled) and return their results"""
+        if not self.enabled:
+            return self.batch_fn(list(items))
+        return self.submit(items).result(timeout=timeout)
+
+    def submit(self, items: Sequence[Any]) -> Future:
+        """Queue items for the next batch; the future resolves to their results"""
+        self._ensure_worker()
+        request = _Request(items)
+        self._queue.put(request)
+        return request.future
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["avg_batch_items"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["avg_batch_requests"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    # ====================
+    # WORKER
+    # ====================
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # First use, or first use in a forked child: the parent's thread and queue are not ours
+                self._queue = queue.SimpleQueue()
+                self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _collect(self) -> List[_Request]:
+        """First waiting request plus whatever arrives within the window, up to max_batch_size items"""
+        batch = [self._queue.get()]
+        size = len(batch[0].items)
+        window_end = time.perf_counter() + self.max_wait_s
+        while size < self.max_batch_size:
+            remaining = window_end - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.items)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            BATCH_QUEUE_DEPTH.observe(len(batch) + self._queue.qsize(), batcher=self.name)
+            items = [item for request in batch for item in request.items]
+            started = time.perf_counter()
+            for request in batch:
+                BATCH_WAIT_SECONDS.observe(started - request.enqueued, batcher=self.name)
+            BATCH_SIZE.observe(len(items), batcher=self.name)
+
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                logger.warning("[MicroBatcher] {} batch of {} items failed: {}: {}", self.name, len(items), type(e).__name__, e)
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.items)])
+                offset += len(request.items)
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["items"] += len(items)
@@ -0,0 +1,145 @@
+"""
+Model Router - Picks the LLM for each graph node from config rules
+
+Rules are matched in order against the node name and the query analysis
+(pattern_type, complexity_level). The first matching rule wins; a rule with
+"model": null means the node skips the LLM and uses its local fallback.
+
+Config (LLM_ROUTING_CONFIG env var: path to a JSON file or inline JSON):
+    {
+      "default_model": "gpt-4o-mini",
+      "rules": [
+        {"name": "simple_list_no_llm", "node": "llm_select_and_fill",
+         "pattern_type": ["LIST_SIMPLE"], "complexity_level": ["basic"], "model": null},
+        {"name": "complex_strong", "node": "llm_select_and_fill",
+         "complexity_level": ["advanced"], "model": "gpt-4o"}
+      ],
+      "pricing": {"gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10.0}}
+    }
+
+Omitted keys fall back to DEFAULT_ROUTING_CONFIG. Pricing is USD per 1M tokens.
+"""
+import json
+import os
+from typing import Any, Dict, Optional
+
+
+DEFAULT_ROUTING_CONFIG: Dict[str, Any] = {
+    "default_model": None,  # None = OPENAI_MODEL env var or gpt-4o-mini
+    "rules": [
+        # Plain lists: the top reranked candidate is already the answer
+        {"name": "simple_list_no_llm", "node": "llm_select_and_fill",
+         "pattern_type": ["LIST_SIMPLE"], "complexity_level": ["basic"], "model": None},
+        # Multi-object / grouped queries need the stronger model to adapt layouts
+        {"name": "complex_strong", "node": "llm_select_and_fill",
+         "complexity_level": ["advanced"], "model": "gpt-4o"},
+        # Basic queries are scored heuristically
+        {"name": "basic_heuristic_score", "node": "score_output",
+         "complexity_level": ["basic"], "model": None},
+    ],
+    "pricing": {
+        "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+        "gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+        "gpt-4-turbo": {"input": 10.00, "cached_input": 10.00, "output": 30.00},
+        "gpt-3.5-turbo": {"input": 0.50, "cached_input": 0.50, "output": 1.50},
+    },
+}
+
+# Analysis fields a rule can match on (rule value = list of accepted values)
+MATCH_FIELDS = ("pattern_type", "complexity_level")
+
+
+def _load_config(source: Optional[str]) -> Dict[str, Any]:
+    """Load routing config from a JSON file path or inline JSON string"""
+    if not source:
+        return {}
+    try:
+        if os.path.isfile(source):
+            with open(source, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return json.loads(source)
+    except (OSError, ValueError) as e:
+        print(f"[ModelRouter] ⚠️  Invalid routing config ({type(e).__name__}: {e}), using defaults")
+        return {}
+
+
+class ModelRouter:
+    """
+    Routes LLM calls to a model per node and query complexity.
+
+    Example:
+        router = ModelRouter()
+        route = router.route("llm_select_and_fill", {"pattern_type": "FULL_COMPLEX", "complexity_level": "advanced"})
+        # {"name": "complex_strong", "node": "llm_select_and_fill", "model": "gpt-4o"}
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize model router
+
+        Args:
+            config: Routing config (default: LLM_ROUTING_CONFIG env var merged over DEFAULT_ROUTING_CONFIG)
+        """
+        if config is None:
+            config = _load_config(os.getenv("LLM_ROUTING_CONFIG"))
+
+        self.default_model = (
+            config.get("default_model")
+            or DEFAULT_ROUTING_CONFIG["default_model"]
+            or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        )
+        self.rules = config.get("rules", DEFAULT_ROUTING_CONFIG["rules"])
+        self.pricing = {**DEFAULT_ROUTING_CONFIG["pricing"], **config.get("pricing", {})}
+
+    def route(self, node: str, analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Pick the route for a node call.
+
+        Args:
+            node: Graph node name (e.g. "llm_select_and_fill")
+            analysis: Query analysis dict (may be None before analysis runs)
+
+        Returns:
+            dict with name, node and model (None = skip the LLM)
+        """
+        analysis = analysis or {}
+        for rule in self.rules:
+            if rule.get("node") not in (None, node):
+                continue
+            if all(
+                analysis.get(field) in rule[field]
+                for field in MATCH_FIELDS if field in rule
+            ):
+                return {"name": rule.get("name", "unnamed"), "node": node, "model": rule.get("model")}
+        return {"name": "default", "node": node, "model": self.default_model}
+
+    def estimate_cost(self, model: Optional[str], usage: Dict[str, int]) -> float:
+        """
+        Estimate USD cost of token usage on a model (0.0 for unknown models).
+
+        Args:
+            model: Model name
+            usage: dict with input_tokens, cached_tokens, output_tokens
+        """
+        prices = self.pricing.get(model)
+        if not prices:
+            return 0.0
+        cached = usage.get("cached_tokens", 0)
+        uncached = max(usage.get("input_tokens", 0) - cached, 0)
+        cost = (
+            uncached * prices["input"]
+            + cached * prices.get("cached_input", prices["input"])
+            + usage.get("output_tokens", 0) * prices["output"]
+        )
+        return round(cost / 1_000_000, 6)
+
+
+# Singleton instance
+_model_router = None
+
+def get_model_router() -> ModelRouter:
+    """Get singleton instance of ModelRouter"""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
@@ -0,0 +1,182 @@
+"""
+Prompt Budget - Token counting and compaction for LLM prompts
+
+Prompts are assembled from named sections. Each section has a priority:
+- priority 0: required (may be summarized, never dropped)
+- priority 1+: optional; the highest number is reduced first
+
+When the rendered prompt exceeds the token budget, sections are reduced one
+at a time (summary first, then dropped) until the prompt fits.
+
+Token counts use tiktoken when its encoding is available locally and fall
+back to a ~4 chars/token estimate otherwise (e.g. offline boxes).
+"""
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+DEFAULT_ENCODING = "o200k_base"  # gpt-4o / gpt-4o-mini tokenizer
+CHARS_PER_TOKEN = 4
+
+_encoder = None
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """Load the tiktoken encoder once (None if tiktoken or its encoding file is unavailable)"""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(os.getenv("PROMPT_TOKEN_ENCODING", DEFAULT_ENCODING))
+        except Exception as e:
+            logger.warning("[PromptBudget] Tokenizer unavailable ({}), estimating {} chars/token", type(e).__name__, CHARS_PER_TOKEN)
+            _encoder = None
+    return _encoder
+
+
+@lru_cache(maxsize=512)
+def count_tokens(text: str) -> int:
+    """Count tokens in text (cached - static prompt sections are counted once)"""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoder.encode(text))
+
+
+def compact_json(obj: Any) -> str:
+    """Serialize to JSON without indentation or padding whitespace"""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class PromptBudget:
+    """
+    Assembles a prompt from named sections and fits it into a token budget.
+
+    Example:
+        budget = PromptBudget(max_tokens=2000, name="LayoutSelectorAgent")
+        budget.add("query", query_text)
+        budget.add("examples", examples_text, priority=3, summary=short_examples)
+        prompt = budget.render()
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, name: str = "PromptBudget", separator: str = "\n\n"):
+        """
+        Initialize prompt budget
+
+        Args:
+            max_tokens: Token budget for the rendered prompt (None = unlimited)
+            name: Label used in token reports
+            separator: Text placed between sections
+        """
+        self.max_tokens = max_tokens
+        self.name = name
+        self.separator = separator
+        self.sections: List[Dict[str, Any]] = []
+        self.last_report: Dict[str, Any] = {}
+
+    def add(self, name: str, text: str, priority: int = 0, summary: Optional[str] = None) -> "PromptBudget":
+        """
+        Add a prompt section
+
+        Args:
+            name: Section name (used in token reports)
+            text: Full section text
+            priority: 0 = required, higher numbers are reduced first
+            summary: Optional shorter text used before dropping the section
+        """
+        self.sections.append({
+            "name": name,
+            "text": text,
+            "priority": priority,
+            "summary": summary,
+            "state": "full",
+        })
+        return self
+
+    def render(self) -> str:
+        """Fit sections into the budget, log tokens per section and return the prompt"""
+        for section in self.sections:
+            section["state"] = "full"
+            section["tokens"] = count_tokens(section["text"])
+
+        total = self._total_tokens()
+        if self.max_tokens is not None and total > self.max_tokens:
+            total = self._reduce(total)
+
+        self.last_report = {
+            "total_tokens": total,
+            "budget": self.max_tokens,
+            "sections": {
+                s["name"]: {"tokens": s["tokens"], "state": s["state"]} for s in self.sections
+            },
+        }
+        self._log_report()
+
+        return self.separator.join(
+            self._current_text(s) for s in self.sections if s["state"] != "dropped"
+        )
+
+    def _reduce(self, total: int) -> int:
+        """Summarize, then drop, sections from the highest priority number down until the prompt fits"""
+        # Reduction order: highest priority number first, later sections first within a priority
+        order = sorted(
+            range(len(self.sections)),
+            key=lambda i: (self.sections[i]["priority"], i),
+            reverse=True,
+        )
+
+        # Pass 1: summaries (cheap, keeps the information)
+        for i in order:
+            if total <= self.max_tokens:
+                return total
+            section = self.sections[i]
+            if section["summary"] is not None:
+                section["state"] = "summary"
+                section["tokens"] = count_tokens(section["summary"])
+                total = self._total_tokens()
+
+        # Pass 2: drop optional sections
+        for i in order:
+            if total <= self.max_tokens:
+                return total
+            section = self.sections[i]
+            if section["priority"] > 0:
+                section["state"] = "dropped"
+                section["tokens"] = 0
+                total = self._total_tokens()
+
+        if total > self.max_tokens:
+            logger.warning("[{}] Prompt still over budget after compaction: {}/{} tokens", self.name, total, self.max_tokens)
+        return total
+
+    def _current_text(self, section: Dict[str, Any]) -> str:
+        return section["summary"] if section["state"] == "summary" else section["text"]
+
+    def _total_tokens(self) -> int:
+        kept = [s for s in self.sections if s["state"] != "dropped"]
+        separators = count_tokens(self.separator) * max(len(kept) - 1, 0)
+        return sum(s["tokens"] for s in kept) + separators
+
+    def _log_report(self):
+        logger.opt(lazy=True).debug(
+            "[{}] Prompt tokens: {}/{} | {}",
+            lambda: self.name,
+            lambda: self.last_report["total_tokens"],
+            lambda: self.max_tokens if self.max_tokens is not None else "unlimited",
+            lambda: self._report_parts()
+        )
+
+    def _report_parts(self) -> str:
+        parts = []
+        for name, info in self.last_report["sections"].items():
+            marker = "" if info["state"] == "full" else f"({info['state']})"
+            parts.append(f"{name}={info['tokens']}{marker}")
+        return ", ".join(parts)
@@ -0,0 +1,252 @@
+"""
+Query Expander - Local query variation generator for RAG expansion
+
+Replaces the LLM-generated `generated_queries` with deterministic, local
+rewrites built from the CRM vocabularies in crm_queries.py:
+- Verb swaps (show -> list, get, fetch, display, find)
+- Pluralization of CRM objects (lead <-> leads, branch <-> branches)
+- Field aliasing (created_date <-> created date, "branch wise" <-> "grouped by branch")
+- Optional embedding-neighbour terms (closest vocabulary term by cosine similarity)
+
+Expansion runs in microseconds and produces the same variations for the
+same input, so the analysis LLM no longer spends output tokens on paraphrases.
+"""
+import re
+from typing import Dict, List, Optional
+
+from design_system_agent.core.dataset_genertor.crm_dataset.crm_queries import (
+    ENUMS,
+    OBJECTS,
+    SYNONYMS,
+)
+
+
+# Verbs that start a query but are not in SYNONYMS (mapped onto the SYNONYMS swap set)
+EXTRA_VERBS = ["view", "retrieve", "give"]
+
+# Words that never get a neighbour substitution
+STOPWORDS = {
+    "a", "an", "the", "my", "me", "all", "of", "for", "in", "on", "by", "with",
+    "where", "is", "are", "and", "or", "to", "from", "this", "that", "which",
+    "top", "wise", "related", "grouped", "sorted", "than", "having", "who", "have",
+}
+
+
+def pluralize(word: str) -> str:
+    """Pluralize a CRM object noun (lead -> leads, branch -> branches, opportunity -> opportunities)"""
+    if word.endswith("y") and len(word) > 1 and word[-2] not in "aeiou":
+        return word[:-1] + "ies"
+    if word.endswith(("s", "x", "ch", "sh")):
+        return word + "es"
+    return word + "s"
+
+
+class QueryExpander:
+    """
+    Generates query variations locally from the CRM vocabularies.
+
+    Each transformation produces its own candidate list; candidates are merged
+    round-robin so the first few variations cover different rewrites
+    (the RAG engine only searches with the first 3 queries).
+    """
+
+    def __init__(
+        self,
+        max_variations: int = 5,
+        embedding_model=None,
+        neighbour_threshold: float = 0.6
+    ):
+        """
+        Initialize query expander
+
+        Args:
+            max_variations: Maximum number of variations returned (including the query itself)
+            embedding_model: Optional SentenceTransformer-compatible model used for
+                             embedding-neighbour terms (disabled when None)
+            neighbour_threshold: Minimum cosine similarity for a neighbour substitution
+        """
+        self.max_variations = max_variations
+        self.embedding_model = embedding_model
+        self.neighbour_threshold = neighbour_threshold
+
+        self.verbs = list(SYNONYMS)
+        self._verb_set = set(self.verbs) | set(EXTRA_VERBS)
+
+        # singular <-> plural object forms
+        self._plural_of = {obj: pluralize(obj) for obj in OBJECTS}
+        self._singular_of = {plural: obj for obj, plural in self._plural_of.items()}
+        # object used as a modifier ("loan amount", "branch wise") keeps its number
+        self._modifier_heads = {"wise", "status", "amount", "balance", "manager"}
+
+        # field aliases: snake_case <-> spaced words
+        fields = {field for obj_fields in OBJECTS.values() for field in obj_fields}
+        fields.update(ENUMS["amount_field"])
+        fields.update(ENUMS["group_by"])
+        self._field_aliases: Dict[str, str] = {}
+        for field in sorted(fields):
+            if "_" in field:
+                spaced = field.replace("_", " ")
+                self._field_aliases[field] = spaced
+                self._field_aliases[spaced] = field
+        self._field_pattern = re.compile(
+            r"\b(" + "|".join(re.escape(a) for a in sorted(self._field_aliases, key=len, reverse=True)) + r")\b"
+        )
+
+        # "<group> wise" <-> "grouped by <group>"
+        group_by = "|".join(re.escape(g.replace("_", " ")) for g in ENUMS["group_by"])
+        self._wise_pattern = re.compile(rf"\b({group_by}) wise\b")
+        self._grouped_pattern = re.compile(rf"\bgrouped by ({group_by})\b")
+
+        # Vocabulary for embedding neighbours (built lazily on first use)
+        self._vocabulary: List[str] = sorted(
+            set(OBJECTS) | set(self._plural_of.values()) | set(self._field_aliases)
+            | {v for key in ("status", "priority", "metrics") for v in ENUMS[key]}
+        )
+        self._vocab_embeddings = None
+        self._neighbour_cache: Dict[str, Optional[str]] = {}
+
+    # ====================
+    # PUBLIC API
+    # ====================
+
+    def expand(self, query: str, max_variations: Optional[int] = None) -> List[str]:
+        """
+        Generate query variations with the same intent.
+
+        Args:
+            query: Normalized user query
+            max_variations: Override for the configured maximum
+
+        Returns:
+            List of unique variations, starting with the (lowercased) query itself
+        """
+        limit = max_variations or self.max_variations
+        base = " ".join(query.lower().split())
+        if not base:
+            return []
+
+        candidate_lists = [
+            self._verb_variations(base),
+            self._number_variations(base),
+            self._field_variations(base),
+            self._neighbour_variations(base),
+        ]
+
+        variations = [base]
+        seen = {base}
+        depth = max((len(c) for c in candidate_lists), default=0)
+        for i in range(depth):
+            for candidates in candidate_lists:
+                if i < len(candidates) and candidates[i] not in seen:
+                    seen.add(candidates[i])
+                    variations.append(candidates[i])
+                    if len(variations) >= limit:
+                        return variations
+        return variations
+
+    # ====================
+    # TRANSFORMATIONS
+    # ====================
+
+    def _verb_variations(self, query: str) -> List[str]:
+        """Swap the leading verb with its synonyms (or prefix one if the query has no verb)"""
+        tokens = query.split()
+        if tokens[0] in self._verb_set:
+            rest = " ".join(tokens[1:])
+            # "show me my leads" -> "list my leads" (drop the pronoun after the verb)
+            if tokens[1:2] == ["me"] and len(tokens) > 2:
+                rest = " ".join(tokens[2:])
+            return [f"{verb} {rest}" for verb in self.verbs if verb != tokens[0]]
+        return [f"{verb} {query}" for verb in self.verbs]
+
+    def _number_variations(self, query: str) -> List[str]:
+        """Toggle singular/plural forms of CRM objects"""
+        tokens = query.split()
+        swapped = []
+        for i, token in enumerate(tokens):
+            next_token = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if next_token in self._modifier_heads:
+                swapped.append(token)
+            elif token in self._plural_of:
+                swapped.append(self._plural_of[token])
+            elif token in self._singular_of:
+                swapped.append(self._singular_of[token])
+            else:
+                swapped.append(token)
+        variation = " ".join(swapped)
+        return [variation] if variation != query else []
+
+    def _field_variations(self, query: str) -> List[str]:
+        """Swap field aliases and group-by phrasing"""
+        variations = []
+        aliased = self._field_pattern.sub(lambda m: self._field_aliases[m.group(1)], query)
+        if aliased != query:
+            variations.append(aliased)
+
+        wise = self._wise_pattern.search(query)
+        if wise:
+            # "branch wise count of leads where ..." -> "count of leads grouped by branch where ..."
+            rest = (query[:wise.start()] + query[wise.end():]).split()
+            clause = ["grouped", "by", wise.group(1)]
+            cut = rest.index("where") if "where" in rest else len(rest)
+            variations.append(" ".join(rest[:cut] + clause + rest[cut:]))
+        elif self._grouped_pattern.search(query):
+            variations.append(self._grouped_pattern.sub(r"\1 wise", query))
+        return variations
+
+    def _neighbour_variations(self, query: str) -> List[str]:
+        """Substitute content words with their nearest vocabulary term (embedding model required)"""
+        if self.embedding_model is None:
+            return []
+
+        tokens = query.split()
+        variations = []
+        for i, token in enumerate(tokens):
+            if token in self._verb_set or token in STOPWORDS or token.isdigit():
+                continue
+            neighbour = self._nearest_term(token)
+            if neighbour:
+                variations.append(" ".join(tokens[:i] + [neighbour] + tokens[i + 1:]))
+        return variations
+
+    def _nearest_term(self, token: str) -> Optional[str]:
+        """Find the closest vocabulary term for a token (cached per token)"""
+        if token in self._neighbour_cache:
+            return self._neighbour_cache[token]
+
+        if self._vocab_embeddings is None:
+            self._vocab_embeddings = self.embedding_model.encode(
+                self._vocabulary,
+                convert_to_numpy=True,
+                normalize_embeddings=True
+            )
+
+        token_embedding = self.embedding_model.encode(
+            [token],
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )[0]
+        similarities = self._vocab_embeddings @ token_embedding
+
+        neighbour = None
+        for idx in similarities.argsort()[::-1]:
+            term = self._vocabulary[idx]
+            if similarities[idx] < self.neighbour_threshold:
+                break
+            if term not in (token, self._plural_of.get(token), self._singular_of.get(token)):
+                neighbour = term
+                break
+
+        self._neighbour_cache[token] = neighbour
+        return neighbour
+
+
+# Singleton instance
+_query_expander = None
+
+def get_query_expander() -> QueryExpander:
+    """Get singleton instance of QueryExpander"""
+    global _query_expander
+    if _query_expander is None:
+        _query_expander = QueryExpander()
+    return _query_expander
@@ -0,0 +1,293 @@
+"""
+Refinement Sessions - Follow-up turns reuse the previous turn's work
+
+Users refine a layout in steps ("show my leads", then "only high
+priority", then "as cards"). Without a session each turn is a cold
+GraphAgent.invoke: fresh analysis (LLM), retrieval (embedding + rerank) and
+selection (LLM). A session keeps the last turn:
+- analysis (QueryAnalysis dump, its query covers the conversation so far)
+- retrieved candidates (score records, bodies stay in the catalog)
+- fetched data
+- the catalog ID of the selected layout
+
+and the nodes of a follow-up turn work incrementally (WorkflowExecutor):
+- analysis  : delta analysis of the follow-up on top of the previous one
+              (QueryAnalyzer.refine, no LLM); a new object or intent is a
+              material change and gets a full analysis
+- retrieval : the previous candidates are re-filtered for the follow-up's
+              view type (VectorLayoutRAGEngine.refilter); full retrieval when
+              none fits or the intent changed
+- data      : reused for the same object type, fetched otherwise
+- selection : the previous layout is re-bound to the data when it still
+              fits, else the best re-filtered candidate (no selection LLM)
+
+What a turn reused is returned in result["metrics"]["session"].
+
+Sessions are bounded (SESSION_MAX_SESSIONS, least recently used dropped
+first) and expire SESSION_TTL_S after their last turn. They are kept in the
+SQLite file of the graph checkpoints (graph_checkpoints.py), shared by the
+workers of a host, so consecutive turns need no sticky routing; with
+SESSION_DB=memory they live in the worker process. A turn under an unknown
+or expired session ID starts cold and continues the session under that ID
+(POST /sessions/{session_id}/query).
+
+Environment Variables:
+- SESSION_TTL_S        : Seconds a session lives after its last turn (default: 1800)
+- SESSION_MAX_SESSIONS : Sessions kept (default: 1000)
+- SESSION_DB           : SQLite file, "memory" keeps sessions in the worker (default: GRAPH_CHECKPOINT_DB)
+
+Usage:
+    sessions = get_session_store()
+    session_id = sessions.create()
+    result = agent.invoke("show my leads", session_id=session_id)
+    result = agent.invoke("only high priority", session_id=session_id)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, TypedDict
+
+
+# Default file of the graph checkpoints (graph_checkpoints.DEFAULT_DB_PATH, not imported: it loads langgraph)
+DEFAULT_DB_PATH = Path(__file__).parent.parent.parent / "checkpoints" / "graph_checkpoints.sqlite"
+
+
+class SessionTurn(TypedDict):
+    """What a follow-up turn can reuse from the previous one"""
+    analysis: Dict                  # QueryAnalysis dump (normalized_query: the conversation so far)
+    candidates: List[Dict]          # Score records of catalog layouts
+    fetched_data: Dict
+    selected_id: Optional[str]      # Catalog ID of the selected layout (None for generated layouts)
+
+
+class _Session:
+    __slots__ = ("session_id", "turn", "turns", "created_at", "touched_at")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turn: Optional[SessionTurn] = None
+        self.turns = 0
+        self.created_at = self.touched_at = time.monotonic()
+
+
+class SessionStore:
+    """
+    Refinement sessions of a worker, bounded and expiring.
+    """
+
+    def __init__(self, ttl_s: Optional[float] = None, max_sessions: Optional[int] = None):
+        """
+        Initialize session store
+
+        Args:
+            ttl_s: Seconds a session lives after its last turn (default: SESSION_TTL_S env var or 1800)
+            max_sessions: Sessions kept, least recently used dropped first (default: SESSION_MAX_SESSIONS env var or 1000)
+        """
+        self.ttl_s = ttl_s if ttl_s is not None else float(os.getenv("SESSION_TTL_S", 1800))
+        self.max_sessions = max_sessions if max_sessions is not None else int(os.getenv("SESSION_MAX_SESSIONS", 1000))
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0, "turns": 0}
+
+    def create(self, session_id: Optional[str] = None) -> str:
+        """Start a session (session_id: a client's ID, kept when the session exists); returns its ID"""
+        session = _Session(session_id or uuid.uuid4().hex)
+        with self._lock:
+            self._expire()
+            if session.session_id in self._sessions:
+                return session.session_id
+            self._sessions[session.session_id] = session
+            self.stats["created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+        return session.session_id
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            self._expire()
+            return session_id in self._sessions
+
+    def last_turn(self, session_id: Optional[str]) -> Optional[SessionTurn]:
+        """Previous turn of a session, None for the first turn or an unknown / expired session"""
+        if session_id is None:
+            return None
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            return session.turn if session is not None else None
+
+    def record_turn(self, session_id: str, turn: SessionTurn) -> int:
+        """Keep a completed turn as the base of the next one; returns the turn number (0 if the session is gone)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return 0
+            session.turn = turn
+            session.turns += 1
+            session.touched_at = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self.stats["turns"] += 1
+            return session.turns
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        """Drop sessions idle for longer than the TTL (caller holds the lock)"""
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))  # least recently used first
+            if now - session.touched_at <= self.ttl_s:
+                break
+            del self._sessions[session.session_id]
+            self.stats["expired"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._sessions),
+                "ttl_s": self.ttl_s,
+                "max_sessions": self.max_sessions,
+                **self.stats,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Refinement sessions in a SQLite file shared by the workers of a host.
+    """
+
+    def __init__(self, path: str, ttl_s: Optional[float] = None, max_sessions: Optional[int] = None):
+        """
+        Initialize session store
+
+        Args:
+            path: SQLite file (e.g. the graph checkpoints')
+            ttl_s: See SessionStore
+            max_sessions: See SessionStore
+        """
+        super().__init__(ttl_s, max_sessions)
+        self.path = str(path)
+        self._local = threading.local()  # connection of each thread
+
+    @contextmanager
+    def _cursor(self, write: bool = False) -> Iterator[sqlite3.Cursor]:
+        """
+        Cursor on this thread's connection, in one transaction
+
+        Reads run in a deferred transaction next to other workers' reads; writes take
+        the write lock up front and drop expired sessions first.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(session_id TEXT PRIMARY KEY, turn TEXT, turns INTEGER NOT NULL, touched_at REAL NOT NULL)"
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            if write:
+                cursor.execute("DELETE FROM sessions WHERE touched_at < ?", (self._expired_before(),))
+                with self._lock:
+                    self.stats["expired"] += cursor.rowcount
+            yield cursor
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.close()
+
+    def _expired_before(self) -> float:
+        """Sessions last touched before this are expired (reads skip them, writes delete them)"""
+        return time.time() - self.ttl_s
+
+    def create(self, session_id: Optional[str] = None) -> str:
+        session_id = session_id or uuid.uuid4().hex
+        with self._cursor(write=True) as cursor:
+            cursor.execute("INSERT OR IGNORE INTO sessions VALUES (?, NULL, 0, ?)", (session_id, time.time()))
+            if cursor.rowcount == 0:
+                return session_id
+            # Least recently used beyond the bound
+            cursor.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY touched_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+            with self._lock:
+                self.stats["created"] += 1
+                self.stats["evicted"] += cursor.rowcount
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        with self._cursor() as cursor:
+            return cursor.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ? AND touched_at >= ?", (session_id, self._expired_before())
+            ).fetchone() is not None
+
+    def last_turn(self, session_id: Optional[str]) -> Optional[SessionTurn]:
+        if session_id is None:
+            return None
+        with self._cursor() as cursor:
+            row = cursor.execute(
+                "SELECT turn FROM sessions WHERE session_id = ? AND touched_at >= ?", (session_id, self._expired_before())
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def record_turn(self, session_id: str, turn: SessionTurn) -> int:
+        with self._cursor(write=True) as cursor:
+            cursor.execute(
+                "UPDATE sessions SET turn = ?, turns = turns + 1, touched_at = ? WHERE session_id = ?",
+                (json.dumps(turn, separators=(",", ":"), default=str), time.time(), session_id)
+            )
+            if cursor.rowcount == 0:
+                return 0
+            turns = cursor.execute("SELECT turns FROM sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+        with self._lock:
+            self.stats["turns"] += 1
+        return turns
+
+    def delete(self, session_id: str) -> bool:
+        with self._cursor(write=True) as cursor:
+            cursor.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return cursor.rowcount == 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cursor() as cursor:
+            sessions = cursor.execute(
+                "SELECT COUNT(*) FROM sessions WHERE touched_at >= ?", (self._expired_before(),)
+            ).fetchone()[0]
+        with self._lock:
+            return {
+                "sessions": sessions,
+                "path": self.path,
+                "ttl_s": self.ttl_s,
+                "max_sessions": self.max_sessions,
+                **self.stats,
+            }
+
+
+# Singleton instance
+_session_store = None
+
+def get_session_store() -> SessionStore:
+    """Get singleton instance of SessionStore (SQLiteSessionStore unless SESSION_DB=memory)"""
+    global _session_store
+    if _session_store is None:
+        path = os.getenv("SESSION_DB") or os.getenv("GRAPH_CHECKPOINT_DB") or str(DEFAULT_DB_PATH)
+        _session_store = SessionStore() if path == "memory" else SQLiteSessionStore(path)
+    return _session_store
@@ -0,0 +1,238 @@
+"""
+Request Profiler - Opt-in sampling profiler for single requests
+
+A sampler thread reads the stack of the request thread every few
+milliseconds (sys._current_frames), so the profiled code runs unmodified.
+Samples are attributed to the graph node on the stack
+(WorkflowExecutor.<node>) and written per request, tagged with the request ID:
+- <request_id>.collapsed        : collapsed stacks ("node:x;file:func;... count"),
+                                  for flamegraph.pl / speedscope / inferno
+- <request_id>.speedscope.json  : speedscope file with one profile per graph node
+
+LangGraph runs nodes on the calling thread, so the request thread covers all
+node work; LLM requests run on the resilient caller pool and show up as
+waiting in ResilientLLMCaller._hedged_call.
+
+Profiling is off by default. A request is profiled when:
+- it sends "X-Profile: 1" and PROFILE_HEADER_ENABLED=true, or
+- it is picked by PROFILE_SAMPLE_RATE
+Each profile samples only its own thread and at most PROFILE_MAX_CONCURRENT
+requests are profiled at once, so concurrent requests stay cheap.
+
+Environment Variables:
+- PROFILE_SAMPLE_RATE     : Share of requests to profile, 0.0-1.0 (default: 0)
+- PROFILE_HEADER_ENABLED  : "true" honours the X-Profile request header (default: false)
+- PROFILE_INTERVAL_MS     : Sampling interval (default: 5)
+- PROFILE_DIR             : Output directory (default: profiles)
+- PROFILE_MAX_CONCURRENT  : Maximum simultaneously profiled requests (default: 2)
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import valid_request_id
+
+
+# Qualified name prefix of graph node methods (samples are grouped by the outermost one)
+NODE_QUALNAME_PREFIX = "WorkflowExecutor."
+
+MAX_STACK_DEPTH = 128
+
+_active_lock = threading.Lock()
+_active_profiles = 0
+
+
+def should_profile(requested: bool = False) -> bool:
+    """Whether the current request should be profiled (header opt-in or sample rate)"""
+    if requested and os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true":
+        return True
+    sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+class RequestProfiler:
+    """
+    Samples the stack of one thread until stopped.
+
+    Example:
+        profiler = RequestProfiler.maybe_start(request_id, requested=True)
+        graph.invoke(state)
+        summary = profiler.stop() if profiler else None
+    """
+
+    def __init__(self, request_id: str, interval_ms: Optional[float] = None, output_dir: Optional[str] = None):
+        """
+        Initialize profiler for the calling thread
+
+        Args:
+            request_id: Request ID used to tag and name the profile
+            interval_ms: Sampling interval (default: PROFILE_INTERVAL_MS env var or 5)
+            output_dir: Directory for profile files (default: PROFILE_DIR env var or "profiles")
+        """
+        self.request_id = request_id
+        self.interval_s = (interval_ms if interval_ms is not None else float(os.getenv("PROFILE_INTERVAL_MS", 5))) / 1000
+        self.output_dir = Path(output_dir or os.getenv("PROFILE_DIR", "profiles"))
+        self.thread_id = threading.get_ident()
+        self.samples: Counter = Counter()  # (node, stack of frame keys) -> sample count
+        self._root = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._holds_slot = False
+
+    @classmethod
+    def maybe_start(cls, request_id: str, requested: bool = False) -> Optional["RequestProfiler"]:
+        """Start a profiler for the calling thread if this request is selected and a slot is free"""
+        global _active_profiles
+        if not should_profile(requested):
+            return None
+        with _active_lock:
+            if _active_profiles >= int(os.getenv("PROFILE_MAX_CONCURRENT", 2)):
+                logger.debug("[RequestProfiler] Skipping {}: too many concurrent profiles", request_id)
+                return None
+            _active_profiles += 1
+        profiler = cls(request_id)
+        profiler._holds_slot = True
+        profiler.start(root=sys._getframe(1))
+        return profiler
+
+    def start(self, root=None):
+        """
+        Start sampling the calling thread
+
+        Args:
+            root: Outermost frame to keep (frames above it are dropped; default: caller's frame)
+        """
+        self._root = root or sys._getframe(1)
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.request_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self, write: bool = True) -> Dict[str, Any]:
+        """
+        Stop sampling and optionally write the profile files
+
+        Returns:
+            Summary with sample counts per node and written file paths
+        """
+        global _active_profiles
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._root = None
+        if self._holds_slot:
+            with _active_lock:
+                _active_profiles -= 1
+            self._holds_slot = False
+        self._elapsed = time.perf_counter() - self._started
+
+        by_node: Dict[str, int] = {}
+        for (node, _), count in self.samples.items():
+            by_node[node] = by_node.get(node, 0) + count
+
+        summary = {
+            "request_id": self.request_id,
+            "interval_ms": round(self.interval_s * 1000, 2),
+            "duration_ms": round(self._elapsed * 1000, 1),
+            "samples": sum(by_node.values()),
+            "by_node": by_node,
+        }
+        if write:
+            summary.update(self.write())
+        return summary
+
+    # ====================
+    # OUTPUT FORMATS
+    # ====================
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, root first, prefixed with the graph node"""
+        lines = []
+        for (node, stack), count in sorted(self.samples.items()):
+            frames = [f"node:{node}"] + [f"{Path(file).name}:{name}" for file, name, _ in stack]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Speedscope file with one sampled profile per graph node"""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Tuple, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+
+        for (node, stack), count in sorted(self.samples.items()):
+            indexes = []
+            for key in stack:
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": key[1], "file": key[0], "line": key[2]})
+                indexes.append(frame_index[key])
+            profile = profiles.setdefault(node, {
+                "type": "sampled",
+                "name": f"{self.request_id} {node}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": 0,
+                "samples": [],
+                "weights": [],
+            })
+            weight = round(count * self.interval_s * 1000, 3)
+            profile["samples"].append(indexes)
+            profile["weights"].append(weight)
+            profile["endValue"] = round(profile["endValue"] + weight, 3)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"request {self.request_id}",
+            "exporter": "design_system_agent.request_profiler",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+    def write(self) -> Dict[str, str]:
+        """Write collapsed and speedscope files; returns their paths"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Files are named by the request ID only when it cannot leave output_dir
+        name = self.request_id if valid_request_id(self.request_id) else f"profile-{uuid.uuid4().hex[:16]}"
+        collapsed_path = self.output_dir / f"{name}.collapsed"
+        speedscope_path = self.output_dir / f"{name}.speedscope.json"
+        collapsed_path.write_text(self.collapsed(), encoding="utf-8")
+        with open(speedscope_path, "w", encoding="utf-8") as f:
+            json.dump(self.speedscope(), f)
+        logger.debug("[RequestProfiler] Profile of {} written to {}", self.request_id, speedscope_path)
+        return {"collapsed_path": str(collapsed_path), "speedscope_path": str(speedscope_path)}
+
+    # ====================
+    # SAMPLING
+    # ====================
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._sample(frame)] += 1
+
+    def _sample(self, frame) -> Tuple[str, Tuple]:
+        """Stack of (file, qualified name, first line) from the root frame down, plus its graph node"""
+        stack = []
+        node = "outside_nodes"
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_qualname, code.co_firstlineno))
+            if code.co_qualname.startswith(NODE_QUALNAME_PREFIX):
+                node = code.co_name
+            if frame is self._root:
+                break
+            frame = frame.f_back
+        stack.reverse()
+        return node, tuple(stack)
@@ -0,0 +1,218 @@
+"""
+Single Flight - Coalesce identical in-flight graph requests
+
+When a team opens the same dashboard at once, identical queries reach
+GraphAgent.invoke concurrently and each would repeat the same LLM and RAG
+work. SingleFlight runs one execution per key (normalized query plus the
+options that change the result) and lets concurrent duplicates wait for it
+and share its result:
+- leader   : first request for a key, runs the graph
+- follower : same key while the leader runs, waits and gets a copy
+- replay   : retried request with a known Idempotency-Key whose execution
+             finished within IDEMPOTENCY_TTL_S, gets a copy of that result
+- detached : follower whose own budget ran out while waiting, runs on its
+             own (degraded by its expired deadline) instead of waiting on
+
+The request's budget class (see deadline.budget_class) is part of the key:
+a leader short on budget takes no-LLM routes and must not hand its degraded
+result to followers that came with a full budget.
+
+Only the in-flight window is coalesced; finished results are kept solely
+for requests that carry an idempotency key (bounded by IDEMPOTENCY_MAX_KEYS
+and the TTL). Failed executions are not kept, a retry runs again. Reusing an
+idempotency key for a different query raises IdempotencyConflict; a retry
+whose options differ (e.g. another load tier) still gets the earlier result.
+
+Environment Variables:
+- REQUEST_COALESCING   : "false" runs every request on its own (default: true)
+- IDEMPOTENCY_TTL_S    : Seconds an idempotency key replays its result (default: 300)
+- IDEMPOTENCY_MAX_KEYS : Idempotency keys remembered (default: 1024)
+
+Usage:
+    flight = get_single_flight()
+    result, role = flight.do(coalesce_key(query), lambda: run_graph(query), idempotency_key=key)
+"""
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from design_system_agent.agent.core.instrumentation import COALESCED_REQUESTS
+
+
+class IdempotencyConflict(ValueError):
+    """Idempotency key already used for a different request"""
+
+
+class ExecutionInProgress(RuntimeError):
+    """Idempotency key is being executed by another worker (checkpoint thread leased)"""
+
+
+def coalesce_key(query: str, **options) -> str:
+    """Case- and whitespace-insensitive query plus the options that change the result"""
+    key = " ".join(query.lower().split())
+    for name in sorted(options):
+        if options[name] is not None:
+            key += f"|{name}={options[name]}"
+    return key
+
+
+class _Call:
+    """One execution shared by its leader and followers"""
+    __slots__ = ("key", "done", "result", "error", "followers", "finished_at")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.finished_at: Optional[float] = None
+
+
+class SingleFlight:
+    """
+    Runs one execution per key at a time; duplicates share its result.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        idempotency_ttl_s: Optional[float] = None,
+        max_idempotency_keys: Optional[int] = None
+    ):
+        """
+        Initialize single flight group
+
+        Args:
+            enabled: Coalesce requests (default: REQUEST_COALESCING env var)
+            idempotency_ttl_s: Seconds a finished execution replays (default: IDEMPOTENCY_TTL_S env var or 300)
+            max_idempotency_keys: Idempotency keys remembered (default: IDEMPOTENCY_MAX_KEYS env var or 1024)
+        """
+        self.enabled = enabled if enabled is not None else os.getenv("REQUEST_COALESCING", "true").lower() != "false"
+        self.idempotency_ttl_s = idempotency_ttl_s if idempotency_ttl_s is not None else float(os.getenv("IDEMPOTENCY_TTL_S", 300))
+        self.max_idempotency_keys = max_idempotency_keys if max_idempotency_keys is not None else int(os.getenv("IDEMPOTENCY_MAX_KEYS", 1024))
+
+        self._in_flight: Dict[str, _Call] = {}
+        self._idempotency: "OrderedDict[str, _Call]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"leader": 0, "follower": 0, "replay": 0, "detached": 0}
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        idempotency_key: Optional[str] = None,
+        timeout_s: Optional[float] = None
+    ) -> Tuple[Any, str]:
+        """
+        Run fn once per key; concurrent callers with the same key share the result
+
+        Args:
+            key: Coalescing key (see coalesce_key)
+            fn: Execution to run when this caller leads
+            idempotency_key: Client key; retries attach to or replay its execution
+            timeout_s: Longest a follower waits (its remaining budget, None = no limit)
+
+        Returns:
+            (result, role) with role "leader", "follower", "replay" or "detached"
+            (waited timeout_s, then ran fn itself); followers and replays get a deep copy
+
+        Raises:
+            IdempotencyConflict: idempotency_key was used for a different key
+        """
+        if not self.enabled and idempotency_key is None:
+            return fn(), "leader"
+
+        with self._lock:
+            call, role = self._join(key, idempotency_key)
+            if role == "follower":
+                call.followers += 1
+            self.stats[role] += 1
+        COALESCED_REQUESTS.inc(role=role)
+
+        if role == "leader":
+            return self._lead(call, fn), role
+        if not call.done.wait(timeout_s):
+            with self._lock:
+                if role == "follower":
+                    call.followers -= 1
+                self.stats["detached"] += 1
+            COALESCED_REQUESTS.inc(role="detached")
+            return fn(), "detached"
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result), role
+
+    def _join(self, key: str, idempotency_key: Optional[str]) -> Tuple[_Call, str]:
+        """Find the execution to share or register a new one (caller holds the lock)"""
+        self._expire()
+        if idempotency_key is not None:
+            call = self._idempotency.get(idempotency_key)
+            if call is not None:
+                # Options (e.g. the load tier) may differ between retries, the query may not
+                if call.key.split("|", 1)[0] != key.split("|", 1)[0]:
+                    raise IdempotencyConflict(f"Idempotency key {idempotency_key!r} was used for a different request")
+                return call, "replay" if call.done.is_set() else "follower"
+
+        call = self._in_flight.get(key) if self.enabled else None
+        role = "follower"
+        if call is None:
+            call, role = _Call(key), "leader"
+            if self.enabled:
+                self._in_flight[key] = call
+        if idempotency_key is not None:
+            self._idempotency[idempotency_key] = call
+            self._expire()  # size limit
+        return call, role
+
+    def _lead(self, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                if self._in_flight.get(call.key) is call:
+                    del self._in_flight[call.key]
+                if call.error is not None:
+                    # A retry of a failed request runs again
+                    for name in [name for name, entry in self._idempotency.items() if entry is call]:
+                        del self._idempotency[name]
+            call.done.set()
+
+    def _expire(self):
+        """Forget finished idempotency entries past the TTL or over the size limit (caller holds the lock)"""
+        now = time.monotonic()
+        while self._idempotency:
+            name, call = next(iter(self._idempotency.items()))  # oldest first
+            expired = call.finished_at is not None and now - call.finished_at > self.idempotency_ttl_s
+            if not expired and len(self._idempotency) <= self.max_idempotency_keys:
+                break
+            del self._idempotency[name]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "in_flight": len(self._in_flight),
+                "waiting_followers": sum(call.followers for call in self._in_flight.values()),
+                "idempotency_keys": len(self._idempotency),
+                **self.stats,
+            }
+
+
+# Singleton instance
+_single_flight = None
+
+def get_single_flight() -> SingleFlight:
+    """Get singleton instance of SingleFlight"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
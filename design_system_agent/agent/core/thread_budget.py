@@ -0,0 +1,137 @@
+"""
+Thread Budget - Per-worker CPU thread counts for torch, FAISS and tokenizers
+
+By default torch, FAISS (OpenMP) and the HuggingFace tokenizers each size
+their pools to every core of the node. With several API workers per node
+that oversubscribes the CPU many times over and tail latency suffers. The
+budget splits the CPUs the process may actually use between the workers:
+- available CPUs: the cgroup CPU quota (cgroup v2 cpu.max, v1
+  cpu.cfs_quota_us / cpu.cfs_period_us) capped by the CPU affinity mask
+- per worker: available CPUs / WEB_CONCURRENCY, at least 1
+and applies it before the models are loaded:
+- OMP_NUM_THREADS / MKL_NUM_THREADS / OPENBLAS_NUM_THREADS (unless set)
+- torch.set_num_threads() and one inter-op thread
+- faiss.omp_set_num_threads()
+- TOKENIZERS_PARALLELISM=false (tokenizer pools would add threads per call)
+
+The applied budget is reported in /rag/stats.
+
+Environment Variables:
+- WEB_CONCURRENCY : Worker processes sharing the CPUs (default: 1)
+- WORKER_THREADS  : Threads per worker, overrides the computed value
+"""
+import math
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+_applied: Optional[Dict[str, Any]] = None
+
+
+def _cgroup_quota(root: Path) -> Optional[float]:
+    """CPUs allowed by the cgroup quota (None = no quota)"""
+    cpu_max = root / "cpu.max"  # cgroup v2: "<quota|max> <period>"
+    if cpu_max.exists():
+        quota, _, period = cpu_max.read_text().strip().partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota_file = root / "cpu" / "cpu.cfs_quota_us"  # cgroup v1
+    period_file = root / "cpu" / "cpu.cfs_period_us"
+    if quota_file.exists() and period_file.exists():
+        quota = int(quota_file.read_text().strip())
+        if quota > 0:
+            return quota / int(period_file.read_text().strip())
+    return None
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> Tuple[float, str]:
+    """CPUs this process may use and where the limit comes from ("cgroup", "affinity" or "cpu_count")"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus, source = float(len(os.sched_getaffinity(0))), "affinity"
+    else:
+        cpus, source = float(os.cpu_count() or 1), "cpu_count"
+    try:
+        quota = _cgroup_quota(cgroup_root)
+    except (OSError, ValueError):
+        quota = None
+    if quota is not None and quota < cpus:
+        cpus, source = quota, "cgroup"
+    return cpus, source
+
+
+def compute_thread_budget(workers: Optional[int] = None, cgroup_root: Path = CGROUP_ROOT) -> Dict[str, Any]:
+    """
+    Thread counts for one worker process
+
+    Args:
+        workers: Worker processes sharing the CPUs (default: WEB_CONCURRENCY env var or 1)
+        cgroup_root: cgroup filesystem to read the CPU quota from
+    """
+    cpus, source = available_cpus(cgroup_root)
+    workers = max(1, workers if workers is not None else int(os.getenv("WEB_CONCURRENCY", 1)))
+    configured = os.getenv("WORKER_THREADS")
+    threads = max(1, int(configured)) if configured else max(1, math.floor(cpus / workers))
+    return {
+        "cpus_available": round(cpus, 2),
+        "cpu_limit_source": "WORKER_THREADS" if configured else source,
+        "workers": workers,
+        "threads_per_worker": threads,
+        "torch_interop_threads": 1,
+        "tokenizers_parallelism": False,
+    }
+
+
+def apply_thread_budget(workers: Optional[int] = None) -> Dict[str, Any]:
+    """Compute the budget and apply it to this process (torch / FAISS pools, BLAS and tokenizer env)"""
+    global _applied
+    budget = compute_thread_budget(workers)
+    threads = str(budget["threads_per_worker"])
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(name, threads)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(budget["threads_per_worker"])
+        try:
+            torch.set_num_interop_threads(budget["torch_interop_threads"])
+        except RuntimeError:
+            pass  # only settable before the first inter-op work; kept as is
+    faiss = sys.modules.get("faiss")
+    if faiss is not None:
+        faiss.omp_set_num_threads(budget["threads_per_worker"])
+
+    _applied = budget
+    return budget
+
+
+def ensure_thread_budget() -> Dict[str, Any]:
+    """
+    Apply the budget again with the worker count this process (or the master
+    it was forked from) was set up with, e.g. the sidecar's single worker.
+    Call it before loading models (env vars), after (torch / FAISS pools) and
+    in forked workers.
+    """
+    if _applied is None:
+        return apply_thread_budget()
+    return apply_thread_budget(_applied["workers"])
+
+
+def get_thread_budget() -> Dict[str, Any]:
+    """Applied budget plus the pool sizes currently in effect"""
+    report = dict(_applied) if _applied is not None else {"applied": False}
+    actual: Dict[str, Any] = {"tokenizers_parallelism": os.getenv("TOKENIZERS_PARALLELISM")}
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        actual["torch_threads"] = torch.get_num_threads()
+        actual["torch_interop_threads"] = torch.get_num_interop_threads()
+    faiss = sys.modules.get("faiss")
+    if faiss is not None:
+        actual["faiss_omp_threads"] = faiss.omp_get_max_threads()
+    report["actual"] = actual
+    return report
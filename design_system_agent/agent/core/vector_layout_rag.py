@@ -2,27 +2,69 @@
 Vector-based Layout RAG Engine with Reranking
 Uses FAISS for vector search and cross-encoder for reranking
 Compatible with Python 3.14+
+
+faiss and sentence_transformers (torch, transformers) are imported when an
+engine is created, not at module import, so entry points that only reference
+the class stay fast to start.
+
+The index is memory-mapped read-only from disk, so its pages live in the page
+cache and are shared by every worker process instead of copied into each.
+
+torch / FAISS / tokenizer thread pools are sized by the per-worker thread
+budget (see thread_budget.py) before the models are loaded.
+
+In client mode (INFERENCE_SIDECAR=true) models and index live in the
+inference sidecar process (see inference_sidecar.py); the engine only loads
+the layout metadata and sends embed / search / rerank over its socket.
+
+Confident analyses are first looked up in the intent table built from the
+corpus next to the index (see intent_lookup.py), which skips embedding,
+FAISS and reranking.
+
+Environment Variables:
+- FAISS_MMAP        : "false" reads the index into process memory (default: true)
+- INFERENCE_SIDECAR : "true" uses the inference sidecar (default: false)
 """
+import os
 import json
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import pickle
-import faiss
-from sentence_transformers import SentenceTransformer, CrossEncoder
 import numpy as np
+from loguru import logger
+
+from design_system_agent.agent.core.instrumentation import RAG_CANDIDATES, RAG_STAGE_SECONDS, timed
+from design_system_agent.agent.core.intent_lookup import IntentLookupTable, intent_key
+from design_system_agent.agent.core.logging_config import debug_enabled, sampled_logger
+from design_system_agent.agent.core.micro_batcher import MicroBatcher
+from design_system_agent.agent.core.inference_sidecar import InferenceClient, sidecar_enabled
+from design_system_agent.agent.core.thread_budget import ensure_thread_budget, get_thread_budget
+
+
+def read_faiss_index(path: Path):
+    """Read a FAISS index, memory-mapped unless FAISS_MMAP=false"""
+    import faiss
+
+    if os.getenv("FAISS_MMAP", "true").lower() == "false":
+        return faiss.read_index(str(path))
+    # IO_FLAG_MMAP_IFC maps the codes of flat indexes (older faiss: IO_FLAG_MMAP)
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return faiss.read_index(str(path), flags)
 
 
 class VectorLayoutRAGEngine:
     """Advanced RAG engine using FAISS for semantic search with reranking"""
     
-    def __init__(self, index_name: str = "crm_layouts"):
+    def __init__(self, index_name: str = "crm_layouts", use_sidecar: Optional[bool] = None):
         """
         Initialize Vector RAG engine with FAISS
         
         Args:
             index_name: Name for the FAISS index
+            use_sidecar: Use the inference sidecar instead of loading models and index
+                         (default: INFERENCE_SIDECAR env var)
         """
-        print("[VectorLayoutRAGEngine] Initializing...")
+        logger.info("[VectorLayoutRAGEngine] Initializing...")
         
         # Paths for persistence
         self.index_dir = Path(__file__).parent.parent.parent / "vector_index"
@@ -31,14 +73,31 @@ class VectorLayoutRAGEngine:
         self.index_path = self.index_dir / f"{index_name}.faiss"
         self.metadata_path = self.index_dir / f"{index_name}_metadata.pkl"
         
-        # Initialize embedding model (lightweight and fast)
-        print("[VectorLayoutRAGEngine] Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions, fast
-        self.embedding_dim = 384
-        
-        # Initialize reranker (cross-encoder for better precision)
-        print("[VectorLayoutRAGEngine] Loading reranker model...")
-        self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')  # Lightweight reranker
+        self.sidecar: Optional[InferenceClient] = None
+        if use_sidecar if use_sidecar is not None else sidecar_enabled():
+            # Client mode: the sidecar owns models and index (and batches requests of all workers)
+            self.sidecar = InferenceClient()
+            self.embedding_model = None
+            self.reranker = None
+            self.embedding_dim = self.sidecar.info["embedding_dim"]
+            self.encode_batcher = MicroBatcher("embedding", self.sidecar.embed, enabled=False)
+            self.rerank_batcher = MicroBatcher("reranker", self.sidecar.rerank, enabled=False)
+        else:
+            ensure_thread_budget()  # OMP / tokenizer env must be set before torch is imported
+            from sentence_transformers import SentenceTransformer, CrossEncoder
+            
+            # Initialize embedding model (lightweight and fast)
+            logger.info("[VectorLayoutRAGEngine] Loading embedding model...")
+            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions, fast
+            self.embedding_dim = 384
+            
+            # Initialize reranker (cross-encoder for better precision)
+            logger.info("[VectorLayoutRAGEngine] Loading reranker model...")
+            self.reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')  # Lightweight reranker
+            
+            # Encoder / cross-encoder calls of concurrent searches share batches (INFERENCE_BATCH_* env vars)
+            self.encode_batcher = MicroBatcher("embedding", self._encode_batch)
+            self.rerank_batcher = MicroBatcher("reranker", self._rerank_batch)
         
         # View type to component mapping (PRIMARY matching)
         self.view_type_components = {
@@ -56,20 +115,41 @@ class VectorLayoutRAGEngine:
         self.index = None
         self.layouts_metadata = []
         
-        # Load and index layouts
-        self.load_and_index_layouts()
+        # Load and index layouts (client mode: metadata only, the sidecar built the index)
+        if self.sidecar is not None:
+            self._load_metadata()
+        else:
+            self.load_and_index_layouts()
+            ensure_thread_budget()  # torch and faiss are loaded now, size their pools
+        
+        # Analysis tuple -> best layout IDs, answered without vector search (rebuilt with the index)
+        self.intent_table = IntentLookupTable.load_or_build(
+            self.index_dir / f"{index_name}_intents.json", self.layouts_metadata
+        )
         
-        print(f"[VectorLayoutRAGEngine] [OK] Initialized with {len(self.layouts_metadata)} indexed layouts")
+        logger.info(f"[VectorLayoutRAGEngine] [OK] Initialized with {len(self.layouts_metadata)} indexed layouts")
+    
+    def _load_metadata(self):
+        """Load the layout metadata written next to the sidecar's index"""
+        if not self.metadata_path.exists():
+            raise FileNotFoundError(
+                f"Layout metadata not found at {self.metadata_path} (sidecar metadata: {self.sidecar.info['metadata_path']})"
+            )
+        with open(self.metadata_path, 'rb') as f:
+            self.layouts_metadata = pickle.load(f)
+        logger.info(f"[VectorLayoutRAGEngine] [OK] Loaded {len(self.layouts_metadata)} layouts, inference via sidecar")
     
     def load_and_index_layouts(self):
         """Load layouts from JSON and index them in FAISS"""
+        import faiss
+
         # Check if index exists
         if self.index_path.exists() and self.metadata_path.exists():
-            print(f"[VectorLayoutRAGEngine] Loading existing index from {self.index_path}...")
-            self.index = faiss.read_index(str(self.index_path))
+            logger.info(f"[VectorLayoutRAGEngine] Loading existing index from {self.index_path}...")
+            self.index = read_faiss_index(self.index_path)
             with open(self.metadata_path, 'rb') as f:
                 self.layouts_metadata = pickle.load(f)
-            print(f"[VectorLayoutRAGEngine] [OK] Loaded {len(self.layouts_metadata)} layouts from disk")
+            logger.info(f"[VectorLayoutRAGEngine] [OK] Loaded {len(self.layouts_metadata)} layouts from disk")
             return
         
         # Find the layouts file
@@ -88,14 +168,14 @@ class VectorLayoutRAGEngine:
             raise FileNotFoundError(f"Layouts file not found. Tried: {possible_paths}")
         
         # Load layouts
-        print(f"[VectorLayoutRAGEngine] Loading layouts from {layouts_path}...")
+        logger.info(f"[VectorLayoutRAGEngine] Loading layouts from {layouts_path}...")
         with open(layouts_path, 'r', encoding='utf-8') as f:
             layouts = json.load(f)
         
-        print(f"[VectorLayoutRAGEngine] Loaded {len(layouts)} layouts")
+        logger.info(f"[VectorLayoutRAGEngine] Loaded {len(layouts)} layouts")
         
         # Create FAISS index (using Inner Product for cosine similarity with normalized vectors)
-        print(f"[VectorLayoutRAGEngine] Creating FAISS index...")
+        logger.info(f"[VectorLayoutRAGEngine] Creating FAISS index...")
         self.index = faiss.IndexFlatIP(self.embedding_dim)  # Inner product for cosine similarity
         
         # Prepare data for indexing
@@ -117,7 +197,7 @@ class VectorLayoutRAGEngine:
             })
         
         # Generate embeddings
-        print(f"[VectorLayoutRAGEngine] Generating embeddings for {len(documents)} documents...")
+        logger.info(f"[VectorLayoutRAGEngine] Generating embeddings for {len(documents)} documents...")
         embeddings = self.embedding_model.encode(
             documents,
             show_progress_bar=True,
@@ -129,12 +209,27 @@ class VectorLayoutRAGEngine:
         self.index.add(embeddings.astype('float32'))
         
         # Save index and metadata
-        print(f"[VectorLayoutRAGEngine] Saving index to disk...")
+        logger.info(f"[VectorLayoutRAGEngine] Saving index to disk...")
         faiss.write_index(self.index, str(self.index_path))
         with open(self.metadata_path, 'wb') as f:
             pickle.dump(self.layouts_metadata, f)
+        # Serve from the mapped file so the in-memory build copy can be freed
+        self.index = read_faiss_index(self.index_path)
         
-        print(f"[VectorLayoutRAGEngine] [OK] Indexed {len(documents)} layouts in FAISS")
+        logger.info(f"[VectorLayoutRAGEngine] [OK] Indexed {len(documents)} layouts in FAISS")
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Embed one micro-batch of queries (normalized, for inner product search)"""
+        return self.embedding_model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+    
+    def _rerank_batch(self, pairs: List[List[str]]) -> np.ndarray:
+        """Score one micro-batch of (query, document) pairs with the cross-encoder"""
+        return self.reranker.predict(pairs, batch_size=len(pairs))
     
     def _create_document_text(self, entry: Dict[str, Any]) -> str:
         """
@@ -227,8 +322,19 @@ class VectorLayoutRAGEngine:
             final_k: Number of final results after reranking
             
         Returns:
-            List of top matching layouts with scores
+            List of top matching layouts with scores; "id" addresses the layout (see get_layout)
         """
+        with timed(RAG_STAGE_SECONDS, stage="total"):
+            return self._search(query, top_k, rerank, final_k)
+    
+    def _search(
+        self,
+        query: str | List[str],
+        top_k: int,
+        rerank: bool,
+        final_k: int
+    ) -> List[Dict[str, Any]]:
+        """Vector search, component matching and optional reranking (see search())"""
         # Handle both single query and list of queries
         queries = [query] if isinstance(query, str) else query
         primary_queries = queries[:3]  # Use top 3 query variations
@@ -239,29 +345,35 @@ class VectorLayoutRAGEngine:
         required_components = self.view_type_components.get(required_view_type, []) if required_view_type else []
         
         if required_view_type:
-            print(f"[VectorLayoutRAGEngine] Detected view type: '{required_view_type}' (requires: {', '.join(required_components)})")
+            logger.opt(lazy=True).debug(
+                "[VectorLayoutRAGEngine] Detected view type: '{}' (requires: {})",
+                lambda: required_view_type, lambda: ", ".join(required_components)
+            )
         
-        print(f"[VectorLayoutRAGEngine] Searching with {len(primary_queries)} query variation(s)")
+        logger.debug("[VectorLayoutRAGEngine] Searching with {} query variation(s)", len(primary_queries))
         
         # Search with each query variation and collect unique results
         all_candidates = {}  # Use dict to track unique layouts by index
         
-        for i, q in enumerate(primary_queries, 1):
-            print(f"  Query {i}: '{q}'")
-            
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode(
-                [q],
-                convert_to_numpy=True,
-                normalize_embeddings=True
-            )
+        search_k = min(top_k * 2, len(self.layouts_metadata))  # Get 2x for each query
+        if self.sidecar is not None:
+            # One round trip: the sidecar embeds and searches
+            with timed(RAG_STAGE_SECONDS, stage="sidecar_search"):
+                all_distances, all_indices = self.sidecar.search(primary_queries, search_k)
+        else:
+            # Embed all query variations in one call (batched with concurrent searches)
+            with timed(RAG_STAGE_SECONDS, stage="encode"):
+                query_embeddings = np.asarray(self.encode_batcher.run(primary_queries))
             
             # Search in FAISS (get more results for filtering)
-            search_k = min(top_k * 2, len(self.layouts_metadata))  # Get 2x for each query
-            distances, indices = self.index.search(query_embedding.astype('float32'), search_k)
+            with timed(RAG_STAGE_SECONDS, stage="vector_search"):
+                all_distances, all_indices = self.index.search(query_embeddings.astype('float32'), search_k)
+        
+        for i, q in enumerate(primary_queries, 1):
+            sampled_logger.debug("[VectorLayoutRAGEngine]   Query {}: '{}'", i, q)
             
             # Collect results from this query
-            for idx, distance in zip(indices[0], distances[0]):
+            for idx, distance in zip(all_indices[i - 1], all_distances[i - 1]):
                 if idx == -1:  # FAISS returns -1 for empty results
                     continue
                 
@@ -288,12 +400,7 @@ class VectorLayoutRAGEngine:
                             component_match_boost = 0.3 * (present_count / len(required_components))
                     
                     all_candidates[idx] = {
-                        "query": metadata["query"],
-                        "object_type": metadata["object_type"],
-                        "layout_type": metadata["layout_type"],
-                        "patterns_used": metadata["patterns_used"],
-                        "layout": metadata["layout"],
-                        "metadata_info": metadata["metadata"],
+                        **self._catalog_entry(int(idx)),
                         "vector_score": similarity_score,
                         "matched_query": q,
                         "has_required_components": has_required_components,
@@ -311,14 +418,18 @@ class VectorLayoutRAGEngine:
         
         # Log component matching results
         if required_view_type:
-            with_components = sum(1 for c in candidate_layouts if c.get('has_required_components', False))
-            print(f"[VectorLayoutRAGEngine] {with_components}/{len(candidate_layouts)} candidates have required {required_view_type} components")
+            logger.opt(lazy=True).debug(
+                "[VectorLayoutRAGEngine] {}/{} candidates have required {} components",
+                lambda: sum(1 for c in candidate_layouts if c.get('has_required_components', False)),
+                lambda: len(candidate_layouts), lambda: required_view_type
+            )
         
         if not candidate_layouts:
-            print("[VectorLayoutRAGEngine] No results found")
+            logger.info("[VectorLayoutRAGEngine] No results found")
             return []
         
-        print(f"[VectorLayoutRAGEngine] Vector search found {len(candidate_layouts)} unique candidates")
+        logger.debug("[VectorLayoutRAGEngine] Vector search found {} unique candidates", len(candidate_layouts))
+        RAG_CANDIDATES.observe(len(candidate_layouts), stage="vector")
         
         # Apply reranking if requested
         if rerank and len(candidate_layouts) > 0:
@@ -326,8 +437,89 @@ class VectorLayoutRAGEngine:
         else:
             candidate_layouts = candidate_layouts[:final_k]
         
-        # Log results with component match info
-        print(f"[VectorLayoutRAGEngine] Returning {len(candidate_layouts)} results:")
+        RAG_CANDIDATES.observe(len(candidate_layouts), stage="returned")
+        
+        logger.debug("[VectorLayoutRAGEngine] Returning {} results", len(candidate_layouts))
+        if debug_enabled():
+            self._log_results(candidate_layouts)
+        
+        return candidate_layouts
+    
+    def lookup(self, analysis: Dict[str, Any], final_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Layouts for the analysis tuple from the intent table (no encoding, FAISS or reranking)
+        
+        Args:
+            analysis: Query analysis (QueryAnalysis dump); callers check its confidence
+            final_k: Number of results to return
+            
+        Returns:
+            Results shaped like search() results, [] when the tuple is not in the table
+        """
+        with timed(RAG_STAGE_SECONDS, stage="intent_lookup"):
+            view_type = intent_key(analysis).split("|")[2]
+            results = []
+            for layout_id in self.intent_table.lookup(analysis)[:final_k]:
+                entry = self.get_layout(layout_id)
+                if entry is None:
+                    continue
+                results.append({
+                    **entry,
+                    "vector_score": 1.0,  # exact intent match, ranks like a perfect similarity
+                    "matched_query": entry["query"],
+                    "has_required_components": True,
+                    "missing_components": [],
+                    "component_match_boost": 0.0,
+                    "required_view_type": view_type,
+                    "retrieval": "intent_lookup"
+                })
+        if results:
+            RAG_CANDIDATES.observe(len(results), stage="returned")
+        return results
+    
+    def refilter(self, candidates: List[Dict[str, Any]], query: str, final_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        Re-filter earlier search results for a refinement (no encoding or reranking)
+
+        Args:
+            candidates: Results (or their score records) of an earlier search()
+            query: The refinement, e.g. "as cards"
+            final_k: Number of results to return
+
+        Returns:
+            Candidates with the refinement's view type components first (earlier order
+            otherwise), unchanged when it names no view type, [] when none has the components
+        """
+        required_view_type = self._detect_view_type(query)
+        if not required_view_type:
+            return candidates[:final_k]
+
+        required_components = self.view_type_components[required_view_type]
+        refiltered = []
+        for candidate in candidates:
+            layout = candidate.get("layout") or (self.get_layout(candidate.get("id")) or {}).get("layout")
+            if layout is None:
+                continue
+            has_match, missing = self._check_component_match(layout, required_components)
+            if has_match:
+                refiltered.append({
+                    **candidate,
+                    "has_required_components": True,
+                    "missing_components": missing,
+                    "component_match_boost": 0.3 * (len(required_components) - len(missing)) / len(required_components),
+                    "required_view_type": required_view_type
+                })
+
+        # Stable sort: equally matching candidates keep their search order
+        refiltered.sort(key=lambda c: c["component_match_boost"], reverse=True)
+        logger.debug(
+            "[VectorLayoutRAGEngine] Refiltered {}/{} candidates for view type '{}'",
+            len(refiltered), len(candidates), required_view_type
+        )
+        return refiltered[:final_k]
+
+    def _log_results(self, candidate_layouts: List[Dict[str, Any]]):
+        """Log each result with its score and component match info (sampled debug lines)"""
         for i, result in enumerate(candidate_layouts, 1):
             score_type = "final_score" if "final_score" in result else "vector_score"
             pattern = result['patterns_used'][0] if result.get('patterns_used') else 'unknown'
@@ -344,9 +536,10 @@ class VectorLayoutRAGEngine:
                 else:
                     match_indicator = " [✗ NO MATCH]"
             
-            print(f"  {i}. {pattern:20} ({score_type}: {result.get(score_type, 0):.3f}){match_indicator} - {result['query']}")
-        
-        return candidate_layouts
+            sampled_logger.debug(
+                "[VectorLayoutRAGEngine]   {}. {:20} ({}: {:.3f}){} - {}",
+                i, pattern, score_type, result.get(score_type, 0), match_indicator, result['query']
+            )
     
     def _rerank_results(
         self,
@@ -365,7 +558,7 @@ class VectorLayoutRAGEngine:
         Returns:
             Reranked results
         """
-        print(f"[VectorLayoutRAGEngine] Reranking {len(candidates)} candidates...")
+        logger.debug("[VectorLayoutRAGEngine] Reranking {} candidates...", len(candidates))
         
         # Prepare query-document pairs for reranking
         pairs = []
@@ -374,7 +567,8 @@ class VectorLayoutRAGEngine:
             pairs.append([query, candidate['query']])
         
         # Get reranking scores
-        rerank_scores = self.reranker.predict(pairs)
+        with timed(RAG_STAGE_SECONDS, stage="rerank"):
+            rerank_scores = self.rerank_batcher.run(pairs)
         
         # Add rerank scores to candidates
         for i, candidate in enumerate(candidates):
@@ -397,10 +591,38 @@ class VectorLayoutRAGEngine:
         # Sort by rerank score
         reranked = sorted(candidates, key=lambda x: x['rerank_score'], reverse=True)
         
-        print(f"[VectorLayoutRAGEngine] [OK] Reranked to top {min(top_k, len(reranked))} results")
+        logger.debug("[VectorLayoutRAGEngine] [OK] Reranked to top {} results", min(top_k, len(reranked)))
         
         return reranked[:top_k]
     
+    def _catalog_entry(self, idx: int) -> Dict[str, Any]:
+        """Catalog fields of an indexed layout; its ID ("crm_<index>") is stable for the index"""
+        metadata = self.layouts_metadata[idx]
+        return {
+            "id": f"crm_{idx}",
+            "query": metadata["query"],
+            "object_type": metadata["object_type"],
+            "layout_type": metadata["layout_type"],
+            "patterns_used": metadata["patterns_used"],
+            "layout": metadata["layout"],
+            "metadata_info": metadata["metadata"]
+        }
+    
+    def get_layout(self, layout_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Catalog layout by ID (LayoutStore catalog)
+        
+        Args:
+            layout_id: Layout ID as returned by search() ("crm_<index>")
+            
+        Returns:
+            Layout with its catalog fields, None for unknown IDs
+        """
+        prefix, _, index = (layout_id or "").partition("_")
+        if prefix != "crm" or not index.isdigit() or int(index) >= len(self.layouts_metadata):
+            return None
+        return self._catalog_entry(int(index))
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector index"""
         return {
@@ -409,7 +631,15 @@ class VectorLayoutRAGEngine:
             "embedding_model": "all-MiniLM-L6-v2",
             "reranker_model": "cross-encoder/ms-marco-MiniLM-L-6-v2",
             "embedding_dim": self.embedding_dim,
-            "index_type": "FAISS IndexFlatIP (Inner Product)"
+            "index_type": "FAISS IndexFlatIP (Inner Product)",
+            "intent_lookup": self.intent_table.get_stats(),
+            "inference": "sidecar" if self.sidecar is not None else "local",
+            "inference_batching": {
+                "embedding": self.encode_batcher.stats(),
+                "reranker": self.rerank_batcher.stats(),
+            },
+            # Models run in the sidecar in client mode, report its budget
+            "thread_budget": self.sidecar.stats().get("thread_budget") if self.sidecar is not None else get_thread_budget(),
         }
 
 
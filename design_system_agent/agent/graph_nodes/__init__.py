@@ -1,34 +1,39 @@
 """
 Graph Nodes Package - All workflow node implementations
+
+Exports are resolved on first access (module __getattr__), so importing a
+single node module does not load the executor and every other node.
 """
+import importlib
+
+_EXPORTS = {
+    # Core workflow executor
+    "WorkflowExecutor": "node_executor",
+
+    # Individual nodes
+    "QueryAnalyzer": "query_analyzer_node",
+    "QueryReformulator": "query_reformulator_node",
+    "LayoutScorer": "layout_scorer_node",
+    "LayoutAdapter": "layout_scorer_node",
+    "OutputScorer": "layout_scorer_node",
+
+    # Orchestrator and agents
+    "LLMLayoutSelectorFiller": "layout_orchestrator",
+    "LayoutSelectorAgent": "layout_selector_agent",
+    "DataFillingAgent": "data_filling_agent",
+    "OutputValidatorAgent": "output_validator_agent",
+
+    # Utilities
+    "FallbackLayoutBuilder": "fallback_layout_builder",
+}
+
+__all__ = list(_EXPORTS)
+
 
-# Core workflow executor
-from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
-
-# Individual nodes
-from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
-from design_system_agent.agent.graph_nodes.query_reformulator_node import QueryReformulator
-from design_system_agent.agent.graph_nodes.layout_scorer_node import LayoutScorer, LayoutAdapter, OutputScorer
-
-# Orchestrator and agents
-from design_system_agent.agent.graph_nodes.layout_orchestrator import LLMLayoutSelectorFiller
-from design_system_agent.agent.graph_nodes.layout_selector_agent import LayoutSelectorAgent
-from design_system_agent.agent.graph_nodes.data_filling_agent import DataFillingAgent
-from design_system_agent.agent.graph_nodes.output_validator_agent import OutputValidatorAgent
-
-# Utilities
-from design_system_agent.agent.graph_nodes.fallback_layout_builder import FallbackLayoutBuilder
-
-__all__ = [
-    "WorkflowExecutor",
-    "QueryAnalyzer",
-    "QueryReformulator",
-    "LayoutScorer",
-    "LayoutAdapter",
-    "OutputScorer",
-    "LLMLayoutSelectorFiller",
-    "LayoutSelectorAgent",
-    "DataFillingAgent",
-    "OutputValidatorAgent",
-    "FallbackLayoutBuilder",
-]
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
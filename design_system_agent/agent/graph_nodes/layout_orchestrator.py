@@ -29,7 +29,9 @@ class LLMLayoutSelectorFiller:
         top_layouts: List[Dict],
         fetched_data: Dict[str, Any],
         analysis: Optional[Dict] = None,
-        context: Optional[Dict] = None
+        context: Optional[Dict] = None,
+        route: Optional[Dict] = None,
+        timeout_s: Optional[float] = None
     ) -> Dict:
         """
         Orchestrate layout selection, filling, and validation using specialized agents.
@@ -41,6 +43,8 @@ class LLMLayoutSelectorFiller:
             fetched_data: Fetched CRM data
             analysis: Query analysis
             context: Additional context
+            route: Model route for layout selection (model None = top candidate, no LLM)
+            timeout_s: LLM timeout derived from the request deadline (None = no limit)
             
         Returns:
             dict with:
@@ -61,7 +65,9 @@ class LLMLayoutSelectorFiller:
             normalized_query=normalized_query,
             candidate_layouts=top_layouts,
             data_summary=data_summary,
-            analysis=analysis
+            analysis=analysis,
+            route=route,
+            timeout_s=timeout_s
         )
         
         # Ensure selection_result is a dict
@@ -100,7 +106,7 @@ class LLMLayoutSelectorFiller:
             "reasoning": reasoning,
             "is_adapted": is_adapted,
             "adaptations": adaptations,
-            "llm_powered": True,
+            "llm_powered": selection_result.get("llm_powered", True),
             "validation": {
                 "is_valid": validation.is_valid,
                 "score": validation.validation_score,
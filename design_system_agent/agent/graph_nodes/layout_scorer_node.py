@@ -1,7 +1,7 @@
 """
 Layout Scorer and Adapter - Ranks and adapts retrieved layouts for the user query
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -205,7 +205,9 @@ class OutputScorer:
         self,
         layout: Dict[str, Any],
         query: str,
-        analysis: Dict[str, Any]
+        analysis: Dict[str, Any],
+        route: Optional[Dict[str, Any]] = None,
+        timeout_s: Optional[float] = None
     ) -> LayoutScore:
         """
         Score the final layout output
@@ -214,12 +216,19 @@ class OutputScorer:
             layout: Final adapted layout
             query: Original user query
             analysis: Query analysis
+            route: Model route from LLMFactory.route() (model None = heuristic score, no LLM)
+            timeout_s: LLM call timeout derived from the request deadline (None = no limit)
             
         Returns:
             LayoutScore with quality metrics
         """
         print(f"[OutputScorer] Scoring final output")
         
+        if route is not None and route.get("model") is None:
+            print(f"[OutputScorer] Route '{route['name']}' skips the LLM, using heuristic score")
+            return self._heuristic_score(layout, analysis)
+        llm = LLMFactory.routed_structured_llm(route, LayoutScore) if route is not None else self.llm
+        
         try:
             prompt = ChatPromptTemplate.from_messages([
                 ("system", """Score the layout quality based on:
@@ -233,13 +242,13 @@ Provide constructive feedback."""),
                 ("user", "Query: {query}\\nPattern: {pattern}\\nComponents: {components}")
             ])
             
-            chain = prompt | self.llm
+            chain = prompt | llm
             
-            score = chain.invoke({
+            score = LLMFactory.invoke(chain, {
                 "query": query,
                 "pattern": layout.get("pattern", "unknown"),
                 "components": str(layout.get("components", []))
-            })
+            }, timeout_s=timeout_s, name="output_scorer")
             
             print(f"[OutputScorer] Overall score: {score.overall_score:.2f}")
             print(f"[OutputScorer] Feedback: {score.feedback[:100]}...")
@@ -248,19 +257,22 @@ Provide constructive feedback."""),
             
         except Exception as e:
             print(f"[OutputScorer] Error: {e}, using default score")
-            # Default scoring based on pattern match
-            components_needed = set(analysis.get("components_needed", []))
-            layout_components = set(c.lower() for c in layout.get("components", []))
-            
-            component_match = len(components_needed & layout_components) / max(len(components_needed), 1)
-            
-            return LayoutScore(
-                overall_score=0.85,
-                component_match=component_match,
-                structure_quality=0.85,
-                ux_score=0.85,
-                feedback="Layout retrieved and adapted successfully"
-            )
+            return self._heuristic_score(layout, analysis)
+    
+    def _heuristic_score(self, layout: Dict[str, Any], analysis: Dict[str, Any]) -> LayoutScore:
+        """Default scoring based on pattern match"""
+        components_needed = set(analysis.get("components_needed", []))
+        layout_components = set(c.lower() for c in layout.get("components", []))
+        
+        component_match = len(components_needed & layout_components) / max(len(components_needed), 1)
+        
+        return LayoutScore(
+            overall_score=0.85,
+            component_match=component_match,
+            structure_quality=0.85,
+            ux_score=0.85,
+            feedback="Layout retrieved and adapted successfully"
+        )
 
 
 if __name__ == "__main__":
@@ -2,14 +2,23 @@
 Layout Selector Agent
 Specialized agent for selecting the best layout from candidates using LLM
 """
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 import json
+import os
+import time
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from loguru import logger
 
 from design_system_agent.agent.core.llm_factory import LLMFactory
+from design_system_agent.agent.core.llm_resilience import CircuitOpenError
+from design_system_agent.agent.core.logging_config import sampled_logger
+from design_system_agent.agent.core.prompt_budget import PromptBudget, compact_json, count_tokens
 from design_system_agent.core.component_types import ACTIVE_COMPONENTS, COMPONENT_CATEGORIES
 from design_system_agent.agent.tools.design_system_tools import get_design_system_tools
-from design_system_agent.agent.tools.langchain_design_tools import get_langchain_design_tools
+from design_system_agent.agent.tools.langchain_design_tools import get_langchain_design_tools, invoke_design_tool
 
 
 class LayoutSelectionResult(BaseModel):
@@ -23,13 +32,170 @@ class LayoutSelectionResult(BaseModel):
     custom_layout: Dict[str, Any] = Field(default_factory=dict, description="Custom layout structure if created from scratch")
 
 
+# ===========================
+# PROMPT SECTIONS
+# ===========================
+
+# Token budget for the selection prompt (override with LAYOUT_SELECTOR_PROMPT_BUDGET)
+DEFAULT_PROMPT_TOKEN_BUDGET = 2000
+
+# Analysis fields that do not help layout selection
+ANALYSIS_EXCLUDED_KEYS = {"generated_queries"}
+
+# Tokens kept free for the request-specific suffix (QUERY, ANALYSIS, DATA, CANDIDATES)
+SUFFIX_TOKEN_RESERVE = 600
+
+PROMPT_SECTION_SEPARATOR = "\n\n"
+
+# Tool-calling rounds per request before the decision is forced (override with LAYOUT_SELECTOR_MAX_TOOL_ROUNDS)
+DEFAULT_MAX_TOOL_ROUNDS = 2
+
+# Tool calls executed per round (extra calls in the same turn are answered with an error)
+MAX_TOOL_CALLS_PER_ROUND = 8
+
+# Shared pool for running the tool calls of one LLM turn in parallel
+_tool_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_CALLS_PER_ROUND, thread_name_prefix="design-tool")
+
+SELECTOR_HEADER = """CRM Layout Architect: SELECT, ADAPT, or CREATE layout matching user query.
+Instructions come first; the request (QUERY, NORMALIZED, ANALYSIS, DATA) and CANDIDATES are at the end."""
+
+COMPONENT_CATALOG = f"COMPONENTS ({sum(len(c) for c in COMPONENT_CATEGORIES.values())} types):\n{compact_json(COMPONENT_CATEGORIES)}"
+
+COMPONENT_CATALOG_SUMMARY = "COMPONENTS: " + ", ".join(
+    component for components in COMPONENT_CATEGORIES.values() for component in components
+)
+
+DESIGN_TOOLS_REFERENCE = """DESIGN SYSTEM TOOLS:
+You have access to tools for querying design resources (use them as needed):
+- search_icons(query) - Find icons by keyword (e.g search_icons("trending") → ["trending-up", "trending-down"])
+- get_icons_by_category(category) - Get icons in category (finance, user, action, status, etc.)
+- get_color_shades(color) - Get shades for a color name (e.g get_color_shades("blue") → ["blue-10", ..., "blue-100"])
+- get_semantic_colors() - Get status colors (returns: success, error, warning, info with variants)
+- get_all_colors() - Get all color families and shades (use sparingly, returns 110+ colors)
+- get_component_schema(type) - Get component prop/value structure details
+- list_all_components() / get_components_by_category(category) - Component types (typography, layout, data_display, ...)
+
+Call independent tools in the same turn. When done, call LayoutSelectionResult with your decision.
+Use these tools when you need specific colors or icons. For common needs, you can use standard colors (blue-60, red-40, success, error) and common icons (user, trending-up, calendar, dollar-sign) directly."""
+
+DESIGN_TOOLS_SUMMARY = """DESIGN SYSTEM TOOLS: search_icons, get_icons_by_category, get_color_shades, get_semantic_colors, get_all_colors, get_component_schema, list_all_components.
+Call LayoutSelectionResult with your decision.
+Standard colors (blue-60, red-40, success, error) and icons (user, trending-up, calendar, dollar-sign) can be used directly."""
+
+LEGACY_CONSTRAINTS = """CONSTRAINTS:
+- Components MUST use type/props/value structure
+- Props = config (size, variant, level, color from palette)
+- Value = data (text, labels, items, icon from list)
+- Colors: Use format "color-shade" (e.g., blue-60, red-40) or semantic (success, error, warning, info)
+- Icons: Use descriptive names matching action/object
+- Components: ONLY from 19 types above"""
+
+COMPONENT_STRUCTURE = """COMPONENT STRUCTURE:
+{"type": "ComponentType", "props": {"size": "md", "color": "blue-60"}, "value": {"text": "content", "icon": "user"}}"""
+
+DECISION_LOGIC = """DECISION LOGIC:
+1. **Analyze Query Pattern** (from ANALYSIS):
+   - pattern_type: LIST_SIMPLE, LIST_ADVANCED, AGGREGATE, FULL_COMPLEX, ADVANCED_AGGREGATE_RELATED, etc.
+   - complexity_level: basic, medium, advanced
+   - view_type: table (lists), list (multi-object), card (aggregations/metrics)
+   - aggregation_type: sum, count, average, min, max, grouped
+   - group_by_field: branch, manager, status, etc.
+
+2. **Match Required Components:**
+   - LIST_SIMPLE/LIST_ADVANCED → Table + Heading + Badge
+   - MULTI_OBJECT → ListCard + Avatar + Badge
+   - AGGREGATE/ADVANCED_AGGREGATE_RELATED → Card + Metric + Heading (+ optional Dashlet for visualization)
+   - FULL_COMPLEX (multi-condition) → Card + Metric + Table + Badge
+
+3. **Match % Evaluation:**
+   - >90% match → Use as-is
+   - 70-90% match → Adapt by ADDING components
+   - <70% match → Select closest match and ADD missing components
+
+4. **Strategy (ALWAYS SELECT A CANDIDATE):**
+   - CRITICAL: You MUST select one of the provided candidate layouts
+   - created_from_scratch = false (ALWAYS)
+   - custom_layout = {} (ALWAYS EMPTY)
+   
+   - >90% match → OPTION A: Use as-is (is_adapted=false, confidence>0.9, selected_layout_id from candidates)
+   - 70-90% match → OPTION B: Adapt by ADDING (is_adapted=true, list added components in adaptations)
+   - <70% match → OPTION C: Select best + ADD heavily (is_adapted=true, extensive additions in adaptations)
+
+RULES:
+✓ CAN: ADD components to selected layout, reorganize rows, extend with additional patterns
+✗ CANNOT: Remove components from selected layout, create from scratch, use unlisted components, send empty adaptations list
+DATA: Complex query + limited data = simpler layout; Rich data = detailed layout; Skip components without data
+CREATE: Build rows → pattern_info arrays → components with type/props/value → map data to value fields"""
+
+COMPONENT_GUIDE = """COMPONENTS BY CATEGORY:
+Typography: Heading (H1-H6), Text (paragraphs), Label (metadata)
+Interactive: Button (actions), Link (navigation)
+Display: Badge (status), Chip (tags), Avatar (profiles), Image, Divider
+Container: Card (panels), Stack (layouts)
+Data: List, Table (multiple records), Metric (KPIs), Dashlet (charts)
+Complex: ListCard (avatar+title+meta), BirthdayCard, Insights (AI), Alert (notifications)"""
+
+SELECTION_EXAMPLES = """EXAMPLES:
+
+EX1 (Simple List): Query="show all leads" | pattern_type=LIST_SIMPLE → {"selected_layout_id": "crm_123", "is_adapted": false, "confidence": 0.95, "reasoning": "Perfect match - Table layout", "adaptations": []}
+
+EX2 (Adapt for Advanced List): Query="top 10 leads sorted by created_date" | pattern_type=LIST_ADVANCED | Layout=Table+Badge → {"selected_layout_id": "crm_234", "is_adapted": true, "confidence": 0.90, "reasoning": "Added sorting indicator", "adaptations": ["Added Chip for sorting indicator"]}
+
+EX3 (Adapt for Aggregation): Query="sum of loan amount for customers grouped by branch" | pattern_type=ADVANCED_AGGREGATE_RELATED | aggregation_type=sum | group_by_field=branch | Best=crm_789 (has Table) → {
+  "selected_layout_id": "crm_789",
+  "created_from_scratch": false,
+  "is_adapted": true,
+  "confidence": 0.85,
+  "reasoning": "Selected table layout, adding Metric cards for branch aggregation and Dashlet for visualization",
+  "adaptations": ["Added Row 1: Heading with aggregation title", "Added Row 2: Metric cards for branch totals", "Added Row 3: Dashlet bar chart", "Kept existing table for detail view"]
+}
+
+EX4 (Adapt for Complex Multi-Object): Query="customers with balance > 100000 and loan > 50000" | pattern_type=FULL_COMPLEX | objects=[customer,account,loan] | has_conditions=true | Best=crm_456 (customer table) → {
+  "selected_layout_id": "crm_456",
+  "created_from_scratch": false,
+  "is_adapted": true,
+  "confidence": 0.82,
+  "reasoning": "Selected customer table layout, adding summary metrics and condition badges",
+  "adaptations": ["Added Row 1: Heading + Badge showing filter conditions", "Added Row 2: Summary metrics (count, avg balance, total loan)", "Kept Row 3: Existing customer table with balance/loan columns"]
+}
+
+EX5 (Adapt for Branch-wise Count): Query="branch wise count of leads where loan status is approved" | pattern_type=FULL_COMPLEX | aggregation_type=count | group_by_field=branch | Best=crm_234 (lead list) → {
+  "selected_layout_id": "crm_234",
+  "created_from_scratch": false,
+  "is_adapted": true,
+  "confidence": 0.80,
+  "reasoning": "Selected lead list layout, adding grouped metrics and chart for branch-wise count",
+  "adaptations": ["Added Row 1: Heading + Chip filter (Loan: Approved)", "Added Row 2: Metric cards per branch (North: 45, South: 38, East: 52)", "Added Row 3: Pie chart for distribution", "Kept original lead table for drill-down"]
+}"""
+
+SELECTION_EXAMPLES_SUMMARY = """EXAMPLES:
+EX1 (Simple List): Query="show all leads" | pattern_type=LIST_SIMPLE → {"selected_layout_id": "crm_123", "is_adapted": false, "confidence": 0.95, "adaptations": []}
+EX2 (Aggregation): Query="sum of loan amount grouped by branch" | pattern_type=ADVANCED_AGGREGATE_RELATED | Best=crm_789 (has Table) → {"selected_layout_id": "crm_789", "is_adapted": true, "confidence": 0.85, "adaptations": ["Added Heading", "Added Metric cards for branch totals", "Added Dashlet bar chart"]}"""
+
+OUTPUT_FORMAT = """OUTPUT JSON (MUST SELECT FROM CANDIDATES):
+{
+  "selected_layout_id": "MUST be ID from provided candidates (e.g., crm_123, crm_234)",
+  "is_adapted": bool,
+  "created_from_scratch": false,  // ALWAYS false
+  "confidence": 0-1,
+  "reasoning": "why you selected this candidate + what you're adding",
+  "adaptations": ["list of components/rows ADDED to selected layout"],
+  "custom_layout": {}  // ALWAYS empty
+}"""
+
+
 class LayoutSelectorAgent:
     """
     Agent responsible for selecting the best layout from candidates.
     Uses LLM to analyze query intent and match with available layouts.
     """
     
-    def __init__(self, use_tools: bool = True):
+    def __init__(
+        self,
+        use_tools: bool = True,
+        prompt_token_budget: Optional[int] = None,
+        max_tool_rounds: Optional[int] = None
+    ):
         """
         Initialize Layout Selector Agent with structured output LLM.
         Uses Pydantic LayoutSelectionResult model for guaranteed structured responses.
@@ -37,8 +203,20 @@ class LayoutSelectorAgent:
         Args:
             use_tools: If True, bind design system tools for dynamic queries (recommended)
                       Automatically falls back to False if OpenAI API key not available
+            prompt_token_budget: Token budget for the selection prompt
+                      (default: LAYOUT_SELECTOR_PROMPT_BUDGET env var or 2000)
+            max_tool_rounds: Tool-calling rounds per request before the decision is forced
+                      (default: LAYOUT_SELECTOR_MAX_TOOL_ROUNDS env var or 2, 0 = no tool calls)
         """
         self.use_tools = use_tools
+        self.prompt_token_budget = prompt_token_budget or int(
+            os.getenv("LAYOUT_SELECTOR_PROMPT_BUDGET", DEFAULT_PROMPT_TOKEN_BUDGET)
+        )
+        self.max_tool_rounds = max_tool_rounds if max_tool_rounds is not None else int(
+            os.getenv("LAYOUT_SELECTOR_MAX_TOOL_ROUNDS", DEFAULT_MAX_TOOL_ROUNDS)
+        )
+        self._routed_llms: Dict[str, tuple] = {}
+        self._static_prefix_cache: Dict[tuple, tuple] = {}
         
         if use_tools:
             try:
@@ -47,34 +225,38 @@ class LayoutSelectorAgent:
                 
                 # Check if bind_tools is supported (not supported by mock LLM)
                 if hasattr(base_llm, 'bind_tools'):
-                    self.llm_with_tools = base_llm.bind_tools(get_langchain_design_tools())
+                    # LayoutSelectionResult is bound as a tool too: the model submits its
+                    # decision with it, so a turn without lookups needs no second call
+                    self.llm_with_tools = base_llm.bind_tools(
+                        get_langchain_design_tools() + [LayoutSelectionResult]
+                    )
                     
                     # Create structured output LLM for final selection decision
                     self.llm_structured = LLMFactory.open_ai_structured_llm(
                         structured_output=LayoutSelectionResult,
                         max_tokens=3000
                     )
-                    print(f"[LayoutSelectorAgent] ✓ Initialized with bind_tools (12 design tools available)")
+                    logger.info(f"[LayoutSelectorAgent] ✓ Initialized with bind_tools (12 design tools available, max {self.max_tool_rounds} tool rounds)")
                 else:
                     # Mock LLM doesn't support bind_tools, fall back to legacy
-                    print(f"[LayoutSelectorAgent] WARNING: bind_tools not supported by LLM, falling back to legacy mode")
+                    logger.warning(f"[LayoutSelectorAgent] bind_tools not supported by LLM, falling back to legacy mode")
                     self.use_tools = False
                     self.llm_with_tools = None
                     self.llm_structured = LLMFactory.open_ai_structured_llm(
                         structured_output=LayoutSelectionResult,
                         max_tokens=3000
                     )
-                    print(f"[LayoutSelectorAgent] ✓ Initialized with structured output (legacy mode)")
+                    logger.info(f"[LayoutSelectorAgent] ✓ Initialized with structured output (legacy mode)")
             except (NotImplementedError, AttributeError) as e:
                 # bind_tools not implemented, fall back to legacy
-                print(f"[LayoutSelectorAgent] WARNING: bind_tools failed ({type(e).__name__}), falling back to legacy mode")
+                logger.warning(f"[LayoutSelectorAgent] bind_tools failed ({type(e).__name__}), falling back to legacy mode")
                 self.use_tools = False
                 self.llm_with_tools = None
                 self.llm_structured = LLMFactory.open_ai_structured_llm(
                     structured_output=LayoutSelectionResult,
                     max_tokens=3000
                 )
-                print(f"[LayoutSelectorAgent] ✓ Initialized with structured output (legacy mode)")
+                logger.info(f"[LayoutSelectorAgent] ✓ Initialized with structured output (legacy mode)")
         else:
             # Legacy mode: single LLM with structured output, info in prompt
             self.llm_with_tools = None
@@ -82,9 +264,9 @@ class LayoutSelectorAgent:
                 structured_output=LayoutSelectionResult,
                 max_tokens=3000
             )
-            print(f"[LayoutSelectorAgent] ✓ Initialized with structured output (legacy mode)")
+            logger.info(f"[LayoutSelectorAgent] ✓ Initialized with structured output (legacy mode)")
         
-        print(f"[LayoutSelectorAgent] Structured output model: {LayoutSelectionResult.__name__}")
+        logger.info(f"[LayoutSelectorAgent] Structured output model: {LayoutSelectionResult.__name__}")
     
     def select_best_layout(
         self,
@@ -92,7 +274,9 @@ class LayoutSelectorAgent:
         normalized_query: str,
         candidate_layouts: List[Dict],
         data_summary: str,
-        analysis: Optional[Dict] = None
+        analysis: Optional[Dict] = None,
+        route: Optional[Dict] = None,
+        timeout_s: Optional[float] = None
     ) -> Dict:
         """
         Select the best layout from candidates or create a new one.
@@ -103,6 +287,8 @@ class LayoutSelectorAgent:
             candidate_layouts: List of candidate layouts (top 3 from reranking)
             data_summary: Summary of available data
             analysis: Query analysis
+            route: Model route from LLMFactory.route() (model None = top candidate, no LLM)
+            timeout_s: Time limit for all LLM calls of this selection (None = no limit)
             
         Returns:
             dict with:
@@ -112,19 +298,38 @@ class LayoutSelectorAgent:
                 - is_adapted: Whether layout was modified
                 - created_from_scratch: Whether layout was created from scratch
                 - adaptations: List of changes made
+                - llm_powered: Whether the LLM made the selection
+                - tool_calls: Design tool calls made by the LLM ({"name", "args"})
+                - prompt_report: Token report of the prompt sections (empty without LLM)
         """
         if not candidate_layouts:
-            print("[LayoutSelectorAgent] ERROR: No candidate layouts provided!")
+            logger.error("[LayoutSelectorAgent] No candidate layouts provided!")
             raise ValueError("LayoutSelectorAgent requires at least one candidate layout")
         
-        # Build selection prompt
-        prompt = self._build_prompt(
-            query, normalized_query, candidate_layouts, data_summary, analysis
-        )
-        
-        # LLM evaluates and selects best match
         fallback_id = candidate_layouts[0].get("id")
-        selection = self._invoke_llm(prompt, fallback_id)
+        llm_powered = route is None or route.get("model") is not None
+        # Per call: the agent is shared by concurrent requests
+        tool_calls: List[Dict[str, Any]] = []
+        prompt_report: Dict[str, Any] = {}
+        if llm_powered:
+            # Build selection prompt
+            prompt, prompt_report = self._render_prompt(
+                query, normalized_query, candidate_layouts, data_summary, analysis
+            )
+            
+            # LLM evaluates and selects best match
+            selection = self._invoke_llm(
+                prompt, fallback_id, model=route.get("model") if route else None, timeout_s=timeout_s,
+                tool_calls=tool_calls
+            )
+        else:
+            # Routed without LLM: reranking already put the best match first
+            logger.debug("[LayoutSelectorAgent] Route '{}' skips the LLM, using top candidate {}", route["name"], fallback_id)
+            selection = LayoutSelectionResult(
+                selected_layout_id=fallback_id,
+                confidence=0.9,
+                reasoning=f"Top reranked candidate (route: {route['name']})"
+            )
         
         # Get the selected layout from candidates (MUST select one)
         selected = next(
@@ -134,19 +339,19 @@ class LayoutSelectorAgent:
         
         # Debug: Check what we got
         if not isinstance(selected, dict):
-            print(f"[LayoutSelectorAgent] ERROR: selected is not a dict, type: {type(selected).__name__}")
+            logger.error("[LayoutSelectorAgent] selected is not a dict, type: {}", type(selected).__name__)
             selected = {}
         elif not selected:
-            print(f"[LayoutSelectorAgent] WARNING: selected layout is empty dict")
+            logger.warning("[LayoutSelectorAgent] selected layout is empty dict")
         else:
-            print(f"[LayoutSelectorAgent] Selected layout keys: {list(selected.keys())}")
+            logger.opt(lazy=True).debug("[LayoutSelectorAgent] Selected layout keys: {}", lambda: list(selected.keys()))
         
         # Final safety check: ensure selected is a valid dict with rows
         if not isinstance(selected, dict):
-            print(f"[LayoutSelectorAgent] ERROR: Final selected is {type(selected).__name__}, using empty structure")
+            logger.error("[LayoutSelectorAgent] Final selected is {}, using empty structure", type(selected).__name__)
             selected = {"rows": []}
         elif "rows" not in selected and "layout" not in selected:
-            print(f"[LayoutSelectorAgent] WARNING: Selected layout missing 'rows' key, wrapping it")
+            logger.warning("[LayoutSelectorAgent] Selected layout missing 'rows' key, wrapping it")
             selected = {"rows": [selected] if selected else []}
         
         return {
@@ -155,7 +360,10 @@ class LayoutSelectorAgent:
             "reasoning": selection.reasoning,
             "is_adapted": selection.is_adapted,
             "created_from_scratch": selection.created_from_scratch,
-            "adaptations": selection.adaptations
+            "adaptations": selection.adaptations,
+            "llm_powered": llm_powered,
+            "tool_calls": tool_calls,
+            "prompt_report": prompt_report
         }
     
     def _build_prompt(
@@ -166,9 +374,104 @@ class LayoutSelectorAgent:
         data_summary: str,
         analysis: Optional[Dict]
     ) -> str:
-        """Build LLM prompt for dynamic layout selection and adaptation"""
+        """Build LLM prompt for dynamic layout selection and adaptation (see _render_prompt)"""
+        return self._render_prompt(query, normalized_query, layouts, data_summary, analysis)[0]
+    
+    def _render_prompt(
+        self,
+        query: str,
+        normalized_query: str,
+        layouts: List[Dict],
+        data_summary: str,
+        analysis: Optional[Dict]
+    ) -> tuple:
+        """
+        Build the selection prompt; returns (prompt, token report of its sections).
+        
+        Layout: static prefix (instructions, catalog, examples) followed by the
+        variable suffix (QUERY, ANALYSIS, DATA, CANDIDATES). The prefix is
+        byte-identical across requests so provider-side prompt caching applies.
+        The suffix is fitted into whatever budget the prefix leaves.
+        """
+        prefix = self.get_static_prefix()
+        
+        suffix_budget = PromptBudget(
+            max_tokens=max(self.prompt_token_budget - count_tokens(prefix), SUFFIX_TOKEN_RESERVE),
+            name="LayoutSelectorAgent:suffix"
+        )
+        suffix_budget.add("request", self._format_request(query, normalized_query, analysis, data_summary))
+        suffix_budget.add(
+            "candidates",
+            f"CANDIDATES (Top {len(layouts)}):\n{compact_json(self._format_candidates(layouts))}",
+            summary=f"CANDIDATES (Top {len(layouts)}):\n{compact_json(self._format_candidates(layouts, with_props=False))}"
+        )
+        suffix_budget.add("instruction", "Analyze and decide:")
+        suffix = suffix_budget.render()
         
-        # Format layouts with ACTUAL structure (not just summary)
+        report = {
+            "prefix": self._static_prefix_cache[(self.use_tools, self.prompt_token_budget)][1],
+            "suffix": suffix_budget.last_report
+        }
+        return prefix + PROMPT_SECTION_SEPARATOR + suffix, report
+    
+    def get_static_prefix(self) -> str:
+        """
+        Get the request-independent prompt prefix (built once per mode and budget).
+        
+        Compaction of static sections depends only on the configured budget, never
+        on the request, so the prefix stays byte-identical between calls.
+        """
+        cache_key = (self.use_tools, self.prompt_token_budget)
+        if cache_key not in self._static_prefix_cache:
+            budget = PromptBudget(
+                max_tokens=self.prompt_token_budget - SUFFIX_TOKEN_RESERVE,
+                name="LayoutSelectorAgent:prefix",
+                separator=PROMPT_SECTION_SEPARATOR
+            )
+            budget.add("header", SELECTOR_HEADER)
+            
+            # Choose design reference based on whether tools are available
+            if self.use_tools:
+                # SHORTER: Component names only; categories, schemas, colors and icons are fetched with tools
+                budget.add("components", COMPONENT_CATALOG_SUMMARY)
+                budget.add("tools", DESIGN_TOOLS_REFERENCE, priority=1, summary=DESIGN_TOOLS_SUMMARY)
+            else:
+                # LEGACY: Full info in prompt (no tools)
+                budget.add("components", COMPONENT_CATALOG, priority=2, summary=COMPONENT_CATALOG_SUMMARY)
+                budget.add("design_reference", self._legacy_design_reference(), priority=1, summary=LEGACY_CONSTRAINTS)
+            
+            budget.add("structure", COMPONENT_STRUCTURE)
+            budget.add("decision_logic", DECISION_LOGIC)
+            if not self.use_tools:
+                budget.add("component_guide", COMPONENT_GUIDE, priority=3)
+            budget.add("examples", SELECTION_EXAMPLES, priority=4, summary=SELECTION_EXAMPLES_SUMMARY)
+            budget.add("output_format", OUTPUT_FORMAT)
+            
+            self._static_prefix_cache[cache_key] = (budget.render(), budget.last_report)
+        
+        return self._static_prefix_cache[cache_key][0]
+    
+    def _format_request(
+        self,
+        query: str,
+        normalized_query: str,
+        analysis: Optional[Dict],
+        data_summary: str
+    ) -> str:
+        """Format request-specific fields; analysis is compact JSON without empty values"""
+        compact_analysis = {
+            key: value for key, value in (analysis or {}).items()
+            if key not in ANALYSIS_EXCLUDED_KEYS and value not in (None, "", [], {})
+        }
+        return (
+            f"QUERY: {query}\n"
+            f"NORMALIZED: {normalized_query}\n"
+            f"ANALYSIS: {compact_json(compact_analysis) if compact_analysis else 'N/A'}\n"
+            f"DATA: {data_summary}"
+        )
+    
+    def _format_candidates(self, layouts: List[Dict], with_props: bool = True) -> List[Dict]:
+        """Format candidate layouts with their row structure (prop names only, never values)"""
         layouts_info = []
         for i, layout in enumerate(layouts, 1):
             layout_obj = layout.get("layout", {})
@@ -181,10 +484,13 @@ class LayoutSelectorAgent:
                 components = []
                 for comp in pattern_info:
                     if isinstance(comp, dict):
-                        components.append({
-                            "type": comp.get("type"),
-                            "props": list(comp.get("props", {}).keys())  # Only prop names, not values
-                        })
+                        if with_props:
+                            components.append({
+                                "type": comp.get("type"),
+                                "props": list(comp.get("props", {}).keys())  # Only prop names, not values
+                            })
+                        else:
+                            components.append(comp.get("type"))
                 rows_structure.append({
                     "row": row_idx + 1,
                     "pattern_type": row.get("pattern_type"),
@@ -198,192 +504,120 @@ class LayoutSelectorAgent:
                 "rows": rows_structure,
                 "sample_query": layout.get("query", "")
             })
+        return layouts_info
+    
+    def _legacy_design_reference(self) -> str:
+        """Color/icon reference and constraints for legacy (no tools) mode"""
+        design_tools = get_design_system_tools()
+        icon_total = len(design_tools.get_all_icons())
+        return f"""COLORS (Compact Reference):
+Primary: red, blue, green, orange, yellow, purple, pink, cyan, teal, indigo, gray
+Shades: 10, 20, 30, 40, 50, 60, 70, 80, 90, 100
+Format: color-shade (e.g., blue-60, red-40)
+Semantic: success, success-light, error, error-light, warning, warning-light, info, info-light
+Neutral: neutral-white, neutral-primary, neutral-secondary, neutral-disabled
+
+ICONS ({icon_total} total):
+Categories: user, action, navigation, data, finance, status, communication, file, time, business, settings, media, location, other
+Examples: user, trending-up, trending-down, check-circle, alert-circle, star, calendar, dollar-sign, mail, phone, settings, search, edit, trash, download, upload, chart, globe, home, menu
+Note: Use descriptive icon names matching the action/object
+
+{LEGACY_CONSTRAINTS}"""
+    
+    def _llms_for_model(self, model: Optional[str]) -> tuple:
+        """Get (llm_with_tools, llm_structured) for a routed model (created once per model)"""
+        if model is None or model == os.getenv("OPENAI_MODEL", "gpt-4o-mini"):
+            return self.llm_with_tools, self.llm_structured
+        if model not in self._routed_llms:
+            route = {"model": model}
+            llm_with_tools = None
+            if self.use_tools:
+                llm_with_tools = LLMFactory.routed_llm(route, max_tokens=3000).bind_tools(
+                    get_langchain_design_tools() + [LayoutSelectionResult]
+                )
+            llm_structured = LLMFactory.routed_structured_llm(route, LayoutSelectionResult, max_tokens=3000)
+            self._routed_llms[model] = (llm_with_tools, llm_structured)
+        return self._routed_llms[model]
+    
+    def _run_tool_loop(
+        self,
+        prompt: str,
+        llm_with_tools,
+        llm_structured,
+        timeout_s: Optional[float] = None,
+        tool_calls_made: Optional[List[Dict[str, Any]]] = None
+    ) -> LayoutSelectionResult:
+        """
+        Bounded tool-calling loop.
         
-        # Get available components list
-        components_by_category = {
-            category: components for category, components in COMPONENT_CATEGORIES.items()
-        }
+        Each round the model either submits LayoutSelectionResult (done) or
+        requests design tools; all tool calls of a turn run in parallel and their
+        results are appended to the conversation. A decision that fails validation
+        is answered with the error, like a failed tool call, so the model can fix it.
+        After max_tool_rounds rounds the decision is forced through the structured
+        output LLM. All rounds share one time limit (timeout_s).
+        Design tool calls are appended to tool_calls_made.
+        """
+        deadline = time.monotonic() + timeout_s if timeout_s is not None else None
         
-        # Choose prompt based on whether tools are available
-        if self.use_tools:
-            # SHORTER PROMPT: Tools available for querying colors/icons/patterns dynamically
-            prompt = f"""CRM Layout Architect: SELECT, ADAPT, or CREATE layout matching user query.
-
-QUERY: {query}
-NORMALIZED: {normalized_query}
-ANALYSIS: {json.dumps(analysis, indent=2) if analysis else "N/A"}
-DATA: {data_summary}
-
-CANDIDATES (Top 3):
-{json.dumps(layouts_info, indent=2)}
-
-COMPONENTS (19 types):
-{json.dumps(components_by_category, indent=2)}
-
-DESIGN SYSTEM TOOLS:
-You have access to tools for querying design resources (use them as needed):
-- search_icons(query) - Find icons by keyword (e.g search_icons("trending") → ["trending-up", "trending-down"])
-- get_icons_by_category(category) - Get icons in category (finance, user, action, status, etc.)
-- get_color_shades(color) - Get shades for a color name (e.g get_color_shades("blue") → ["blue-10", ..., "blue-100"])
-- get_semantic_colors() - Get status colors (returns: success, error, warning, info with variants)
-- get_all_colors() - Get all color families and shades (use sparingly, returns 110+ colors)
-- get_component_schema(type) - Get component prop/value structure details
-
-Use these tools when you need specific colors or icons. For common needs, you can use standard colors (blue-60, red-40, success, error) and common icons (user, trending-up, calendar, dollar-sign) directly.
-
-COMPONENT STRUCTURE:
-{{"type": "ComponentType", "props": {{"size": "md", "color": "blue-60"}}, "value": {{"text": "content", "icon": "user"}}}}
-
-DECISION LOGIC:"""
-        else:
-            # LEGACY: Full info in prompt (no tools)
-            design_tools = get_design_system_tools()
-            
-            color_summary = {
-                "primary_colors": ["red", "blue", "green", "orange", "yellow", "purple", "pink", "cyan", "teal", "indigo", "gray"],
-                "shades": "10, 20, 30, 40, 50, 60, 70, 80, 90, 100",
-                "format": "color-shade (e.g., blue-60, red-40)",
-                "semantic": ["success", "success-light", "error", "error-light", "warning", "warning-light", "info", "info-light"],
-                "neutral": ["neutral-white", "neutral-primary", "neutral-secondary", "neutral-disabled"]
-            }
+        def remaining() -> Optional[float]:
+            return max(deadline - time.monotonic(), 0.0) if deadline is not None else None
+        
+        tool_calls_made = tool_calls_made if tool_calls_made is not None else []
+        messages = [HumanMessage(content=prompt)]
+        
+        for round_num in range(1, self.max_tool_rounds + 1):
+            response = LLMFactory.invoke(llm_with_tools, messages, timeout_s=remaining(), name="layout_selector_tools")
+            messages.append(response)
             
-            icon_summary = {
-                "total": len(design_tools.get_all_icons()),
-                "categories": ["user", "action", "navigation", "data", "finance", "status", "communication", "file", "time", "business", "settings", "media", "location", "other"],
-                "common_examples": ["user", "trending-up", "trending-down", "check-circle", "alert-circle", "star", "calendar", "dollar-sign", "mail", "phone", "settings", "search", "edit", "trash", "download", "upload", "chart", "globe", "home", "menu"]
-            }
+            tool_calls = getattr(response, "tool_calls", None) or []
+            selection_call = next((c for c in tool_calls if c["name"] == LayoutSelectionResult.__name__), None)
+            if selection_call is not None:
+                try:
+                    result = LayoutSelectionResult(**selection_call["args"])
+                    logger.debug("[LayoutSelectorAgent] ✓ Decision submitted in round {}", round_num)
+                    return result
+                except ValidationError as e:
+                    logger.debug("[LayoutSelectorAgent] Invalid decision in round {}: {}", round_num, e)
+                    messages.append(ToolMessage(
+                        content=json.dumps({"error": f"{type(e).__name__}: {e}"}),
+                        tool_call_id=selection_call["id"], name=selection_call["name"]
+                    ))
+                    tool_calls = [c for c in tool_calls if c is not selection_call]
+            elif not tool_calls:
+                # Plain text answer - structure it below
+                break
             
-            prompt = f"""CRM Layout Architect: SELECT, ADAPT, or CREATE layout matching user query.
-
-QUERY: {query}
-NORMALIZED: {normalized_query}
-ANALYSIS: {json.dumps(analysis, indent=2) if analysis else "N/A"}
-DATA: {data_summary}
-
-CANDIDATES (Top 3):
-{json.dumps(layouts_info, indent=2)}
-
-COMPONENTS (19 types):
-{json.dumps(components_by_category, indent=2)}
-
-COLORS (Compact Reference):
-Primary: {', '.join(color_summary['primary_colors'])}
-Shades: {color_summary['shades']}
-Format: {color_summary['format']}
-Semantic: {', '.join(color_summary['semantic'])}
-Neutral: {', '.join(color_summary['neutral'])}
-
-ICONS ({icon_summary['total']} total):
-Categories: {', '.join(icon_summary['categories'])}
-Examples: {', '.join(icon_summary['common_examples'])}
-Note: Use descriptive icon names matching the action/object
-
-COMPONENT STRUCTURE (REQUIRED):
-{{"type": "ComponentType", "props": {{"size": "md", "color": "blue-60"}}, "value": {{"text": "content", "icon": "user"}}}}
-
-CONSTRAINTS:
-- Components MUST use type/props/value structure
-- Props = config (size, variant, level, color from palette)
-- Value = data (text, labels, items, icon from list)
-- Colors: Use format "color-shade" (e.g., blue-60, red-40) or semantic (success, error, warning, info)
-- Icons: Use descriptive names matching action/object
-- Components: ONLY from 19 types above
-
-DECISION LOGIC:"""
+            sampled_logger.opt(lazy=True).debug(
+                "[LayoutSelectorAgent] Round {}: {} tool call(s): {}",
+                lambda: round_num, lambda: len(tool_calls), lambda: ", ".join(c["name"] for c in tool_calls)
+            )
+            messages.extend(self._execute_tool_calls(tool_calls))
+            tool_calls_made.extend({"name": c["name"], "args": c.get("args", {})} for c in tool_calls)
         
-        # Common decision rules for both modes
-        prompt += """
-1. **Analyze Query Pattern** (from ANALYSIS):
-   - pattern_type: LIST_SIMPLE, LIST_ADVANCED, AGGREGATE, FULL_COMPLEX, ADVANCED_AGGREGATE_RELATED, etc.
-   - complexity_level: basic, medium, advanced
-   - view_type: table (lists), list (multi-object), card (aggregations/metrics)
-   - aggregation_type: sum, count, average, min, max, grouped
-   - group_by_field: branch, manager, status, etc.
-
-2. **Match Required Components:**
-   - LIST_SIMPLE/LIST_ADVANCED → Table + Heading + Badge
-   - MULTI_OBJECT → ListCard + Avatar + Badge
-   - AGGREGATE/ADVANCED_AGGREGATE_RELATED → Card + Metric + Heading (+ optional Dashlet for visualization)
-   - FULL_COMPLEX (multi-condition) → Card + Metric + Table + Badge
-
-3. **Match % Evaluation:**
-   - >90% match → Use as-is
-   - 70-90% match → Adapt by ADDING components
-   - <70% match → Select closest match and ADD missing components
-
-4. **Strategy (ALWAYS SELECT A CANDIDATE):**
-   - CRITICAL: You MUST select one of the provided candidate layouts
-   - created_from_scratch = false (ALWAYS)
-   - custom_layout = {} (ALWAYS EMPTY)
-   
-   - >90% match → OPTION A: Use as-is (is_adapted=false, confidence>0.9, selected_layout_id from candidates)
-   - 70-90% match → OPTION B: Adapt by ADDING (is_adapted=true, list added components in adaptations)
-   - <70% match → OPTION C: Select best + ADD heavily (is_adapted=true, extensive additions in adaptations)
-
-RULES:
-✓ CAN: ADD components to selected layout, reorganize rows, extend with additional patterns
-✗ CANNOT: Remove components from selected layout, create from scratch, use unlisted components, send empty adaptations list
-DATA: Complex query + limited data = simpler layout; Rich data = detailed layout; Skip components without data
-CREATE: Build rows → pattern_info arrays → components with type/props/value → map data to value fields
-
-COMPONENTS BY CATEGORY:
-Typography: Heading (H1-H6), Text (paragraphs), Label (metadata)
-Interactive: Button (actions), Link (navigation)
-Display: Badge (status), Chip (tags), Avatar (profiles), Image, Divider
-Container: Card (panels), Stack (layouts)
-Data: List, Table (multiple records), Metric (KPIs), Dashlet (charts)
-Complex: ListCard (avatar+title+meta), BirthdayCard, Insights (AI), Alert (notifications)
-
-EXAMPLES:
-
-EX1 (Simple List): Query="show all leads" | pattern_type=LIST_SIMPLE → {{"selected_layout_id": "crm_123", "is_adapted": false, "confidence": 0.95, "reasoning": "Perfect match - Table layout", "adaptations": []}}
-
-EX2 (Adapt for Advanced List): Query="top 10 leads sorted by created_date" | pattern_type=LIST_ADVANCED | Layout=Table+Badge → {{"selected_layout_id": "crm_234", "is_adapted": true, "confidence": 0.90, "reasoning": "Added sorting indicator", "adaptations": ["Added Chip for sorting indicator"]}}
-
-EX3 (Adapt for Aggregation): Query="sum of loan amount for customers grouped by branch" | pattern_type=ADVANCED_AGGREGATE_RELATED | aggregation_type=sum | group_by_field=branch | Best=crm_789 (has Table) → {{
-  "selected_layout_id": "crm_789",
-  "created_from_scratch": false,
-  "is_adapted": true,
-  "confidence": 0.85,
-  "reasoning": "Selected table layout, adding Metric cards for branch aggregation and Dashlet for visualization",
-  "adaptations": ["Added Row 1: Heading with aggregation title", "Added Row 2: Metric cards for branch totals", "Added Row 3: Dashlet bar chart", "Kept existing table for detail view"]
-}}
-
-EX4 (Adapt for Complex Multi-Object): Query="customers with balance > 100000 and loan > 50000" | pattern_type=FULL_COMPLEX | objects=[customer,account,loan] | has_conditions=true | Best=crm_456 (customer table) → {{
-  "selected_layout_id": "crm_456",
-  "created_from_scratch": false,
-  "is_adapted": true,
-  "confidence": 0.82,
-  "reasoning": "Selected customer table layout, adding summary metrics and condition badges",
-  "adaptations": ["Added Row 1: Heading + Badge showing filter conditions", "Added Row 2: Summary metrics (count, avg balance, total loan)", "Kept Row 3: Existing customer table with balance/loan columns"]
-}}
-
-EX5 (Adapt for Branch-wise Count): Query="branch wise count of leads where loan status is approved" | pattern_type=FULL_COMPLEX | aggregation_type=count | group_by_field=branch | Best=crm_234 (lead list) → {{
-  "selected_layout_id": "crm_234",
-  "created_from_scratch": false,
-  "is_adapted": true,
-  "confidence": 0.80,
-  "reasoning": "Selected lead list layout, adding grouped metrics and chart for branch-wise count",
-  "adaptations": ["Added Row 1: Heading + Chip filter (Loan: Approved)", "Added Row 2: Metric cards per branch (North: 45, South: 38, East: 52)", "Added Row 3: Pie chart for distribution", "Kept original lead table for drill-down"]
-}}
-
-OUTPUT JSON (MUST SELECT FROM CANDIDATES):
-{{
-  "selected_layout_id": "MUST be ID from provided candidates (e.g., crm_123, crm_234)",
-  "is_adapted": bool,
-  "created_from_scratch": false,  // ALWAYS false
-  "confidence": 0-1,
-  "reasoning": "why you selected this candidate + what you're adding",
-  "adaptations": ["list of components/rows ADDED to selected layout"],
-  "custom_layout": {{}}  // ALWAYS empty
-}}
-
-Analyze and decide:
-"""
-        return prompt
+        return LLMFactory.invoke(llm_structured, messages, timeout_s=remaining(), name="layout_selector")
+    
+    def _execute_tool_calls(self, tool_calls: List[Dict]) -> List[ToolMessage]:
+        """Run the tool calls of one turn in parallel (memoized design tools) and wrap results as ToolMessages"""
+        executed = tool_calls[:MAX_TOOL_CALLS_PER_ROUND]
+        results = list(_tool_executor.map(
+            lambda call: invoke_design_tool(call["name"], call.get("args")),
+            executed
+        ))
+        results += ['{"error":"Too many tool calls in one turn"}'] * (len(tool_calls) - len(executed))
+        
+        return [
+            ToolMessage(content=result, tool_call_id=call["id"], name=call["name"])
+            for call, result in zip(tool_calls, results)
+        ]
     
     def _invoke_llm(
-        self, prompt: str, fallback_layout_id: str
+        self,
+        prompt: str,
+        fallback_layout_id: str,
+        model: Optional[str] = None,
+        timeout_s: Optional[float] = None,
+        tool_calls: Optional[List[Dict[str, Any]]] = None
     ) -> LayoutSelectionResult:
         """
         Invoke LLM to select layout using structured output with Pydantic model.
@@ -391,45 +625,59 @@ Analyze and decide:
         Args:
             prompt: The prompt string for layout selection
             fallback_layout_id: Fallback layout ID if LLM fails
+            model: Routed model name (None = model configured at init)
+            timeout_s: Time limit for the LLM call(s) (None = no limit)
+            tool_calls: Receives the design tool calls of the tool loop
             
         Returns:
             LayoutSelectionResult: Structured Pydantic model with selection result
         """
         
         try:
-            print(f"[LayoutSelectorAgent] Invoking LLM with prompt length: {len(prompt)} chars")
-            print(f"[LayoutSelectorAgent] Using structured output with model: {LayoutSelectionResult.__name__}")
+            logger.debug("[LayoutSelectorAgent] Invoking LLM with prompt length: {} chars", len(prompt))
             
-            # Invoke LLM with structured output (returns LayoutSelectionResult directly)
-            result = self.llm_structured.invoke(prompt)
+            llm_with_tools, llm_structured = self._llms_for_model(model)
+            if self.use_tools and llm_with_tools is not None and self.max_tool_rounds > 0:
+                # Tool loop: model may look up design resources before deciding
+                result = self._run_tool_loop(prompt, llm_with_tools, llm_structured, timeout_s, tool_calls)
+            else:
+                # Invoke LLM with structured output (returns LayoutSelectionResult directly)
+                result = LLMFactory.invoke(llm_structured, prompt, timeout_s=timeout_s, name="layout_selector")
             
             # Verify result is correct type (real API returns LayoutSelectionResult, mock may differ)
             if isinstance(result, LayoutSelectionResult):
-                print(f"[LayoutSelectorAgent] ✓ Successfully received structured output")
-                print(f"[LayoutSelectorAgent] ✓ Selected: {result.selected_layout_id}, Confidence: {result.confidence}")
-                print(f"[LayoutSelectorAgent] ✓ Created from scratch: {result.created_from_scratch}, Adapted: {result.is_adapted}")
+                logger.debug(
+                    "[LayoutSelectorAgent] ✓ Selected: {}, Confidence: {}, Created from scratch: {}, Adapted: {}",
+                    result.selected_layout_id, result.confidence, result.created_from_scratch, result.is_adapted
+                )
                 return result
             else:
                 # Mock LLM or unexpected response - use fallback
-                print(f"[LayoutSelectorAgent] WARNING: Expected LayoutSelectionResult, got {type(result).__name__}")
-                print(f"[LayoutSelectorAgent] Using fallback layout due to unexpected response type")
+                logger.warning(
+                    "[LayoutSelectorAgent] Expected LayoutSelectionResult, got {} - using fallback layout",
+                    type(result).__name__
+                )
                 raise TypeError(f"LLM returned {type(result).__name__} instead of LayoutSelectionResult")
             
             
         except Exception as e:
             error_type = type(e).__name__
             error_msg = str(e)
-            print(f"[LayoutSelectorAgent] LLM invocation failed ({error_type}): {error_msg}")
+            logger.warning("[LayoutSelectorAgent] LLM invocation failed ({}): {}", error_type, error_msg)
             
             # Check for common issues
-            if "rate_limit" in error_msg.lower():
-                print("[LayoutSelectorAgent] ⚠️  Rate limit exceeded - wait and retry")
+            if isinstance(e, TimeoutError):
+                logger.warning("[LayoutSelectorAgent] Request deadline reached - using top candidate")
+            elif isinstance(e, CircuitOpenError):
+                logger.warning("[LayoutSelectorAgent] LLM circuit open - using top candidate")
+            elif "rate_limit" in error_msg.lower():
+                logger.warning("[LayoutSelectorAgent] Rate limit exceeded - wait and retry")
             elif "quota" in error_msg.lower():
-                print("[LayoutSelectorAgent] ⚠️  API quota exceeded - check billing")
+                logger.warning("[LayoutSelectorAgent] API quota exceeded - check billing")
             elif "token" in error_msg.lower() or "length" in error_msg.lower():
-                print(f"[LayoutSelectorAgent] ⚠️  Token limit issue - prompt: {len(prompt)} chars")
+                logger.warning("[LayoutSelectorAgent] Token limit issue - prompt: {} chars", len(prompt))
             elif "api_key" in error_msg.lower() or "auth" in error_msg.lower():
-                print("[LayoutSelectorAgent] ⚠️  API key authentication failed")
+                logger.warning("[LayoutSelectorAgent] API key authentication failed")
             
             # Default to first candidate layout
             return LayoutSelectionResult(
@@ -1,8 +1,27 @@
 """
 Node Executor - All workflow node implementations
 Handles execution of individual graph nodes
+
+Layouts travel through the state by ID: retrieved_layouts holds score
+records, selected_layout / adapted_layout / outcome["layout"] hold layout IDs.
+Nodes resolve bodies from the request's LayoutStore (see layout_store.py).
+
+In a refinement session the nodes build on the session's previous turn
+(delta analysis, re-filtered candidates, reused data, no selection LLM) and
+record what they reused in state["refinement"] (see refinement_sessions.py).
 """
+from typing import Dict, Optional
+
+from loguru import logger
+
 from design_system_agent.agent.models import AgentState
+from design_system_agent.agent.core.llm_factory import LLMFactory
+from design_system_agent.agent.core.deadline import has_budget, llm_timeout_s, remaining_ms
+from design_system_agent.agent.core.degradation_tiers import LEAN_RERANK_K
+from design_system_agent.agent.core.intent_lookup import INTENT_LOOKUP_MIN_CONFIDENCE
+from design_system_agent.agent.core.layout_store import LayoutStore, get_layout_store
+from design_system_agent.agent.core.llm_resilience import CircuitOpenError, get_resilient_caller
+from design_system_agent.agent.core.refinement_sessions import SessionTurn
 from design_system_agent.agent.tools.data_fetcher import DataFetcherTool
 from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
 from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
@@ -12,6 +31,30 @@ from design_system_agent.agent.graph_nodes.fallback_layout_builder import Fallba
 from design_system_agent.agent.graph_nodes.default_layout import DefaultLayoutBuilder
 
 
+# Minimum vector similarity for using the top candidate without LLM selection (deadline mode)
+TOP_CANDIDATE_MIN_SIMILARITY = 0.6
+
+# No-LLM routes taken when the deadline budget is short, the LLM circuit is open or the tier is minimal
+DEGRADED_ROUTES = ("deadline_skip_llm", "circuit_open", "tier_minimal")
+
+# Nodes that skip the LLM per load-adaptive tier (see degradation_tiers.py)
+TIER_NO_LLM_NODES = {
+    "full": (),
+    "lean": ("score_output",),
+    "minimal": ("analyze_and_reformulate", "llm_select_and_fill", "score_output"),
+}
+
+# Vector candidates, reranking and results per tier (None = rerank when the deadline allows)
+TIER_RETRIEVAL = {
+    "full": {"top_k": 20, "rerank": None, "final_k": 3},
+    "lean": {"top_k": LEAN_RERANK_K, "rerank": None, "final_k": 3},
+    "minimal": {"top_k": 1, "rerank": False, "final_k": 1},
+}
+
+# No-LLM selection route of a refinement turn: the re-filtered top candidate is re-bound to the data
+SESSION_REFINE_ROUTE = "session_refine"
+
+
 class WorkflowExecutor:
     """
     Executes all workflow nodes.
@@ -28,6 +71,70 @@ class WorkflowExecutor:
         self.fallback_builder = FallbackLayoutBuilder()
         self.default_builder = DefaultLayoutBuilder()
     
+    def _route(self, state: AgentState, node: str) -> Dict:
+        """
+        Pick the model route for a node and record it in state.
+        
+        A node the load tier runs without LLM, short on deadline budget, or
+        called while the LLM circuit is open, gets a no-LLM route (degraded mode).
+        Selection in a refinement turn with re-filtered candidates needs no LLM.
+        """
+        tier = state.get("tier") or "full"
+        if node == "llm_select_and_fill" and (state.get("refinement") or {}).get("retrieval") == "refiltered":
+            route = {"name": SESSION_REFINE_ROUTE, "node": node, "model": None}
+        elif node in TIER_NO_LLM_NODES[tier]:
+            self._degrade(state, node, f"tier_{tier}")
+            route = {"name": f"tier_{tier}", "node": node, "model": None}
+        elif not self._has_budget(state, node, "skip_llm"):
+            route = {"name": "deadline_skip_llm", "node": node, "model": None}
+        elif get_resilient_caller().breaker.is_open():
+            self._degrade(state, node, "circuit_open")
+            route = {"name": "circuit_open", "node": node, "model": None}
+        else:
+            route = LLMFactory.route(node, state.get("analysis"))
+        state["routes"] = {**(state.get("routes") or {}), node: route}
+        logger.debug("[WorkflowExecutor] Route for {}: {} (model={})", node, route["name"], route["model"] or "no LLM")
+        return route
+    
+    def _has_budget(self, state: AgentState, node: str, degraded_action: str) -> bool:
+        """Check the node's deadline budget; record the degradation when it is short"""
+        if has_budget(state.get("deadline"), node):
+            return True
+        self._degrade(state, node, degraded_action)
+        return False
+    
+    def _layout_store(self, state: AgentState) -> LayoutStore:
+        """Layout store of the execution (opened by GraphAgent, ID in state["layout_store"])"""
+        store = get_layout_store(state.get("layout_store"))
+        if store is None:
+            raise RuntimeError(f"No open layout store {state.get('layout_store')!r}")
+        return store
+    
+    def _previous_turn(self, state: AgentState, refining: bool = False) -> Optional[SessionTurn]:
+        """
+        Previous turn of the execution's refinement session, as loaded when the execution started
+        (None outside sessions, on the first turn or once expired)
+        
+        Args:
+            refining: Only when this turn was analysed as a refinement of it (delta analysis)
+        """
+        if refining and (state.get("refinement") or {}).get("analysis") != "delta":
+            return None
+        return state.get("session_turn")
+    
+    def _reuse(self, state: AgentState, step: str, how: str):
+        """Record how a step used the previous turn"""
+        state["refinement"] = {**(state.get("refinement") or {}), step: how}
+    
+    def _degrade(self, state: AgentState, node: str, action: str):
+        """Record that a node ran in degraded mode"""
+        state["degraded"] = (state.get("degraded") or []) + [f"{node}:{action}"]
+        remaining = remaining_ms(state.get("deadline"))
+        logger.info(
+            "[WorkflowExecutor] {}: {}, degrading ({})",
+            node, f"{remaining:.0f}ms left" if remaining is not None else "no deadline", action
+        )
+    
     # ====================
     # WORKFLOW NODES
     # ====================
@@ -51,10 +158,31 @@ class WorkflowExecutor:
         """Single LLM call for query analysis: normalize, extract intent, generate variations, detect object/layout"""
         normalized_query = state.get("normalized_query", "")
         
-        # Single LLM call does everything: normalize + intent + variations + object_type + layout_type
-        # QueryAnalyzer has built-in fallback for when LLM is unavailable
-        analysis = self.query_analyzer.invoke(normalized_query)
-        state["analysis"] = analysis.dict()
+        # Follow-up turn: delta analysis on top of the previous one (None = material change)
+        previous = self._previous_turn(state)
+        analysis = self.query_analyzer.refine(previous["analysis"], normalized_query) if previous else None
+        if analysis is not None:
+            self._reuse(state, "analysis", "delta")
+            state["normalized_query"] = analysis.normalized_query
+        else:
+            if previous:
+                self._reuse(state, "analysis", "full")
+            # Single LLM call does everything: normalize + intent + variations + object_type + layout_type
+            # QueryAnalyzer has built-in fallback for when LLM is unavailable
+            try:
+                analysis = self.query_analyzer.invoke(
+                    normalized_query,
+                    route=self._route(state, "analyze_and_reformulate"),
+                    timeout_s=llm_timeout_s(state.get("deadline"))
+                )
+            except (TimeoutError, CircuitOpenError) as e:
+                action = "llm_timeout" if isinstance(e, TimeoutError) else "circuit_open"
+                self._degrade(state, "analyze_and_reformulate", action)
+                analysis = self.query_analyzer.invoke(
+                    normalized_query, route={"name": action, "model": None}
+                )
+        # Query variations go to rag_query only, the state keeps one copy
+        state["analysis"] = analysis.model_dump(exclude={"generated_queries"})
         
         # Build RAG query from analysis (no additional LLM call needed)
         state["rag_query"] = {
@@ -67,8 +195,36 @@ class WorkflowExecutor:
         return state
     
     def retrieve_layouts(self, state: AgentState) -> AgentState:
-        """Retrieve top 20 layouts using original query + LLM-generated variations, rerank to top 3"""
+        """Retrieve top 20 layouts using original query + LLM-generated variations, rerank to top 3 (fewer in lean / minimal tiers)
+        
+        Confident analyses found in the intent table skip the vector search (see intent_lookup.py).
+        """
         rag_query = state.get("rag_query", {})
+        retrieval = TIER_RETRIEVAL[state.get("tier") or "full"]
+        
+        # Refinement: re-filter the previous candidates, full retrieval when none fits
+        previous = self._previous_turn(state, refining=True)
+        if previous and previous["candidates"]:
+            # The previous selection stays first while it fits the refinement
+            candidates = sorted(previous["candidates"], key=lambda c: c["id"] != previous["selected_id"])
+            layouts = self.layout_rag.refilter(candidates, state.get("query", ""), final_k=retrieval["final_k"])
+            if layouts:
+                self._reuse(state, "retrieval", "refiltered")
+                store = self._layout_store(state)
+                state["retrieved_layouts"] = [store.record(layout) for layout in layouts]
+                return state
+        if state.get("refinement"):
+            self._reuse(state, "retrieval", "full")
+        
+        # Confident analysis: intent table lookup instead of embedding, FAISS and reranking
+        analysis = state.get("analysis") or {}
+        if (analysis.get("confidence") or 0.0) >= INTENT_LOOKUP_MIN_CONFIDENCE:
+            layouts = self.layout_rag.lookup(analysis, final_k=retrieval["final_k"])
+            if layouts:
+                logger.debug("[WorkflowExecutor] Intent lookup hit: {}", [layout["id"] for layout in layouts])
+                store = self._layout_store(state)
+                state["retrieved_layouts"] = [store.record(layout) for layout in layouts]
+                return state
         
         try:
             # Use LLM-generated query variations for better retrieval
@@ -80,9 +236,10 @@ class WorkflowExecutor:
             
             layouts = self.layout_rag.search(
                 query=all_queries if all_queries else [original_query],
-                top_k=20,
-                rerank=True,
-                final_k=3
+                top_k=retrieval["top_k"],
+                rerank=retrieval["rerank"] if retrieval["rerank"] is not None
+                else self._has_budget(state, "retrieve_layouts", "skip_rerank"),
+                final_k=retrieval["final_k"]
             )
 
             if not layouts:
@@ -92,7 +249,9 @@ class WorkflowExecutor:
                     analysis=None
                 )]
 
-            state["retrieved_layouts"] = layouts
+            # Score records only, bodies stay in the catalog / layout store
+            store = self._layout_store(state)
+            state["retrieved_layouts"] = [store.record(layout) for layout in layouts]
         except Exception:
             state["retrieved_layouts"] = []
         
@@ -104,29 +263,35 @@ class WorkflowExecutor:
         rag_query = state.get("rag_query", {})
         analysis = state.get("analysis", {})
         
+        # Refinement of the same object: the previous turn's records are re-bound
+        previous = self._previous_turn(state, refining=True)
+        if previous:
+            self._reuse(state, "data", "reused")
+            state["fetched_data"] = previous["fetched_data"]
+            return state
+        if state.get("refinement"):
+            self._reuse(state, "data", "fetched")
+        
         try:
             data = self.data_fetcher.detect_and_fetch(query, analysis, rag_query)
             
             # Check if data is empty
             if not data or (isinstance(data, dict) and not any(v for v in data.values() if v)):
-                print(f"[WorkflowExecutor] ⚠️  Data fetcher returned empty data for query: '{query}'")
-                print(f"[WorkflowExecutor] 💡 This is expected if:")
-                print(f"[WorkflowExecutor]    - CRM data source is not connected")
-                print(f"[WorkflowExecutor]    - Query doesn't match any records")
-                print(f"[WorkflowExecutor]    - Using mock/test mode")
+                # Expected when no CRM source is connected, nothing matches, or in mock mode
+                logger.debug("[WorkflowExecutor] Data fetcher returned empty data for query: '{}'", query)
                 state["fetched_data"] = {}
             else:
                 state["fetched_data"] = data
         except Exception as e:
-            print(f"[WorkflowExecutor] ⚠️  Data fetching failed: {str(e)}")
-            print(f"[WorkflowExecutor] 💡 Falling back to empty data - layout will be generated without records")
+            logger.warning("[WorkflowExecutor] Data fetching failed ({}), continuing without records", e)
             state["fetched_data"] = {}
         
         return state
     
     def llm_select_and_fill(self, state: AgentState) -> AgentState:
         """LLM intelligently selects best layout AND fills it with data"""
-        layouts = state.get("retrieved_layouts", [])
+        store = self._layout_store(state)
+        layouts = [store.resolve(record) for record in state.get("retrieved_layouts") or []]
         query = state.get("query", "")
         normalized_query = state.get("normalized_query", "")
         analysis = state.get("analysis", {})
@@ -134,19 +299,20 @@ class WorkflowExecutor:
         
         # Ensure data is a dict (handle edge case where it might be a list)
         if not isinstance(data, dict):
-            print(f"[WorkflowExecutor] Warning: fetched_data is {type(data)}, converting to dict")
+            logger.warning("[WorkflowExecutor] fetched_data is {}, converting to dict", type(data).__name__)
             data = {}
         
         # If no layouts retrieved from RAG, use default layout builder
         if not layouts:
-            print("[WorkflowExecutor] No RAG matches found, using default layout builder")
+            logger.info("[WorkflowExecutor] No RAG matches found, using default layout builder")
             default_layout = self.default_builder.build_default_layout(
                 query=query,
                 data=data,
                 analysis=analysis
             )
-            state["selected_layout"] = default_layout
-            state["adapted_layout"] = default_layout
+            layout_id = store.put(default_layout)
+            state["selected_layout"] = layout_id
+            state["adapted_layout"] = layout_id
             state["layout_ranking"] = {
                 "confidence": 0.7,
                 "reasoning": "No RAG matches found - using default layout with heading, description, list, and badge",
@@ -158,6 +324,18 @@ class WorkflowExecutor:
             return state
         
         
+        route = self._route(state, "llm_select_and_fill")
+        if route["name"] == SESSION_REFINE_ROUTE:
+            previous = self._previous_turn(state)
+            self._reuse(
+                state, "selection",
+                "rebound" if previous and layouts[0].get("id") == previous["selected_id"] else "refiltered"
+            )
+        elif route["name"] in DEGRADED_ROUTES and layouts[0].get("vector_score", 0.0) < TOP_CANDIDATE_MIN_SIMILARITY:
+            # No LLM available (deadline / circuit) and the top candidate is a weak match
+            self._degrade(state, "llm_select_and_fill", "fallback_layout")
+            return self._use_fallback_layout(state, query, data, analysis, f"LLM unavailable ({route['name']})")
+        
         try:
             result = self.llm_selector_filler.select_and_fill_layout(
                 query=query,
@@ -168,7 +346,9 @@ class WorkflowExecutor:
                 context={
                     "task_plan": state.get("task_plan"),
                     "progress": state.get("progress", 0)
-                }
+                },
+                route=route,
+                timeout_s=llm_timeout_s(state.get("deadline"))
             )
             
             # Ensure result is a dict
@@ -185,8 +365,9 @@ class WorkflowExecutor:
             adaptations = result.get("adaptations", [])
             llm_powered = result.get("llm_powered", True)
             
-            state["selected_layout"] = selected_layout
-            state["adapted_layout"] = selected_layout
+            layout_id = store.put(selected_layout)
+            state["selected_layout"] = layout_id
+            state["adapted_layout"] = layout_id
             state["layout_ranking"] = {
                 "confidence": confidence,
                 "reasoning": reasoning,
@@ -196,78 +377,91 @@ class WorkflowExecutor:
             }
         except Exception as e:
             error_msg = str(e)
-            print(f"[WorkflowExecutor] LLM selection failed: {error_msg}")
+            logger.warning("[WorkflowExecutor] LLM selection failed: {}", error_msg)
             
             # Check if it's an API key issue
             if "api" in error_msg.lower() or "auth" in error_msg.lower() or "key" in error_msg.lower():
-                print("[WorkflowExecutor] ⚠️  OPENAI_API_KEY may not be set or is invalid")
-                print("[WorkflowExecutor] 💡 To fix:")
-                print("[WorkflowExecutor]    1. Get API key from: https://platform.openai.com/api-keys")
-                print("[WorkflowExecutor]    2. Set environment variable: $env:OPENAI_API_KEY = 'sk-...'")
-                print("[WorkflowExecutor]    3. Optional: Set model with $env:OPENAI_MODEL = 'gpt-5-mini'")
-                print("[WorkflowExecutor]    4. Restart debug session")
-            
-            # Ensure data and analysis are dicts for fallback
-            safe_data = data if isinstance(data, dict) else {}
-            safe_analysis = analysis if isinstance(analysis, dict) else {}
+                logger.warning(
+                    "[WorkflowExecutor] OPENAI_API_KEY may not be set or is invalid "
+                    "(get one at https://platform.openai.com/api-keys and set OPENAI_API_KEY)"
+                )
             
-            # If data is empty or None, provide better context
-            if not safe_data or safe_data == {}:
-                print(f"[WorkflowExecutor] ⚠️  No data available for query: '{query}'")
-                print(f"[WorkflowExecutor] 💡 Fallback layout will use query-based object detection")
-            
-            fallback_layout = self.fallback_builder.build_fallback_layout(
-                query, safe_data, safe_analysis
+            return self._use_fallback_layout(
+                state, query, data, analysis, f"Error in LLM selection: {error_msg}", error=error_msg
             )
-            state["selected_layout"] = fallback_layout
-            state["adapted_layout"] = fallback_layout
-            state["layout_ranking"] = {
-                "confidence": 0.5,
-                "reasoning": f"Error in LLM selection: {error_msg}",
-                "is_adapted": False,
-                "use_fallback": True,
-                "llm_powered": False,
-                "adaptations": [],
-                "error": error_msg
-            }
+        
+        return state
+    
+    def _use_fallback_layout(
+        self,
+        state: AgentState,
+        query: str,
+        data: Dict,
+        analysis: Dict,
+        reasoning: str,
+        error: Optional[str] = None
+    ) -> AgentState:
+        """Build the query-based fallback layout when LLM selection is unavailable"""
+        # Ensure data and analysis are dicts for fallback
+        safe_data = data if isinstance(data, dict) else {}
+        safe_analysis = analysis if isinstance(analysis, dict) else {}
+        
+        # If data is empty or None, provide better context
+        if not safe_data or safe_data == {}:
+            logger.debug("[WorkflowExecutor] No data for query '{}', fallback layout uses query-based object detection", query)
+        
+        fallback_layout = self.fallback_builder.build_fallback_layout(
+            query, safe_data, safe_analysis
+        )
+        layout_id = self._layout_store(state).put(fallback_layout)
+        state["selected_layout"] = layout_id
+        state["adapted_layout"] = layout_id
+        state["layout_ranking"] = {
+            "confidence": 0.5,
+            "reasoning": reasoning,
+            "is_adapted": False,
+            "use_fallback": True,
+            "llm_powered": False,
+            "adaptations": []
+        }
+        if error:
+            state["layout_ranking"]["error"] = error
         
         return state
     
     def score_output(self, state: AgentState) -> AgentState:
         """Validate and score final output"""
-        layout = state.get("adapted_layout")
+        layout_id = state.get("adapted_layout")
+        layout = self._layout_store(state).get(layout_id) if layout_id else None
         query = state.get("normalized_query", "")
         analysis = state.get("analysis", {})
-        data = state.get("fetched_data")
         
         # Ensure analysis is a dict
         if not isinstance(analysis, dict):
             analysis = {}
         
-        # Ensure data is safe for output
-        if not isinstance(data, dict):
-            data = {}
-        
         if not layout:
             state["output_score"] = None
             state["outcome"] = {"success": False, "error": "No layout generated"}
             return state
         
         try:
-            score = self.output_scorer.score_output(layout, query, analysis)
-            state["output_score"] = score.dict()
+            score = self.output_scorer.score_output(
+                layout, query, analysis,
+                route=self._route(state, "score_output"),
+                timeout_s=llm_timeout_s(state.get("deadline"))
+            )
+            state["output_score"] = score.model_dump()
             state["outcome"] = {
                 "success": True,
-                "layout": layout,
-                "data": data,
+                "layout": layout_id,
                 "score": score.overall_score
             }
         except Exception:
             state["output_score"] = {"overall_score": 0.8}
             state["outcome"] = {
                 "success": True,
-                "layout": layout,
-                "data": data,
+                "layout": layout_id,
                 "score": 0.8
             }
         
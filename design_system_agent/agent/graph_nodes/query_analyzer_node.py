@@ -2,16 +2,20 @@
 Query Analyzer - Analyzes user intent and extracts key information
 """
 from langchain_core.prompts import ChatPromptTemplate
+from loguru import logger
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic.json_schema import SkipJsonSchema
+from typing import Dict, List, Optional
 from design_system_agent.agent.core.llm_factory import LLMFactory
+from design_system_agent.agent.core.query_expander import get_query_expander
 
 
 class QueryAnalysis(BaseModel):
     """Structured output for query analysis"""
     normalized_query: str = Field(description="Query normalized to standard English grammar")
     intent: str = Field(description="HTTP-like intent: GET, POST, UPDATE, DELETE")
-    generated_queries: List[str] = Field(description="Multiple query variations with same intent for better RAG retrieval")
+    # Filled locally by QueryExpander after the LLM call (hidden from the LLM schema to save output tokens)
+    generated_queries: SkipJsonSchema[List[str]] = Field(default_factory=list, description="Multiple query variations with same intent for better RAG retrieval")
     object_type: str = Field(default="unknown", description="Primary CRM object type")
     objects: List[str] = Field(default_factory=list, description="All objects mentioned (for multi-object queries)")
     layout_type: str = Field(default="list", description="Layout type: list, detail, form, dashboard")
@@ -25,11 +29,23 @@ class QueryAnalysis(BaseModel):
     confidence: float = Field(description="Confidence score 0-1 for the analysis")
 
 
+# Follow-up words that switch the view of a refined query (QueryAnalysis.view_type)
+REFINEMENT_VIEW_WORDS = {
+    "card": ("card", "cards", "tiles", "dashboard"),
+    "table": ("table", "grid", "tabular"),
+    "list": ("list", "listing"),
+}
+
+# Follow-up words that narrow the records ("only high priority", "without closed ones")
+REFINEMENT_CONDITION_WORDS = ("only", "where", "filter", "with", "without", "excluding", "except")
+
+
 class QueryAnalyzer:
     """Analyzes user queries to understand intent and requirements"""
     
     @classmethod
     def get_analysis_prompt(cls) -> ChatPromptTemplate:
+        """Analysis prompt: static system instructions followed by the query as user message"""
         system_prompt = """You are an advanced CRM query analyzer specialized in Banking/CRM patterns.
 
 **Your Task:**
@@ -72,18 +88,12 @@ class QueryAnalyzer:
    - has_conditions: true if WHERE/filter conditions present
    - has_sorting: true if "top 10", "sorted by", order present
 
-9. **Generate Query Variations** (3-5 variations with same intent):
-   - Use synonyms (show → display, fetch, get)
-   - Reorder words
-   - Add/remove context
-
 **Examples:**
 
 Input: "show me my lead"
 Output: {{
   "normalized_query": "Show me my leads",
   "intent": "GET",
-  "generated_queries": ["show me my leads", "display my leads", "get my leads", "view leads list"],
   "object_type": "lead",
   "objects": ["lead"],
   "layout_type": "list",
@@ -101,7 +111,6 @@ Input: "top 10 leads sorted by created_date"
 Output: {{
   "normalized_query": "Top 10 leads sorted by created_date",
   "intent": "GET",
-  "generated_queries": ["top 10 leads sorted by created date", "show top 10 leads ordered by created date", "display 10 leads sorted by date"],
   "object_type": "lead",
   "objects": ["lead"],
   "layout_type": "list",
@@ -119,7 +128,6 @@ Input: "sum of loan amount for customers grouped by branch"
 Output: {{
   "normalized_query": "Sum of loan amount for customers grouped by branch",
   "intent": "GET",
-  "generated_queries": ["total loan amount grouped by branch", "branch wise sum of loan amount for customers", "aggregate loan amount by branch"],
   "object_type": "loan",
   "objects": ["customer", "loan", "branch"],
   "layout_type": "dashboard",
@@ -137,7 +145,6 @@ Input: "customers with total balance greater than 100000 and loan amount greater
 Output: {{
   "normalized_query": "Customers with total balance greater than 100000 and loan amount greater than 50000",
   "intent": "GET",
-  "generated_queries": ["customers where balance > 100000 and loan > 50000", "high value customers with balance > 100k and loan > 50k"],
   "object_type": "customer",
   "objects": ["customer", "account", "loan"],
   "layout_type": "list",
@@ -155,7 +162,6 @@ Input: "branch wise count of leads where loan status is approved"
 Output: {{
   "normalized_query": "Branch wise count of leads where loan status is approved",
   "intent": "GET",
-  "generated_queries": ["count of leads by branch where loan is approved", "branch wise lead count with approved loans", "leads grouped by branch filtered by loan status approved"],
   "object_type": "lead",
   "objects": ["lead", "loan", "branch"],
   "layout_type": "dashboard",
@@ -168,37 +174,110 @@ Output: {{
   "has_sorting": false,
   "confidence": 0.85
 }}
-
-Now analyze this query:
-{normalized_query}
 """
         
+        # Static system prompt first, query last: the system message is byte-identical
+        # across requests so provider-side prompt prefix caching applies
         return ChatPromptTemplate.from_messages([
-            ("system", system_prompt)
+            ("system", system_prompt),
+            ("user", "Now analyze this query:\n{normalized_query}")
         ])
     
     @classmethod
-    def invoke(cls, normalized_query: str) -> QueryAnalysis:
-        """Analyze the normalized query and return structured analysis"""
+    def invoke(
+        cls,
+        normalized_query: str,
+        route: Optional[Dict] = None,
+        timeout_s: Optional[float] = None
+    ) -> QueryAnalysis:
+        """
+        Analyze the normalized query and return structured analysis
+        
+        Args:
+            normalized_query: Query to analyze
+            route: Model route from LLMFactory.route() (model None = keyword analysis, no LLM)
+            timeout_s: LLM call timeout derived from the request deadline (None = no limit)
+        """
+        if route is not None and route.get("model") is None:
+            print(f"[QueryAnalyzer] Route '{route['name']}' skips the LLM, using keyword analysis")
+            return cls.keyword_analysis(normalized_query)
+        
         prompt = cls.get_analysis_prompt()
         
         # Use structured output with Pydantic model
-        llm = LLMFactory.open_ai_structured_llm(structured_output=QueryAnalysis)
+        if route is not None:
+            llm = LLMFactory.routed_structured_llm(route, QueryAnalysis)
+        else:
+            llm = LLMFactory.open_ai_structured_llm(structured_output=QueryAnalysis)
         chain = prompt | llm
         
         print(f"[QueryAnalyzer] Analyzing query: {normalized_query}")
         
         # LLM-only approach - no keyword fallback
-        analysis = chain.invoke({"normalized_query": normalized_query})
+        analysis = LLMFactory.invoke(
+            chain, {"normalized_query": normalized_query}, timeout_s=timeout_s, name="query_analyzer"
+        )
         print(f"[QueryAnalyzer] Normalized: {analysis.normalized_query}")
         print(f"[QueryAnalyzer] Pattern: {analysis.pattern_type}, Objects: {analysis.objects}, Complexity: {analysis.complexity_level}")
         print(f"[QueryAnalyzer] View Type: {analysis.view_type}, Aggregation: {analysis.aggregation_type}, Group By: {analysis.group_by_field}")
+        
+        # Query variations are generated locally (no LLM output tokens)
+        analysis.generated_queries = get_query_expander().expand(analysis.normalized_query)
         print(f"[QueryAnalyzer] Generated {len(analysis.generated_queries)} query variations")
         return analysis
     
     @classmethod
-    def _fallback_analysis_deprecated(cls, query: str) -> QueryAnalysis:
-        """Keyword-based analysis when LLM is unavailable"""
+    def refine(cls, previous: Dict, followup: str) -> Optional[QueryAnalysis]:
+        """
+        Delta analysis of a follow-up turn ("only high priority", "as cards") on top of the previous analysis (no LLM)
+        
+        Args:
+            previous: Analysis of the previous turn (QueryAnalysis dump)
+            followup: The follow-up query
+            
+        Returns:
+            Analysis of the conversation query, None when the follow-up changes the
+            intent or the object materially (needs a full analysis)
+        """
+        delta = cls.keyword_analysis(followup)
+        followup_words = set(followup.lower().split())
+        mentioned = [obj for obj in delta.objects if obj != "data"]
+        if delta.intent != previous.get("intent", "GET"):
+            return None
+        if mentioned and previous.get("object_type") not in mentioned:
+            return None
+        
+        updates = {}
+        for view_type, words in REFINEMENT_VIEW_WORDS.items():
+            if followup_words.intersection(words):
+                updates["view_type"] = view_type
+        if delta.aggregation_type or delta.group_by_field:
+            updates.update(
+                aggregation_type=delta.aggregation_type or previous.get("aggregation_type"),
+                group_by_field=delta.group_by_field or previous.get("group_by_field"),
+                pattern_type=delta.pattern_type,
+                complexity_level=delta.complexity_level,
+                view_type=updates.get("view_type", delta.view_type)
+            )
+        if delta.has_conditions or followup_words.intersection(REFINEMENT_CONDITION_WORDS):
+            updates["has_conditions"] = True
+        if delta.has_sorting:
+            updates["has_sorting"] = True
+        if (updates.get("has_conditions") or updates.get("has_sorting")) and previous.get("pattern_type") == "LIST_SIMPLE":
+            updates.update(pattern_type="LIST_ADVANCED", complexity_level="medium")
+        
+        conversation_query = f"{previous['normalized_query']} {followup.strip()}"
+        logger.debug("[QueryAnalyzer] Refined '{}' with '{}': {}", previous["normalized_query"], followup, sorted(updates))
+        return QueryAnalysis(**{
+            **previous,
+            **updates,
+            "normalized_query": conversation_query,
+            "generated_queries": get_query_expander().expand(conversation_query)
+        })
+    
+    @classmethod
+    def keyword_analysis(cls, query: str) -> QueryAnalysis:
+        """Keyword-based analysis (no LLM): routes without a model, follow-up deltas, the offline intent table"""
         query_lower = query.lower()
         
         # Detect object type from keywords
@@ -273,12 +352,14 @@ Now analyze this query:
             pattern_type = "MULTI_OBJECT"
             complexity = "medium"
         
-        print(f"[QueryAnalyzer] Fallback detected: object={primary_object}, objects={detected_objects}, pattern={pattern_type}")
+        logger.debug(
+            "[QueryAnalyzer] Keyword analysis: object={}, objects={}, pattern={}", primary_object, detected_objects, pattern_type
+        )
         
         return QueryAnalysis(
             normalized_query=query,
             intent=intent,
-            generated_queries=[query],
+            generated_queries=get_query_expander().expand(query),
             object_type=primary_object,
             objects=detected_objects if detected_objects else [primary_object],
             layout_type="list",
@@ -2,10 +2,21 @@
 Graph Agent - Main Orchestrator
 Single Responsibility: Coordinate the layout generation workflow
 """
-from typing import AsyncGenerator
+import time
+import uuid
+from typing import AsyncGenerator, Optional
 from design_system_agent.agent.models import AgentState, AgentEvent
 from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
 from design_system_agent.agent.layout_graph_builder import GraphBuilder
+from design_system_agent.agent.core.llm_usage import start_usage_tracking, summarize_usage
+from design_system_agent.agent.core.model_router import get_model_router
+from design_system_agent.agent.core.deadline import budget_class, new_deadline, remaining_ms
+from design_system_agent.agent.core.instrumentation import GRAPH_RESUMES, get_request_id, start_request, start_span_recording
+from design_system_agent.agent.core.request_profiler import RequestProfiler
+from design_system_agent.agent.core.single_flight import ExecutionInProgress, coalesce_key, get_single_flight
+from design_system_agent.agent.core.degradation_tiers import get_tier_controller
+from design_system_agent.agent.core.layout_store import LayoutStore, close_layout_store, get_layout_store, open_layout_store
+from design_system_agent.agent.core.refinement_sessions import SessionTurn, get_session_store
 
 
 class GraphAgent:
@@ -26,17 +37,35 @@ class GraphAgent:
     
     def __init__(self, verbose: bool = True):
         """Initialize agent with workflow executor and graph"""
+        # Imports langgraph, like building the graph (GRAPH_CHECKPOINTS=false: None)
+        from design_system_agent.agent.core.graph_checkpoints import get_graph_checkpointer
+
         self.executor = WorkflowExecutor()
-        self.graph = GraphBuilder.build(self.executor)
+        # Failed executions resume from the last completed node on retry
+        self.checkpointer = get_graph_checkpointer()
+        self.graph = GraphBuilder.build(self.executor, checkpointer=self.checkpointer)
         self.verbose = verbose
+        # Identical concurrent queries share one execution (REQUEST_COALESCING)
+        self.single_flight = get_single_flight()
+        # Pipeline depth adapts to queue depth and latency (LOAD_ADAPTIVE_TIERS)
+        self.tiers = get_tier_controller()
     
-    def _create_initial_state(self, query: str) -> AgentState:
+    def _create_initial_state(
+        self,
+        query: str,
+        deadline: Optional[float] = None,
+        tier: str = "full",
+        layout_store: Optional[str] = None,
+        session: Optional[str] = None,
+        session_turn: Optional[SessionTurn] = None
+    ) -> AgentState:
         """Create initial state for graph execution"""
         return {
             "query": query,
             "normalized_query": query,
             "analysis": None,
             "rag_query": None,
+            "layout_store": layout_store,
             "retrieved_layouts": None,
             "layout_ranking": None,
             "selected_layout": None,
@@ -47,6 +76,13 @@ class GraphAgent:
             "task_plan": None,
             "current_task_index": 0,
             "fetched_data": None,
+            "routes": {},
+            "deadline": deadline,
+            "degraded": [],
+            "tier": tier,
+            "session": session,
+            "session_turn": session_turn,
+            "refinement": {},
             "events": [],
             "progress": 0.0,
             "error": None
@@ -55,7 +91,9 @@ class GraphAgent:
     def _extract_result(self, final_state: AgentState) -> dict:
         """Extract result from final state - returns complete layout with all metadata"""
         outcome = final_state.get("outcome", {})
-        layout_obj = outcome.get("layout", {})
+        # The state holds the layout ID, the body is resolved for serialization
+        store = get_layout_store(final_state.get("layout_store"))
+        layout_obj = (store.get(outcome.get("layout")) if store else None) or {}
         rag_query = final_state.get("rag_query", {})
         
         # Extract only essential fields: id, query, layout, score, object_type, layout_type
@@ -68,13 +106,120 @@ class GraphAgent:
             "layout_type": rag_query.get("layout_type", "list")
         }
     
-    def invoke(self, query: str, json_output: bool = False) -> dict:
+    def _session_turn(self, final_state: AgentState, store: LayoutStore) -> SessionTurn:
+        """What the next turn of the session can reuse (catalog layouts only, generated ones die with the store)"""
+        catalog = self.executor.layout_rag.get_layout
+        selected = store.get(final_state.get("adapted_layout")) or {}
+        candidates = final_state.get("retrieved_layouts") or []
+        previous = final_state.get("session_turn")
+        if previous and (final_state.get("refinement") or {}).get("retrieval") == "refiltered":
+            # Later refinements filter the retrieved set again, not this turn's subset
+            candidates = previous["candidates"]
+        return {
+            "analysis": final_state["analysis"],
+            "candidates": [record for record in candidates if catalog(record["id"])],
+            "fetched_data": final_state.get("fetched_data") or {},
+            "selected_id": selected.get("id") if catalog(selected.get("id")) else None
+        }
+    
+    def _summarize_routes(self, routes: dict, usage: dict) -> dict:
+        """Attach per-node LLM tokens and estimated cost to the route each node took"""
+        router = get_model_router()
+        summary = {}
+        for node, route in routes.items():
+            node_usage = usage.get("by_node", {}).get(node, {})
+            summary[node] = {
+                **route,
+                "llm_calls": node_usage.get("calls", 0),
+                "cost_usd": router.estimate_cost(route.get("model"), node_usage) if node_usage else 0.0
+            }
+        return summary
+    
+    def _resume_point(self, config: Optional[dict], query: str) -> Optional[str]:
+        """Node a checkpointed execution of this query stopped at, None to start over"""
+        if config is None:
+            return None
+        snapshot = self.graph.get_state(config)
+        if snapshot.next and snapshot.values.get("query") == query:
+            return snapshot.next[0]
+        # Completed, expired or another query under the same ID
+        self.checkpointer.delete_thread(config["configurable"]["thread_id"])
+        return None
+    
+    def _lease_thread(self, idempotency_key: Optional[str], request_id: str, deadline: float) -> tuple:
+        """
+        Checkpoint thread of an execution and its lease; returns (thread ID, lease token or None without checkpoints)
+        
+        A thread runs one execution at a time: a busy idempotency key is rejected
+        (ExecutionInProgress), a busy request ID gets a thread of its own.
+        """
+        thread_id = idempotency_key or request_id
+        if self.checkpointer is None:
+            return thread_id, None
+        lease = self.checkpointer.acquire_lease(thread_id, deadline)
+        if lease is None:
+            if idempotency_key:
+                raise ExecutionInProgress(f"Idempotency key {idempotency_key!r} is being executed by another request")
+            thread_id = f"{request_id}-{uuid.uuid4().hex[:8]}"
+            lease = self.checkpointer.acquire_lease(thread_id, deadline)
+        return thread_id, lease
+    
+    def _run_timed(self, initial_state: Optional[AgentState], config: Optional[dict] = None):
+        """
+        Run the graph and time each node; returns (final state, node durations in ms)
+        
+        initial_state None resumes the checkpointed execution of config's thread.
+        """
+        nodes_ms = {}
+        final_state = initial_state
+        last = time.perf_counter()
+        for mode, chunk in self.graph.stream(initial_state, config, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+            now = time.perf_counter()
+            for node in chunk:
+                nodes_ms[node] = round((now - last) * 1000, 1)
+            last = now
+        return final_state, nodes_ms
+    
+    def invoke(
+        self,
+        query: str,
+        json_output: bool = False,
+        deadline_ms: Optional[int] = None,
+        profile: bool = False,
+        idempotency_key: Optional[str] = None,
+        tier: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> dict:
         """
         Synchronous execution of the workflow.
         
+        Concurrent calls with the same normalized query share one execution
+        (single flight); a known idempotency key attaches to or replays its
+        earlier execution. Profiled requests always run on their own. Only
+        requests of the same budget class coalesce, and a follower waits at
+        most its own budget before running degraded on its own.
+        
+        The pipeline tier (full / lean / minimal) follows the load unless
+        forced (see degradation_tiers.py) and is returned as result["tier"].
+        
+        A retry of a failed execution (same idempotency key, else same
+        X-Request-ID) resumes at the node that failed (see graph_checkpoints.py).
+        
+        In a refinement session ("show my leads", then "only high priority")
+        the query refines the previous turn, which is reused where the intent
+        did not change (see refinement_sessions.py).
+        
         Args:
             query: User's natural language query
             json_output: If True, prints clean JSON output only
+            deadline_ms: Request latency budget (default: REQUEST_DEADLINE_MS env var or 15000)
+            profile: Request a sampling profile (honoured when PROFILE_HEADER_ENABLED=true)
+            idempotency_key: Client key (Idempotency-Key header) identifying retries of one request
+            tier: Requested tier (X-Tier header, honoured when TIER_HEADER_ENABLED=true)
+            session_id: Refinement session (SessionStore.create()); unknown or expired sessions start cold
             
         Returns:
             Result dictionary with layout, data, and metadata
@@ -84,10 +229,29 @@ class GraphAgent:
             print(f"[GraphAgent] Processing Query: {query}")
             print(f"{'='*60}\n")
         
-        initial_state = self._create_initial_state(query)
-        final_state = self.graph.invoke(initial_state)
+        tier = self.tiers.select(tier)
+        deadline = new_deadline(deadline_ms)
+        
+        def execute():
+            # Budget left when the execution starts (a detached follower has spent part of it waiting)
+            return self._execute(query, max(round(remaining_ms(deadline)), 0), profile, tier, idempotency_key, session_id)
         
-        result = self._extract_result(final_state)
+        if profile:
+            result, role = execute(), "leader"
+        else:
+            # Only requests with a comparable budget share an execution; followers wait at most their own budget
+            result, role = self.single_flight.do(
+                coalesce_key(query, tier=tier, session=session_id, budget=budget_class(deadline)),
+                execute,
+                idempotency_key=idempotency_key,
+                timeout_s=max(remaining_ms(deadline), 0) / 1000
+            )
+        # Per-request fields go on a copy, the shared result may still be copied for followers
+        result = {**result, "metrics": {**result["metrics"], "coalescing": role}}
+        if role in ("follower", "replay"):
+            # Shared result: keep the executing request's ID for its spans, report this request's own
+            result["metrics"]["coalesced_from"] = result["request_id"]
+            result["request_id"] = get_request_id() or start_request()
         
         if json_output:
             import json
@@ -99,6 +263,89 @@ class GraphAgent:
         
         return result
     
+    def _execute(
+        self,
+        query: str,
+        deadline_ms: Optional[int],
+        profile: bool,
+        tier: str = "full",
+        idempotency_key: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> dict:
+        """Run (or resume) the graph once and collect per-request metrics"""
+        # Per-request LLM usage (tokens, prompt-cache hits) collected by LLMUsageTracker
+        usage = start_usage_tracking()
+        # Request ID (set by the API middleware, else new) links the spans of this request
+        request_id = get_request_id() or start_request()
+        spans = start_span_recording()
+        
+        started = time.time()
+        deadline = new_deadline(deadline_ms)
+        # Checkpoint thread: a retry with the same key / request ID resumes this execution
+        thread_id, lease = self._lease_thread(idempotency_key, request_id, deadline)
+        config = {"configurable": {"thread_id": thread_id}} if lease else None
+        store_id, profiler = None, None
+        try:
+            resume_at = self._resume_point(config, query)
+            
+            # Layout bodies of this execution, the state passes IDs (generated layouts kept with the checkpoint)
+            store_id = open_layout_store(
+                catalog=self.executor.layout_rag.get_layout,
+                layouts=self.checkpointer.layouts(thread_id) if config else None
+            )
+            initial_state = self._create_initial_state(
+                query, deadline=deadline, tier=tier, layout_store=store_id, session=session_id,
+                # Read once: every node of the execution refines the same turn
+                session_turn=get_session_store().last_turn(session_id) if session_id and not resume_at else None
+            )
+            if resume_at:
+                # Completed nodes keep their outputs; the retry brings a new budget, tier and store
+                self.graph.update_state(config, {"deadline": deadline, "tier": tier, "layout_store": store_id})
+                GRAPH_RESUMES.inc(node=resume_at)
+            profiler = RequestProfiler.maybe_start(request_id, requested=profile)
+            final_state, nodes_ms = self._run_timed(None if resume_at else initial_state, config)
+            result = self._extract_result(final_state)
+            turn = 0
+            if session_id and final_state["outcome"].get("success"):
+                # Base of the session's next turn (before the store and its generated layouts close)
+                turn = get_session_store().record_turn(
+                    session_id, self._session_turn(final_state, get_layout_store(store_id))
+                )
+            if config:
+                self.checkpointer.delete_thread(thread_id)  # completed, nothing left to resume
+        finally:
+            profile_summary = profiler.stop() if profiler else None
+            close_layout_store(store_id)
+            if lease:
+                self.checkpointer.release_lease(thread_id, lease)
+        
+        self.tiers.record_latency((time.time() - started) * 1000)
+        
+        result["request_id"] = request_id
+        result["tier"] = tier
+        result["metrics"] = {
+            "nodes_ms": nodes_ms,
+            "spans": spans,
+            "llm": summarize_usage(usage),
+            "routes": self._summarize_routes(final_state.get("routes", {}), usage),
+            "deadline": {
+                "budget_ms": round((deadline - started) * 1000),
+                "elapsed_ms": round((time.time() - started) * 1000),
+                "degraded": final_state.get("degraded", [])
+            }
+        }
+        if config:
+            result["metrics"]["checkpoint"] = {"thread_id": thread_id, "resumed_at": resume_at}
+        if session_id:
+            result["metrics"]["session"] = {
+                "session_id": session_id,
+                "turn": turn,
+                "reused": final_state.get("refinement") or {}
+            }
+        if profile_summary:
+            result["metrics"]["profile"] = profile_summary
+        return result
+    
     async def astream(self, query: str) -> AsyncGenerator[AgentEvent, None]:
         """
         Async streaming execution - yields events in real-time.
@@ -2,10 +2,14 @@
 Graph Builder - Constructs the workflow graph
 Single Responsibility: Graph structure definition
 """
-from langgraph.graph import StateGraph, END
+from typing import TYPE_CHECKING
 
 from design_system_agent.agent.models import AgentState
 from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+from design_system_agent.agent.core.instrumentation import instrument_node
+
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
 
 
 class GraphBuilder:
@@ -15,7 +19,7 @@ class GraphBuilder:
     """
     
     @staticmethod
-    def build(executor: WorkflowExecutor) -> StateGraph:
+    def build(executor: WorkflowExecutor, checkpointer=None) -> "StateGraph":
         """
         Build the LLM-powered workflow graph.
         
@@ -24,20 +28,23 @@ class GraphBuilder:
         
         Args:
             executor: WorkflowExecutor instance with all node methods
+            checkpointer: Stores the state after each node so failed executions resume (see graph_checkpoints.py)
             
         Returns:
             Compiled StateGraph ready for execution
         """
+        from langgraph.graph import StateGraph, END  # imported on first build (slow import)
+
         workflow = StateGraph(AgentState)
         
-        # Add all nodes
-        workflow.add_node("plan_tasks", executor.plan_tasks)
-        workflow.add_node("normalize_query", executor.normalize_query)
-        workflow.add_node("analyze_and_reformulate", executor.analyze_and_reformulate)
-        workflow.add_node("retrieve_layouts", executor.retrieve_layouts)
-        workflow.add_node("fetch_data", executor.fetch_data)
-        workflow.add_node("llm_select_and_fill", executor.llm_select_and_fill)
-        workflow.add_node("score_output", executor.score_output)
+        # Add all nodes (timed into dsa_node_duration_seconds unless METRICS_ENABLED=false)
+        workflow.add_node("plan_tasks", instrument_node("plan_tasks", executor.plan_tasks))
+        workflow.add_node("normalize_query", instrument_node("normalize_query", executor.normalize_query))
+        workflow.add_node("analyze_and_reformulate", instrument_node("analyze_and_reformulate", executor.analyze_and_reformulate))
+        workflow.add_node("retrieve_layouts", instrument_node("retrieve_layouts", executor.retrieve_layouts))
+        workflow.add_node("fetch_data", instrument_node("fetch_data", executor.fetch_data))
+        workflow.add_node("llm_select_and_fill", instrument_node("llm_select_and_fill", executor.llm_select_and_fill))
+        workflow.add_node("score_output", instrument_node("score_output", executor.score_output))
         
         # Define edges (workflow flow)
         workflow.set_entry_point("plan_tasks")
@@ -49,4 +56,4 @@ class GraphBuilder:
         workflow.add_edge("llm_select_and_fill", "score_output")
         workflow.add_edge("score_output", END)
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=checkpointer)
@@ -43,15 +43,16 @@ class AgentState(TypedDict):
     analysis: Optional[Dict]
     rag_query: Optional[Dict]
     
-    # Layout processing
-    retrieved_layouts: Optional[List[Dict]]
+    # Layout processing (bodies live in the layout store, see layout_store.py)
+    layout_store: Optional[str]               # Store ID of this execution
+    retrieved_layouts: Optional[List[Dict]]   # Score records: id, query, scores (no layout body)
     layout_ranking: Optional[Dict]
-    selected_layout: Optional[Dict]
-    adapted_layout: Optional[Dict]
+    selected_layout: Optional[str]            # Layout ID
+    adapted_layout: Optional[str]             # Layout ID
     output_score: Optional[Dict]
     
     # Result
-    outcome: Dict
+    outcome: Dict                             # success, layout (ID), score
     messages: Annotated[List, operator.add]
     
     # Task planning
@@ -61,6 +62,19 @@ class AgentState(TypedDict):
     # Data fetching
     fetched_data: Optional[Dict]     # Data for populating layout
     
+    # Model routing
+    routes: Dict                     # Node name -> route taken (name, model)
+    
+    # Latency budget
+    deadline: Optional[float]        # Absolute request deadline (epoch seconds), None = unbounded
+    degraded: List[str]              # "node:action" entries for nodes that ran in degraded mode
+    tier: str                        # Load-adaptive pipeline tier: full, lean or minimal
+    
+    # Refinement session
+    session: Optional[str]           # Session ID, the previous turn is reused (see refinement_sessions.py)
+    session_turn: Optional[Dict]     # Previous turn of the session (SessionTurn), loaded once per execution
+    refinement: Dict                 # Step -> how the previous turn was reused (analysis, retrieval, data, selection)
+    
     # Streaming
     events: Annotated[List[AgentEvent], operator.add]  # Event stream
     progress: float                  # Overall progress (0.0 to 1.0)
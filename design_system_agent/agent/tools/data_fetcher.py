@@ -6,6 +6,8 @@ from typing import Dict, Optional, List
 import json
 from pathlib import Path
 
+from loguru import logger
+
 
 class DataFetcherTool:
     """
@@ -26,13 +28,13 @@ class DataFetcherTool:
         """Load sample CRM data"""
         try:
             if not self.data_file.exists():
-                print(f"[DataFetcher] Warning: Sample data file not found at {self.data_file}")
+                logger.warning(f"[DataFetcher] Sample data file not found at {self.data_file}")
                 return {}
             
             with open(self.data_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
-            print(f"[DataFetcher] Error loading sample data: {e}")
+            logger.error(f"[DataFetcher] Error loading sample data: {e}")
             return {}
     
     def fetch_data(
@@ -58,10 +60,10 @@ class DataFetcherTool:
         data = self.sample_data.get(key)
         
         if data:
-            print(f"[DataFetcher] Fetched data for {object_type} {layout_type}")
+            logger.debug("[DataFetcher] Fetched data for {} {}", object_type, layout_type)
             return data
         else:
-            print(f"[DataFetcher] No data found for {key}")
+            logger.debug("[DataFetcher] No data found for {}", key)
             return None
     
     def fetch_multi_entity_data(
@@ -86,7 +88,7 @@ class DataFetcherTool:
             if obj_data:
                 multi_data[obj] = obj_data
         
-        print(f"[DataFetcher] Fetched multi-object data for: {', '.join(objects)}")
+        logger.opt(lazy=True).debug("[DataFetcher] Fetched multi-object data for: {}", lambda: ", ".join(objects))
         return multi_data
     
     def detect_and_fetch(
@@ -125,7 +127,7 @@ class DataFetcherTool:
         if layout_type == "list" and rag_query and "layout_type" in rag_query:
             layout_type = rag_query["layout_type"]
         
-        print(f"[DataFetcher] Detected objects: {detected_objects}, layout_type: {layout_type}")
+        logger.debug("[DataFetcher] Detected objects: {}, layout_type: {}", detected_objects, layout_type)
         
         # Fetch data
         if len(detected_objects) == 1:
@@ -133,14 +135,14 @@ class DataFetcherTool:
             data = self.fetch_data(detected_objects[0], layout_type)
             if data:
                 return data
-            print(f"[DataFetcher] No data found for {detected_objects[0]}_{layout_type}, trying fallback")
+            logger.debug("[DataFetcher] No data found for {}_{}, trying fallback", detected_objects[0], layout_type)
             return {}
         elif len(detected_objects) > 1:
             # Multi-object
             return self.fetch_multi_entity_data(detected_objects, layout_type)
         else:
             # No objects detected - should not happen with new fallback
-            print(f"[DataFetcher] ⚠️  No objects detected, this should not happen!")
+            logger.warning("[DataFetcher] No objects detected, this should not happen!")
             return {}
     
     def _detect_objects_from_query(
@@ -158,26 +160,25 @@ class DataFetcherTool:
             # Filter out "unknown" or "data"
             objects = [obj for obj in objects if obj not in ["unknown", "data"]]
             if objects:
-                print(f"[DataFetcher] Using objects from LLM analysis: {objects}")
+                logger.debug("[DataFetcher] Using objects from LLM analysis: {}", objects)
                 return objects[:3]  # Limit to 3
         
         # Priority 2: Use analysis.object_type if available (from LLM)
         if analysis and "object_type" in analysis:
             obj_type = analysis["object_type"]
             if obj_type and obj_type not in ["unknown", "data"]:
-                print(f"[DataFetcher] Using object_type from LLM analysis: {obj_type}")
+                logger.debug("[DataFetcher] Using object_type from LLM analysis: {}", obj_type)
                 return [obj_type]
         
         # Priority 3: Use rag_query object_type
         if rag_query and "object_type" in rag_query:
             obj_type = rag_query["object_type"]
             if obj_type and obj_type not in ["unknown", "data"]:
-                print(f"[DataFetcher] Using object_type from rag_query: {obj_type}")
+                logger.debug("[DataFetcher] Using object_type from rag_query: {}", obj_type)
                 return [obj_type]
         
         # No valid objects detected - LLM analysis required
-        print(f"[DataFetcher] ⚠️  Could not detect objects - LLM analysis required")
-        print(f"[DataFetcher] 💡 Make sure OPENAI_API_KEY is set for query analysis")
+        logger.warning("[DataFetcher] Could not detect objects - LLM analysis required (is OPENAI_API_KEY set?)")
         return []
         return []
     
@@ -2,6 +2,9 @@
 LangChain Design System Tools
 Wrapper to expose design system tools as LangChain tools for LLM function calling
 """
+import json
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 from langchain_core.tools import tool
 
@@ -211,3 +214,84 @@ def get_langchain_design_tools() -> List:
         get_components_by_category,
         list_all_components,
     ]
+
+
+# ===========================
+# TOOL EXECUTION (MEMOIZED)
+# ===========================
+
+# Tools whose result depends only on their arguments (static design system data)
+DETERMINISTIC_TOOLS = {
+    "get_all_colors", "get_color_shades", "get_semantic_colors",
+    "search_icons", "get_icons_by_category", "get_all_icons",
+    "get_pattern_info", "get_patterns_by_category", "list_all_patterns",
+    "get_component_schema", "get_components_by_category", "list_all_components",
+}
+
+TOOL_RESULT_CACHE_SIZE = 1024
+
+_tools_by_name: Dict[str, Any] = {}
+_tool_result_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_tool_cache_lock = threading.Lock()
+_tool_cache_stats = {"hits": 0, "misses": 0}
+
+
+def invoke_design_tool(name: str, args: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Run a design system tool and return its result as compact JSON.
+    
+    Results of deterministic tools are memoized across requests (LRU, keyed
+    by tool name and arguments), so repeated lookups like get_all_colors()
+    or search_icons("user") skip the tool entirely.
+    
+    Args:
+        name: Tool name (as returned in the LLM tool call)
+        args: Tool arguments
+    
+    Returns:
+        JSON string of the tool result (or an error message for unknown tools and bad arguments)
+    """
+    if not _tools_by_name:
+        _tools_by_name.update({t.name: t for t in get_langchain_design_tools()})
+    
+    design_tool = _tools_by_name.get(name)
+    if design_tool is None:
+        return json.dumps({"error": f"Unknown tool: {name}"})
+    
+    args = args or {}
+    cacheable = name in DETERMINISTIC_TOOLS
+    key = (name, json.dumps(args, sort_keys=True, default=str))
+    if cacheable:
+        with _tool_cache_lock:
+            if key in _tool_result_cache:
+                _tool_result_cache.move_to_end(key)
+                _tool_cache_stats["hits"] += 1
+                return _tool_result_cache[key]
+            _tool_cache_stats["misses"] += 1
+    
+    try:
+        output = design_tool.invoke(args)
+    except Exception as e:
+        # Bad arguments from the LLM: answer this call with the error (not cached), keep the loop going
+        return json.dumps({"error": f"{type(e).__name__}: {e}"})
+    result = json.dumps(output, separators=(",", ":"), default=str)
+    
+    if cacheable:
+        with _tool_cache_lock:
+            _tool_result_cache[key] = result
+            if len(_tool_result_cache) > TOOL_RESULT_CACHE_SIZE:
+                _tool_result_cache.popitem(last=False)
+    return result
+
+
+def get_tool_cache_stats() -> Dict[str, int]:
+    """Get hit/miss counters and size of the tool result cache"""
+    with _tool_cache_lock:
+        return {**_tool_cache_stats, "size": len(_tool_result_cache)}
+
+
+def clear_tool_cache():
+    """Clear memoized tool results (e.g. after the design system data changes)"""
+    with _tool_cache_lock:
+        _tool_result_cache.clear()
+        _tool_cache_stats.update(hits=0, misses=0)
@@ -0,0 +1,35 @@
+"""
+Gunicorn config - preload-then-fork serving with uvicorn workers
+
+    gunicorn -c design_system_agent/api/gunicorn_conf.py design_system_agent.api.main:app
+
+The app is imported in the master (preload_app) and on_starting builds the
+agent there before any worker is forked (see prefork.py), so models, FAISS
+index and layout metadata are loaded once and shared copy-on-write. The
+thread budget is split between the configured workers before that.
+
+Environment Variables:
+- API_HOST / API_PORT : Bind address (default: 0.0.0.0:8000)
+- WEB_CONCURRENCY     : Worker processes (default: 2)
+- PRELOAD_MODELS : See prefork.py
+- WORKER_THREADS : See thread_budget.py
+"""
+import os
+
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """Runs in the master after the app is imported and before workers are forked"""
+    from design_system_agent.agent.core.thread_budget import apply_thread_budget
+    from design_system_agent.api.prefork import preload
+    from design_system_agent.api.router import get_agent
+
+    apply_thread_budget(server.cfg.workers)
+    preload(get_agent)
@@ -0,0 +1,335 @@
+"""
+Local OpenAI-compatible stub server for offline load and latency testing.
+
+Speaks the chat-completions wire format (including tool calls, json_schema
+response formats and SSE streaming) and answers with schema-valid payloads:
+- QueryAnalysis         : keyword analysis of the user query
+- LayoutSelectionResult : first candidate id found in the prompt
+- LayoutScore           : fixed quality scores
+- any other schema      : generated from the JSON schema
+
+Latency, error rate and streaming speed are configurable through env vars or
+at runtime through POST /stub/config.
+
+Run:
+    python -m design_system_agent.api.llm_stub --port 8900
+    export LLM_BASE_URL=http://127.0.0.1:8900/v1   # LLMFactory uses the stub
+
+Environment Variables:
+- STUB_LATENCY_DIST   : fixed, uniform, lognormal or exponential (default: lognormal)
+- STUB_LATENCY_MS     : Median/mean latency in ms (default: 800)
+- STUB_LATENCY_SIGMA  : lognormal sigma / uniform spread ratio (default: 0.4)
+- STUB_ERROR_RATE     : Share of requests answered with an error (default: 0)
+- STUB_ERROR_STATUSES : Comma-separated error statuses to pick from (default: 429,500,503)
+- STUB_TOKENS_PER_S   : Streaming speed (default: 200)
+- STUB_CACHED_RATIO   : Share of prompt tokens reported as cached (default: 0)
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from design_system_agent.agent.core.prompt_budget import count_tokens
+
+
+def _default_config() -> Dict[str, Any]:
+    return {
+        "latency_dist": os.getenv("STUB_LATENCY_DIST", "lognormal"),
+        "latency_ms": float(os.getenv("STUB_LATENCY_MS", 800)),
+        "latency_sigma": float(os.getenv("STUB_LATENCY_SIGMA", 0.4)),
+        "error_rate": float(os.getenv("STUB_ERROR_RATE", 0)),
+        "error_statuses": [int(s) for s in os.getenv("STUB_ERROR_STATUSES", "429,500,503").split(",")],
+        "tokens_per_s": float(os.getenv("STUB_TOKENS_PER_S", 200)),
+        "cached_ratio": float(os.getenv("STUB_CACHED_RATIO", 0)),
+    }
+
+
+config: Dict[str, Any] = _default_config()
+stats: Dict[str, Any] = {"requests": 0, "errors": 0, "streams": 0, "by_schema": {}}
+
+app = FastAPI(title="LLM Stub", description="OpenAI-compatible stub for offline testing")
+
+
+# ====================
+# LATENCY & ERRORS
+# ====================
+
+def sample_latency_s() -> float:
+    """Draw one response latency from the configured distribution"""
+    median = config["latency_ms"] / 1000
+    sigma = config["latency_sigma"]
+    dist = config["latency_dist"]
+    if dist == "fixed":
+        return median
+    if dist == "uniform":
+        return random.uniform(median * (1 - sigma), median * (1 + sigma))
+    if dist == "exponential":
+        return random.expovariate(1 / median) if median > 0 else 0.0
+    return random.lognormvariate(0, sigma) * median
+
+
+def sample_error() -> Optional[int]:
+    """Pick an error status for this request (None = success)"""
+    if random.random() < config["error_rate"]:
+        return random.choice(config["error_statuses"])
+    return None
+
+
+# ====================
+# PAYLOADS
+# ====================
+
+def _message_text(messages: List[Dict[str, Any]]) -> str:
+    """Concatenate message contents (string or content-part lists)"""
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(p.get("text", "") for p in content if isinstance(p, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def _last_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return _message_text([message])
+    return ""
+
+
+def example_from_schema(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None) -> Any:
+    """Generate a minimal instance that validates against a JSON schema"""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return example_from_schema(options[0], defs)
+    if "default" in schema:
+        return schema["default"]
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    schema_type = schema.get("type", "object")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    if schema_type == "object":
+        return {
+            name: example_from_schema(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        return []
+    return {"string": "stub", "number": 0.8, "integer": 1, "boolean": False, "null": None}[schema_type]
+
+
+def build_payload(name: str, schema: Dict[str, Any], messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Schema-valid payload for a known pipeline schema (generic instance otherwise)"""
+    payload = example_from_schema(schema) if schema else {}
+
+    if name == "QueryAnalysis":
+        # Imported lazily: keyword analysis from the analyzer module
+        from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
+        query = _last_user_text(messages).split("\n")[-1].strip() or "show records"
+        analysis = QueryAnalyzer.keyword_analysis(query).model_dump()
+        payload.update({k: v for k, v in analysis.items() if k in schema.get("properties", analysis)})
+    elif name == "LayoutSelectionResult":
+        ids = re.findall(r'"id":\s*"([^"]+)"', _message_text(messages))
+        payload.update({
+            "selected_layout_id": ids[0] if ids else "custom_layout",
+            "confidence": 0.9,
+            "reasoning": "Stub selection: top ranked candidate",
+            "is_adapted": False,
+            "created_from_scratch": False,
+            "adaptations": [],
+            "custom_layout": {},
+        })
+    elif name == "LayoutScore":
+        payload.update({
+            "overall_score": 0.85,
+            "component_match": 0.8,
+            "structure_quality": 0.9,
+            "ux_score": 0.85,
+            "feedback": "Stub score",
+        })
+    return payload
+
+
+def plan_response(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Decide the assistant message for a request: structured content, tool call or text"""
+    messages = body.get("messages", [])
+    response_format = body.get("response_format") or {}
+
+    if response_format.get("type") == "json_schema":
+        spec = response_format["json_schema"]
+        payload = build_payload(spec.get("name", ""), spec.get("schema", {}), messages)
+        return {"schema": spec.get("name", "json_schema"), "content": json.dumps(payload), "tool_calls": None}
+
+    tools = {t["function"]["name"]: t["function"] for t in body.get("tools", []) if t.get("type") == "function"}
+    if tools:
+        tool_choice = body.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            name = tool_choice["function"]["name"]
+        else:
+            # Tool loop: submit the decision tool when bound, else the first tool
+            name = "LayoutSelectionResult" if "LayoutSelectionResult" in tools else next(iter(tools))
+        arguments = build_payload(name, tools[name].get("parameters", {}), messages)
+        tool_call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)},
+        }
+        return {"schema": name, "content": None, "tool_calls": [tool_call]}
+
+    if response_format.get("type") == "json_object":
+        return {"schema": "json_object", "content": "{}", "tool_calls": None}
+    return {"schema": "text", "content": "stub response", "tool_calls": None}
+
+
+def _usage(messages: List[Dict[str, Any]], plan: Dict[str, Any]) -> Dict[str, Any]:
+    prompt_tokens = count_tokens(_message_text(messages))
+    completion_text = plan["content"] or json.dumps(plan["tool_calls"])
+    completion_tokens = count_tokens(completion_text)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": int(prompt_tokens * config["cached_ratio"])},
+    }
+
+
+# ====================
+# ENDPOINTS
+# ====================
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    latency = sample_latency_s()
+    error_status = sample_error()
+    if error_status is not None:
+        stats["errors"] += 1
+        await asyncio.sleep(latency / 4)
+        return JSONResponse(
+            status_code=error_status,
+            content={"error": {"message": f"Stub error {error_status}", "type": "stub_error", "code": error_status}},
+        )
+
+    plan = plan_response(body)
+    stats["by_schema"][plan["schema"]] = stats["by_schema"].get(plan["schema"], 0) + 1
+    usage = _usage(body.get("messages", []), plan)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:16]}"
+    model = body.get("model", "gpt-4o-mini")
+
+    if body.get("stream"):
+        stats["streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        return StreamingResponse(
+            _stream(completion_id, model, plan, usage, latency, include_usage),
+            media_type="text/event-stream",
+        )
+
+    await asyncio.sleep(latency)
+    message = {"role": "assistant", "content": plan["content"]}
+    if plan["tool_calls"]:
+        message["tool_calls"] = plan["tool_calls"]
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if plan["tool_calls"] else "stop",
+        }],
+        "usage": usage,
+    }
+
+
+async def _stream(completion_id, model, plan, usage, latency, include_usage):
+    """SSE chunks: first token after the sampled latency, then tokens_per_s"""
+    def chunk(delta, finish_reason=None, chunk_usage=None):
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if chunk_usage is not None:
+            data["choices"] = []
+            data["usage"] = chunk_usage
+        return f"data: {json.dumps(data)}\n\n"
+
+    await asyncio.sleep(latency)
+    yield chunk({"role": "assistant", "content": "" if plan["content"] is not None else None})
+
+    # ~4 characters per token
+    delay = 1 / config["tokens_per_s"] if config["tokens_per_s"] > 0 else 0
+    if plan["tool_calls"]:
+        call = plan["tool_calls"][0]
+        arguments = call["function"]["arguments"]
+        yield chunk({"tool_calls": [{"index": 0, "id": call["id"], "type": "function",
+                                     "function": {"name": call["function"]["name"], "arguments": ""}}]})
+        for i in range(0, len(arguments), 4):
+            await asyncio.sleep(delay)
+            yield chunk({"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + 4]}}]})
+        yield chunk({}, finish_reason="tool_calls")
+    else:
+        content = plan["content"]
+        for i in range(0, len(content), 4):
+            await asyncio.sleep(delay)
+            yield chunk({"content": content[i:i + 4]})
+        yield chunk({}, finish_reason="stop")
+
+    if include_usage:
+        yield chunk({}, chunk_usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [
+        {"id": m, "object": "model", "owned_by": "stub"} for m in ("gpt-4o-mini", "gpt-4o")
+    ]}
+
+
+@app.get("/stub/stats")
+async def stub_stats():
+    return {"config": config, **stats}
+
+
+@app.post("/stub/config")
+async def update_config(request: Request):
+    """Change latency/error settings at runtime (partial update, {"reset": true} restores env defaults)"""
+    updates = await request.json()
+    if updates.pop("reset", False):
+        config.update(_default_config())
+    unknown = set(updates) - set(config)
+    if unknown:
+        return JSONResponse(status_code=400, content={"detail": f"Unknown settings: {sorted(unknown)}"})
+    config.update(updates)
+    return config
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
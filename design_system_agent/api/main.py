@@ -16,12 +16,24 @@ sys.path.insert(0, str(project_root))
 
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
+import asyncio
 from contextlib import asynccontextmanager
 from loguru import logger
 
-from design_system_agent.api.router import router
+from design_system_agent.agent.core.logging_config import configure_logging, set_request_log_level
+
+# Enqueued loguru sink with per-module levels and sampling (LOG_* env vars)
+configure_logging()
+
+from design_system_agent.api.router import get_agent, router
+from design_system_agent.api.warmup import get_readiness, run_warmup
+from design_system_agent.agent.core.instrumentation import (
+    HTTP_SECONDS, METRICS_ENABLED, get_metrics_registry, start_request, timed
+)
+from design_system_agent.agent.core.llm_resilience import get_resilient_caller
+from design_system_agent.agent.tools.langchain_design_tools import get_tool_cache_stats
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -37,11 +49,17 @@ async def lifespan(app: FastAPI):
         logger.info("Auto dataset generation is disabled. Run generate_dataset.py manually to create dataset.")
         logger.info("Dataset path: dataset/crm_query_dataset.json")
     
-    # Initialize services here (vector store, LLM client, etc.)
+    # Load and warm models, index, LLM clients and graph off the event loop;
+    # /ready reports 503 until this finishes
+    warmup = asyncio.create_task(asyncio.to_thread(run_warmup, get_agent))
     yield
     
+    if not warmup.done():
+        logger.info("Shutting down before warmup finished")
+    
     # Cleanup here
     logger.info("Shutting down Design System Agent API")
+    await logger.complete()  # flush the enqueued log sink
 
 
 # Get environment settings
@@ -74,6 +92,43 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Assign a request ID (X-Request-ID header or generated), set its log level and time the request"""
+    request_id = start_request(request.headers.get("x-request-id"))
+    # Per-request verbosity, e.g. "X-Log-Level: DEBUG" (honoured with LOG_REQUEST_OVERRIDE=true)
+    set_request_log_level(request.headers.get("x-log-level"))
+    with timed(HTTP_SECONDS, path="unmatched", status="500") as span:
+        response = await call_next(request)
+        # Route template, not the raw path, keeps label cardinality bounded
+        route = request.scope.get("route")
+        span.set(path=getattr(route, "path", "unmatched"), status=str(response.status_code))
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
+def _collect_llm_and_cache_gauges():
+    """Scrape-time gauges: LLM resilience counters and design tool cache hit ratio"""
+    llm = get_resilient_caller().get_stats()
+    tools = get_tool_cache_stats()
+    lookups = tools["hits"] + tools["misses"]
+    return {
+        "dsa_llm_calls": ("LLM call counters since start", {
+            f'{{event="{event}"}}': llm[event]
+            for event in ("calls", "successes", "failures", "retries", "timeouts", "hedges", "hedge_wins", "short_circuits")
+        }),
+        "dsa_llm_circuit_open": ("1 while the LLM circuit breaker is open", {
+            "": 1 if llm["circuit"]["state"] == "open" else 0
+        }),
+        "dsa_tool_cache_hit_ratio": ("Design tool result cache hit ratio since start", {
+            "": tools["hits"] / lookups if lookups else 0
+        }),
+    }
+
+
+get_metrics_registry().add_collector(_collect_llm_and_cache_gauges)
+
+
 # Exception Handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -106,6 +161,24 @@ async def root():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once models, index, LLM clients and graph are warm, 503 before"""
+    snapshot = get_readiness().snapshot()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if snapshot["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=snapshot,
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics (node, RAG, LLM and HTTP histograms)"""
+    if not METRICS_ENABLED:
+        return PlainTextResponse("# metrics disabled (METRICS_ENABLED=false)\n", status_code=404)
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
     return {
@@ -0,0 +1,95 @@
+"""
+Preload-then-fork serving.
+
+Loading the agent per worker means N copies of both transformer models, the
+FAISS index and the layout metadata. With gunicorn's preload mode
+(gunicorn_conf.py) the master builds the AgentController once and then forks
+the workers, which share those pages copy-on-write:
+- the agent is built in the master without running inference, so no torch /
+  OpenMP thread pool exists at fork time (pools created before fork are not
+  usable in the child)
+- gc.freeze() moves everything loaded so far into the permanent generation,
+  so garbage collection in the workers does not write to (and copy) those pages
+- the FAISS index is memory-mapped (FAISS_MMAP in vector_layout_rag.py), its
+  pages come from the page cache
+- after fork each worker applies its own thread budget (torch / FAISS pools,
+  see thread_budget.py) and replaces thread pools that already started
+  threads in the master
+
+The startup warmup still runs in every worker (first inference, /ready), it
+just finds the agent already built.
+
+Environment Variables:
+- PRELOAD_MODELS  : "false" skips the master preload; every worker loads its own copy (default: true)
+- WEB_CONCURRENCY, WORKER_THREADS : Per-worker thread budget (see thread_budget.py)
+"""
+import gc
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from loguru import logger
+
+from design_system_agent.agent.core.thread_budget import ensure_thread_budget
+
+
+_fork_hook_registered = False
+
+
+def preload_enabled() -> bool:
+    return os.getenv("PRELOAD_MODELS", "true").lower() != "false"
+
+
+def preload(get_agent: Callable) -> Dict[str, Any]:
+    """
+    Build the agent in the master process before workers are forked
+
+    Args:
+        get_agent: Returns the (lazily built) AgentController
+
+    Returns:
+        Summary with whether the agent was preloaded and how long it took
+    """
+    global _fork_hook_registered
+    if not preload_enabled():
+        logger.info("Model preload disabled (PRELOAD_MODELS=false), workers load their own copies")
+        return {"preloaded": False}
+
+    started = time.perf_counter()
+    try:
+        get_agent()
+    except Exception as e:
+        # Workers retry in their warmup and report the failure on /ready
+        logger.error("Preload failed, workers load their own copies: {}: {}", type(e).__name__, e)
+        return {"preloaded": False, "error": f"{type(e).__name__}: {e}"}
+    gc.collect()
+    gc.freeze()
+    if not _fork_hook_registered:
+        os.register_at_fork(after_in_child=reinit_after_fork)
+        _fork_hook_registered = True
+
+    duration_s = time.perf_counter() - started
+    logger.info("Preloaded agent in master (pid {}) in {:.1f} s, {} objects frozen", os.getpid(), duration_s, gc.get_freeze_count())
+    return {"preloaded": True, "duration_s": round(duration_s, 2)}
+
+
+def _fresh_pool(pool: ThreadPoolExecutor) -> ThreadPoolExecutor:
+    """Same-sized replacement for a pool whose threads only exist in the parent"""
+    if not pool._threads:
+        return pool  # never started a thread, safe to keep
+    return ThreadPoolExecutor(max_workers=pool._max_workers, thread_name_prefix=pool._thread_name_prefix)
+
+
+def reinit_after_fork():
+    """Reset per-process state in a forked worker (registered with os.register_at_fork)"""
+    ensure_thread_budget()
+
+    resilience = sys.modules.get("design_system_agent.agent.core.llm_resilience")
+    if resilience is not None and resilience._resilient_caller is not None:
+        caller = resilience._resilient_caller
+        caller._executor = _fresh_pool(caller._executor)
+    selector = sys.modules.get("design_system_agent.agent.graph_nodes.layout_selector_agent")
+    if selector is not None:
+        selector._tool_executor = _fresh_pool(selector._tool_executor)
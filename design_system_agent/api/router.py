@@ -1,30 +1,51 @@
 """
 API routes for design system agent endpoints.
 """
-from fastapi import APIRouter, HTTPException
+import asyncio
+import threading
+
+from fastapi import APIRouter, Header, HTTPException
 from pydantic import BaseModel
-from typing import Any, Optional, List, Dict
+from typing import TYPE_CHECKING, Any, Optional, List, Dict, Literal
 from loguru import logger
 
-from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
+from design_system_agent.agent.core.admission_control import AdmissionRejected, get_admission_controller
+from design_system_agent.agent.core.degradation_tiers import get_tier_controller
+from design_system_agent.agent.core.instrumentation import valid_request_id
+from design_system_agent.agent.core.llm_resilience import get_resilient_caller
+from design_system_agent.agent.core.refinement_sessions import get_session_store
+from design_system_agent.agent.core.single_flight import ExecutionInProgress, IdempotencyConflict, get_single_flight
 
 from ..agent.agent_controller import AgentController
-from ..core.dataset_genertor.dataset_generator_controller import DataSetGeneratorController
+
+if TYPE_CHECKING:
+    from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
 
 router = APIRouter()
-agent = AgentController()
+
+# Agent controller (built by the startup warmup, or on first use)
+_agent: Optional[AgentController] = None
+_agent_lock = threading.Lock()
 
 # RAG Engine (lazy initialization)
-_rag_engine: Optional[VectorLayoutRAGEngine] = None
+_rag_engine: Optional["VectorLayoutRAGEngine"] = None
+
 
+def get_agent() -> AgentController:
+    """Get or initialize the agent controller (singleton pattern, safe against concurrent first use)"""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = AgentController()
+    return _agent
 
-def get_rag_engine() -> VectorLayoutRAGEngine:
-    """Get or initialize the RAG engine (singleton pattern)"""
+
+def get_rag_engine() -> "VectorLayoutRAGEngine":
+    """Get the RAG engine (shared with the agent's graph so models and index are loaded once)"""
     global _rag_engine
     if _rag_engine is None:
-        logger.info("Initializing Vector RAG Engine...")
-        _rag_engine = VectorLayoutRAGEngine()
-        logger.info("Vector RAG Engine initialized successfully")
+        _rag_engine = get_agent().agent.executor.layout_rag
     return _rag_engine
 
 
@@ -32,6 +53,8 @@ class QueryRequest(BaseModel):
     query: str
     context: Optional[str] = None
     format: Optional[str] = "json"  # react, html, or json
+    deadline_ms: Optional[int] = None  # latency budget (default: REQUEST_DEADLINE_MS)
+    priority: Literal["interactive", "batch", "regeneration"] = "interactive"  # admission queue order
 
 
 class RAGSearchRequest(BaseModel):
@@ -63,13 +86,109 @@ class DatasetGenerateResponse(BaseModel):
 
 
 @router.post("/query", response_model=Dict[str, Any])
-async def process_query(request: QueryRequest):
-    """Process a design system query and generate code in specified format."""
+async def process_query(
+    request: QueryRequest,
+    x_profile: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    x_tier: Optional[Literal["full", "lean", "minimal"]] = Header(None)
+):
+    """Process a design system query and generate code in specified format.
+    
+    Send "X-Profile: 1" to run the request under the sampling profiler
+    (requires PROFILE_HEADER_ENABLED=true; see request_profiler.py).
+    
+    Requests wait for a graph slot by priority and get 429 with Retry-After
+    when the wait would exceed their deadline (see admission_control.py).
+    
+    Identical concurrent queries share one execution; retries sending the
+    same "Idempotency-Key" attach to or replay it (see single_flight.py).
+    
+    Under load the pipeline runs a lean or minimal tier, reported as "tier"
+    in the response; "X-Tier: lean" forces one when TIER_HEADER_ENABLED=true
+    (see degradation_tiers.py).
+    
+    A retry of a failed request with the same "Idempotency-Key" (or, without
+    one, the same "X-Request-ID") resumes at the node that failed instead of
+    rerunning analysis and retrieval (see graph_checkpoints.py). A key still
+    being executed by another worker gets 409.
+    """
+    return await _run_query(request, x_profile, idempotency_key, x_tier)
+
+
+@router.post("/sessions", response_model=Dict[str, Any])
+async def create_session():
+    """
+    Start a refinement session for follow-up queries ("show my leads", then "only high priority", then "as cards").
+    
+    Returns:
+        The session ID and its idle expiry in seconds
+    """
+    sessions = get_session_store()
+    return {"session_id": sessions.create(), "ttl_s": sessions.ttl_s}
+
+
+@router.post("/sessions/{session_id}/query", response_model=Dict[str, Any])
+async def process_session_query(
+    session_id: str,
+    request: QueryRequest,
+    x_profile: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    x_tier: Optional[Literal["full", "lean", "minimal"]] = Header(None)
+):
+    """Process a query as the next turn of a refinement session (see POST /query).
+    
+    A follow-up that keeps the intent and object reuses the previous turn:
+    delta analysis, re-filtered candidates, the fetched data and the selected
+    layout; a material change runs the full pipeline. What was reused is
+    reported in metrics.session (see refinement_sessions.py).
+    
+    Sessions are shared by the workers of a host. An unknown or expired
+    session ID runs a cold first turn and continues the session under that ID.
+    """
+    if not valid_request_id(session_id):
+        raise HTTPException(status_code=422, detail="Session IDs are 1-64 letters, digits, '_' or '-'")
+    get_session_store().create(session_id)
+    return await _run_query(request, x_profile, idempotency_key, x_tier, session_id=session_id)
+
+
+@router.delete("/sessions/{session_id}", response_model=Dict[str, Any])
+async def delete_session(session_id: str):
+    """End a refinement session before it expires."""
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session {session_id}")
+    return {"session_id": session_id, "deleted": True}
+
+
+async def _run_query(
+    request: QueryRequest,
+    x_profile: Optional[str],
+    idempotency_key: Optional[str],
+    x_tier: Optional[str],
+    session_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Admit and run one query (shared by /query and session turns)"""
     try:
         print(f"Processing query: {request.query} (format: {request.format})")
-        result = agent.process_query(request.query)
+        async with get_admission_controller().admit(request.priority, request.deadline_ms) as remaining_ms:
+            # The graph blocks; run it off the event loop so queued requests can be admitted and rejected
+            result = await asyncio.to_thread(
+                get_agent().process_query,
+                request.query,
+                deadline_ms=remaining_ms,
+                profile=x_profile in ("1", "true"),
+                idempotency_key=idempotency_key,
+                tier=x_tier,
+                session_id=session_id
+            )
         print(f"Query processed successfully")
         return result
+    except AdmissionRejected as e:
+        logger.warning("Query not admitted: {}", e)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ExecutionInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         print(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -130,7 +249,14 @@ async def rag_stats():
             "metadata_path": str(rag_engine.metadata_path),
             "embedding_model": "all-MiniLM-L6-v2",
             "embedding_dimension": rag_engine.embedding_dim,
-            "reranker_model": "cross-encoder/ms-marco-MiniLM-L-6-v2"
+            "reranker_model": "cross-encoder/ms-marco-MiniLM-L-6-v2",
+            "inference": "sidecar" if rag_engine.sidecar is not None else "local",
+            "inference_batching": {
+                "embedding": rag_engine.encode_batcher.stats(),
+                "reranker": rag_engine.rerank_batcher.stats(),
+            },
+            "thread_budget": rag_engine.get_stats()["thread_budget"],
+            "intent_lookup": rag_engine.intent_table.get_stats(),
         }
         
         logger.info("RAG stats retrieved")
@@ -141,6 +267,52 @@ async def rag_stats():
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 
+@router.get("/llm/stats", response_model=Dict[str, Any])
+async def llm_stats():
+    """
+    Get LLM call resilience state for monitoring.
+    
+    Returns:
+        Call counters (retries, hedges, timeouts, short circuits),
+        circuit breaker state and p95 latency per call name
+    """
+    return get_resilient_caller().get_stats()
+
+
+@router.get("/admission/stats", response_model=Dict[str, Any])
+async def admission_stats():
+    """
+    Get /query admission statistics (slots in use, queue per priority, wait estimate,
+    rejections) and the load-adaptive pipeline tier.
+    
+    Returns:
+        Dictionary with admission controller statistics and tier state
+    """
+    return {**get_admission_controller().get_stats(), "tier": get_tier_controller().get_stats()}
+
+
+@router.get("/coalescing/stats", response_model=Dict[str, Any])
+async def coalescing_stats():
+    """
+    Get request coalescing statistics (in-flight executions, leaders, followers, idempotent replays).
+    
+    Returns:
+        Dictionary with single flight statistics
+    """
+    return get_single_flight().get_stats()
+
+
+@router.get("/sessions/stats", response_model=Dict[str, Any])
+async def session_stats():
+    """
+    Get refinement session statistics (live sessions, created, expired, evicted, turns).
+    
+    Returns:
+        Dictionary with session store statistics
+    """
+    return get_session_store().get_stats()
+
+
 @router.post("/rag/rebuild", response_model=Dict[str, Any])
 async def rebuild_rag_index():
     """
@@ -150,6 +322,9 @@ async def rebuild_rag_index():
     Returns:
         Status information about the rebuild
     """
+    if get_rag_engine().sidecar is not None:
+        raise HTTPException(status_code=409, detail="The index is owned by the inference sidecar; delete its index files and restart it to rebuild")
+    
     try:
         global _rag_engine
         
@@ -164,12 +339,13 @@ async def rebuild_rag_index():
             logger.info(f"Removing existing index directory: {index_dir}")
             shutil.rmtree(index_dir)
         
-        # Reset RAG engine (will rebuild on next access)
-        _rag_engine = None
-        
-        # Initialize new RAG engine (this will rebuild the index)
+        # Initialize new RAG engine (this will rebuild the index) and hand it to the graph
+        from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
+
         logger.info("Rebuilding index...")
-        rag_engine = get_rag_engine()
+        rag_engine = VectorLayoutRAGEngine()
+        get_agent().agent.executor.layout_rag = rag_engine
+        _rag_engine = rag_engine
         
         result = {
             "status": "success",
@@ -204,7 +380,8 @@ async def generate_dataset(request: DatasetGenerateRequest):
     try:
         logger.info(f"Starting dataset generation (total_records={request.total_records}, force={request.force_regenerate})")
         
-        # Initialize dataset generator controller
+        # Initialize dataset generator controller (imported here: it loads every component builder and pattern)
+        from ..core.dataset_genertor.dataset_generator_controller import DataSetGeneratorController
         dataset_controller = DataSetGeneratorController()
         
         # Check if dataset already exists
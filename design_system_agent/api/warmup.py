@@ -0,0 +1,159 @@
+"""
+Startup warmup and readiness gating.
+
+The lifespan hook starts run_warmup() in a background thread, so /health
+(liveness) answers right away while /ready (readiness) returns 503 until
+every step finished:
+- agent:       build AgentController (SentenceTransformer, CrossEncoder,
+               FAISS index, LLM clients, compiled graph)
+- models:      encode / rerank dummy batches and one FAISS search so the first
+               request does not pay torch's first-inference overhead
+- llm_clients: prebuild the clients of every routed model
+- graph:       run one query through the graph with an expired deadline
+               (every node takes its no-LLM path, so no tokens are spent)
+
+Environment Variables:
+- WARMUP_ENABLED  : "false" skips warmup and reports ready immediately (default: true)
+- WARMUP_QUERY    : Query used for the graph warmup (default: "show all leads")
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+
+WARMUP_STEPS = ("agent", "models", "llm_clients", "graph")
+
+
+class Readiness:
+    """Thread-safe record of warmup progress"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = "starting"  # starting -> ready | failed
+        self.steps: Dict[str, Dict[str, Any]] = {step: {"status": "pending"} for step in WARMUP_STEPS}
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def step_done(self, step: str, duration_s: float, status: str = "done"):
+        with self._lock:
+            self.steps[step] = {"status": status, "duration_ms": round(duration_s * 1000, 1)}
+
+    def mark_ready(self):
+        with self._lock:
+            self.status = "ready"
+            self.ready_at = time.time()
+
+    def mark_failed(self, step: str, error: Exception):
+        with self._lock:
+            self.status = "failed"
+            self.error = f"{step}: {type(error).__name__}: {error}"
+            self.steps[step] = {"status": "failed"}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "steps": {name: dict(step) for name, step in self.steps.items()},
+                "error": self.error,
+                "warmup_s": round((self.ready_at or time.time()) - self.started_at, 2),
+            }
+
+
+# Singleton instance
+_readiness = None
+
+def get_readiness() -> Readiness:
+    """Get singleton instance of Readiness"""
+    global _readiness
+    if _readiness is None:
+        _readiness = Readiness()
+    return _readiness
+
+
+# ====================
+# WARMUP STEPS
+# ====================
+
+def warm_models(rag_engine):
+    """Run dummy batches through the embedding model, the reranker and the FAISS index"""
+    if getattr(rag_engine, "sidecar", None) is not None:
+        # Models live in the inference sidecar; warm the connection and its batch path
+        rag_engine.sidecar.search(["warmup query", "show all leads"], 1)
+        rag_engine.sidecar.rerank([["warmup query", "show all leads"]])
+        return
+    embeddings = rag_engine.embedding_model.encode(
+        ["warmup query", "show all leads", "account dashboard with metrics"],
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    rag_engine.reranker.predict([["warmup query", "show all leads"], ["warmup query", "account dashboard"]])
+    if rag_engine.index is not None and rag_engine.index.ntotal:
+        rag_engine.index.search(embeddings[:1].astype("float32"), min(10, rag_engine.index.ntotal))
+
+
+def prebuild_llm_clients(graph_agent):
+    """Create the LLM clients of every model the router can pick"""
+    from design_system_agent.agent.core.llm_factory import LLMFactory
+    from design_system_agent.agent.core.model_router import get_model_router
+    from design_system_agent.agent.graph_nodes.layout_scorer_node import LayoutScore
+    from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalysis
+
+    router = get_model_router()
+    models = {router.default_model} | {rule["model"] for rule in router.rules if rule.get("model")}
+    selector = graph_agent.executor.llm_selector_filler.selector_agent
+    for model in sorted(models):
+        route = {"model": model}
+        LLMFactory.routed_structured_llm(route, QueryAnalysis)
+        LLMFactory.routed_structured_llm(route, LayoutScore)
+        selector._llms_for_model(model)
+    return sorted(models)
+
+
+def warm_graph(graph_agent):
+    """Run one query through the compiled graph without LLM calls (expired deadline)"""
+    graph_agent.invoke(os.getenv("WARMUP_QUERY", "show all leads"), deadline_ms=0)
+
+
+def run_warmup(get_agent: Callable, readiness: Optional[Readiness] = None) -> Readiness:
+    """
+    Run all warmup steps and mark the service ready (blocking; run it in a thread)
+
+    Args:
+        get_agent: Returns the (lazily built) AgentController
+        readiness: Readiness record to update (default: singleton)
+    """
+    readiness = readiness or get_readiness()
+    if os.getenv("WARMUP_ENABLED", "true").lower() == "false":
+        for step in WARMUP_STEPS:
+            readiness.step_done(step, 0.0, status="skipped")
+        readiness.mark_ready()
+        return readiness
+
+    steps = (
+        ("agent", lambda: get_agent()),
+        ("models", lambda: warm_models(get_agent().agent.executor.layout_rag)),
+        ("llm_clients", lambda: prebuild_llm_clients(get_agent().agent)),
+        ("graph", lambda: warm_graph(get_agent().agent)),
+    )
+    for step, run in steps:
+        started = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            readiness.mark_failed(step, e)
+            logger.error("Warmup step '{}' failed: {}: {}", step, type(e).__name__, e)
+            return readiness
+        readiness.step_done(step, time.perf_counter() - started)
+        logger.info("Warmup step '{}' done in {:.0f} ms", step, (time.perf_counter() - started) * 1000)
+
+    readiness.mark_ready()
+    logger.info("Service ready after {:.1f} s", time.time() - readiness.started_at)
+    return readiness
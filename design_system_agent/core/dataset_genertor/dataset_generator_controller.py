@@ -1,15 +1,17 @@
 """
 Dataset Generator Controller
 Provides interface for generating datasets from various sources
-"""
 
-from design_system_agent.core.dataset_genertor.crm_dataset.crm_layout_generator import CRMLayoutGenerator
+The CRM layout generator (all component builders and layout patterns) is
+imported when the controller is created, not when this module is imported.
+"""
 
 
 class DataSetGeneratorController:
     """Controller for managing dataset generation"""
     
     def __init__(self):
+        from design_system_agent.core.dataset_genertor.crm_dataset.crm_layout_generator import CRMLayoutGenerator
         self.crm_layout_generator = CRMLayoutGenerator()
 
     def generate_summary_dataset(self):
@@ -0,0 +1,118 @@
+"""
+Test /query admission control: concurrency limit, priority order, 429 with Retry-After
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from design_system_agent.agent.core.admission_control import AdmissionController, AdmissionRejected
+from design_system_agent.api import router as router_module
+
+
+async def hold(controller, priority, order, release, deadline_ms=10000):
+    async with controller.admit(priority, deadline_ms):
+        order.append(priority)
+        await release.wait()
+
+
+def test_limits_concurrency_and_serves_interactive_first():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=8, enabled=True)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(controller, "batch", order, release))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(hold(controller, priority, order, release))
+                  for priority in ("regeneration", "batch", "interactive")]
+        await asyncio.sleep(0.01)
+        assert controller.active == 1 and len(controller) == 3
+
+        release.set()
+        await asyncio.gather(first, *queued)
+        return order, controller.get_stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["batch", "interactive", "batch", "regeneration"]
+    assert stats["active"] == 0 and stats["completed"] == 4 and stats["queued"] == {"interactive": 0, "batch": 0, "regeneration": 0}
+
+
+def test_full_queue_sheds_lower_priority_or_rejects():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, enabled=True)
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(hold(controller, "interactive", order, release))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(hold(controller, "batch", order, release))
+        await asyncio.sleep(0)
+
+        interactive = asyncio.create_task(hold(controller, "interactive", order, release))  # sheds the batch request
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as shed:
+            await batch
+        with pytest.raises(AdmissionRejected) as full:
+            await hold(controller, "interactive", order, release)  # nothing lower left to shed
+
+        release.set()
+        await asyncio.gather(running, interactive)
+        return shed.value, full.value, controller.get_stats()
+
+    shed, full, stats = asyncio.run(scenario())
+    assert shed.reason == "shed" and full.reason == "queue_full"
+    assert stats["shed"] == 1 and stats["rejected"] == 1 and stats["completed"] == 2
+
+
+def test_rejects_when_estimated_wait_or_queueing_exceeds_deadline():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=8, enabled=True)
+        controller.service_time_s = 2.5
+        order, release = [], asyncio.Event()
+        running = asyncio.create_task(hold(controller, "interactive", order, release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as upfront:
+            await hold(controller, "interactive", order, release, deadline_ms=1000)
+
+        controller.service_time_s = 0.01  # estimate fits, but the slot never frees in time
+        started = time.perf_counter()
+        with pytest.raises(AdmissionRejected) as queued:
+            await hold(controller, "interactive", order, release, deadline_ms=50)
+        waited = time.perf_counter() - started
+
+        release.set()
+        await running
+        return upfront.value, queued.value, waited, controller
+
+    upfront, queued, waited, controller = asyncio.run(scenario())
+    assert upfront.reason == "deadline" and upfront.retry_after_header == "3"
+    assert queued.reason == "deadline" and 0.04 < waited < 1
+    assert controller.active == 0 and len(controller) == 0
+
+
+def test_query_endpoint_returns_429_with_retry_after(monkeypatch):
+    controller = AdmissionController(max_concurrent=1, max_queue=0, enabled=True)
+    monkeypatch.setattr(router_module, "get_admission_controller", lambda: controller)
+
+    def process_query(query, deadline_ms=None, profile=False, idempotency_key=None, tier=None, session_id=None):
+        time.sleep(0.2)
+        return {"query": query, "deadline_ms": deadline_ms}
+
+    monkeypatch.setattr(router_module, "get_agent", lambda: type("Agent", (), {"process_query": staticmethod(process_query)}))
+    app = FastAPI()
+    app.include_router(router_module.router)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(
+                client.post("/query", json={"query": "show all leads", "deadline_ms": 5000}),
+                client.post("/query", json={"query": "open cases", "priority": "batch"}),
+            )
+
+    ok, rejected = asyncio.run(scenario())
+    assert ok.status_code == 200 and 4000 < ok.json()["deadline_ms"] <= 5000
+    assert rejected.status_code == 429 and rejected.headers["Retry-After"] == "1"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,95 @@
+"""
+Test deadline-aware degradation in WorkflowExecutor
+"""
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from design_system_agent.agent.core.deadline import has_budget, llm_timeout_s, new_deadline
+from design_system_agent.agent.core.layout_store import get_layout_store, open_layout_store
+from design_system_agent.agent.core.llm_factory import LLMFactory
+from design_system_agent.agent.graph_nodes.fallback_layout_builder import FallbackLayoutBuilder
+from design_system_agent.agent.graph_nodes.layout_orchestrator import LLMLayoutSelectorFiller
+from design_system_agent.agent.graph_nodes.layout_scorer_node import OutputScorer
+from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+
+
+def _executor():
+    """WorkflowExecutor with the LLM-side components only (no RAG models needed)"""
+    executor = WorkflowExecutor.__new__(WorkflowExecutor)
+    executor.output_scorer = OutputScorer()
+    executor.llm_selector_filler = LLMLayoutSelectorFiller()
+    executor.fallback_builder = FallbackLayoutBuilder()
+    return executor
+
+
+def _state(deadline, layouts=None):
+    store_id = open_layout_store()
+    return {
+        "query": "show all leads",
+        "normalized_query": "show all leads",
+        "analysis": {"pattern_type": "FULL_COMPLEX", "complexity_level": "advanced", "object_type": "lead"},
+        "layout_store": store_id,
+        "retrieved_layouts": layouts or [],
+        "fetched_data": {},
+        "adapted_layout": get_layout_store(store_id).put({"rows": []}),
+        "routes": {},
+        "deadline": deadline,
+        "degraded": [],
+    }
+
+
+def test_budget_and_timeout():
+    assert has_budget(None, "llm_select_and_fill")
+    assert not has_budget(new_deadline(100), "llm_select_and_fill")
+    assert has_budget(new_deadline(100), "fetch_data")
+
+    timeout = llm_timeout_s(new_deadline(5000))
+    assert 4.0 < timeout <= 4.5
+    assert llm_timeout_s(new_deadline(0)) == 0.2
+
+
+def test_llm_call_timeout():
+    slow = RunnableLambda(lambda _: time.sleep(1) or "late")
+    assert LLMFactory.invoke(RunnableLambda(lambda x: x * 2), 2, timeout_s=1.0) == 4
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        LLMFactory.invoke(slow, None, timeout_s=0.1)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_short_budget_skips_scoring_llm():
+    executor = _executor()
+    state = executor.score_output(_state(new_deadline(50)))
+
+    assert state["routes"]["score_output"]["model"] is None
+    assert state["degraded"] == ["score_output:skip_llm"]
+    assert state["outcome"]["success"]
+
+
+def test_short_budget_uses_confident_top_candidate():
+    executor = _executor()
+    strong = {"id": "crm_1", "query": "show all leads", "vector_score": 0.9,
+              "layout": {"rows": [{"pattern_info": []}]}}
+
+    state = executor.llm_select_and_fill(_state(new_deadline(50), [strong]))
+
+    assert state["layout_ranking"]["llm_powered"] is False
+    assert not state["layout_ranking"].get("use_fallback")
+    assert state["degraded"] == ["llm_select_and_fill:skip_llm"]
+
+
+def test_short_budget_weak_candidate_uses_fallback_builder():
+    executor = _executor()
+    weak = {"id": "crm_2", "query": "lead detail", "vector_score": 0.2, "layout": {"rows": []}}
+
+    state = executor.llm_select_and_fill(_state(new_deadline(50), [weak]))
+
+    assert state["layout_ranking"]["use_fallback"]
+    assert state["degraded"] == ["llm_select_and_fill:skip_llm", "llm_select_and_fill:fallback_layout"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,103 @@
+"""
+Test load-adaptive degradation tiers: hysteresis, forcing, per-tier node behaviour
+"""
+import threading
+import time
+
+import pytest
+
+from design_system_agent.agent.core.degradation_tiers import TierController
+from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    for name, value in {"TIER_QUEUE_HIGH": "8", "TIER_QUEUE_LOW": "2", "TIER_LATENCY_HIGH_MS": "8000",
+                        "TIER_LATENCY_LOW_MS": "4000", "TIER_DWELL_S": "0"}.items():
+        monkeypatch.setenv(name, value)
+    for name in ("TIER_FORCE", "TIER_HEADER_ENABLED", "LOAD_ADAPTIVE_TIERS"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_steps_one_tier_at_a_time_with_hysteresis():
+    depth = {"value": 0}
+    controller = TierController(queue_depth=lambda: depth["value"])
+    assert controller.select() == "full"
+
+    depth["value"] = 10
+    assert [controller.select(), controller.select(), controller.select()] == ["lean", "minimal", "minimal"]
+
+    depth["value"] = 5  # between the low and high marks: no change either way
+    assert controller.select() == "minimal"
+
+    depth["value"] = 1
+    assert [controller.select(), controller.select()] == ["lean", "full"]
+
+
+def test_latency_steps_down_and_dwell_limits_changes(monkeypatch):
+    monkeypatch.setenv("TIER_DWELL_S", "60")
+    controller = TierController(queue_depth=lambda: 0)
+    for _ in range(20):
+        controller.record_latency(9000)
+    assert controller.select() == "lean"
+    for _ in range(20):
+        controller.record_latency(9000)
+    assert controller.select() == "lean"  # dwell time not over
+    assert controller.get_stats()["p95_latency_ms"] == 9000
+
+
+def test_concurrent_requests_step_once_per_dwell(monkeypatch):
+    monkeypatch.setenv("TIER_DWELL_S", "60")
+    ready = threading.Barrier(4)
+
+    def queue_depth():
+        time.sleep(0.05)  # every request passes the unlocked dwell check before one changes the tier
+        return 100
+
+    controller = TierController(queue_depth=queue_depth)
+    threads = [threading.Thread(target=lambda: (ready.wait(), controller.select())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert controller.tier == "lean"
+
+
+def test_forced_tier_and_header(monkeypatch):
+    controller = TierController(queue_depth=lambda: 100, forced="minimal")
+    assert controller.select() == "minimal"
+    assert controller.select("full") == "minimal"  # header ignored unless enabled
+
+    monkeypatch.setenv("TIER_HEADER_ENABLED", "true")
+    assert controller.select("lean") == "lean"
+    with pytest.raises(ValueError):
+        controller.select("tiny")
+    assert TierController(queue_depth=lambda: 100, enabled=False).select() == "full"
+
+
+def test_nodes_follow_the_tier(monkeypatch):
+    executor = WorkflowExecutor.__new__(WorkflowExecutor)  # no models needed for routing and retrieval
+    searches = []
+
+    class FakeRAG:
+        def search(self, **kwargs):
+            searches.append(kwargs)
+            return [{"id": "layout-1", "vector_score": 0.9}]
+
+    executor.layout_rag = FakeRAG()
+
+    minimal = {"tier": "minimal", "deadline": None, "degraded": [], "rag_query": {"search_query": "leads"}}
+    for node in ("analyze_and_reformulate", "llm_select_and_fill", "score_output"):
+        assert executor._route(minimal, node) == {"name": "tier_minimal", "node": node, "model": None}
+    executor.retrieve_layouts(minimal)
+    assert searches[-1] == {"query": ["leads"], "top_k": 1, "rerank": False, "final_k": 1}
+
+    lean = {"tier": "lean", "deadline": None, "degraded": [], "rag_query": {"search_query": "leads"}}
+    assert executor._route(lean, "score_output")["model"] is None
+    executor.retrieve_layouts(lean)
+    assert searches[-1]["top_k"] == 5 and searches[-1]["rerank"] is True
+    assert lean["degraded"] == ["score_output:tier_lean"]
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,154 @@
+"""
+Test graph checkpoints: SQLite saver with TTL, retries resuming at the failed node
+"""
+import contextvars
+import time
+
+import pytest
+
+from design_system_agent.agent.core.degradation_tiers import TierController
+from design_system_agent.agent.core.graph_checkpoints import SQLiteCheckpointSaver
+from design_system_agent.agent.core.instrumentation import start_request
+from design_system_agent.agent.core.single_flight import ExecutionInProgress, SingleFlight
+from design_system_agent.agent.graph_nodes.default_layout import DefaultLayoutBuilder
+from design_system_agent.agent.graph_nodes.fallback_layout_builder import FallbackLayoutBuilder
+from design_system_agent.agent.graph_nodes.layout_orchestrator import LLMLayoutSelectorFiller
+from design_system_agent.agent.graph_nodes.layout_scorer_node import OutputScorer
+from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
+from design_system_agent.agent.layout_graph_agent import GraphAgent
+from design_system_agent.agent.layout_graph_builder import GraphBuilder
+from design_system_agent.agent.tools.data_fetcher import DataFetcherTool
+
+
+LAYOUT = {"id": "crm_0", "query": "show all leads", "patterns_used": ["LIST_SIMPLE"],
+          "layout": {"rows": [{"pattern_type": "data_list", "pattern_info": [{"type": "Table", "props": {}}]}]}}
+
+
+class FakeRAG:
+    def search(self, **kwargs):
+        return [{**LAYOUT, "vector_score": 0.9}]
+
+    def get_layout(self, layout_id):
+        return LAYOUT if layout_id == "crm_0" else None
+
+
+def counted(calls, name, node, fail_first=False):
+    def run(state):
+        calls.append(name)
+        if fail_first and calls.count(name) == 1:
+            raise RuntimeError("LLM gateway unavailable")
+        return node(state)
+    return run
+
+
+def _agent(saver, calls):
+    """GraphAgent on the minimal tier (no LLM); the first llm_select_and_fill fails"""
+    executor = WorkflowExecutor.__new__(WorkflowExecutor)
+    executor.layout_rag = FakeRAG()
+    executor.query_analyzer = QueryAnalyzer()
+    executor.data_fetcher = DataFetcherTool()
+    executor.output_scorer = OutputScorer()
+    executor.llm_selector_filler = LLMLayoutSelectorFiller()
+    executor.fallback_builder = FallbackLayoutBuilder()
+    executor.default_builder = DefaultLayoutBuilder()
+    for node in ("analyze_and_reformulate", "retrieve_layouts", "fetch_data", "llm_select_and_fill"):
+        setattr(executor, node, counted(calls, node, getattr(executor, node), fail_first=node == "llm_select_and_fill"))
+
+    agent = GraphAgent.__new__(GraphAgent)
+    agent.executor = executor
+    agent.checkpointer = saver
+    agent.graph = GraphBuilder.build(executor, checkpointer=saver)
+    agent.verbose = False
+    agent.single_flight = SingleFlight(enabled=True)
+    agent.tiers = TierController(forced="minimal")
+    return agent
+
+
+def test_retry_resumes_at_the_failed_node(tmp_path):
+    saver = SQLiteCheckpointSaver(path=str(tmp_path / "graph.sqlite"), ttl_s=60)
+    calls = []
+    agent = _agent(saver, calls)
+
+    with pytest.raises(RuntimeError):
+        agent.invoke("show all leads", idempotency_key="retry-1")
+    assert saver.get_stats()["threads"] == 1
+
+    result = agent.invoke("show all leads", idempotency_key="retry-1")
+
+    assert calls.count("analyze_and_reformulate") == 1 and calls.count("retrieve_layouts") == 1
+    assert calls.count("llm_select_and_fill") == 2
+    assert result["metrics"]["checkpoint"] == {"thread_id": "retry-1", "resumed_at": "llm_select_and_fill"}
+    assert set(result["metrics"]["nodes_ms"]) == {"llm_select_and_fill", "score_output"}
+    assert result["id"] == "crm_0" and result["layout"] == LAYOUT["layout"]
+    assert saver.get_stats()["threads"] == 0  # completed threads are deleted
+
+
+def test_other_query_under_the_same_id_starts_over(tmp_path):
+    saver = SQLiteCheckpointSaver(path=str(tmp_path / "graph.sqlite"), ttl_s=60)
+    calls = []
+    agent = _agent(saver, calls)
+
+    with pytest.raises(RuntimeError):
+        agent.invoke("show all leads", idempotency_key="key-1")
+    agent.single_flight = SingleFlight(enabled=True)  # forget the key in-process, like another worker
+    result = agent.invoke("open cases", idempotency_key="key-1")
+
+    assert calls.count("analyze_and_reformulate") == 2
+    assert result["metrics"]["checkpoint"]["resumed_at"] is None
+
+
+def test_live_threads_are_not_shared(tmp_path):
+    path = str(tmp_path / "graph.sqlite")
+    saver = SQLiteCheckpointSaver(path=path, ttl_s=60)
+    calls = []
+    agent = _agent(saver, calls)
+    other_worker = SQLiteCheckpointSaver(path=path, ttl_s=60)
+    key_lease = other_worker.acquire_lease("key-1", time.time() + 5)
+    trace_lease = other_worker.acquire_lease("trace-1", time.time() + 5)
+    assert key_lease and trace_lease and other_worker.acquire_lease("key-1", time.time() + 5) is None
+
+    with pytest.raises(ExecutionInProgress):
+        agent.invoke("show all leads", idempotency_key="key-1")
+    assert calls == []
+
+    # A request ID reused by concurrent requests (e.g. a propagated trace ID) gets its own thread
+    def invoke_as_trace():
+        start_request("trace-1")
+        with pytest.raises(RuntimeError):
+            agent.invoke("show all leads")
+    contextvars.copy_context().run(invoke_as_trace)
+    assert calls.count("analyze_and_reformulate") == 1 and saver.get_stats()["threads"] == 1
+    assert other_worker.get_tuple({"configurable": {"thread_id": "trace-1"}}) is None
+
+    other_worker.release_lease("key-1", key_lease)
+    agent.single_flight = SingleFlight(enabled=True)
+    assert agent.invoke("show all leads", idempotency_key="key-1")["metrics"]["checkpoint"]["thread_id"] == "key-1"
+    assert saver.acquire_lease("key-1", time.time()) is not None  # released after the execution
+
+
+def test_checkpoints_and_layouts_expire(tmp_path):
+    path = str(tmp_path / "graph.sqlite")
+    saver = SQLiteCheckpointSaver(path=path, ttl_s=60)
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+    checkpoint = {"v": 4, "id": "c1", "ts": "2026-01-01T00:00:00+00:00", "channel_values": {"query": "leads"},
+                  "channel_versions": {"query": 1}, "versions_seen": {}, "updated_channels": ["query"]}
+    saved = saver.put(config, checkpoint, {"step": 1}, {"query": 1})
+    saver.put_writes(saved, [("tier", "lean")], task_id="task-1")
+    saver.layouts("t1")["local_1"] = {"layout": {"rows": []}}
+
+    reopened = SQLiteCheckpointSaver(path=path, ttl_s=60)  # e.g. another worker
+    stored = reopened.get_tuple({"configurable": {"thread_id": "t1"}})
+    assert stored.checkpoint["channel_values"] == {"query": "leads"}
+    assert stored.pending_writes == [("task-1", "tier", "lean")]
+    assert reopened.layouts("t1") == {"local_1": {"layout": {"rows": []}}}
+
+    expired = SQLiteCheckpointSaver(path=path, ttl_s=0)
+    time.sleep(0.01)
+    assert expired.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+    reopened.delete_thread("t1")
+    assert reopened.layouts("t1") == {} and reopened.get_stats()["threads"] == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,110 @@
+"""
+Test the inference sidecar protocol and VectorLayoutRAGEngine client mode
+"""
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from design_system_agent.agent.core.inference_sidecar import InferenceClient, InferenceSidecar, SidecarError
+from design_system_agent.agent.core.micro_batcher import MicroBatcher
+from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine, read_faiss_index
+
+
+INDEX_DIR = Path(__file__).parent / "design_system_agent" / "vector_index"
+
+
+def fake_embed(texts):
+    """Deterministic normalized 384-d vectors (stand-in for the SentenceTransformer)"""
+    vectors = np.stack([np.random.default_rng(zlib.crc32(text.encode())).standard_normal(384) for text in texts])
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype("float32")
+
+
+def fake_rerank(pairs):
+    if any(query == "explode" for query, _ in pairs):
+        raise ValueError("bad pair")
+    return np.array([len(document) / 100 for _, document in pairs], dtype="float32")
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    engine = SimpleNamespace(
+        embedding_dim=384,
+        index=read_faiss_index(INDEX_DIR / "crm_layouts.faiss"),
+        metadata_path=INDEX_DIR / "crm_layouts_metadata.pkl",
+        encode_batcher=MicroBatcher("sidecar_embedding", fake_embed, max_wait_ms=1, enabled=True),
+        rerank_batcher=MicroBatcher("sidecar_reranker", fake_rerank, max_wait_ms=1, enabled=True),
+        get_stats=lambda: {"total_documents": 1},
+    )
+    server = InferenceSidecar(engine, str(tmp_path / "inference.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_embed_search_rerank_round_trip_through_shared_memory(sidecar):
+    client = InferenceClient(sidecar.path, timeout_s=5)
+    try:
+        embeddings = client.embed(["show all leads", "open cases"])
+        np.testing.assert_allclose(embeddings, fake_embed(["show all leads", "open cases"]))
+
+        distances, indices = client.search(["show all leads"], 5)
+        expected_d, expected_i = sidecar.engine.index.search(fake_embed(["show all leads"]), 5)
+        np.testing.assert_array_equal(indices, expected_i)
+        np.testing.assert_allclose(distances, expected_d, rtol=1e-6)
+
+        np.testing.assert_allclose(client.rerank([["q", "abc"], ["q", "abcdef"]]), [0.03, 0.06])
+        assert client.info["shm"] is True and client.stats() == {"total_documents": 1}
+    finally:
+        client.close()
+
+
+def test_large_results_and_clients_without_shared_memory_go_inline(sidecar):
+    for shm_bytes in (0, 64):  # no segment / segment too small for 10 x 384 floats
+        client = InferenceClient(sidecar.path, timeout_s=5, shm_bytes=shm_bytes)
+        texts = [f"query {i}" for i in range(10)]
+        np.testing.assert_allclose(client.embed(texts), fake_embed(texts))
+        client.close()
+
+
+def test_sidecar_errors_are_raised_and_connection_stays_usable(sidecar, monkeypatch):
+    client = InferenceClient(sidecar.path, timeout_s=5)
+    with pytest.raises(SidecarError, match="bad pair"):
+        client.rerank([["explode", "x"]])
+    assert client.rerank([["q", "x"]]).shape == (1,)
+    client.close()
+
+    monkeypatch.setenv("INFERENCE_SIDECAR_WAIT_S", "0")
+    with pytest.raises(SidecarError, match="not reachable"):
+        InferenceClient(sidecar.path + ".missing")
+
+
+def test_engine_client_mode_searches_via_sidecar(sidecar, monkeypatch):
+    monkeypatch.setenv("INFERENCE_SIDECAR_SOCKET", sidecar.path)
+    monkeypatch.setenv("INFERENCE_SIDECAR_WAIT_S", "1")
+    engine = VectorLayoutRAGEngine(use_sidecar=True)
+    try:
+        assert engine.embedding_model is None and engine.index is None
+        assert engine.get_stats()["inference"] == "sidecar"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda q: engine.search(q, top_k=5, final_k=3), ["show all leads", "lead list"] * 4))
+
+        for layouts in results:
+            assert 0 < len(layouts) <= 3
+            assert all("rerank_score" in layout and "layout" in layout for layout in layouts)
+        assert results[0] == results[2]
+    finally:
+        engine.sidecar.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,90 @@
+"""
+Test hot-path instrumentation: histograms, Prometheus text output, request IDs and spans
+"""
+import contextvars
+
+import pytest
+
+from design_system_agent.agent.core import instrumentation
+from design_system_agent.agent.core.instrumentation import (
+    MetricsRegistry, instrument_node, start_request, start_span_recording, timed
+)
+from design_system_agent.agent.core.llm_resilience import CircuitBreaker, ResilientLLMCaller
+
+
+class FakeLLM:
+    def __init__(self, error=None):
+        self.error = error
+
+    def invoke(self, llm_input):
+        if self.error:
+            raise self.error
+        return "ok"
+
+
+def test_histogram_renders_prometheus_text():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test latency", (0.1, 1.0), ("node",))
+    histogram.observe(0.05, node="a")
+    histogram.observe(0.5, node="a")
+    histogram.observe(5.0, node="a")
+    registry.add_collector(lambda: {"test_gauge": ("A gauge", {'{kind="x"}': 2})})
+
+    text = registry.render()
+
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{node="a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{node="a",le="1"} 2' in text
+    assert 'test_seconds_bucket{node="a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{node="a"} 3' in text
+    assert 'test_gauge{kind="x"} 2' in text
+
+
+def test_spans_carry_request_id_across_nodes():
+    def run():
+        request_id = start_request("req-1")
+        spans = start_span_recording()
+        node = instrument_node("retrieve_layouts", lambda state: state)
+        node({})
+        with timed(instrumentation.RAG_STAGE_SECONDS, stage="rerank"):
+            pass
+        return request_id, spans
+
+    request_id, spans = contextvars.copy_context().run(run)
+
+    assert request_id == "req-1"
+    assert [span.get("node") or span.get("stage") for span in spans] == ["retrieve_layouts", "rerank"]
+    assert all(span["request_id"] == "req-1" for span in spans)
+
+
+def test_llm_call_outcomes_are_recorded():
+    caller = ResilientLLMCaller(max_retries=0, hedging=False, breaker=CircuitBreaker(failure_threshold=1))
+
+    def run():
+        spans = start_span_recording()
+        caller.call(FakeLLM(), "hi", name="probe")
+        with pytest.raises(ConnectionError):
+            caller.call(FakeLLM(ConnectionError("down")), "hi", name="probe")
+        with pytest.raises(Exception):
+            caller.call(FakeLLM(), "hi", name="probe")
+        return spans
+
+    spans = contextvars.copy_context().run(run)
+    assert [span["outcome"] for span in spans] == ["success", "error", "short_circuit"]
+    assert 'dsa_llm_call_duration_seconds_count{name="probe",outcome="success"}' in instrumentation.get_metrics_registry().render()
+
+
+def test_disabled_metrics_are_noops(monkeypatch):
+    monkeypatch.setattr(instrumentation, "METRICS_ENABLED", False)
+    node = lambda state: state
+
+    assert instrument_node("plan_tasks", node) is node
+    assert timed(instrumentation.NODE_SECONDS, node="x") is instrumentation._NOOP_TIMER
+
+    histogram = MetricsRegistry().histogram("off_seconds", "Off", (1.0,))
+    histogram.observe(0.5)
+    assert "off_seconds_count" not in "\n".join(histogram.render())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
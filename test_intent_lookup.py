@@ -0,0 +1,84 @@
+"""
+Test the intent lookup table: offline build from the corpus, rebuild on corpus change, retrieval without vector search
+"""
+import pickle
+from pathlib import Path
+
+import pytest
+
+from design_system_agent.agent.core.intent_lookup import IntentLookupTable, build_intent_table, intent_key
+from design_system_agent.agent.core.layout_store import close_layout_store, open_layout_store
+from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
+from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+
+
+METADATA_PATH = Path(__file__).parent / "design_system_agent" / "vector_index" / "crm_layouts_metadata.pkl"
+
+with open(METADATA_PATH, "rb") as f:
+    CORPUS = pickle.load(f)
+
+LEADS = {"object_type": "lead", "pattern_type": "LIST_SIMPLE", "view_type": "table",
+         "aggregation_type": None, "group_by_field": None, "confidence": 0.95}
+
+
+def _components(layout_id):
+    layout = CORPUS[int(layout_id.split("_")[1])]["layout"]
+    return {component["type"] for row in layout["rows"] for component in row["pattern_info"]}
+
+
+class FakeRAG(VectorLayoutRAGEngine):
+    """Real corpus and intent table, counted vector searches"""
+
+    def __init__(self):
+        self.layouts_metadata = CORPUS
+        self.intent_table = IntentLookupTable(build_intent_table(CORPUS))
+        self.searches = 0
+
+    def search(self, **kwargs):
+        self.searches += 1
+        return [{**self._catalog_entry(0), "vector_score": 0.7}]
+
+
+def test_table_ranks_layouts_with_the_view_components():
+    table = build_intent_table(CORPUS, top_k=3)
+
+    tables = table[intent_key(LEADS)]
+    assert len(tables) == 3 and all("Table" in _components(layout_id) for layout_id in tables)
+    cards = table[intent_key({**LEADS, "view_type": "card"})]
+    assert all("Card" in _components(layout_id) for layout_id in cards)
+    # No view type: the pattern's (PATTERN_TO_VIEW_TYPE: LIST_SIMPLE -> table)
+    assert intent_key({**LEADS, "view_type": None}) == intent_key(LEADS) == "lead|list_simple|table||"
+
+
+def test_table_is_rebuilt_for_another_corpus(tmp_path):
+    path = tmp_path / "crm_layouts_intents.json"
+    built = IntentLookupTable.load_or_build(path, CORPUS)
+    assert path.exists() and IntentLookupTable.load_or_build(path, CORPUS).table == built.table
+
+    smaller = IntentLookupTable.load_or_build(path, CORPUS[:10])
+    assert smaller.table != built.table and smaller.lookup({**LEADS, "object_type": "loan"}) == []
+    assert smaller.get_stats()["miss"] == 1
+    assert IntentLookupTable(built.table, enabled=False).lookup(LEADS) == []
+
+
+def test_confident_analyses_skip_the_vector_search():
+    executor = WorkflowExecutor.__new__(WorkflowExecutor)
+    executor.layout_rag = FakeRAG()
+    store_id = open_layout_store(catalog=executor.layout_rag.get_layout)
+    try:
+        state = {"tier": "full", "deadline": None, "degraded": [], "layout_store": store_id,
+                 "analysis": LEADS, "rag_query": {"search_query": "show all leads"}}
+        executor.retrieve_layouts(state)
+        assert executor.layout_rag.searches == 0
+        assert [record["id"] for record in state["retrieved_layouts"]] == executor.layout_rag.intent_table.table[intent_key(LEADS)]
+        assert state["retrieved_layouts"][0]["retrieval"] == "intent_lookup"
+
+        executor.retrieve_layouts({**state, "analysis": {**LEADS, "confidence": 0.6}})  # keyword analysis
+        executor.retrieve_layouts({**state, "analysis": {**LEADS, "object_type": "loan"}})  # not in the table
+        assert executor.layout_rag.searches == 2
+    finally:
+        close_layout_store(store_id)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
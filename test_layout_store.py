@@ -0,0 +1,79 @@
+"""
+Test reference-based layout passing: layout store, slim state, result serialization
+"""
+import pytest
+
+from design_system_agent.agent.core.layout_store import (
+    LayoutStore, close_layout_store, get_layout_store, open_layout_store
+)
+from design_system_agent.agent.graph_nodes.fallback_layout_builder import FallbackLayoutBuilder
+from design_system_agent.agent.graph_nodes.layout_orchestrator import LLMLayoutSelectorFiller
+from design_system_agent.agent.graph_nodes.layout_scorer_node import OutputScorer
+from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+from design_system_agent.agent.layout_graph_agent import GraphAgent
+
+
+CATALOG = {
+    "crm_0": {"id": "crm_0", "query": "show all leads", "patterns_used": ["LIST_SIMPLE"],
+              "layout": {"rows": [{"pattern_type": "data_list", "pattern_info": [{"type": "Table", "props": {}}]}]},
+              "metadata_info": {"source": "catalog"}},
+}
+
+
+class FakeRAG:
+    def search(self, **kwargs):
+        return [{**CATALOG["crm_0"], "vector_score": 0.9, "final_score": 0.8}]
+
+    def get_layout(self, layout_id):
+        return CATALOG.get(layout_id)
+
+
+def test_store_records_and_resolves():
+    store = LayoutStore(catalog=CATALOG.get)
+    record = store.record({**CATALOG["crm_0"], "vector_score": 0.9})
+    assert record == {"id": "crm_0", "query": "show all leads", "patterns_used": ["LIST_SIMPLE"], "vector_score": 0.9}
+    assert store.resolve(record)["layout"] is CATALOG["crm_0"]["layout"]
+    assert len(store) == 0  # catalog bodies are not copied
+
+    generated = store.record({"layout": {"rows": []}, "vector_score": 0.1})
+    assert generated == {"id": "local_1", "vector_score": 0.1}
+    assert store.resolve(generated)["layout"] == {"rows": []}
+    assert store.get("crm_9") is None and store.get(None) is None
+
+
+def test_store_registry():
+    store_id = open_layout_store()
+    assert isinstance(get_layout_store(store_id), LayoutStore)
+    assert open_layout_store() != store_id
+    close_layout_store(store_id)
+    assert get_layout_store(store_id) is None
+
+
+def test_state_carries_ids_and_result_resolves_bodies():
+    executor = WorkflowExecutor.__new__(WorkflowExecutor)  # no models needed on the no-LLM routes
+    executor.layout_rag = FakeRAG()
+    executor.output_scorer = OutputScorer()
+    executor.llm_selector_filler = LLMLayoutSelectorFiller()
+    executor.fallback_builder = FallbackLayoutBuilder()
+
+    store_id = open_layout_store(catalog=executor.layout_rag.get_layout)
+    state = {
+        "query": "show all leads", "normalized_query": "show all leads", "tier": "minimal",
+        "analysis": {"object_type": "lead"}, "rag_query": {"search_query": "show all leads"},
+        "layout_store": store_id, "fetched_data": {}, "routes": {}, "deadline": None, "degraded": [],
+    }
+    for node in (executor.retrieve_layouts, executor.llm_select_and_fill, executor.score_output):
+        state = node(state)
+
+    assert "layout" not in state["retrieved_layouts"][0] and state["retrieved_layouts"][0]["id"] == "crm_0"
+    assert state["selected_layout"] == state["adapted_layout"] == state["outcome"]["layout"] == "local_1"
+
+    agent = GraphAgent.__new__(GraphAgent)
+    result = agent._extract_result(state)
+    assert result["id"] == "crm_0"
+    assert result["layout"]["rows"][0]["pattern_info"][0]["type"] == "Table"
+    close_layout_store(store_id)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
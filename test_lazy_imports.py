@@ -0,0 +1,55 @@
+"""
+Tests for lazy loading of heavy dependencies (fresh interpreter per check)
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+HEAVY = ("torch", "faiss", "sentence_transformers", "langgraph", "langchain_openai")
+
+
+def loaded_after_import(statement: str):
+    """Heavy packages present in sys.modules after running an import in a fresh interpreter"""
+    code = f"import sys, json; {statement}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).parent, capture_output=True, text=True, timeout=300
+    )
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", [
+    "design_system_agent.api.router",
+    "design_system_agent.agent.core.vector_layout_rag",
+    "design_system_agent.agent.layout_graph_agent",
+])
+def test_entry_points_do_not_load_heavy_dependencies(module):
+    assert loaded_after_import(f"import {module}") == []
+
+
+def test_dataset_controller_defers_layout_generator():
+    code = (
+        "import sys; import design_system_agent.core.dataset_genertor.dataset_generator_controller; "
+        "print([m for m in sys.modules if m.endswith('crm_layout_generator')])"
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == "[]"
+
+
+def test_package_exports_resolve_lazily():
+    from design_system_agent.agent import core, graph_nodes
+    from design_system_agent.agent.core.logging_config import configure_logging
+
+    assert core.configure_logging is configure_logging
+    assert graph_nodes.WorkflowExecutor.__name__ == "WorkflowExecutor"
+    with pytest.raises(AttributeError):
+        core.does_not_exist
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
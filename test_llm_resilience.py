@@ -0,0 +1,153 @@
+"""
+Test LLM retries, hedging and circuit breaker against a local fake OpenAI server
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+from langchain_openai import ChatOpenAI
+
+from design_system_agent.agent.core.llm_resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientLLMCaller,
+)
+
+
+def _completion(content):
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+    }
+
+
+@pytest.fixture
+def fake_openai():
+    """Fake chat-completions server answering with the scripted status codes, then 200"""
+    script = {"statuses": [], "hits": 0, "delay_s": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            script["hits"] += 1
+            time.sleep(script["delay_s"])
+            status = script["statuses"].pop(0) if script["statuses"] else 200
+            body = _completion("ok") if status == 200 else {"error": {"message": "fail", "type": "server_error"}}
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm = ChatOpenAI(
+        model="gpt-4o-mini",
+        api_key="sk-test",
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        max_retries=0,
+    )
+    yield llm, script
+    server.shutdown()
+
+
+def test_retries_rate_limit_then_succeeds(fake_openai):
+    llm, script = fake_openai
+    script["statuses"] = [429, 503]
+    caller = ResilientLLMCaller(max_retries=2, base_backoff_s=0.01, hedging=False)
+
+    assert caller.call(llm, "hi").content == "ok"
+    stats = caller.get_stats()
+    assert script["hits"] == 3
+    assert stats["retries"] == 2 and stats["successes"] == 1
+    assert stats["circuit"]["state"] == "closed"
+
+
+def test_breaker_opens_and_short_circuits(fake_openai):
+    llm, script = fake_openai
+    script["statuses"] = [500] * 10
+    caller = ResilientLLMCaller(
+        max_retries=0, hedging=False,
+        breaker=CircuitBreaker(failure_threshold=3, recovery_time_s=60)
+    )
+
+    for _ in range(3):
+        with pytest.raises(Exception):
+            caller.call(llm, "hi")
+    with pytest.raises(CircuitOpenError):
+        caller.call(llm, "hi")
+
+    assert script["hits"] == 3
+    assert caller.get_stats()["short_circuits"] == 1
+    assert caller.breaker.is_open()
+
+
+def test_abandoned_requests_stop_at_the_call_deadline(fake_openai):
+    llm, script = fake_openai
+    script["delay_s"] = 3  # slow provider; the client's own timeout is 600s
+    caller = ResilientLLMCaller(max_retries=0, hedging=False)
+    submitted = []
+    submit = caller._submit
+    caller._submit = lambda *args: submitted.append(submit(*args)) or submitted[-1]
+
+    with pytest.raises(TimeoutError):
+        caller.call(llm | RunnableLambda(lambda message: message.content), "hi", timeout_s=0.3)
+    # The pool thread is released at the deadline, not when the provider answers
+    assert submitted[0].exception(timeout=1) is not None
+
+
+def test_half_open_trial_closes_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time_s=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()        # trial call
+    assert not breaker.allow()    # only one trial at a time
+    breaker.record_success()
+    assert breaker.get_state()["state"] == "closed"
+
+
+def test_hedge_after_p95_delay():
+    calls = {"n": 0}
+
+    def flaky_latency(_):
+        calls["n"] += 1
+        time.sleep(1.0 if calls["n"] == 1 else 0.01)
+        return calls["n"]
+
+    caller = ResilientLLMCaller(hedging=True, max_hedge_ratio=1.0)
+    for _ in range(20):
+        caller.latency.record("selector", 0.05)
+
+    started = time.perf_counter()
+    assert caller.call(RunnableLambda(flaky_latency), None, name="selector") == 2
+    assert time.perf_counter() - started < 0.5
+    assert caller.get_stats()["hedge_wins"] == 1
+
+
+def test_non_retryable_error_is_not_retried():
+    calls = {"n": 0}
+
+    def invalid(_):
+        calls["n"] += 1
+        raise ValueError("schema mismatch")
+
+    caller = ResilientLLMCaller(max_retries=3, hedging=False)
+    with pytest.raises(ValueError):
+        caller.call(RunnableLambda(invalid), None)
+    assert calls["n"] == 1
+    assert caller.breaker.get_state()["consecutive_failures"] == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
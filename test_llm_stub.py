@@ -0,0 +1,89 @@
+"""
+Test the pipeline LLM clients against the local OpenAI-compatible stub server
+"""
+import socket
+import threading
+import time
+
+import httpx
+import pytest
+import uvicorn
+from langchain_openai import ChatOpenAI
+
+from design_system_agent.api import llm_stub
+from design_system_agent.agent.graph_nodes.layout_scorer_node import LayoutScore, OutputScorer
+from design_system_agent.agent.graph_nodes.layout_selector_agent import LayoutSelectorAgent
+from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalysis, QueryAnalyzer
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(llm_stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def fast_stub(stub_url, monkeypatch):
+    monkeypatch.setenv("LLM_BASE_URL", f"{stub_url}/v1")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    httpx.post(f"{stub_url}/stub/config", json={"reset": True, "latency_dist": "fixed", "latency_ms": 0})
+
+
+def test_structured_analysis_and_score():
+    analysis = QueryAnalyzer.invoke("branch wise count of leads")
+    assert isinstance(analysis, QueryAnalysis)
+    assert analysis.object_type == "lead"
+    assert analysis.group_by_field == "branch"
+
+    score = OutputScorer().score_output({"rows": []}, "show leads", {})
+    assert isinstance(score, LayoutScore) and score.overall_score == 0.85
+
+
+def test_selector_tool_loop_picks_candidate():
+    agent = LayoutSelectorAgent(use_tools=True)
+    assert agent.use_tools
+
+    candidates = [
+        {"id": "crm_7", "query": "show all leads", "layout": {"rows": [{"pattern_info": []}]}},
+        {"id": "crm_8", "query": "lead detail", "layout": {"rows": []}},
+    ]
+    result = agent.select_best_layout("show all leads", "show all leads", candidates, "N/A")
+
+    assert result["confidence"] == 0.9
+    assert result["selected_layout"]["id"] == "crm_7"
+
+
+def test_latency_errors_and_streaming(stub_url):
+    llm = ChatOpenAI(model="gpt-4o-mini", api_key="stub", base_url=f"{stub_url}/v1", max_retries=0)
+
+    httpx.post(f"{stub_url}/stub/config", json={"latency_ms": 200})
+    started = time.perf_counter()
+    llm.invoke("hi")
+    assert time.perf_counter() - started >= 0.2
+
+    httpx.post(f"{stub_url}/stub/config", json={"latency_ms": 0, "tokens_per_s": 0})
+    chunks = [c.content for c in llm.stream("hi")]
+    assert "".join(chunks) == "stub response" and len(chunks) > 2
+
+    httpx.post(f"{stub_url}/stub/config", json={"error_rate": 1.0, "error_statuses": [429]})
+    with pytest.raises(Exception) as error:
+        llm.invoke("hi")
+    assert getattr(error.value, "status_code", None) == 429
+
+
+def test_example_from_schema():
+    schema = QueryAnalysis.model_json_schema()
+    QueryAnalysis(**llm_stub.example_from_schema(schema))
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
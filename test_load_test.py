@@ -0,0 +1,76 @@
+"""
+Test the asyncio load generator against an in-process fake of the API
+"""
+import argparse
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from benchmarks.load_test import compare, parse_mix, run_load
+
+
+def make_app():
+    app = FastAPI()
+    calls = {"rag": 0}
+
+    @app.post("/api/v1/query")
+    async def query(body: dict):
+        await asyncio.sleep(0.002)
+        return {"layout": {}, "metrics": {"nodes_ms": {"retrieve_layouts": 1.5, "llm_select_and_fill": 4.0}}}
+
+    @app.post("/api/v1/rag/search")
+    async def rag(body: dict):
+        calls["rag"] += 1
+        if calls["rag"] % 5 == 0:
+            raise HTTPException(status_code=503)
+        return {"query": body["query"], "results": [], "total_results": 0}
+
+    return app
+
+
+def make_args(**overrides):
+    args = dict(
+        base_url="http://test", mix="query=1,rag=1", concurrency=4, rate=0.0, requests=40,
+        duration=0.0, deadline_ms=None, priority=None, timeout=10.0, seed=7,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def run(args):
+    return asyncio.run(run_load(args, transport=httpx.ASGITransport(app=make_app(), raise_app_exceptions=False)))
+
+
+def test_closed_loop_reports_endpoints_and_nodes():
+    results = run(make_args())
+
+    endpoints = results["endpoints"]
+    assert endpoints["query"]["requests"] + endpoints["rag"]["requests"] == 40
+    assert endpoints["query"]["errors"] == 0
+    assert endpoints["rag"]["errors"] > 0
+    assert endpoints["rag"]["statuses"]["503"] == endpoints["rag"]["errors"]
+    assert {"p50_ms", "p95_ms", "p99_ms"} <= set(endpoints["query"])
+    assert results["nodes"]["llm_select_and_fill"]["p50_ms"] == 4.0
+
+
+def test_open_loop_rate():
+    results = run(make_args(rate=200.0, requests=20, mix="query=1"))
+    assert results["endpoints"]["query"]["requests"] == 20
+    assert set(results["endpoints"]) == {"query"}
+
+
+def test_compare_and_mix():
+    baseline = {"endpoints": {"query": {"p50_ms": 10.0, "p95_ms": 20.0}}, "nodes": {}}
+    current = {"endpoints": {"query": {"p50_ms": 12.0, "p95_ms": 18.0}}, "nodes": {}}
+    rows = {row["metric"]: row["change_pct"] for row in compare(current, baseline)}
+    assert rows == {"p50_ms": 20.0, "p95_ms": -10.0}
+
+    assert parse_mix("query=1,rag=3") == {"query": 1.0, "rag": 3.0}
+    with pytest.raises(ValueError):
+        parse_mix("bogus=1")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,95 @@
+"""
+Test the loguru logging pipeline: module levels, per-request verbosity, sampling, lazy formatting
+"""
+import contextvars
+import sys
+
+import pytest
+from loguru import logger
+
+from design_system_agent.agent.core import logging_config
+from design_system_agent.agent.core.instrumentation import start_request
+from design_system_agent.agent.core.logging_config import (
+    configure_logging, debug_enabled, sampled_logger, set_request_log_level
+)
+
+
+@pytest.fixture
+def records():
+    collected = []
+    yield collected
+    logger.remove()
+    logging_config._handler_id = None
+    logger.add(sys.stderr)
+
+
+def sink_into(collected):
+    return lambda message: collected.append(message.record)
+
+
+def test_module_levels(records):
+    configure_logging(sink=sink_into(records), level="DEBUG", module_levels="test_logging_config=WARNING", enqueue=False)
+
+    logger.info("hidden")
+    logger.warning("shown")
+
+    assert [r["message"] for r in records] == ["shown"]
+
+
+def test_request_verbosity_and_lazy_formatting(records):
+    configure_logging(sink=sink_into(records), level="INFO", request_override=True, enqueue=False)
+    calls = []
+
+    def expensive():
+        calls.append(1)
+        return "value"
+
+    def request(level):
+        start_request(f"req-{level}")
+        set_request_log_level(level)
+        enabled = debug_enabled()
+        logger.opt(lazy=True).debug("detail {}", expensive)
+        return enabled
+
+    assert contextvars.copy_context().run(request, None) is False
+    assert contextvars.copy_context().run(request, "DEBUG") is True
+
+    assert [(r["message"], r["extra"]["request_id"]) for r in records] == [("detail value", "req-DEBUG")]
+    assert len(calls) == 2  # lazy args run once the record passes loguru's level check
+
+
+def test_quiet_production_skips_debug_work(records):
+    configure_logging(sink=sink_into(records), level="INFO", enqueue=False)
+    calls = []
+
+    logger.opt(lazy=True).debug("detail {}", lambda: calls.append(1))
+    set_request_log_level("DEBUG")  # ignored without LOG_REQUEST_OVERRIDE
+
+    assert not debug_enabled()
+    assert calls == [] and records == []
+
+
+def test_sampling(records):
+    configure_logging(sink=sink_into(records), level="DEBUG", sample_rate=0.0, enqueue=False)
+    for _ in range(50):
+        sampled_logger.debug("per candidate")
+    logger.debug("summary")
+    assert [r["message"] for r in records] == ["summary"]
+
+    records.clear()
+    configure_logging(sink=sink_into(records), level="DEBUG", sample_rate=1.0, enqueue=False)
+    for _ in range(5):
+        sampled_logger.debug("per candidate")
+    assert len(records) == 5
+
+
+def test_enqueued_sink_is_flushed(records):
+    lines = []
+    configure_logging(sink=lines.append, level="INFO", enqueue=True)
+    logger.info("queued")
+    logger.complete()
+    assert any("queued" in line for line in lines)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,109 @@
+"""
+Test micro-batching of inference requests from concurrent threads
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from design_system_agent.agent.core.instrumentation import BATCH_SIZE
+from design_system_agent.agent.core.micro_batcher import MicroBatcher
+
+
+class SlowModel:
+    """Batch function with a fixed per-call cost, recording batch sizes"""
+
+    def __init__(self, cost_s=0.02):
+        self.cost_s = cost_s
+        self.batches = []
+        self.threads = set()
+
+    def __call__(self, items):
+        self.batches.append(len(items))
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.cost_s)
+        return np.array([len(item) for item in items])
+
+
+def run_concurrently(batcher, requests):
+    barrier = threading.Barrier(len(requests))
+
+    def call(items):
+        barrier.wait()
+        return list(batcher.run(items, timeout=5))
+
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(call, requests))
+
+
+def test_concurrent_requests_share_batches_and_get_their_own_results():
+    model = SlowModel()
+    batcher = MicroBatcher("test_shared", model, max_batch_size=64, max_wait_ms=20, enabled=True)
+    requests = [["a" * (i + 1)] * (i % 3 + 1) for i in range(8)]
+
+    results = run_concurrently(batcher, requests)
+
+    assert results == [[len(items[0])] * len(items) for items in requests]
+    assert len(model.batches) < len(requests)
+    assert sum(model.batches) == sum(len(items) for items in requests)
+    assert model.threads == {"batcher-test_shared"}
+    assert batcher.stats()["avg_batch_requests"] > 1
+    assert ("test_shared",) in BATCH_SIZE._series
+
+
+def test_batches_respect_max_size_but_run_oversized_requests_whole():
+    model = SlowModel(cost_s=0.01)
+    batcher = MicroBatcher("test_max", model, max_batch_size=4, max_wait_ms=20, enabled=True)
+
+    run_concurrently(batcher, [["x", "y", "z"]] * 6)
+    assert max(model.batches) <= 6  # a batch closes once it holds >= 4 items
+
+    assert list(batcher.run(["q"] * 10)) == [1] * 10
+    assert model.batches[-1] == 10
+
+
+def test_batch_failure_is_raised_in_every_request():
+    def broken(items):
+        raise RuntimeError("model crashed")
+
+    batcher = MicroBatcher("test_error", broken, max_wait_ms=20, enabled=True)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        run_concurrently(batcher, [["a"], ["b"]])
+    # The worker survives a failed batch
+    batcher.batch_fn = lambda items: items
+    assert batcher.run(["ok"]) == ["ok"]
+
+
+def test_disabled_batcher_runs_inline(monkeypatch):
+    monkeypatch.setenv("INFERENCE_BATCHING", "false")
+    model = SlowModel(cost_s=0)
+    batcher = MicroBatcher("test_inline", model)
+
+    assert list(batcher.run(["ab"])) == [2]
+    assert model.threads == {threading.current_thread().name}
+    assert batcher._thread is None
+
+
+def test_worker_restarts_in_forked_child():
+    batcher = MicroBatcher("test_fork", lambda items: [item * 2 for item in items], max_wait_ms=1, enabled=True)
+    assert batcher.run([1]) == [2]  # worker thread running in the parent
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = batcher.submit([21]).result(timeout=5) == [42]
+        os.write(write_fd, b"1" if ok else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.waitpid(pid, 0)
+    os.close(read_fd)
+
+    assert result == b"1"
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
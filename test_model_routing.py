@@ -0,0 +1,59 @@
+"""
+Test complexity-based model routing (ModelRouter / LLMFactory.route)
+"""
+import json
+
+from design_system_agent.agent.core.model_router import ModelRouter
+from design_system_agent.agent.graph_nodes.layout_selector_agent import LayoutSelectorAgent
+
+
+def test_default_rules():
+    router = ModelRouter(config={"default_model": "gpt-4o-mini"})
+
+    simple = router.route("llm_select_and_fill", {"pattern_type": "LIST_SIMPLE", "complexity_level": "basic"})
+    assert simple["name"] == "simple_list_no_llm" and simple["model"] is None
+
+    complex_ = router.route("llm_select_and_fill", {"pattern_type": "FULL_COMPLEX", "complexity_level": "advanced"})
+    assert complex_["model"] == "gpt-4o"
+
+    # no analysis yet -> default model
+    assert router.route("analyze_and_reformulate", None) == {
+        "name": "default", "node": "analyze_and_reformulate", "model": "gpt-4o-mini"
+    }
+
+
+def test_rules_from_env_json(monkeypatch):
+    config = {"rules": [{"name": "all_fast", "model": "gpt-3.5-turbo"}]}
+    monkeypatch.setenv("LLM_ROUTING_CONFIG", json.dumps(config))
+
+    route = ModelRouter().route("score_output", {"complexity_level": "advanced"})
+    assert route == {"name": "all_fast", "node": "score_output", "model": "gpt-3.5-turbo"}
+
+
+def test_cost_estimate_uses_cached_price():
+    router = ModelRouter(config={})
+    usage = {"input_tokens": 1_000_000, "cached_tokens": 500_000, "output_tokens": 100_000}
+
+    assert router.estimate_cost("gpt-4o-mini", usage) == round(0.5 * 0.15 + 0.5 * 0.075 + 0.1 * 0.60, 6)
+    assert router.estimate_cost("unknown-model", usage) == 0.0
+
+
+def test_no_llm_route_selects_top_candidate():
+    agent = LayoutSelectorAgent(use_tools=False)
+    candidates = [
+        {"id": "crm_1", "query": "show all leads", "layout": {"rows": [{"pattern_info": []}]}},
+        {"id": "crm_2", "query": "show lead detail", "layout": {"rows": []}},
+    ]
+
+    result = agent.select_best_layout(
+        "show all leads", "show all leads", candidates, "N/A",
+        route={"name": "simple_list_no_llm", "node": "llm_select_and_fill", "model": None}
+    )
+
+    assert result["llm_powered"] is False
+    assert result["selected_layout"]["id"] == "crm_1"
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
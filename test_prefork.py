@@ -0,0 +1,88 @@
+"""
+Test preload-then-fork serving: master preload, post-fork reset, FAISS mmap
+"""
+import gc
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from design_system_agent.api import prefork
+
+
+@pytest.fixture(autouse=True)
+def unfreeze():
+    yield
+    gc.unfreeze()
+
+
+def test_preload_builds_agent_once_in_master(monkeypatch):
+    monkeypatch.delenv("PRELOAD_MODELS", raising=False)
+    builds = []
+
+    summary = prefork.preload(lambda: builds.append("agent"))
+
+    assert builds == ["agent"]
+    assert summary["preloaded"] is True
+    assert gc.get_freeze_count() > 0
+
+
+def test_preload_disabled_or_failed_leaves_loading_to_workers(monkeypatch):
+    monkeypatch.setenv("PRELOAD_MODELS", "false")
+    assert prefork.preload(lambda: pytest.fail("agent built")) == {"preloaded": False}
+
+    monkeypatch.setenv("PRELOAD_MODELS", "true")
+
+    def broken():
+        raise OSError("model files missing")
+
+    summary = prefork.preload(broken)
+    assert summary["preloaded"] is False and "model files missing" in summary["error"]
+
+
+def test_forked_child_replaces_started_pools():
+    from design_system_agent.agent.core import llm_resilience
+
+    caller = llm_resilience.get_resilient_caller()
+    caller._executor.submit(lambda: None).result()  # pool has a thread in the parent
+    parent_pool = id(caller._executor)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        prefork.reinit_after_fork()
+        replaced = id(caller._executor) != parent_pool
+        works = caller._executor.submit(lambda: 42).result(timeout=5) == 42
+        os.write(write_fd, b"1" if replaced and works else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.waitpid(pid, 0)
+    os.close(read_fd)
+
+    assert result == b"1"
+    unused = ThreadPoolExecutor(max_workers=1)
+    assert prefork._fresh_pool(unused) is unused  # no threads to lose, kept as is
+
+
+def test_faiss_index_is_memory_mapped(tmp_path, monkeypatch):
+    faiss = pytest.importorskip("faiss")
+    from design_system_agent.agent.core.vector_layout_rag import read_faiss_index
+
+    monkeypatch.delenv("FAISS_MMAP", raising=False)
+    path = tmp_path / "layouts.faiss"
+    index = faiss.IndexFlatIP(8)
+    index.add(np.eye(8, dtype="float32"))
+    faiss.write_index(index, str(path))
+
+    mapped = read_faiss_index(path)
+    _, ids = mapped.search(np.eye(8, dtype="float32")[2:3], 1)
+
+    assert ids[0][0] == 2
+    assert any(str(path) in line for line in Path("/proc/self/maps").read_text().splitlines())
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
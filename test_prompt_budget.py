@@ -0,0 +1,42 @@
+"""
+Test prompt token budgeting and compaction (PromptBudget)
+"""
+from design_system_agent.agent.core.prompt_budget import PromptBudget, compact_json, count_tokens
+
+
+def test_compact_json_has_no_padding():
+    assert compact_json({"a": [1, 2], "b": "x"}) == '{"a":[1,2],"b":"x"}'
+
+
+def test_unlimited_budget_keeps_all_sections():
+    budget = PromptBudget()
+    budget.add("query", "QUERY: show my leads")
+    budget.add("examples", "EXAMPLES: " + "example " * 50, priority=2)
+
+    prompt = budget.render()
+    assert "QUERY: show my leads" in prompt
+    assert "EXAMPLES" in prompt
+    assert budget.last_report["sections"]["examples"]["state"] == "full"
+
+
+def test_summary_before_drop_and_required_sections_kept():
+    required = "QUERY: show my leads"
+    budget = PromptBudget(max_tokens=count_tokens(required) + 20)
+    budget.add("query", required)
+    budget.add("catalog", "COMPONENTS: " + "Table " * 100, priority=1, summary="COMPONENTS: Table")
+    budget.add("examples", "EXAMPLES: " + "example " * 100, priority=2, summary="EXAMPLES: " + "ex " * 60)
+
+    prompt = budget.render()
+    sections = budget.last_report["sections"]
+
+    assert required in prompt
+    assert sections["catalog"]["state"] == "summary"
+    assert sections["examples"]["state"] == "dropped"
+    assert budget.last_report["total_tokens"] <= budget.max_tokens
+
+
+if __name__ == "__main__":
+    test_compact_json_has_no_padding()
+    test_unlimited_budget_keeps_all_sections()
+    test_summary_before_drop_and_required_sections_kept()
+    print("✓ All prompt budget tests passed")
@@ -0,0 +1,61 @@
+"""
+Test that LLM prompts keep a byte-identical static prefix across requests
+(required for provider-side prompt prefix caching)
+"""
+import os
+
+# Use empty key to trigger mock LLM
+os.environ["OPENAI_API_KEY"] = ""
+
+from design_system_agent.agent.graph_nodes.layout_selector_agent import LayoutSelectorAgent
+from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
+
+
+def _candidate(layout_id, query, components):
+    return {
+        "id": layout_id,
+        "query": query,
+        "patterns_used": ["pattern1"],
+        "layout": {"rows": [{"pattern_type": "pattern1", "pattern_info": [{"type": c, "props": {"level": 1}} for c in components]}]},
+    }
+
+
+REQUESTS = [
+    ("show my leads", {"object_type": "lead", "pattern_type": "LIST_SIMPLE"},
+     [_candidate("crm_1", "show my lead", ["Heading", "Table"])]),
+    ("sum of loan amount grouped by branch", {"object_type": "loan", "pattern_type": "AGGREGATE", "group_by_field": "branch"},
+     [_candidate("crm_7", "loan totals", ["Heading", "Metric", "Card"] * 20), _candidate("crm_9", "loans", ["Table"])]),
+]
+
+
+def test_layout_selector_prefix_is_byte_identical():
+    for use_tools in (True, False):
+        agent = LayoutSelectorAgent(use_tools=use_tools)
+        agent.use_tools = use_tools
+        prefix = agent.get_static_prefix()
+
+        prompts = [
+            agent._build_prompt(query, query, layouts, "No data available", analysis)
+            for query, analysis, layouts in REQUESTS
+        ]
+
+        for prompt in prompts:
+            assert prompt.startswith(prefix)
+            assert "QUERY:" not in prefix and "CANDIDATES (" not in prefix
+        assert prompts[0] != prompts[1]
+
+
+def test_query_analyzer_system_prompt_is_static():
+    prompt = QueryAnalyzer.get_analysis_prompt()
+    first = prompt.format_messages(normalized_query="show my leads")
+    second = prompt.format_messages(normalized_query="branch wise count of leads")
+
+    assert first[0].content == second[0].content
+    assert "show my leads" in first[-1].content
+    assert "show my leads" not in first[0].content
+
+
+if __name__ == "__main__":
+    test_layout_selector_prefix_is_byte_identical()
+    test_query_analyzer_system_prompt_is_static()
+    print("✓ All prompt prefix tests passed")
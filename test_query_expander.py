@@ -0,0 +1,48 @@
+"""
+Test local query variation generation (QueryExpander)
+"""
+from design_system_agent.agent.core.query_expander import QueryExpander, pluralize
+from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalysis
+
+
+def test_variations_are_deterministic():
+    expander = QueryExpander()
+    first = expander.expand("Show me my leads")
+    second = expander.expand("Show me my leads")
+
+    assert first == second
+    assert first[0] == "show me my leads"
+    assert len(first) == len(set(first)) <= 5
+
+
+def test_verb_plural_and_field_rewrites():
+    expander = QueryExpander(max_variations=10)
+
+    variations = expander.expand("top 10 leads sorted by created_date")
+    assert "show top 10 leads sorted by created_date" in variations
+    assert "top 10 lead sorted by created_date" in variations
+    assert "top 10 leads sorted by created date" in variations
+
+    variations = expander.expand("branch wise count of leads where loan status is approved")
+    assert "count of leads grouped by branch where loan status is approved" in variations
+    # objects used as modifiers keep their number
+    assert all("loans status" not in v and "branches wise" not in v for v in variations)
+
+
+def test_pluralize():
+    assert pluralize("lead") == "leads"
+    assert pluralize("branch") == "branches"
+    assert pluralize("opportunity") == "opportunities"
+
+
+def test_generated_queries_hidden_from_llm_schema():
+    schema = QueryAnalysis.model_json_schema()
+    assert "generated_queries" not in schema["properties"]
+
+
+if __name__ == "__main__":
+    test_variations_are_deterministic()
+    test_verb_plural_and_field_rewrites()
+    test_pluralize()
+    test_generated_queries_hidden_from_llm_schema()
+    print("✓ All query expander tests passed")
@@ -0,0 +1,189 @@
+"""
+Test refinement sessions: bounded / expiring store, delta analysis, follow-up turns reusing the previous turn
+"""
+import asyncio
+import json
+import sqlite3
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from design_system_agent.agent.core import refinement_sessions
+from design_system_agent.agent.core.degradation_tiers import TierController
+from design_system_agent.agent.core.refinement_sessions import SessionStore, SQLiteSessionStore, get_session_store
+from design_system_agent.agent.core.single_flight import SingleFlight
+from design_system_agent.agent.core.vector_layout_rag import VectorLayoutRAGEngine
+from design_system_agent.agent.graph_nodes.default_layout import DefaultLayoutBuilder
+from design_system_agent.agent.graph_nodes.fallback_layout_builder import FallbackLayoutBuilder
+from design_system_agent.agent.graph_nodes.layout_orchestrator import LLMLayoutSelectorFiller
+from design_system_agent.agent.graph_nodes.layout_scorer_node import OutputScorer
+from design_system_agent.agent.graph_nodes.node_executor import WorkflowExecutor
+from design_system_agent.agent.graph_nodes.query_analyzer_node import QueryAnalyzer
+from design_system_agent.agent.layout_graph_agent import GraphAgent
+from design_system_agent.agent.layout_graph_builder import GraphBuilder
+from design_system_agent.agent.tools.data_fetcher import DataFetcherTool
+from design_system_agent.api import router as router_module
+
+
+def _entry(query, component):
+    return {"query": query, "object_type": "lead", "layout_type": "list", "patterns_used": ["LIST_SIMPLE"],
+            "metadata": {}, "layout": {"rows": [{"pattern_type": "data_list", "pattern_info": [{"type": component, "props": {}}]}]}}
+
+
+class FakeRAG(VectorLayoutRAGEngine):
+    """Catalog of a table and a card layout; search returns both, refilter is the engine's"""
+
+    def __init__(self):
+        self.layouts_metadata = [_entry("show all leads", "Table"), _entry("leads as cards", "Card")]
+        self.view_type_components = {"card": ["Card", "Metric", "Dashlet"], "table": ["Table"], "list": ["List", "ListCard"]}
+        self.searches = 0
+
+    def search(self, **kwargs):
+        self.searches += 1
+        return [{**self._catalog_entry(0), "vector_score": 0.9}, {**self._catalog_entry(1), "vector_score": 0.8}]
+
+
+def _agent():
+    """GraphAgent on the minimal tier (no LLM), without checkpoints"""
+    executor = WorkflowExecutor.__new__(WorkflowExecutor)
+    executor.layout_rag = FakeRAG()
+    executor.query_analyzer = QueryAnalyzer()
+    executor.data_fetcher = DataFetcherTool()
+    executor.output_scorer = OutputScorer()
+    executor.llm_selector_filler = LLMLayoutSelectorFiller()
+    executor.fallback_builder = FallbackLayoutBuilder()
+    executor.default_builder = DefaultLayoutBuilder()
+
+    agent = GraphAgent.__new__(GraphAgent)
+    agent.executor = executor
+    agent.checkpointer = None
+    agent.graph = GraphBuilder.build(executor)
+    agent.verbose = False
+    agent.single_flight = SingleFlight(enabled=True)
+    agent.tiers = TierController(forced="minimal")
+    return agent
+
+
+@pytest.fixture
+def shared_sessions(tmp_path, monkeypatch):
+    """Sessions in a SQLite file, like the workers of a host"""
+    sessions = SQLiteSessionStore(tmp_path / "graph.sqlite")
+    monkeypatch.setattr(refinement_sessions, "_session_store", sessions)
+    return sessions
+
+
+def _store(backend, tmp_path, **kwargs):
+    return SessionStore(**kwargs) if backend == "memory" else SQLiteSessionStore(tmp_path / "graph.sqlite", **kwargs)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_is_bounded_and_expires(backend, tmp_path):
+    sessions = _store(backend, tmp_path, ttl_s=60, max_sessions=2)
+    first, second, third = sessions.create(), sessions.create(), sessions.create()
+    assert not sessions.exists(first) and sessions.exists(second) and sessions.exists(third)
+    assert sessions.get_stats()["evicted"] == 1
+
+    turn = {"analysis": {}, "candidates": [], "fetched_data": {}, "selected_id": None}
+    assert sessions.record_turn(second, turn) == 1 and sessions.last_turn(second) == turn
+    assert sessions.record_turn(first, turn) == 0  # evicted sessions are not revived
+    assert sessions.create(second) == second and sessions.last_turn(second) == turn  # existing IDs are kept
+
+    expiring = _store(backend, tmp_path / "expiring", ttl_s=0)
+    session_id = expiring.create()
+    time.sleep(0.01)
+    assert expiring.last_turn(session_id) is None
+    expiring.delete(session_id)  # SQLite: writes drop expired sessions
+    assert expiring.get_stats()["expired"] == 1
+
+
+def test_lookups_do_not_wait_for_writers(shared_sessions, tmp_path):
+    session_id = shared_sessions.create()
+    turn = {"analysis": {"object_type": "lead"}, "candidates": [{"id": "crm_0", "vector_score": 0.9}],
+            "fetched_data": {}, "selected_id": "crm_0"}
+    shared_sessions.record_turn(session_id, turn)
+
+    other_worker = sqlite3.connect(tmp_path / "graph.sqlite", isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")  # holds the write lock
+    try:
+        started = time.monotonic()
+        assert shared_sessions.last_turn(session_id) == turn and shared_sessions.exists(session_id)
+        assert time.monotonic() - started < 1
+    finally:
+        other_worker.execute("ROLLBACK")
+        other_worker.close()
+    stored = sqlite3.connect(tmp_path / "graph.sqlite").execute("SELECT turn FROM sessions").fetchone()[0]
+    assert json.loads(stored) == turn  # plain JSON, no pickle
+
+
+def test_refine_applies_deltas_and_detects_material_changes():
+    leads = QueryAnalyzer.keyword_analysis("show my leads").model_dump(exclude={"generated_queries"})
+
+    narrowed = QueryAnalyzer.refine(leads, "only high priority")
+    assert narrowed.normalized_query == "show my leads only high priority"
+    assert narrowed.object_type == "lead" and narrowed.has_conditions and narrowed.pattern_type == "LIST_ADVANCED"
+    assert narrowed.generated_queries
+
+    as_cards = QueryAnalyzer.refine(narrowed.model_dump(exclude={"generated_queries"}), "as cards")
+    assert as_cards.view_type == "card" and as_cards.has_conditions
+
+    assert QueryAnalyzer.refine(leads, "show open cases") is None  # other object
+    assert QueryAnalyzer.refine(leads, "create a new lead") is None  # other intent
+
+
+def test_follow_up_turns_reuse_the_previous_turn(shared_sessions, tmp_path):
+    agent = _agent()
+    rag = agent.executor.layout_rag
+    session_id = get_session_store().create()
+
+    first = agent.invoke("show my leads", session_id=session_id)
+    assert first["id"] == "crm_0" and rag.searches == 1
+    assert first["metrics"]["session"] == {"session_id": session_id, "turn": 1, "reused": {}}
+
+    narrowed = agent.invoke("only high priority", session_id=session_id)
+    assert narrowed["metrics"]["session"]["reused"] == {
+        "analysis": "delta", "retrieval": "refiltered", "data": "reused", "selection": "rebound"
+    }
+    assert narrowed["id"] == "crm_0" and rag.searches == 1
+    assert narrowed["metrics"]["routes"]["llm_select_and_fill"]["name"] == "session_refine"
+    assert "analyze_and_reformulate" not in narrowed["metrics"]["routes"]  # no analysis call
+    # Another worker of the host continues the session
+    assert SQLiteSessionStore(tmp_path / "graph.sqlite").last_turn(session_id)["analysis"]["has_conditions"]
+
+    as_cards = agent.invoke("as cards", session_id=session_id)
+    assert as_cards["metrics"]["session"]["reused"]["selection"] == "refiltered"
+    assert as_cards["id"] == "crm_1" and rag.searches == 1
+
+    other = agent.invoke("show open cases", session_id=session_id)
+    assert other["metrics"]["session"]["reused"] == {"analysis": "full", "retrieval": "full", "data": "fetched"}
+    assert rag.searches == 2 and other["metrics"]["session"]["turn"] == 4
+
+
+def test_unknown_session_runs_a_cold_first_turn(shared_sessions, monkeypatch):
+    agent = _agent()
+
+    def process_query(query, deadline_ms=None, profile=False, idempotency_key=None, tier=None, session_id=None):
+        return agent.invoke(query, deadline_ms=deadline_ms, session_id=session_id)
+
+    monkeypatch.setattr(router_module, "get_agent", lambda: type("Agent", (), {"process_query": staticmethod(process_query)}))
+    app = FastAPI()
+    app.include_router(router_module.router)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = await client.post("/sessions/expired-1/query", json={"query": "show my leads"})
+            follow_up = await client.post("/sessions/expired-1/query", json={"query": "only high priority"})
+            invalid = await client.post("/sessions/bad.id/query", json={"query": "show my leads"})
+            return first, follow_up, invalid
+
+    first, follow_up, invalid = asyncio.run(scenario())
+    assert first.status_code == 200 and first.json()["metrics"]["session"]["turn"] == 1
+    assert first.json()["metrics"]["session"]["reused"] == {}
+    assert follow_up.json()["metrics"]["session"]["turn"] == 2
+    assert follow_up.json()["metrics"]["session"]["reused"]["analysis"] == "delta"
+    assert invalid.status_code == 422
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,127 @@
+"""
+Test the opt-in per-request sampling profiler
+"""
+import json
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from design_system_agent.agent.core import request_profiler
+from design_system_agent.agent.core.request_profiler import RequestProfiler, should_profile
+
+
+class WorkflowExecutor:
+    """Stand-in with the qualified names of real graph nodes"""
+
+    def retrieve_layouts(self, seconds):
+        return busy(seconds)
+
+    def score_output(self, seconds):
+        return busy(seconds)
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def run_profiled(request_id, tmp_path):
+    profiler = RequestProfiler(request_id, interval_ms=1, output_dir=str(tmp_path))
+    profiler.start()
+    executor = WorkflowExecutor()
+    executor.retrieve_layouts(0.15)
+    executor.score_output(0.05)
+    return profiler.stop()
+
+
+def test_profile_is_split_by_node_and_written(tmp_path):
+    summary = run_profiled("req-a", tmp_path)
+
+    assert summary["samples"] > 20
+    assert summary["by_node"]["retrieve_layouts"] > summary["by_node"]["score_output"] > 0
+
+    collapsed = open(summary["collapsed_path"], encoding="utf-8").read()
+    assert "node:retrieve_layouts;" in collapsed and "busy" in collapsed
+
+    speedscope = json.load(open(summary["speedscope_path"], encoding="utf-8"))
+    names = {profile["name"] for profile in speedscope["profiles"]}
+    assert {"req-a retrieve_layouts", "req-a score_output"} <= names
+    frame_names = {frame["name"] for frame in speedscope["shared"]["frames"]}
+    assert "busy" in frame_names and "test_profile_is_split_by_node_and_written" not in frame_names
+
+
+def test_concurrent_profiles_only_sample_their_own_thread(tmp_path):
+    results = {}
+
+    def worker(name, node_seconds):
+        profiler = RequestProfiler(name, interval_ms=1, output_dir=str(tmp_path))
+        profiler.start()
+        getattr(WorkflowExecutor(), node_seconds[0])(node_seconds[1])
+        results[name] = profiler.stop(write=False)
+
+    threads = [
+        threading.Thread(target=worker, args=("req-x", ("retrieve_layouts", 0.1))),
+        threading.Thread(target=worker, args=("req-y", ("score_output", 0.1))),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(results["req-x"]["by_node"]) - {"outside_nodes"} == {"retrieve_layouts"}
+    assert set(results["req-y"]["by_node"]) - {"outside_nodes"} == {"score_output"}
+
+
+def test_off_by_default_and_opt_in(monkeypatch):
+    monkeypatch.delenv("PROFILE_SAMPLE_RATE", raising=False)
+    monkeypatch.delenv("PROFILE_HEADER_ENABLED", raising=False)
+    assert not should_profile(requested=True)
+    assert RequestProfiler.maybe_start("req-off", requested=True) is None
+
+    monkeypatch.setenv("PROFILE_HEADER_ENABLED", "true")
+    assert should_profile(requested=True)
+    assert not should_profile(requested=False)
+
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1.0")
+    assert should_profile(requested=False)
+
+
+def test_concurrency_cap(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1.0")
+    monkeypatch.setenv("PROFILE_MAX_CONCURRENT", "1")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+
+    first = RequestProfiler.maybe_start("req-1")
+    assert first is not None
+    assert RequestProfiler.maybe_start("req-2") is None
+    first.stop(write=False)
+    second = RequestProfiler.maybe_start("req-3")
+    assert second is not None
+    second.stop(write=False)
+    assert request_profiler._active_profiles == 0
+
+
+def test_traversal_request_ids_stay_in_the_profile_dir(tmp_path):
+    from fastapi.testclient import TestClient
+    from design_system_agent.api import main
+
+    client = TestClient(main.app)  # no lifespan: only the request ID middleware runs
+    for header in ("../../etc/foo", "/tmp/evil", "a" * 65):
+        request_id = client.get("/no-such-route", headers={"X-Request-ID": header}).headers["X-Request-ID"]
+        assert request_id != header and "/" not in request_id and "." not in request_id
+    assert client.get("/no-such-route", headers={"X-Request-ID": "gateway-42"}).headers["X-Request-ID"] == "gateway-42"
+
+    profile_dir = tmp_path / "profiles"
+    summary = run_profiled("../../evil", profile_dir)
+    for path in (summary["collapsed_path"], summary["speedscope_path"]):
+        assert Path(path).resolve().parent == profile_dir.resolve()
+    assert not (tmp_path / "evil.collapsed").exists()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
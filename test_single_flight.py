@@ -0,0 +1,110 @@
+"""
+Test single-flight coalescing of identical in-flight queries and idempotency keys
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from design_system_agent.agent.core.deadline import budget_class, new_deadline
+from design_system_agent.agent.core.single_flight import IdempotencyConflict, SingleFlight, coalesce_key
+
+
+def slow_execution(calls, delay=0.1):
+    def run():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return {"layout": {"rows": [1, 2]}, "request_id": "leader"}
+    return run
+
+
+def test_coalesce_key_normalizes_query_and_options():
+    assert coalesce_key("  Show my   LEADS ") == coalesce_key("show my leads")
+    assert coalesce_key("show my leads", tier="lean") != coalesce_key("show my leads", tier="full")
+    assert coalesce_key("show my leads", tier=None) == coalesce_key("show my leads")
+
+
+def test_concurrent_duplicates_share_one_execution():
+    flight, calls = SingleFlight(enabled=True), []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = list(pool.map(lambda _: flight.do(coalesce_key("show my leads"), slow_execution(calls)), range(8)))
+
+    assert len(calls) == 1
+    roles = sorted(role for _, role in outcomes)
+    assert roles == ["follower"] * 7 + ["leader"]
+    results = [result for result, _ in outcomes]
+    assert all(result == results[0] for result in results)
+    assert len({id(result) for result in results}) == 8  # followers get copies
+
+    # Nothing is kept once the execution finished
+    flight.do(coalesce_key("show my leads"), slow_execution(calls, 0))
+    assert len(calls) == 2 and flight.get_stats()["in_flight"] == 0
+
+
+def test_errors_propagate_to_followers_and_are_not_kept():
+    flight = SingleFlight(enabled=True)
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("graph failed")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "q", failing, "retry-1")
+        started.wait()
+        follower = pool.submit(flight.do, "q", failing, "retry-1")
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="graph failed"):
+                future.result()
+
+    calls = []
+    assert flight.do("q", slow_execution(calls, 0), idempotency_key="retry-1")[1] == "leader"
+
+
+def test_idempotency_key_replays_within_ttl_and_rejects_other_queries(monkeypatch):
+    flight, calls = SingleFlight(enabled=False, idempotency_ttl_s=60, max_idempotency_keys=2), []
+    assert flight.do("q", slow_execution(calls, 0), idempotency_key="k1")[1] == "leader"
+    result, role = flight.do("q", slow_execution(calls, 0), idempotency_key="k1")
+    assert role == "replay" and result["layout"] == {"rows": [1, 2]} and len(calls) == 1
+
+    with pytest.raises(IdempotencyConflict):
+        flight.do("other query", slow_execution(calls, 0), idempotency_key="k1")
+    assert flight.do("q|tier=lean", slow_execution(calls, 0), idempotency_key="k1")[1] == "replay"
+
+    # Bounded by size and TTL
+    flight.do("q2", slow_execution(calls, 0), idempotency_key="k2")
+    flight.do("q3", slow_execution(calls, 0), idempotency_key="k3")
+    assert flight.get_stats()["idempotency_keys"] == 2
+    flight.idempotency_ttl_s = 0
+    time.sleep(0.01)
+    assert flight.do("q", slow_execution(calls, 0), idempotency_key="k1")[1] == "leader"
+    assert flight.get_stats()["idempotency_keys"] == 1
+
+
+def test_short_budgets_do_not_share_and_followers_stop_waiting():
+    assert budget_class(new_deadline(15000)) == "full" and budget_class(new_deadline(0)) == "short"
+    assert coalesce_key("q", budget="short") != coalesce_key("q", budget="full")
+
+    flight, calls = SingleFlight(enabled=True), []
+    started = threading.Event()
+
+    def leader_run():
+        started.set()
+        return slow_execution(calls, 0.5)()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "q", leader_run)
+        started.wait()
+        waited = time.perf_counter()
+        result, role = flight.do("q", lambda: {"request_id": "own"}, timeout_s=0.05)
+        waited = time.perf_counter() - waited
+        assert leader.result()[1] == "leader"
+
+    assert role == "detached" and result == {"request_id": "own"} and waited < 0.4
+    assert flight.get_stats()["detached"] == 1 and flight.get_stats()["waiting_followers"] == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,82 @@
+"""
+Test the per-worker thread budget: cgroup quota, worker split, applying to torch / FAISS
+"""
+import os
+
+import pytest
+
+from design_system_agent.agent.core import thread_budget
+
+
+@pytest.fixture(autouse=True)
+def isolated_env(monkeypatch):
+    saved = dict(os.environ)
+    for name in ("WEB_CONCURRENCY", "WORKER_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS",
+                 "OPENBLAS_NUM_THREADS", "TOKENIZERS_PARALLELISM"):
+        os.environ.pop(name, None)
+    monkeypatch.setattr(thread_budget, "_applied", None)
+    yield
+    os.environ.clear()
+    os.environ.update(saved)
+
+
+def test_cgroup_v2_and_v1_quotas(tmp_path):
+    (tmp_path / "cpu.max").write_text("250000 100000\n")
+    assert thread_budget._cgroup_quota(tmp_path) == 2.5
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert thread_budget._cgroup_quota(tmp_path) is None
+
+    v1 = tmp_path / "v1"
+    (v1 / "cpu").mkdir(parents=True)
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("150000\n")
+    (v1 / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert thread_budget._cgroup_quota(v1) == 1.5
+
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert thread_budget._cgroup_quota(v1) is None
+    assert thread_budget._cgroup_quota(tmp_path / "missing") is None
+
+
+def test_budget_splits_quota_between_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+    (tmp_path / "cpu.max").write_text("400000 100000\n")
+
+    budget = thread_budget.compute_thread_budget(workers=2, cgroup_root=tmp_path)
+    assert budget["cpus_available"] == 4 and budget["cpu_limit_source"] == "cgroup"
+    assert budget["threads_per_worker"] == 2 and budget["torch_interop_threads"] == 1
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "8")
+    assert thread_budget.compute_thread_budget(cgroup_root=tmp_path)["threads_per_worker"] == 1
+
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    budget = thread_budget.compute_thread_budget(workers=4, cgroup_root=tmp_path)
+    assert budget["cpu_limit_source"] == "affinity" and budget["threads_per_worker"] == 4
+
+    monkeypatch.setenv("WORKER_THREADS", "3")
+    budget = thread_budget.compute_thread_budget(workers=4, cgroup_root=tmp_path)
+    assert budget["threads_per_worker"] == 3 and budget["cpu_limit_source"] == "WORKER_THREADS"
+
+
+def test_apply_sets_env_and_faiss_pool():
+    faiss = pytest.importorskip("faiss")
+    previous = faiss.omp_get_max_threads()
+    os.environ["MKL_NUM_THREADS"] = "7"  # explicit settings are kept
+    os.environ["WORKER_THREADS"] = "1"
+    try:
+        budget = thread_budget.apply_thread_budget(workers=2)
+        assert os.environ["OMP_NUM_THREADS"] == "1" and os.environ["MKL_NUM_THREADS"] == "7"
+        assert os.environ["TOKENIZERS_PARALLELISM"] == "false"
+
+        report = thread_budget.get_thread_budget()
+        assert report["workers"] == 2 and report["threads_per_worker"] == budget["threads_per_worker"]
+        assert report["actual"]["faiss_omp_threads"] == 1
+
+        # Later calls keep the worker count the process was set up with
+        assert thread_budget.ensure_thread_budget()["workers"] == 2
+    finally:
+        faiss.omp_set_num_threads(previous)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
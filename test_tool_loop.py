@@ -0,0 +1,118 @@
+"""
+Test the LayoutSelectorAgent tool-calling loop and memoized design tools
+"""
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+
+from design_system_agent.agent.graph_nodes.layout_selector_agent import (
+    LayoutSelectionResult,
+    LayoutSelectorAgent,
+)
+from design_system_agent.agent.tools.langchain_design_tools import (
+    clear_tool_cache,
+    get_tool_cache_stats,
+    invoke_design_tool,
+)
+
+
+CANDIDATES = [{"id": "crm_1", "query": "show all leads", "layout": {"rows": []}}]
+DECISION = {"selected_layout_id": "crm_1", "confidence": 0.9, "reasoning": "match"}
+
+
+def _scripted_agent(turns, max_tool_rounds=2):
+    """Agent whose tool-bound LLM replays the given AIMessages and records its inputs"""
+    agent = LayoutSelectorAgent(use_tools=False, max_tool_rounds=max_tool_rounds)
+    seen = []
+
+    def reply(messages):
+        seen.append(list(messages))
+        return turns[len(seen) - 1]
+
+    agent.use_tools = True
+    agent.llm_with_tools = RunnableLambda(reply)
+    agent.llm_structured = RunnableLambda(
+        lambda messages: LayoutSelectionResult(selected_layout_id="crm_1", confidence=0.4, reasoning="forced")
+    )
+    return agent, seen
+
+
+def test_parallel_tool_calls_then_decision():
+    clear_tool_cache()
+    agent, seen = _scripted_agent([
+        AIMessage(content="", tool_calls=[
+            {"name": "search_icons", "args": {"query": "user"}, "id": "c1"},
+            {"name": "get_semantic_colors", "args": {}, "id": "c2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "LayoutSelectionResult", "args": DECISION, "id": "c3"},
+        ]),
+    ])
+
+    result = agent.select_best_layout("show leads", "show leads", CANDIDATES, "N/A")
+
+    assert result["confidence"] == 0.9
+    tool_messages = [m for m in seen[1] if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == ["c1", "c2"]
+    assert "user" in tool_messages[0].content
+    assert [c["name"] for c in result["tool_calls"]] == ["search_icons", "get_semantic_colors"]
+
+
+def test_round_limit_forces_structured_decision():
+    lookup = AIMessage(content="", tool_calls=[{"name": "get_all_colors", "args": {}, "id": "c1"}])
+    agent, seen = _scripted_agent([lookup, lookup, lookup], max_tool_rounds=2)
+
+    result = agent.select_best_layout("show leads", "show leads", CANDIDATES, "N/A")
+
+    assert len(seen) == 2
+    assert result["reasoning"] == "forced"
+
+
+def test_bad_arguments_and_invalid_decisions_are_fed_back():
+    clear_tool_cache()
+    agent, seen = _scripted_agent([
+        AIMessage(content="", tool_calls=[
+            {"name": "get_component_schema", "args": {"bogus_arg": 1}, "id": "c1"},
+            {"name": "LayoutSelectionResult", "args": {"selected_layout_id": "crm_1"}, "id": "c2"},
+        ]),
+        AIMessage(content="", tool_calls=[
+            {"name": "LayoutSelectionResult", "args": DECISION, "id": "c3"},
+        ]),
+    ])
+
+    result = agent.select_best_layout("show leads", "show leads", CANDIDATES, "N/A")
+
+    assert result["confidence"] == 0.9 and result["reasoning"] == "match"  # not the fallback
+    errors = {m.tool_call_id: m.content for m in seen[1] if isinstance(m, ToolMessage)}
+    assert "ValidationError" in errors["c1"] and "ValidationError" in errors["c2"]
+    assert get_tool_cache_stats()["size"] == 0  # errors are not memoized
+
+
+def test_tool_results_memoized_across_calls():
+    clear_tool_cache()
+    first = invoke_design_tool("get_color_shades", {"color_name": "blue"})
+    second = invoke_design_tool("get_color_shades", {"color_name": "blue"})
+
+    assert first == second and "blue-60" in first
+    stats = get_tool_cache_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert "error" in invoke_design_tool("drop_tables", {})
+
+
+def test_tools_prefix_omits_full_catalog():
+    agent = LayoutSelectorAgent(use_tools=False)
+    legacy_prefix = agent.get_static_prefix()
+    agent.use_tools = True
+    tools_prefix = agent.get_static_prefix()
+
+    assert "COMPONENTS BY CATEGORY" in legacy_prefix
+    assert "COMPONENTS BY CATEGORY" not in tools_prefix
+    assert "list_all_components" in tools_prefix
+
+
+if __name__ == "__main__":
+    test_parallel_tool_calls_then_decision()
+    test_round_limit_forces_structured_decision()
+    test_bad_arguments_and_invalid_decisions_are_fed_back()
+    test_tool_results_memoized_across_calls()
+    test_tools_prefix_omits_full_catalog()
+    print("✓ All tool loop tests passed")
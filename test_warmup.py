@@ -0,0 +1,84 @@
+"""
+Test startup warmup steps and the /ready readiness gate
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from design_system_agent.api import main
+from design_system_agent.api.warmup import Readiness, run_warmup
+
+
+class FakeIndex:
+    ntotal = 5
+
+    def __init__(self):
+        self.searches = 0
+
+    def search(self, vectors, k):
+        self.searches += 1
+        return np.zeros((1, k)), np.zeros((1, k), dtype=int)
+
+
+def make_agent(calls):
+    rag = SimpleNamespace(
+        embedding_model=SimpleNamespace(encode=lambda texts, **kw: calls.append("encode") or np.zeros((len(texts), 4))),
+        reranker=SimpleNamespace(predict=lambda pairs: calls.append("rerank") or [0.0] * len(pairs)),
+        index=FakeIndex(),
+    )
+    selector = SimpleNamespace(_llms_for_model=lambda model: calls.append(f"llm:{model}"))
+    graph_agent = SimpleNamespace(
+        executor=SimpleNamespace(layout_rag=rag, llm_selector_filler=SimpleNamespace(selector_agent=selector)),
+        invoke=lambda query, deadline_ms=None: calls.append(("graph", query, deadline_ms)),
+    )
+    return SimpleNamespace(agent=graph_agent)
+
+
+def test_warmup_runs_every_step():
+    calls = []
+    agent = make_agent(calls)
+    readiness = run_warmup(lambda: agent, Readiness())
+
+    assert readiness.ready
+    assert {step["status"] for step in readiness.snapshot()["steps"].values()} == {"done"}
+    assert "encode" in calls and "rerank" in calls
+    assert agent.agent.executor.layout_rag.index.searches == 1
+    assert "llm:gpt-4o" in calls  # complex_strong route model is prebuilt
+    assert ("graph", "show all leads", 0) in calls  # expired deadline = no LLM calls
+
+
+def test_failed_step_keeps_service_unready():
+    def broken_agent():
+        raise OSError("model download failed")
+
+    readiness = run_warmup(broken_agent, Readiness())
+
+    snapshot = readiness.snapshot()
+    assert snapshot["status"] == "failed"
+    assert snapshot["steps"]["agent"]["status"] == "failed"
+    assert "model download failed" in snapshot["error"]
+
+
+def test_ready_endpoint_flips_after_warmup(monkeypatch):
+    readiness = Readiness()
+    monkeypatch.setattr(main, "get_readiness", lambda: readiness)
+    client = TestClient(main.app)  # no lifespan: warmup is driven by the test
+
+    assert client.get("/health").status_code == 200
+    assert client.get("/ready").status_code == 503
+
+    run_warmup(lambda: make_agent([]), readiness)
+    response = client.get("/ready")
+    assert response.status_code == 200 and response.json()["status"] == "ready"
+
+
+def test_warmup_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    readiness = run_warmup(lambda: pytest.fail("agent must not be built"), Readiness())
+    assert readiness.ready
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))